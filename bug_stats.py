@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+问题每日统计汇总表（bug_daily_stats）
+按 (创建日期, 团队, 产品线, 状态, 类型) 汇总问题数量，看板类接口读取汇总表而不是扫描bugs表。
+
+- 团队取处理人所在的团队（user_teams），处理人属于多个团队时每个团队各计一次；
+  未分配或处理人没有团队时团队为空字符串
+- team = ALL_TEAMS 的行每个问题只计一次，用于全局统计
+- 修改问题（或处理人的团队）时，在修改前调用remove_*、修改后调用add_*，与业务更新在同一事务中：
+  先减去旧状态的贡献，再加上新状态的贡献，适用于任意字段的变化
+- PostgreSQL（READ COMMITTED）下remove_*先锁定相关问题行（FOR UPDATE），再锁定处理人行：
+  并发修改同一问题（或同一处理人的团队）时，后一个事务等前一个提交后再读取旧状态，汇总表不会漂移。
+  加锁顺序固定为先问题后用户，避免死锁；SQLite的写事务本身串行，不需要加锁
+- rebuild() 从bugs表全量重建（database_tools/maintenance_tools/rebuild_bug_daily_stats.py）
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import DB_TYPE
+from sql_adapter import adapt_sql
+
+# 全局统计行的团队值（每个问题只计一次）
+ALL_TEAMS = '*'
+
+# created_at为空的问题归到该日期
+UNKNOWN_DAY = '1970-01-01'
+
+KEY_COLUMNS = ('day', 'team', 'product_line_id', 'status', 'type')
+
+# 问题对汇总表的贡献：按处理人团队展开的行 + 全局行
+_CONTRIBUTION_SQL = f'''
+    SELECT COALESCE(DATE(b.created_at), '{UNKNOWN_DAY}') AS day, COALESCE(ut.team, '') AS team,
+           COALESCE(b.product_line_id, 0) AS product_line_id,
+           COALESCE(b.status, '') AS status, COALESCE(b.type, '') AS type
+    FROM bugs b
+    LEFT JOIN user_teams ut ON ut.user_id = b.assigned_to
+    WHERE {{where}}
+    UNION ALL
+    SELECT COALESCE(DATE(b.created_at), '{UNKNOWN_DAY}'), '{ALL_TEAMS}',
+           COALESCE(b.product_line_id, 0),
+           COALESCE(b.status, ''), COALESCE(b.type, '')
+    FROM bugs b
+    WHERE {{where}}
+'''
+
+
+def _apply(cursor, where_sql: str, params: Sequence[Any], sign: int) -> None:
+    """把满足where_sql的问题的贡献乘以sign累加到汇总表"""
+    # sign只能是1或-1，直接写入SQL：rebuild()因此不带参数，可用于与应用配置不同类型的数据库（如同步工具的目标库）
+    contributions = _CONTRIBUTION_SQL.format(where=where_sql)
+    query, query_params = adapt_sql(f'''
+        INSERT INTO bug_daily_stats (day, team, product_line_id, status, type, bug_count)
+        SELECT day, team, product_line_id, status, type, COUNT(*) * {1 if sign > 0 else -1}
+        FROM ({contributions}) contributions
+        WHERE 1 = 1
+        GROUP BY day, team, product_line_id, status, type
+        ON CONFLICT (day, team, product_line_id, status, type)
+        DO UPDATE SET bug_count = bug_daily_stats.bug_count + excluded.bug_count
+    ''', tuple(params) + tuple(params))
+    cursor.execute(query, query_params)
+
+
+def _ids_condition(bug_ids: Iterable[int]) -> Tuple[Optional[str], List[Any]]:
+    ids = [bug_id for bug_id in bug_ids if bug_id is not None]
+    if not ids:
+        return None, []
+    return f"b.id IN ({', '.join(['%s'] * len(ids))})", ids
+
+
+def _lock(cursor, sql: str, params: Sequence[Any]) -> None:
+    """PostgreSQL下执行加锁查询（SQLite不需要）"""
+    if DB_TYPE != 'postgres':
+        return
+    query, query_params = adapt_sql(sql, tuple(params))
+    cursor.execute(query, query_params)
+    cursor.fetchall()
+
+
+def _lock_assignees(cursor, where_sql: str, params: Sequence[Any]) -> None:
+    """共享锁定问题的处理人行：处理人的团队变化（remove_assignee）要等本事务提交"""
+    _lock(cursor, f'''
+        SELECT u.id FROM users u
+        WHERE u.id IN (SELECT b.assigned_to FROM bugs b WHERE {where_sql})
+        ORDER BY u.id FOR SHARE
+    ''', params)
+
+
+def add_bugs(cursor, bug_ids: Iterable[int]) -> None:
+    """问题新增或修改后调用：加上这些问题当前状态的贡献"""
+    where_sql, params = _ids_condition(bug_ids)
+    if where_sql:
+        # 重新指派后的新处理人
+        _lock_assignees(cursor, where_sql, params)
+        _apply(cursor, where_sql, params, 1)
+
+
+def remove_bugs(cursor, bug_ids: Iterable[int]) -> None:
+    """问题修改或删除前调用：锁定这些问题，减去其当前状态的贡献"""
+    where_sql, params = _ids_condition(bug_ids)
+    if where_sql:
+        _lock(cursor, f'SELECT b.id FROM bugs b WHERE {where_sql} ORDER BY b.id FOR UPDATE', params)
+        _lock_assignees(cursor, where_sql, params)
+        _apply(cursor, where_sql, params, -1)
+
+
+def add_assignee(cursor, user_id: int) -> None:
+    """处理人的团队变化后调用：加上指派给该用户的问题的贡献"""
+    _apply(cursor, 'b.assigned_to = %s', [user_id], 1)
+
+
+def remove_assignee(cursor, user_id: int) -> None:
+    """处理人的团队变化前调用：锁定指派给该用户的问题和用户行，减去这些问题的贡献"""
+    _lock(cursor, 'SELECT b.id FROM bugs b WHERE b.assigned_to = %s ORDER BY b.id FOR UPDATE', [user_id])
+    _lock(cursor, 'SELECT id FROM users WHERE id = %s FOR UPDATE', [user_id])
+    _apply(cursor, 'b.assigned_to = %s', [user_id], -1)
+
+
+def rebuild(cursor) -> int:
+    """从bugs表全量重建汇总表，返回汇总行数"""
+    cursor.execute('DELETE FROM bug_daily_stats')
+    _apply(cursor, '1 = 1', [], 1)
+    cursor.execute('SELECT COUNT(*) FROM bug_daily_stats')
+    return cursor.fetchone()[0]
+
+
+def status_counts(cursor, teams: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """按状态统计问题数量
+
+    Args:
+        teams: 为None时统计全部问题；否则为这些团队的计数之和（按团队展开，不去重）
+    """
+    if teams is None:
+        where_sql, params = 'team = %s', [ALL_TEAMS]
+    elif not teams:
+        return {}
+    else:
+        where_sql, params = f"team IN ({', '.join(['%s'] * len(teams))})", list(teams)
+    query, query_params = adapt_sql(f'''
+        SELECT status, SUM(bug_count) FROM bug_daily_stats
+        WHERE {where_sql}
+        GROUP BY status
+    ''', params)
+    cursor.execute(query, query_params)
+    return {row[0]: int(row[1] or 0) for row in cursor.fetchall() if row[1]}
+
+
+def team_status_counts(cursor) -> Dict[str, Dict[str, int]]:
+    """按团队、状态统计问题数量：{团队: {状态: 数量}}（不含未分配和全局行）"""
+    query, params = adapt_sql('''
+        SELECT team, status, SUM(bug_count) FROM bug_daily_stats
+        WHERE team NOT IN (%s, %s)
+        GROUP BY team, status
+    ''', (ALL_TEAMS, ''))
+    cursor.execute(query, params)
+    result: Dict[str, Dict[str, int]] = {}
+    for team, status, count in cursor.fetchall():
+        if count:
+            result.setdefault(team, {})[status] = int(count)
+    return result
+
+
+def group_counts(cursor, dimension: str, start_day: Optional[str] = None, end_day: Optional[str] = None,
+                 statuses: Sequence[str] = (), types: Sequence[str] = ()) -> List[Tuple[Any, int]]:
+    """全局行按维度（day/status/type）分组计数，按数量倒序
+
+    日期为创建日期的闭区间 [start_day, end_day]；类型为空时按'bug'统计（与报表图表一致）
+    """
+    expressions = {
+        'day': 'day',
+        'status': 'status',
+        'type': "COALESCE(NULLIF(type, ''), 'bug')",
+    }
+    expression = expressions[dimension]
+    conditions = ['team = %s']
+    params: List[Any] = [ALL_TEAMS]
+    if start_day:
+        conditions.append('day >= %s')
+        params.append(start_day)
+    if end_day:
+        conditions.append('day <= %s')
+        params.append(end_day)
+    if statuses:
+        conditions.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    if types:
+        conditions.append(f"type IN ({', '.join(['%s'] * len(types))})")
+        params.extend(types)
+    query, query_params = adapt_sql(f'''
+        SELECT {expression} AS label, SUM(bug_count) AS total FROM bug_daily_stats
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {expression}
+        HAVING SUM(bug_count) > 0
+        ORDER BY total DESC, label
+    ''', params)
+    cursor.execute(query, query_params)
+    return [(row[0], int(row[1])) for row in cursor.fetchall()]
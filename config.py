@@ -27,6 +27,17 @@ DATABASE_CONFIG = {
     'postgres': POSTGRES_CONFIG,  # PostgreSQL配置
     'sqlite': SQLITE_CONFIG       # SQLite配置
 }
+
+# 数据库连接池配置（默认关闭，设置 DB_POOL_ENABLED=true 启用）
+# PostgreSQL使用进程内有界连接池；SQLite为每个线程复用一个连接
+DB_POOL_CONFIG = {
+    'enabled': os.getenv('DB_POOL_ENABLED', 'false').lower() == 'true',
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),          # 预建连接数
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),         # 最大连接数（每个进程）
+    'max_uses': int(os.getenv('DB_POOL_MAX_USES', '500')),        # 单个连接借出N次后重建，0表示不限
+    'health_check_interval': int(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30')),  # 空闲超过N秒借出前检查
+    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10'))            # 连接池耗尽时的等待秒数
+}
 # 开发环境配置
 # DB_CONFIG = {
 #     'dbname': os.getenv('DATABASE_NAME', 'postgres'),  # 默认值postgres
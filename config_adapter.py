@@ -7,6 +7,7 @@
 
 import os
 import sys
+import secrets
 
 # 检测是否在exe环境中
 if getattr(sys, 'frozen', False):
@@ -47,7 +48,48 @@ ALLOWED_EXTENSIONS = set(ext.strip() for ext in ALLOWED_EXTENSIONS_STR.split(','
 MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '16777216'))  # 16MB
 
 # Flask应用配置
-SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key-change-this')
+# 登录会话由SECRET_KEY签名：模板、示例配置和docker-compose中出现过的公开默认值一律视为未设置
+KNOWN_DEFAULT_SECRET_KEYS = {
+    'default-secret-key-change-this',
+    'your-secret-key-change-this-to-random-string',
+    'rebugtracker-postgres-secret-key-change-this',
+    'rebugtracker-sqlite-secret-key-change-this',
+    'change-this-secret-key-in-production',
+}
+SECRET_KEY_FILE = os.getenv('SECRET_KEY_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.secret_key'))
+
+
+def _load_or_create_secret_key(path):
+    """读取持久化的随机密钥，不存在时生成（多个worker同时启动时只有一个能创建，其余读取）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+
+    key = secrets.token_urlsafe(48)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'r', encoding='utf-8') as f:
+            existing = f.read().strip()
+        if existing:
+            return existing
+        raise RuntimeError(f"SECRET_KEY文件为空: {path}，请删除后重启或设置SECRET_KEY环境变量")
+    except OSError as e:
+        raise RuntimeError(f"SECRET_KEY未设置且无法写入 {path}（{e}），请设置SECRET_KEY环境变量") from e
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(key)
+    return key
+
+
+_env_secret_key = os.getenv('SECRET_KEY', '').strip()
+SECRET_KEY_FROM_ENV = bool(_env_secret_key) and _env_secret_key not in KNOWN_DEFAULT_SECRET_KEYS
+# 未设置或为公开默认值时，使用首次启动生成并持久化的随机密钥（不会回退到公开默认值）
+SECRET_KEY = _env_secret_key if SECRET_KEY_FROM_ENV else _load_or_create_secret_key(SECRET_KEY_FILE)
 FLASK_ENV = os.getenv('FLASK_ENV', 'production')
 FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
 
@@ -96,7 +138,7 @@ def get_config_summary():
         'UPLOAD_FOLDER': UPLOAD_FOLDER,
         'LOG_FOLDER': LOG_FOLDER,
         'ENABLE_REGISTRATION': ENABLE_REGISTRATION,
-        'SECRET_KEY_SET': bool(SECRET_KEY and SECRET_KEY != 'default-secret-key-change-this'),
+        'SECRET_KEY_SET': SECRET_KEY_FROM_ENV,
     }
 
 def validate_config():
@@ -105,8 +147,8 @@ def validate_config():
     warnings = []
     
     # 检查必要配置
-    if SECRET_KEY == 'default-secret-key-change-this':
-        warnings.append("使用默认SECRET_KEY，建议修改")
+    if not SECRET_KEY_FROM_ENV:
+        warnings.append(f"SECRET_KEY未设置，使用自动生成的密钥: {SECRET_KEY_FILE}（多实例部署需设置相同的SECRET_KEY）")
     
     if DB_TYPE == 'postgres':
         if not POSTGRES_CONFIG['password'] or POSTGRES_CONFIG['password'] == 'your_password_here':
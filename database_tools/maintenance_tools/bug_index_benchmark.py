@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# 问题列表索引基准测试工具
+# 在临时SQLite数据库中生成10万条问题数据，对比创建性能索引前后各角色列表查询的执行计划和耗时
+#
+# 用法:
+#   python database_tools/maintenance_tools/bug_index_benchmark.py [--bugs 100000] [--repeat 5]
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEAMS = ['实施组', '实施组研发', '新能源', '网络分析', '第三道防线', '智能告警', '操作票及防误', '电量', '消纳', '自动发电控制']
+STATUSES = ['待处理', '已分配', '处理中', '已解决', '已完成', '已驳回']
+
+# 与首页/组内成员/产品经理/报表使用的查询保持一致（取第一页，每页50条）
+BENCH_QUERIES = [
+    ('管理员全量列表', '''
+        SELECT b.id, b.title, b.status, b.created_at
+        FROM bugs b
+        LEFT JOIN users u1 ON b.created_by = u1.id
+        LEFT JOIN users u2 ON b.assigned_to = u2.id
+        ORDER BY b.created_at DESC, b.id DESC LIMIT 51
+    ''', ()),
+    ('实施组-自己创建', '''
+        SELECT b.id, b.title, b.status, b.created_at
+        FROM bugs b
+        LEFT JOIN users u1 ON b.created_by = u1.id
+        LEFT JOIN users u2 ON b.assigned_to = u2.id
+        WHERE b.created_by = ?
+        ORDER BY b.created_at DESC, b.id DESC LIMIT 51
+    ''', ('ssz_user',)),
+    ('组内成员-我的任务', '''
+        SELECT b.id, b.title, b.status, b.created_at
+        FROM bugs b
+        LEFT JOIN users u1 ON b.created_by = u1.id
+        LEFT JOIN users u2 ON b.assigned_to = u2.id
+        WHERE (b.assigned_to = ?)
+           OR (b.status = '待处理' AND b.assigned_to IS NULL AND u1.team = ?)
+           OR (b.status = '已解决' AND b.assigned_to = ?)
+        ORDER BY b.created_at DESC, b.id DESC LIMIT 51
+    ''', ('zncy_user', '网络分析', 'zncy_user')),
+    ('实施组-按创建人计数', '''
+        SELECT COUNT(*) FROM (SELECT 1 FROM bugs b WHERE b.created_by = ? LIMIT 10001) capped
+    ''', ('ssz_user',)),
+    ('报表-状态+时间范围', '''
+        SELECT b.status, COUNT(*) FROM bugs b
+        WHERE b.status = '待处理' AND b.created_at >= ? AND b.created_at < ?
+        GROUP BY b.status
+    ''', ('2024-03-01', '2024-04-01')),
+    ('报表-产品线+时间范围', '''
+        SELECT COUNT(*) FROM bugs b
+        WHERE b.product_line_id = ? AND b.created_at >= ? AND b.created_at < ?
+    ''', (3, '2024-03-01', '2024-04-01')),
+]
+
+
+def seed(conn, bug_count):
+    """生成用户和问题数据"""
+    c = conn.cursor()
+    user_ids = {'ssz': [], 'zncy': [], 'fzr': []}
+    for i in range(300):
+        role_en = ('ssz', 'zncy', 'fzr')[i % 3]
+        team = TEAMS[i % len(TEAMS)]
+        c.execute("INSERT INTO users (username, password, role, role_en, team) VALUES (?, 'x', ?, ?, ?)",
+                  (f'bench_{i}', role_en, role_en, team))
+        user_ids[role_en].append(c.lastrowid)
+
+    rnd = random.Random(42)
+    start = datetime(2023, 1, 1)
+    rows = []
+    for i in range(bug_count):
+        created_at = start + timedelta(seconds=rnd.randint(0, 2 * 365 * 86400))
+        assigned_to = rnd.choice(user_ids['zncy']) if rnd.random() < 0.7 else None
+        rows.append((
+            f'问题 {i}', '基准测试数据', rnd.choice(STATUSES), rnd.choice(user_ids['ssz']), assigned_to,
+            created_at.strftime('%Y-%m-%d %H:%M:%S'), rnd.choice(['bug', '需求']), rnd.randint(1, 10)
+        ))
+        if len(rows) >= 5000:
+            c.executemany('''INSERT INTO bugs (title, description, status, created_by, assigned_to, created_at, type, product_line_id)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+            rows = []
+    if rows:
+        c.executemany('''INSERT INTO bugs (title, description, status, created_by, assigned_to, created_at, type, product_line_id)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    conn.commit()
+    c.execute('ANALYZE')
+    return user_ids['ssz'][0], user_ids['zncy'][0]
+
+
+def run_queries(conn, label, params_map, repeat):
+    """输出每条查询的执行计划和平均耗时，返回 {查询名: 毫秒}"""
+    print(f"\n===== {label} =====")
+    results = {}
+    c = conn.cursor()
+    for name, sql, params in BENCH_QUERIES:
+        params = tuple(params_map.get(p, p) for p in params)
+        c.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        plan = [row[-1] for row in c.fetchall()]
+
+        elapsed = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            c.execute(sql, params)
+            c.fetchall()
+            elapsed.append((time.perf_counter() - t0) * 1000)
+        results[name] = sum(elapsed) / len(elapsed)
+
+        print(f"\n📌 {name}: 平均 {results[name]:.2f} ms")
+        for step in plan:
+            print(f"   {step}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='问题列表索引基准测试')
+    parser.add_argument('--bugs', type=int, default=100000, help='生成的问题数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每条查询重复次数')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['SQLITE_DB_PATH'] = os.path.join(tmp_dir, 'bench.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(tmp_dir, 'uploads')
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import rebugtracker
+    from db_factory import get_db_connection
+
+    print(f"🔧 初始化临时数据库: {os.environ['SQLITE_DB_PATH']}")
+    rebugtracker.init_db()
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    # 先删除性能索引，测量无索引时的基线
+    for name, _, _ in rebugtracker.PERFORMANCE_INDEXES:
+        c.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.commit()
+
+    print(f"🌱 生成 {args.bugs} 条问题数据...")
+    t0 = time.perf_counter()
+    ssz_id, zncy_id = seed(conn, args.bugs)
+    print(f"   完成，用时 {time.perf_counter() - t0:.1f} 秒")
+
+    params_map = {'ssz_user': ssz_id, 'zncy_user': zncy_id}
+    before = run_queries(conn, '创建索引前', params_map, args.repeat)
+
+    created = rebugtracker.ensure_performance_indexes(c)
+    conn.commit()
+    after = run_queries(conn, f'创建索引后（新建 {len(created)} 个）', params_map, args.repeat)
+    conn.close()
+
+    print("\n===== 汇总 =====")
+    print(f"{'查询':<20}{'索引前(ms)':>12}{'索引后(ms)':>12}{'加速比':>10}")
+    for name, _, _ in BENCH_QUERIES:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<20}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
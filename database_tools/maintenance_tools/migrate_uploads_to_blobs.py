@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文件迁移工具：把 uploads/ 下按原文件名保存的旧附件迁移到按内容寻址的存储（见upload_store）
+使用.env中配置的数据库和上传目录。
+
+- 只有bugs.image_path（没有bug_images记录）的旧问题先补一条bug_images记录
+- 旧附件计算SHA-256后复制到 uploads/blobs/，更新bug_images.image_path、bugs.image_path并登记引用，
+  内容相同的文件只保存一份；每批提交，可重复运行（已迁移的附件跳过）
+- --delete-originals 迁移后删除已迁移的旧文件；--gc 删除没有附件引用的文件（已删除问题的附件）
+  （--gc 与正在进行的上传可能同时判断同一文件，请在没有用户上传时执行）
+
+用法:
+    python database_tools/maintenance_tools/migrate_uploads_to_blobs.py [--dry-run] [--delete-originals] [--gc]
+        [--batch-size 200]
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import upload_store
+from config import DB_TYPE
+from config_adapter import UPLOAD_FOLDER
+from db_factory import get_db_connection
+from sql_adapter import adapt_sql
+
+
+def _execute(cursor, sql, params=()):
+    query, params = adapt_sql(sql, params)
+    cursor.execute(query, params)
+
+
+def backfill_bug_images(cursor):
+    """为只有bugs.image_path的问题补bug_images记录，返回补充的条数"""
+    cursor.execute('''
+        INSERT INTO bug_images (bug_id, image_path, created_at)
+        SELECT b.id, b.image_path, b.created_at FROM bugs b
+        WHERE b.image_path IS NOT NULL AND b.image_path != ''
+          AND NOT EXISTS (SELECT 1 FROM bug_images i WHERE i.bug_id = b.id)
+    ''')
+    return cursor.rowcount
+
+
+def _legacy_name(path):
+    """附件路径中的文件名；已是按内容寻址的文件名时返回None"""
+    name = (path or '').replace('\\', '/').split('/')[-1]
+    if not name or upload_store.BLOB_NAME_RE.match(name):
+        return None
+    return name
+
+
+class UploadMigrator:
+    """迁移旧附件；同一个旧文件只计算一次哈希"""
+
+    def __init__(self, upload_folder, dry_run=False):
+        self.upload_folder = upload_folder
+        self.dry_run = dry_run
+        self.stored = {}
+        self.missing = set()
+        self.blobs = set()
+        self.bytes_saved = 0
+
+    def store(self, name):
+        """保存旧文件，返回upload_store.store_file的结果；文件不存在时返回None"""
+        if name in self.stored:
+            return self.stored[name]
+        path = os.path.join(self.upload_folder, name)
+        if not os.path.isfile(path):
+            self.missing.add(name)
+            return None
+        if self.dry_run:
+            stored = {'name': name, 'size': os.path.getsize(path)}
+        else:
+            stored = upload_store.store_file(path, self.upload_folder, name)
+            if stored['sha256'] in self.blobs or not stored['created']:
+                self.bytes_saved += stored['size']
+            self.blobs.add(stored['sha256'])
+        self.stored[name] = stored
+        return stored
+
+    def migrate_bug_images(self, conn, batch_size):
+        """迁移bug_images中未登记引用的附件，返回迁移的条数"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT i.id, i.image_path FROM bug_images i
+            WHERE NOT EXISTS (SELECT 1 FROM bug_image_blobs r WHERE r.bug_image_id = i.id)
+            ORDER BY i.id
+        ''')
+        rows = [(row[0], row[1]) for row in cursor.fetchall()]
+        migrated = 0
+        for image_id, image_path in rows:
+            name = _legacy_name(image_path)
+            stored = self.store(name) if name else None
+            if not stored:
+                continue
+            migrated += 1
+            if self.dry_run:
+                continue
+            new_path = image_path.replace('\\', '/')[:-len(name)] + stored['name']
+            _execute(cursor, 'UPDATE bug_images SET image_path = %s WHERE id = %s', (new_path, image_id))
+            upload_store.attach_blob(cursor, image_id, stored)
+            if migrated % batch_size == 0:
+                conn.commit()
+                print(f"   已迁移 {migrated} 条附件")
+        conn.commit()
+        return migrated
+
+    def migrate_bug_main_images(self, conn):
+        """更新bugs.image_path（主图片）为迁移后的文件名，返回更新的条数"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, image_path FROM bugs WHERE image_path IS NOT NULL AND image_path != ''")
+        updated = 0
+        for bug_id, image_path in [(row[0], row[1]) for row in cursor.fetchall()]:
+            name = _legacy_name(image_path)
+            stored = self.stored.get(name) if name else None
+            if not stored or self.dry_run:
+                continue
+            new_path = image_path.replace('\\', '/')[:-len(name)] + stored['name']
+            _execute(cursor, 'UPDATE bugs SET image_path = %s WHERE id = %s', (new_path, bug_id))
+            updated += 1
+        conn.commit()
+        return updated
+
+    def delete_originals(self):
+        """删除已迁移的旧文件，返回删除的文件数"""
+        deleted = 0
+        for name in self.stored:
+            path = os.path.join(self.upload_folder, name)
+            if os.path.isfile(path):
+                os.remove(path)
+                deleted += 1
+        return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='迁移上传文件到按内容寻址的存储')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不修改文件和数据库')
+    parser.add_argument('--delete-originals', action='store_true', help='迁移后删除已迁移的旧文件')
+    parser.add_argument('--gc', action='store_true', help='删除没有附件引用的文件')
+    parser.add_argument('--batch-size', type=int, default=200, help='每批提交的附件数')
+    args = parser.parse_args()
+
+    print(f"🔧 数据库类型: {DB_TYPE}")
+    print(f"📁 上传目录: {UPLOAD_FOLDER}")
+    migrator = UploadMigrator(UPLOAD_FOLDER, dry_run=args.dry_run)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if not args.dry_run:
+            backfilled = backfill_bug_images(cursor)
+            conn.commit()
+            print(f"✅ 补充bug_images记录: {backfilled} 条")
+
+        print("🔄 迁移附件...")
+        migrated = migrator.migrate_bug_images(conn, args.batch_size)
+        updated = migrator.migrate_bug_main_images(conn)
+        print(f"✅ 迁移附件 {migrated} 条（文件 {len(migrator.stored)} 个，"
+              f"去重后 {len(migrator.blobs)} 个，节省 {migrator.bytes_saved / 1024 / 1024:.1f} MB），"
+              f"更新问题主图片 {updated} 条")
+        if migrator.missing:
+            print(f"⚠️ {len(migrator.missing)} 个附件文件不存在，保持原路径: {sorted(migrator.missing)[:10]}")
+
+        if args.dry_run:
+            print("ℹ️ 试运行，未做修改")
+            return 0
+        if args.delete_originals:
+            print(f"🗑️ 删除已迁移的旧文件: {migrator.delete_originals()} 个")
+        if args.gc:
+            deleted = upload_store.delete_unreferenced_blobs(cursor, UPLOAD_FOLDER)
+            conn.commit()
+            print(f"🗑️ 删除没有附件引用的文件: {deleted} 个")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ 迁移失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题每日统计汇总表重建工具
+从bugs表全量重建bug_daily_stats（使用.env中配置的数据库）。
+直接修改过bugs表（数据同步、导入、手工修复）或怀疑汇总数据有偏差时运行；
+--check 只比较汇总表与bugs表的状态统计，不做修改。
+
+用法:
+    python database_tools/maintenance_tools/rebuild_bug_daily_stats.py [--check]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import bug_stats
+from config import DB_TYPE
+from db_factory import get_db_connection
+
+
+def load_bug_status_counts(cursor):
+    """直接从bugs表统计各状态数量"""
+    cursor.execute("SELECT COALESCE(status, ''), COUNT(*) FROM bugs GROUP BY COALESCE(status, '')")
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def check(cursor):
+    """比较汇总表与bugs表，返回是否一致"""
+    expected = load_bug_status_counts(cursor)
+    actual = bug_stats.status_counts(cursor)
+    consistent = True
+    for status in sorted(set(expected) | set(actual)):
+        mark = '✅' if expected.get(status, 0) == actual.get(status, 0) else '❌'
+        if mark == '❌':
+            consistent = False
+        print(f"  {mark} {status or '(空)'}: bugs表 {expected.get(status, 0)} / 汇总表 {actual.get(status, 0)}")
+    return consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建问题每日统计汇总表')
+    parser.add_argument('--check', action='store_true', help='只检查汇总表与bugs表是否一致')
+    args = parser.parse_args()
+
+    print(f"🔧 数据库类型: {DB_TYPE}")
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if args.check:
+            print("🔍 检查汇总表...")
+            consistent = check(cursor)
+            print("✅ 汇总表与bugs表一致" if consistent else "⚠️ 汇总表与bugs表不一致，请运行本工具重建")
+            return 0 if consistent else 1
+
+        print("🔄 重建bug_daily_stats...")
+        started = time.time()
+        rows = bug_stats.rebuild(cursor)
+        conn.commit()
+        print(f"✅ 重建完成: {rows} 行，用时 {time.time() - started:.2f} 秒")
+        check(cursor)
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ 重建失败: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# 报表日期范围筛选基准测试工具
+# 在临时SQLite数据库中生成10万条问题数据（已创建性能索引），对比报表筛选条件
+#   DATE(b.created_at) >= ? AND DATE(b.created_at) <= ?      （旧写法，列被函数包裹，无法使用索引）
+#   b.created_at >= ? AND b.created_at < ?（结束日期+1天）  （report_query生成的半开区间）
+# 的执行计划、耗时和结果行数
+#
+# 用法:
+#   python database_tools/maintenance_tools/report_date_range_benchmark.py [--bugs 100000] [--repeat 5]
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (名称, 筛选条件)：一个月、一周和一天的范围，以及叠加状态筛选
+BENCH_FILTERS = [
+    ('一个月', {'dateRange': {'start': '2024-03-01', 'end': '2024-03-31'}}),
+    ('一周', {'dateRange': {'start': '2024-03-04', 'end': '2024-03-10'}}),
+    ('一天', {'dateRange': {'start': '2024-03-05', 'end': '2024-03-05'}}),
+    ('一个月+状态', {'dateRange': {'start': '2024-03-01', 'end': '2024-03-31'}, 'status': ['待处理', '处理中']}),
+]
+
+
+def legacy_filters(report_query, filters):
+    """旧写法：DATE(created_at) 比较"""
+    conditions, params = report_query.compile_filters(filters)
+    date_range = filters.get('dateRange') or {}
+    legacy = []
+    for condition in conditions:
+        if condition == 'b.created_at >= %s':
+            legacy.append('DATE(b.created_at) >= %s')
+        elif condition == 'b.created_at < %s':
+            legacy.append('DATE(b.created_at) <= %s')
+        else:
+            legacy.append(condition)
+    params = [date_range['start'], date_range['end']] + params[2:]
+    return legacy, params
+
+
+def run_query(conn, sql, params, repeat):
+    """返回 (执行计划, 平均毫秒, 结果)"""
+    c = conn.cursor()
+    c.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    plan = [row[-1] for row in c.fetchall()]
+    elapsed = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        c.execute(sql, params)
+        result = c.fetchall()
+        elapsed.append((time.perf_counter() - t0) * 1000)
+    return plan, sum(elapsed) / len(elapsed), [tuple(row) for row in result]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报表日期范围筛选基准测试')
+    parser.add_argument('--bugs', type=int, default=100000, help='生成的问题数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每条查询重复次数')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['SQLITE_DB_PATH'] = os.path.join(tmp_dir, 'bench.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(tmp_dir, 'uploads')
+    os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import rebugtracker
+    import report_query
+    from db_factory import get_db_connection
+    from bug_index_benchmark import seed
+
+    print(f"🔧 初始化临时数据库: {os.environ['SQLITE_DB_PATH']}")
+    rebugtracker.init_db()
+
+    conn = get_db_connection()
+    print(f"🌱 生成 {args.bugs} 条问题数据...")
+    t0 = time.perf_counter()
+    seed(conn, args.bugs)
+    print(f"   完成，用时 {time.perf_counter() - t0:.1f} 秒")
+
+    summary = []
+    for name, filters in BENCH_FILTERS:
+        query = report_query.ReportQuery(filters)
+        new_sql, new_params = query.group_query(['status'])
+
+        # 同一条聚合查询，只替换日期条件
+        query.conditions, query.params = legacy_filters(report_query, filters)
+        old_sql, old_params = query.group_query(['status'])
+
+        old_plan, old_ms, old_rows = run_query(conn, old_sql, old_params, args.repeat)
+        new_plan, new_ms, new_rows = run_query(conn, new_sql, new_params, args.repeat)
+        same = sorted(old_rows) == sorted(new_rows)
+        summary.append((name, old_ms, new_ms, same))
+
+        print(f"\n📌 {name}: DATE() {old_ms:.2f} ms / 半开区间 {new_ms:.2f} ms，结果{'一致' if same else '不一致'}")
+        for label, plan in (('DATE()', old_plan), ('半开区间', new_plan)):
+            print(f"   [{label}]")
+            for step in plan:
+                print(f"      {step}")
+    conn.close()
+
+    print("\n===== 汇总 =====")
+    print(f"{'范围':<14}{'DATE()(ms)':>12}{'半开区间(ms)':>14}{'加速比':>10}{'结果':>6}")
+    for name, old_ms, new_ms, same in summary:
+        speedup = old_ms / new_ms if new_ms else float('inf')
+        print(f"{name:<14}{old_ms:>12.2f}{new_ms:>14.2f}{speedup:>9.1f}x{'一致' if same else '不一致':>6}")
+
+
+if __name__ == '__main__':
+    main()
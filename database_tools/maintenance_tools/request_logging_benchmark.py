@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# 请求热路径日志基准测试工具
+# 模拟一次问题列表/提交/附件请求中的调试日志（当前用户、50条问题列表、表单、附件路径检查），
+# 在生产配置（日志级别INFO）下对比：
+#   即时格式化 f-string 调用 logger.debug（旧写法，日志不输出也要格式化参数、检查文件）
+#   logger.debug 惰性 %-格式（只在级别启用时格式化）
+#   request_logging.log_debug，DEBUG_LOGGING关闭（直接返回）
+# 以及高频INFO日志（通知发送成功）全量输出与 log_sampled 采样输出的单条耗时
+#
+# 用法:
+#   python database_tools/maintenance_tools/request_logging_benchmark.py [--requests 20000]
+
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+import request_logging
+
+USER = {'id': 12, 'username': 'zhangsan', 'chinese_name': '张三', 'role': '负责人', 'role_en': 'fzr', 'team': '网络分析'}
+FORM = {'title': '登录页面报错', 'description': '点击登录后提示500错误' * 5, 'manager': '负责人甲', 'type': 'bug'}
+BUGS = [{'id': i, 'title': f'问题{i}', 'description': '问题描述' * 20, 'status': '处理中',
+         'created_at': '2024-03-05 10:00:00', 'creator_name': '实施甲', 'assignee_name': '成员甲'}
+        for i in range(50)]
+
+
+def eager_request(logger, upload_folder, file_path):
+    """旧写法：f-string在调用前完成格式化"""
+    logger.debug(f"当前用户: {USER}")
+    logger.debug(f"收到问题提交请求，表单数据: {FORM}")
+    logger.debug(f"提交用户ID: {USER['id']}, 标题: {FORM['title']}, 描述: {FORM['description']}")
+    logger.debug(f"Rendering team_issues.html with user role: {USER['role']} and bugs: {BUGS}")
+    logger.debug(f"上传目录: {upload_folder}")
+    logger.debug(f"完整路径: {file_path}")
+    logger.debug(f"文件是否存在: {os.path.exists(file_path)}")
+
+
+def lazy_request(logger, upload_folder, file_path):
+    """惰性%-格式：级别未启用时不格式化（文件检查这类参数仍会计算）"""
+    logger.debug("当前用户: %s", USER)
+    logger.debug("收到问题提交请求，表单数据: %s", FORM)
+    logger.debug("提交用户ID: %s, 标题: %s, 描述: %s", USER['id'], FORM['title'], FORM['description'])
+    logger.debug("Rendering team_issues.html with user role: %s and bugs: %s", USER['role'], BUGS)
+    logger.debug("上传目录: %s", upload_folder)
+    logger.debug("完整路径: %s", file_path)
+    logger.debug("文件是否存在: %s", os.path.exists(file_path))
+
+
+def switched_request(logger, upload_folder, file_path):
+    """当前写法：log_debug只记录廉价字段，DEBUG_LOGGING关闭时直接返回"""
+    request_logging.log_debug(logger, "收到问题提交请求: user_id=%s, title=%s", USER['id'], FORM['title'])
+    request_logging.log_debug(logger, "Rendering team_issues.html: role=%s, bugs=%d", USER['role'], len(BUGS))
+    request_logging.log_debug(logger, "文件保存成功: %s", file_path)
+
+
+def measure(func, count, *args):
+    """返回每次调用的平均微秒数"""
+    t0 = time.perf_counter()
+    for _ in range(count):
+        func(*args)
+    return (time.perf_counter() - t0) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求热路径日志基准测试')
+    parser.add_argument('--requests', type=int, default=20000, help='模拟的请求次数')
+    args = parser.parse_args()
+
+    # 生产配置：INFO级别，输出到内存
+    logger = logging.getLogger('request_logging_benchmark')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    stream = io.StringIO()
+    logger.addHandler(logging.StreamHandler(stream))
+
+    upload_folder = tempfile.mkdtemp()
+    file_path = os.path.join(upload_folder, 'bug_1_screenshot.png')
+    request_logging.DEBUG_LOGGING = False
+
+    print(f"🔧 日志级别INFO，模拟 {args.requests} 次请求")
+    results = [
+        ('f-string logger.debug', measure(eager_request, args.requests, logger, upload_folder, file_path)),
+        ('惰性 logger.debug', measure(lazy_request, args.requests, logger, upload_folder, file_path)),
+        ('log_debug (关闭)', measure(switched_request, args.requests, logger, upload_folder, file_path)),
+    ]
+    assert stream.getvalue() == '', '调试日志不应输出'
+
+    print("\n===== 每请求调试日志开销 =====")
+    baseline = results[0][1]
+    print(f"{'写法':<24}{'微秒/请求':>12}{'节省':>10}")
+    for name, us in results:
+        print(f"{name:<24}{us:>12.2f}{(1 - us / baseline) * 100:>9.1f}%")
+
+    # 高频INFO日志：每条通知发送成功都记录 vs 采样
+    messages = args.requests * 5
+    full = measure(lambda: logger.info("Email sent to %s: %s", 'user@example.com', '问题状态变更'), messages)
+    full_bytes = len(stream.getvalue())
+    stream.seek(0)
+    stream.truncate()
+    sampled = measure(lambda: request_logging.log_sampled(
+        logger, logging.INFO, 'email.sent', "Email sent to %s: %s", 'user@example.com', '问题状态变更'), messages)
+    sampled_bytes = len(stream.getvalue())
+
+    print(f"\n===== 高频INFO日志（{messages} 条，采样间隔 {request_logging.LOG_SAMPLE_EVERY}）=====")
+    print(f"{'写法':<24}{'微秒/条':>12}{'日志字节':>12}")
+    print(f"{'全量 logger.info':<24}{full:>12.2f}{full_bytes:>12}")
+    print(f"{'log_sampled':<24}{sampled:>12.2f}{sampled_bytes:>12}")
+
+
+if __name__ == '__main__':
+    main()
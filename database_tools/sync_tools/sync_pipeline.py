@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite ↔ PostgreSQL 流式同步管道
+两个同步工具（sync_sqlite_to_postgres_data.py / smart_sync_postgres_to_sqlite.py）共用：
+
+- 读取：按主键顺序流式读取，PostgreSQL使用服务器端游标（named cursor），每次fetchmany一批，
+  不把整张表读入内存
+- 写入：PostgreSQL使用 COPY FROM STDIN；SQLite使用 executemany，每批一个事务
+- 断点续传：目标库的sync_checkpoints表记录每张表已同步到的主键，与该批数据在同一事务中提交；
+  中断后使用 --resume 从断点继续，已完成的表直接跳过
+- 保留原主键（问题的处理人、通知的用户等引用关系不变），源库中引用不存在用户/问题的孤儿记录被过滤
+- 同步完成后重建目标库的派生表（bug_daily_stats、notification_counters），PostgreSQL同时校正自增序列
+- 增量同步（run_incremental）：users、projects、bugs、bug_images、notifications 的插入/更新由触发器写入
+  sync_updated_at，删除写入sync_tombstones（数据库迁移9）。目标库的sync_watermarks记录每张表已同步到的
+  sync_updated_at和墓碑ID（高水位），每次只复制高水位之后变化的行（插入或更新）并删除墓碑对应的行；
+  其他小表整表替换。高水位向前回退 overlap 秒再读取，避免漏掉提交较晚的事务（重复读取的行按主键覆盖）。
+  高水位在全量同步开始时记录，因此增量同步前需要先执行一次全量同步
+"""
+
+import io
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认每批行数
+DEFAULT_BATCH_SIZE = 5000
+
+# 同步的表：(表名, 主键列, 源库过滤条件)，按依赖顺序排列
+SYNC_TABLES = [
+    ('users', ('id',), None),
+    ('user_teams', ('user_id', 'team'), 'user_id IN (SELECT id FROM users)'),
+    ('product_lines', ('id',), None),
+    ('projects', ('id',), None),
+    ('bugs', ('id',), None),
+    ('bug_images', ('id',), 'bug_id IN (SELECT id FROM bugs)'),
+    ('upload_blobs', ('sha256',), None),
+    ('bug_image_blobs', ('bug_image_id',),
+     'bug_image_id IN (SELECT id FROM bug_images WHERE bug_id IN (SELECT id FROM bugs))'),
+    ('system_config', ('config_key',), None),
+    ('user_notification_preferences', ('user_id',), 'user_id IN (SELECT id FROM users)'),
+    ('notifications', ('id',), 'user_id IN (SELECT id FROM users)'),
+]
+
+# 增量同步：按高水位跟踪变更的表（与rebugtracker.SYNC_TRACKED_TABLES一致）
+TRACKED_TABLES = ('users', 'projects', 'bugs', 'bug_images', 'notifications')
+# 未跟踪变更的小表整表替换；product_lines、upload_blobs被外键引用，只插入或更新
+UPSERT_ONLY_TABLES = ('product_lines', 'upload_blobs')
+# 高水位回退的秒数
+DEFAULT_OVERLAP_SECONDS = 300
+
+WATERMARK_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS sync_watermarks (
+        table_name TEXT PRIMARY KEY,
+        changed_since TEXT,
+        tombstone_id INTEGER NOT NULL DEFAULT 0,
+        synced_at TEXT
+    )
+'''
+
+CHECKPOINT_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS sync_checkpoints (
+        table_name TEXT PRIMARY KEY,
+        last_key TEXT,
+        rows_copied INTEGER NOT NULL DEFAULT 0,
+        finished INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    )
+'''
+
+
+def _key_condition(key: Sequence[str], placeholder: str) -> str:
+    """主键大于断点的条件（多列主键使用行值比较）"""
+    if len(key) == 1:
+        return f'{key[0]} > {placeholder}'
+    return f"({', '.join(key)}) > ({', '.join([placeholder] * len(key))})"
+
+
+class _Endpoint:
+    """同步的一端（源库或目标库）"""
+
+    db_type = ''
+    placeholder = ''
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def table_exists(self, table: str) -> bool:
+        raise NotImplementedError
+
+    def columns(self, table: str) -> List[str]:
+        raise NotImplementedError
+
+    def _stream_cursor(self, name: str):
+        return self.conn.cursor()
+
+    def stream_query(self, name: str, sql: str, params: Sequence[Any], batch_size: int) -> Iterator[List[Tuple]]:
+        """执行查询并分批返回结果"""
+        cursor = self._stream_cursor(name)
+        try:
+            cursor.execute(sql.replace('%s', self.placeholder), list(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def stream(self, table: str, columns: Sequence[str], key: Sequence[str], where: Optional[str],
+               after: Optional[Sequence[Any]], batch_size: int) -> Iterator[List[Tuple]]:
+        """按主键顺序分批读取（after为断点主键，不含）"""
+        conditions = []
+        params: List[Any] = []
+        if where:
+            conditions.append(where)
+        if after is not None:
+            conditions.append(_key_condition(key, self.placeholder))
+            params.extend(after)
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f" ORDER BY {', '.join(key)}"
+        return self.stream_query(table, sql, params, batch_size)
+
+    def insert_rows(self, cursor, table: str, columns: Sequence[str], rows: Sequence[Tuple]) -> None:
+        raise NotImplementedError
+
+    def upsert_rows(self, cursor, table: str, columns: Sequence[str], key: Sequence[str],
+                    rows: Sequence[Tuple]) -> None:
+        """按主键插入或覆盖"""
+        raise NotImplementedError
+
+    def delete_rows(self, cursor, table: str, ids: Sequence[int]) -> None:
+        """按id删除"""
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join([self.placeholder] * len(chunk))})", chunk)
+
+    def reset_sequence(self, cursor, table: str) -> None:
+        """写入显式主键后校正自增序列（SQLite自动维护）"""
+
+    def execute(self, cursor, sql: str, params: Sequence[Any] = ()) -> None:
+        cursor.execute(sql.replace('%s', self.placeholder), tuple(params))
+
+
+class SqliteEndpoint(_Endpoint):
+    db_type = 'sqlite'
+    placeholder = '?'
+
+    def table_exists(self, table: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def columns(self, table: str) -> List[str]:
+        cursor = self.conn.cursor()
+        cursor.execute(f'PRAGMA table_info({table})')
+        return [row[1] for row in cursor.fetchall()]
+
+    def insert_rows(self, cursor, table: str, columns: Sequence[str], rows: Sequence[Tuple]) -> None:
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows)
+
+    def upsert_rows(self, cursor, table: str, columns: Sequence[str], key: Sequence[str],
+                    rows: Sequence[Tuple]) -> None:
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))}) "
+            + _conflict_clause(columns, key), rows)
+
+
+def _conflict_clause(columns: Sequence[str], key: Sequence[str]) -> str:
+    updates = [f'{column} = excluded.{column}' for column in columns if column not in key]
+    if not updates:
+        return f"ON CONFLICT ({', '.join(key)}) DO NOTHING"
+    return f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {', '.join(updates)}"
+
+
+def _copy_value(value: Any) -> str:
+    """COPY ... CSV 的字段：NULL不加引号，其他值一律加引号（区分NULL和空字符串）"""
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class PostgresEndpoint(_Endpoint):
+    db_type = 'postgres'
+    placeholder = '%s'
+
+    def table_exists(self, table: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', (table,))
+        return cursor.fetchone()[0]
+
+    def columns(self, table: str) -> List[str]:
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+            ORDER BY ordinal_position
+        ''', (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def _stream_cursor(self, name: str):
+        # 服务器端游标：结果保留在服务器，每次fetchmany只传输一批
+        return self.conn.cursor(name=f'sync_{name}')
+
+    def insert_rows(self, cursor, table: str, columns: Sequence[str], rows: Sequence[Tuple]) -> None:
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def upsert_rows(self, cursor, table: str, columns: Sequence[str], key: Sequence[str],
+                    rows: Sequence[Tuple]) -> None:
+        # COPY到事务内的临时表，再合并到目标表
+        stage = f'sync_stage_{table}'
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS')
+        self.insert_rows(cursor, stage, columns, rows)
+        column_list = ', '.join(columns)
+        cursor.execute(f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} '
+                       + _conflict_clause(columns, key))
+        cursor.execute(f'TRUNCATE {stage}')
+
+    def delete_rows(self, cursor, table: str, ids: Sequence[int]) -> None:
+        cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', (list(ids),))
+
+    def reset_sequence(self, cursor, table: str) -> None:
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', (table, 'id'))
+        row = cursor.fetchone()
+        if row and row[0]:
+            cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)', (row[0],))
+
+
+def _load_checkpoints(target: _Endpoint) -> Dict[str, Dict[str, Any]]:
+    cursor = target.conn.cursor()
+    cursor.execute('SELECT table_name, last_key, rows_copied, finished FROM sync_checkpoints')
+    checkpoints = {row[0]: {'last_key': json.loads(row[1]) if row[1] else None,
+                            'rows': row[2], 'finished': bool(row[3])}
+                   for row in cursor.fetchall()}
+    target.conn.commit()
+    return checkpoints
+
+
+def _save_checkpoint(target: _Endpoint, cursor, table: str, last_key: Optional[Sequence[Any]],
+                     rows: int, finished: bool) -> None:
+    target.execute(cursor, '''
+        INSERT INTO sync_checkpoints (table_name, last_key, rows_copied, finished, updated_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            last_key = excluded.last_key, rows_copied = excluded.rows_copied,
+            finished = excluded.finished, updated_at = excluded.updated_at
+    ''', (table, json.dumps(list(last_key)) if last_key is not None else None, rows, int(finished),
+          time.strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def _tracks_changes(endpoint: _Endpoint, table: str) -> bool:
+    """该表是否有增量同步的变更跟踪（数据库迁移9）"""
+    return (table in TRACKED_TABLES and endpoint.table_exists('sync_tombstones')
+            and 'sync_updated_at' in endpoint.columns(table))
+
+
+def _capture_watermarks(source: _Endpoint, tables: Sequence[Tuple]) -> Dict[str, Tuple[Optional[str], int]]:
+    """源库当前的高水位：{表名: (最大sync_updated_at, 最大墓碑ID)}"""
+    watermarks = {}
+    cursor = source.conn.cursor()
+    for table, _, _ in tables:
+        if not source.table_exists(table) or not _tracks_changes(source, table):
+            continue
+        cursor.execute(f'SELECT MAX(sync_updated_at) FROM {table}')
+        changed_since = cursor.fetchone()[0]
+        source.execute(cursor, 'SELECT COALESCE(MAX(id), 0) FROM sync_tombstones WHERE table_name = %s', (table,))
+        tombstone_id = cursor.fetchone()[0]
+        watermarks[table] = (str(changed_since) if changed_since is not None else None, int(tombstone_id))
+    source.conn.commit()
+    return watermarks
+
+
+def _load_watermarks(target: _Endpoint) -> Dict[str, Tuple[Optional[str], int]]:
+    cursor = target.conn.cursor()
+    cursor.execute('SELECT table_name, changed_since, tombstone_id FROM sync_watermarks')
+    watermarks = {row[0]: (row[1], int(row[2])) for row in cursor.fetchall()}
+    target.conn.commit()
+    return watermarks
+
+
+def _save_watermark(target: _Endpoint, cursor, table: str, changed_since: Optional[str], tombstone_id: int) -> None:
+    target.execute(cursor, '''
+        INSERT INTO sync_watermarks (table_name, changed_since, tombstone_id, synced_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            changed_since = excluded.changed_since, tombstone_id = excluded.tombstone_id,
+            synced_at = excluded.synced_at
+    ''', (table, changed_since, tombstone_id, time.strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def prepare_target(source: _Endpoint, target: _Endpoint, tables: Sequence[Tuple],
+                   resume: bool) -> Dict[str, Dict[str, Any]]:
+    """创建断点表和高水位表；非续传时清空目标表和断点，并记录源库当前的高水位，返回已有的断点"""
+    cursor = target.conn.cursor()
+    cursor.execute(CHECKPOINT_TABLE_SQL)
+    cursor.execute(WATERMARK_TABLE_SQL)
+    target.conn.commit()
+    if resume:
+        return _load_checkpoints(target)
+
+    print("🗑️ 清空目标表...")
+    cursor.execute('DELETE FROM sync_checkpoints')
+    cursor.execute('DELETE FROM sync_watermarks')
+    for table, _, _ in reversed(tables):
+        if target.table_exists(table):
+            cursor.execute(f'DELETE FROM {table}')
+            print(f"   ✅ 清空表: {table}")
+    if target.table_exists('sync_tombstones'):
+        # 清空目标表时目标库触发器写入的墓碑没有意义
+        cursor.execute('DELETE FROM sync_tombstones')
+    # 复制开始前的高水位：复制过程中发生的变更由之后的增量同步补上
+    for table, (changed_since, tombstone_id) in _capture_watermarks(source, tables).items():
+        _save_watermark(target, cursor, table, changed_since, tombstone_id)
+    target.conn.commit()
+    return {}
+
+
+def _common_columns(source: _Endpoint, target: _Endpoint, table: str) -> List[str]:
+    """两端都有的列（按目标库的列顺序）"""
+    source_columns = set(source.columns(table))
+    return [column for column in target.columns(table) if column in source_columns]
+
+
+def sync_table(source: _Endpoint, target: _Endpoint, table: str, key: Sequence[str], where: Optional[str],
+               checkpoint: Optional[Dict[str, Any]], batch_size: int) -> Tuple[int, float]:
+    """流式同步一张表，返回 (本次同步行数, 用时秒)"""
+    columns = _common_columns(source, target, table)
+    missing_key = [column for column in key if column not in columns]
+    if missing_key:
+        raise ValueError(f"{table} 缺少主键列: {missing_key}")
+    key_indexes = [columns.index(column) for column in key]
+
+    after = checkpoint['last_key'] if checkpoint else None
+    total = checkpoint['rows'] if checkpoint else 0
+    copied = 0
+    started = time.time()
+    cursor = target.conn.cursor()
+    for rows in source.stream(table, columns, key, where, after, batch_size):
+        last_key = [rows[-1][index] for index in key_indexes]
+        try:
+            target.insert_rows(cursor, table, columns, rows)
+            copied += len(rows)
+            _save_checkpoint(target, cursor, table, last_key, total + copied, False)
+            target.conn.commit()
+        except Exception:
+            target.conn.rollback()
+            raise
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"\r   {table}: {total + copied} 行，{copied / elapsed:.0f} 行/秒", end='', flush=True)
+
+    target.reset_sequence(cursor, table)
+    _save_checkpoint(target, cursor, table, after if not copied else last_key, total + copied, True)
+    target.conn.commit()
+    return copied, time.time() - started
+
+
+def refresh_derived_tables(target: _Endpoint) -> None:
+    """从同步后的数据重建派生表：问题每日统计、每用户通知计数"""
+    import bug_stats
+
+    cursor = target.conn.cursor()
+    if target.table_exists('bug_daily_stats'):
+        rows = bug_stats.rebuild(cursor)
+        print(f"   ✅ bug_daily_stats: {rows} 行")
+    if target.table_exists('notification_counters'):
+        cursor.execute('DELETE FROM notification_counters')
+        cursor.execute('''
+            INSERT INTO notification_counters (user_id, total_count, unread_count)
+            SELECT user_id, COUNT(*), SUM(CASE WHEN NOT read_status THEN 1 ELSE 0 END)
+            FROM notifications GROUP BY user_id
+        ''')
+        print("   ✅ notification_counters")
+    target.conn.commit()
+
+
+def run_sync(source: _Endpoint, target: _Endpoint, tables: Sequence[Tuple] = SYNC_TABLES,
+             batch_size: int = DEFAULT_BATCH_SIZE, resume: bool = False) -> Dict[str, int]:
+    """按顺序同步各表，返回 {表名: 本次同步行数}"""
+    checkpoints = prepare_target(source, target, tables, resume)
+    results = {}
+    run_started = time.time()
+    for table, key, where in tables:
+        checkpoint = checkpoints.get(table)
+        if checkpoint and checkpoint['finished']:
+            print(f"⏭️ {table}: 已完成（{checkpoint['rows']} 行），跳过")
+            continue
+        if not source.table_exists(table) or not target.table_exists(table):
+            print(f"⚠️ {table}: 源库或目标库中不存在，跳过")
+            continue
+        resumed = f"，从断点 {checkpoint['last_key']} 继续" if checkpoint and checkpoint['last_key'] else ''
+        print(f"📋 同步 {table}{resumed}...")
+        copied, elapsed = sync_table(source, target, table, key, where, checkpoint, batch_size)
+        results[table] = copied
+        rate = copied / elapsed if elapsed > 0 else 0
+        print(f"\r   ✅ {table}: 同步 {copied} 行，用时 {elapsed:.1f} 秒，{rate:.0f} 行/秒")
+
+    print("🔄 重建派生表...")
+    refresh_derived_tables(target)
+
+    total = sum(results.values())
+    elapsed = time.time() - run_started
+    print(f"📊 本次共同步 {total} 行，用时 {elapsed:.1f} 秒，{total / elapsed if elapsed > 0 else 0:.0f} 行/秒")
+    return results
+
+
+def _since_with_overlap(changed_since: Optional[str], overlap_seconds: int) -> Optional[str]:
+    """高水位向前回退overlap秒（与SQLite触发器写入的格式一致，精确到毫秒）"""
+    if changed_since is None:
+        return None
+    cutoff = datetime.fromisoformat(str(changed_since)) - timedelta(seconds=overlap_seconds)
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _sync_changed_rows(source: _Endpoint, target: _Endpoint, table: str, where: Optional[str],
+                       watermark: Tuple[Optional[str], int], batch_size: int, overlap_seconds: int) -> int:
+    """复制高水位之后插入或更新的行，每批提交时推进高水位，返回行数"""
+    changed_since, tombstone_id = watermark
+    columns = _common_columns(source, target, table)
+    stamp_index = columns.index('sync_updated_at')
+    since = _since_with_overlap(changed_since, overlap_seconds)
+    conditions = ['sync_updated_at >= %s' if since is not None else 'sync_updated_at IS NOT NULL']
+    if where:
+        conditions.append(where)
+    sql = (f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(conditions)} "
+           f"ORDER BY sync_updated_at, id")
+
+    copied = 0
+    cursor = target.conn.cursor()
+    for rows in source.stream_query(table, sql, [since] if since is not None else [], batch_size):
+        try:
+            target.upsert_rows(cursor, table, columns, ('id',), rows)
+            changed_since = max(str(changed_since or ''), str(rows[-1][stamp_index]))
+            _save_watermark(target, cursor, table, changed_since, tombstone_id)
+            target.conn.commit()
+        except Exception:
+            target.conn.rollback()
+            raise
+        copied += len(rows)
+    if copied:
+        target.reset_sequence(cursor, table)
+        target.conn.commit()
+    return copied
+
+
+def _apply_tombstones(source: _Endpoint, target: _Endpoint, table: str,
+                      watermark: Tuple[Optional[str], int], batch_size: int) -> int:
+    """删除源库墓碑（高水位之后）对应的行，返回墓碑数"""
+    changed_since, tombstone_id = watermark
+    sql = 'SELECT id, row_id FROM sync_tombstones WHERE table_name = %s AND id > %s ORDER BY id'
+    applied = 0
+    cursor = target.conn.cursor()
+    for rows in source.stream_query(f'tombstones_{table}', sql, [table, tombstone_id], batch_size):
+        try:
+            target.delete_rows(cursor, table, [row[1] for row in rows])
+            tombstone_id = rows[-1][0]
+            _save_watermark(target, cursor, table, changed_since, tombstone_id)
+            target.conn.commit()
+        except Exception:
+            target.conn.rollback()
+            raise
+        applied += len(rows)
+    return applied
+
+
+def _replace_table(source: _Endpoint, target: _Endpoint, table: str, key: Sequence[str],
+                   where: Optional[str], batch_size: int, upsert: bool) -> int:
+    """未跟踪变更的表：在一个事务内整表替换（或只插入/更新），返回行数"""
+    columns = _common_columns(source, target, table)
+    copied = 0
+    cursor = target.conn.cursor()
+    try:
+        if not upsert:
+            cursor.execute(f'DELETE FROM {table}')
+        for rows in source.stream(table, columns, key, where, None, batch_size):
+            if upsert:
+                target.upsert_rows(cursor, table, columns, key, rows)
+            else:
+                target.insert_rows(cursor, table, columns, rows)
+            copied += len(rows)
+        target.reset_sequence(cursor, table)
+        target.conn.commit()
+    except Exception:
+        target.conn.rollback()
+        raise
+    return copied
+
+
+def run_incremental(source: _Endpoint, target: _Endpoint, tables: Sequence[Tuple] = SYNC_TABLES,
+                    batch_size: int = DEFAULT_BATCH_SIZE,
+                    overlap_seconds: int = DEFAULT_OVERLAP_SECONDS) -> Dict[str, int]:
+    """增量同步：按高水位复制变化的行并应用删除，返回 {表名: 复制/删除行数}"""
+    cursor = target.conn.cursor()
+    cursor.execute(WATERMARK_TABLE_SQL)
+    target.conn.commit()
+    watermarks = _load_watermarks(target)
+    present = [spec for spec in tables if source.table_exists(spec[0]) and target.table_exists(spec[0])]
+    tracked = [table for table, _, _ in present if _tracks_changes(source, table)]
+    missing = [table for table in tracked if table not in watermarks]
+    if missing:
+        raise RuntimeError(f"目标库缺少高水位记录（{', '.join(missing)}），请先执行一次全量同步")
+
+    results = {}
+    run_started = time.time()
+    # 先按依赖顺序插入/更新，再按相反顺序删除
+    for table, key, where in present:
+        started = time.time()
+        if table in tracked:
+            copied = _sync_changed_rows(source, target, table, where, watermarks[table], batch_size, overlap_seconds)
+            watermarks = _load_watermarks(target)
+            mode = '变化'
+        else:
+            copied = _replace_table(source, target, table, key, where, batch_size, table in UPSERT_ONLY_TABLES)
+            mode = '全部'
+        results[table] = copied
+        print(f"   ✅ {table}: 同步{mode} {copied} 行，用时 {time.time() - started:.1f} 秒")
+
+    for table in reversed(tracked):
+        deleted = _apply_tombstones(source, target, table, watermarks[table], batch_size)
+        if deleted:
+            results[table] += deleted
+            print(f"   🗑️ {table}: 删除 {deleted} 行")
+
+    print("🔄 重建派生表...")
+    refresh_derived_tables(target)
+
+    total = sum(results.values())
+    elapsed = time.time() - run_started
+    print(f"📊 本次增量同步 {total} 行，用时 {elapsed:.1f} 秒，{total / elapsed if elapsed > 0 else 0:.0f} 行/秒")
+    return results
+
+
+def verify_counts(source: _Endpoint, target: _Endpoint, tables: Sequence[Tuple] = SYNC_TABLES) -> bool:
+    """比较源库（过滤孤儿记录后）与目标库的行数"""
+    print("\n📊 验证同步结果:")
+    consistent = True
+    for table, _, where in tables:
+        if not source.table_exists(table) or not target.table_exists(table):
+            continue
+        counts = []
+        for endpoint, condition in ((source, where), (target, None)):
+            cursor = endpoint.conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {table}" + (f" WHERE {condition}" if condition else ''))
+            counts.append(cursor.fetchone()[0])
+            endpoint.conn.commit()
+        mark = '✅' if counts[0] == counts[1] else '❌'
+        consistent = consistent and counts[0] == counts[1]
+        print(f"  {mark} {table}: 源库 {counts[0]} / 目标库 {counts[1]}")
+    return consistent
+
+
+def ensure_target_schema() -> None:
+    """按目标库执行应用的数据库迁移（调用方需先把DB_TYPE等环境变量设置为目标库）"""
+    import rebugtracker
+
+    applied = rebugtracker.init_db()
+    if applied:
+        print(f"🗄️ 目标库已执行数据库迁移: {applied}")
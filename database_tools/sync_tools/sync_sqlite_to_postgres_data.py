@@ -2,312 +2,90 @@
 # -*- coding: utf-8 -*-
 """
 同步SQLite数据到PostgreSQL
-将SQLite数据库中的数据同步到PostgreSQL数据库
+将SQLite数据库中的数据同步到PostgreSQL数据库（.env中的DATABASE_*配置）
 用于双数据库切换时的反向同步
+
+- 按主键流式读取SQLite，每批通过 COPY FROM STDIN 写入PostgreSQL（见sync_pipeline）
+- 每批提交时记录断点，中断后使用 --resume 继续
+- 全量同步之后可使用 --incremental 只同步变化的行和删除（按高水位）
+- PostgreSQL中的system_config配置数据保留，不被覆盖
+
+用法:
+    python database_tools/sync_tools/sync_sqlite_to_postgres_data.py [--sqlite rebugtracker.db]
+        [--batch-size 5000] [--resume | --incremental] [--yes]
 """
 
-import sys
 import os
+import sys
 import sqlite3
-import psycopg2
-from psycopg2.extras import DictCursor
-from datetime import datetime
-
-# PostgreSQL配置
-POSTGRES_CONFIG = {
-    'dbname': 'postgres',
-    'user': 'postgres',
-    'password': '$RFV5tgb',
-    'host': '192.168.1.5',
-    'port': 5432
-}
+import argparse
 
-def clear_postgres_tables(pg_cursor, pg_conn):
-    """清空PostgreSQL表数据"""
-    print("🗑️ 清空PostgreSQL表数据...")
-    
-    # 按依赖关系顺序清空表
-    tables = [
-        'notifications',
-        'user_notification_preferences',
-        'bugs',
-        'projects',
-        'users'
-    ]
-    
-    # system_config表不清空，保留配置
-    
-    for table in tables:
-        try:
-            pg_cursor.execute(f"DELETE FROM {table}")
-            print(f"  🗑️ 清空 {table}")
-        except Exception as e:
-            print(f"  ⚠️ 清空表 {table} 失败: {e}")
-    
-    pg_conn.commit()
-    print("✅ 表数据清空完成")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def sync_users_table(sqlite_cursor, pg_cursor, pg_conn):
-    """同步users表"""
-    print("👥 同步users表到PostgreSQL...")
-    
-    sqlite_cursor.execute("SELECT * FROM users ORDER BY id")
-    users = sqlite_cursor.fetchall()
-    
-    for user in users:
-        # SQLite字段: id, username, password, role, team, role_en, team_en, chinese_name, email, phone, gotify_app_token, gotify_user_id
-        # PostgreSQL插入时指定id
-        values = [
-            user[0],   # id
-            user[1],   # username
-            user[2],   # password
-            user[3],   # role
-            user[4],   # team
-            user[5],   # role_en
-            user[6],   # team_en
-            user[7],   # chinese_name
-            user[8],   # email
-            user[9],   # phone
-            user[10],  # gotify_app_token
-            user[11]   # gotify_user_id
-        ]
-        
-        pg_cursor.execute('''
-            INSERT INTO users 
-            (id, username, password, role, team, role_en, team_en, chinese_name, 
-             email, phone, gotify_app_token, gotify_user_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', values)
-    
-    # 更新序列
-    if users:
-        max_id = max(user[0] for user in users)
-        pg_cursor.execute(f"SELECT setval('users_id_seq', {max_id})")
-    
-    pg_conn.commit()
-    print(f"  ✅ 同步了 {len(users)} 个用户")
-
-def sync_bugs_table(sqlite_cursor, pg_cursor, pg_conn):
-    """同步bugs表"""
-    print("🐛 同步bugs表到PostgreSQL...")
-    
-    sqlite_cursor.execute("SELECT * FROM bugs ORDER BY id")
-    bugs = sqlite_cursor.fetchall()
-    
-    for bug in bugs:
-        # SQLite字段: id, title, description, status, assigned_to, created_by, project, created_at, resolved_at, resolution, image_path, type
-        values = [
-            bug[0],   # id
-            bug[1],   # title
-            bug[2],   # description
-            bug[3],   # status
-            bug[4],   # assigned_to
-            bug[5],   # created_by
-            bug[6],   # project
-            bug[7],   # created_at
-            bug[8],   # resolved_at
-            bug[9],   # resolution
-            bug[10],  # image_path
-            bug[11] if len(bug) > 11 else 'bug'   # type (默认为'bug'如果字段不存在)
-        ]
-
-        pg_cursor.execute('''
-            INSERT INTO bugs
-            (id, title, description, status, assigned_to, created_by, project,
-             created_at, resolved_at, resolution, image_path, type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', values)
-    
-    # 更新序列
-    if bugs:
-        max_id = max(bug[0] for bug in bugs)
-        pg_cursor.execute(f"SELECT setval('bugs_id_seq', {max_id})")
-    
-    pg_conn.commit()
-    print(f"  ✅ 同步了 {len(bugs)} 个问题")
-
-def sync_projects_table(sqlite_cursor, pg_cursor, pg_conn):
-    """同步projects表"""
-    print("📋 同步projects表到PostgreSQL...")
-
-    try:
-        sqlite_cursor.execute("SELECT * FROM projects ORDER BY id")
-        projects = sqlite_cursor.fetchall()
-
-        for project in projects:
-            # SQLite字段: id, name, type, city, start_date, factory_acceptance_date,
-            #            site_acceptance_date, practical_date, description, created_at, updated_at
-            values = [
-                project[0],   # id
-                project[1],   # name
-                project[2],   # type
-                project[3],   # city
-                project[4],   # start_date
-                project[5],   # factory_acceptance_date
-                project[6],   # site_acceptance_date
-                project[7],   # practical_date
-                project[8],   # description
-                project[9],   # created_at
-                project[10]   # updated_at
-            ]
-
-            pg_cursor.execute('''
-                INSERT INTO projects
-                (id, name, type, city, start_date, factory_acceptance_date,
-                 site_acceptance_date, practical_date, description, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', values)
-
-        # 更新序列
-        if projects:
-            max_id = max(project[0] for project in projects)
-            pg_cursor.execute(f"SELECT setval('projects_id_seq', {max_id})")
-
-        pg_conn.commit()
-        print(f"  ✅ 同步了 {len(projects)} 个项目")
-
-    except Exception as e:
-        print(f"  ❌ 同步projects表失败: {e}")
-
-def sync_user_notification_preferences_table(sqlite_cursor, pg_cursor, pg_conn):
-    """同步user_notification_preferences表"""
-    print("🔔 同步user_notification_preferences表到PostgreSQL...")
-    
-    try:
-        sqlite_cursor.execute("SELECT * FROM user_notification_preferences ORDER BY user_id")
-        preferences = sqlite_cursor.fetchall()
-        
-        for pref in preferences:
-            values = [
-                pref[0],  # user_id
-                pref[1],  # email_enabled
-                pref[2],  # gotify_enabled
-                pref[3],  # inapp_enabled
-                pref[4],  # created_at
-                pref[5]   # updated_at
-            ]
-            
-            pg_cursor.execute('''
-                INSERT INTO user_notification_preferences 
-                (user_id, email_enabled, gotify_enabled, inapp_enabled, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', values)
-        
-        pg_conn.commit()
-        print(f"  ✅ 同步了 {len(preferences)} 个用户偏好")
-        
-    except Exception as e:
-        print(f"  ⚠️ user_notification_preferences表同步失败: {e}")
-
-def sync_notifications_table(sqlite_cursor, pg_cursor, pg_conn):
-    """同步notifications表"""
-    print("📬 同步notifications表到PostgreSQL...")
-    
-    try:
-        sqlite_cursor.execute("SELECT * FROM notifications ORDER BY id")
-        notifications = sqlite_cursor.fetchall()
-        
-        for notif in notifications:
-            # SQLite字段: id, user_id, title, content, read_status, created_at, read_at, related_bug_id
-            values = [
-                notif[0],  # id
-                notif[1],  # user_id
-                notif[2],  # title
-                notif[3],  # content
-                notif[4],  # read_status
-                notif[5],  # created_at
-                notif[6],  # read_at
-                notif[7]   # related_bug_id
-            ]
-            
-            pg_cursor.execute('''
-                INSERT INTO notifications 
-                (id, user_id, title, content, read_status, created_at, read_at, related_bug_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', values)
-        
-        # 更新序列
-        if notifications:
-            max_id = max(notif[0] for notif in notifications)
-            pg_cursor.execute(f"SELECT setval('notifications_id_seq', {max_id})")
-        
-        pg_conn.commit()
-        print(f"  ✅ 同步了 {len(notifications)} 个通知")
-        
-    except Exception as e:
-        print(f"  ⚠️ notifications表同步失败: {e}")
-
-def verify_postgres_data(pg_cursor):
-    """验证PostgreSQL数据"""
-    print("\n📊 验证PostgreSQL同步结果:")
-    
-    tables = ['users', 'projects', 'bugs', 'user_notification_preferences', 'notifications']
-    for table in tables:
-        pg_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        count = pg_cursor.fetchone()[0]
-        print(f"  {table}: {count} 条记录")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='同步SQLite数据到PostgreSQL')
+    parser.add_argument('--sqlite', default=os.path.join(PROJECT_ROOT, 'rebugtracker.db'), help='SQLite数据库路径')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批行数')
+    parser.add_argument('--incremental', action='store_true', help='增量同步：只同步上次同步之后变化的行')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的位置继续')
+    parser.add_argument('--yes', action='store_true', help='不询问确认')
+    args = parser.parse_args()
+
     print("🚀 开始同步SQLite数据到PostgreSQL")
     print("=" * 60)
-    
-    # SQLite数据库路径
-    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'rebugtracker.db')
-    print(f"📁 SQLite数据库路径: {db_path}")
-    
-    if not os.path.exists(db_path):
+    print(f"📁 SQLite数据库路径: {args.sqlite}")
+    if not os.path.exists(args.sqlite):
         print("❌ SQLite数据库文件不存在")
-        return
-    
-    # 连接数据库
+        return 1
+
+    # 目标库为PostgreSQL：应用模块（迁移、汇总表重建）按PostgreSQL执行
+    os.environ['DB_TYPE'] = 'postgres'
+    os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import psycopg2
+    import sync_pipeline
+    from config import POSTGRES_CONFIG
+
     print(f"🔗 连接PostgreSQL: {POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG.get('port', 5432)}")
-    
-    try:
-        # SQLite连接
-        sqlite_conn = sqlite3.connect(db_path)
-        sqlite_cursor = sqlite_conn.cursor()
-        
-        # PostgreSQL连接
-        pg_conn = psycopg2.connect(**POSTGRES_CONFIG)
-        pg_cursor = pg_conn.cursor(cursor_factory=DictCursor)
-        
-        # 警告提示
+    if not args.resume and not args.incremental and not args.yes:
         print("⚠️ 注意：此操作将清空PostgreSQL中的用户、问题和通知数据！")
         print("📋 system_config配置数据将保留")
-        
         response = input("是否继续？(y/N): ")
         if response.lower() != 'y':
             print("❌ 操作已取消")
-            return
-        
-        # 1. 清空PostgreSQL数据
-        clear_postgres_tables(pg_cursor, pg_conn)
-        
-        # 2. 同步各个表的数据
-        sync_users_table(sqlite_cursor, pg_cursor, pg_conn)
-        sync_projects_table(sqlite_cursor, pg_cursor, pg_conn)
-        sync_bugs_table(sqlite_cursor, pg_cursor, pg_conn)
-        sync_user_notification_preferences_table(sqlite_cursor, pg_cursor, pg_conn)
-        sync_notifications_table(sqlite_cursor, pg_cursor, pg_conn)
-        
-        # 3. 验证结果
-        verify_postgres_data(pg_cursor)
-        
-        print("\n🎉 SQLite数据同步到PostgreSQL完成！")
-        
+            return 1
+
+    sqlite_conn = pg_conn = None
+    try:
+        sync_pipeline.ensure_target_schema()
+        sqlite_conn = sqlite3.connect(args.sqlite)
+        pg_conn = psycopg2.connect(**POSTGRES_CONFIG)
+        source = sync_pipeline.SqliteEndpoint(sqlite_conn)
+        target = sync_pipeline.PostgresEndpoint(pg_conn)
+
+        tables = [spec for spec in sync_pipeline.SYNC_TABLES if spec[0] != 'system_config']
+        if args.incremental:
+            sync_pipeline.run_incremental(source, target, tables, batch_size=args.batch_size)
+        else:
+            sync_pipeline.run_sync(source, target, tables, batch_size=args.batch_size, resume=args.resume)
+        consistent = sync_pipeline.verify_counts(source, target, tables)
+
+        print("\n🎉 SQLite数据同步到PostgreSQL完成！" if consistent else "\n⚠️ 同步完成，但行数不一致，请检查")
+        return 0 if consistent else 1
     except Exception as e:
-        print(f"❌ 同步失败: {e}")
+        print(f"\n❌ 同步失败: {e}")
+        print("💡 修复问题后可使用 --resume 从断点继续")
         import traceback
         traceback.print_exc()
-        
+        return 1
     finally:
-        try:
-            sqlite_conn.close()
-            pg_conn.close()
-            print("\n✅ 数据库连接已关闭")
-        except:
-            pass
+        for conn in (sqlite_conn, pg_conn):
+            if conn is not None:
+                conn.close()
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,17 +1,30 @@
 # db_factory.py: 数据库连接模块，提供统一的数据库连接接口
 # 根据配置创建PostgreSQL或SQLite数据库连接，并处理特定于数据库的初始化设置
+# 支持连接池模式（DB_POOL_ENABLED=true）：
+# - PostgreSQL: 进程内共享的有界连接池，借出时做健康检查，使用N次后重建连接
+# - SQLite: 每个线程复用一个连接，PRAGMA只在建立连接时执行一次
+# 池化模式下调用方仍然使用 conn.close()，连接会被归还到池中而不是真正关闭
+
+import os
+import time
+import logging
+import threading
+from collections import deque
 
 import psycopg2
+import psycopg2.pool
 import sqlite3
-from config import DB_TYPE, DATABASE_CONFIG
+from config import DB_TYPE, DATABASE_CONFIG, DB_POOL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _create_raw_connection():
+    """创建一个新的底层数据库连接（不经过连接池）
 
-def get_db_connection():
-    """获取数据库连接实例
-    
     Returns:
-        connection: 配置好的数据库连接对象
-        支持PostgreSQL和SQLite两种数据库类型
-        
+        connection: 配置好的psycopg2或sqlite3连接对象
+
     Raises:
         ValueError: 当配置的数据库类型不被支持时抛出异常
     """
@@ -27,8 +40,379 @@ def get_db_connection():
         # 启用WAL模式提升并发性能
         conn.execute('PRAGMA journal_mode=WAL;')
         # 设置5秒锁等待超时
-        conn.execute('PRAGMA busy_timeout = 5000;')  
+        conn.execute('PRAGMA busy_timeout = 5000;')
         return conn
     else:
         # 不支持的数据库类型
         raise ValueError(f"不支持的数据库类型: {DB_TYPE}")
+
+
+class _PoolEntry:
+    """连接池中的一条底层连接及其使用记录"""
+
+    __slots__ = ('conn', 'uses', 'created_at', 'last_used', 'depth')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.uses = 0            # 已被借出并归还的次数
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.depth = 0           # 当前借出层数（仅SQLite线程复用时会大于1）
+
+
+class PooledConnection:
+    """池化连接代理
+
+    除close()外的所有属性和方法都转发给底层连接，
+    因此现有的 cursor()/commit()/rollback()/autocommit 等用法保持不变。
+    close() 会把连接归还到池中；忘记调用close()的代理在被回收时也会自动归还。
+    """
+
+    def __init__(self, pool, entry):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_entry', entry)
+        object.__setattr__(self, '_released', False)
+
+    def __getattr__(self, name):
+        return getattr(self._entry.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._entry.conn, name, value)
+
+    def __enter__(self):
+        self._entry.conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return self._entry.conn.__exit__(exc_type, exc_value, tb)
+
+    def close(self):
+        """归还连接到连接池（重复调用无副作用）"""
+        if self._released:
+            return
+        object.__setattr__(self, '_released', True)
+        self._pool.release(self._entry)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PostgresConnectionPool:
+    """PostgreSQL有界连接池
+
+    - min_size: 首次使用时预先建立的连接数
+    - max_size: 同时存在的最大连接数，耗尽时最多等待timeout秒
+    - max_uses: 单个连接被借出max_uses次后关闭并重建，避免长连接状态累积
+    - health_check_interval: 空闲超过该秒数的连接在借出前执行 SELECT 1 检查
+    """
+
+    def __init__(self, min_size=1, max_size=10, max_uses=500,
+                 health_check_interval=30, timeout=10):
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._total = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {
+            'created': 0,       # 新建的底层连接数
+            'checkouts': 0,     # 借出次数
+            'reused': 0,        # 复用已有连接的借出次数
+            'recycled': 0,      # 达到max_uses后重建的连接数
+            'discarded': 0,     # 健康检查失败或已断开而丢弃的连接数
+            'waits': 0,         # 因连接池耗尽而等待的次数
+            'timeouts': 0,      # 等待超时次数
+        }
+        self._prefill()
+
+    def _prefill(self):
+        """预先建立min_size个连接"""
+        for _ in range(self.min_size):
+            try:
+                conn = _create_raw_connection()
+            except Exception as e:
+                logger.warning(f"连接池预建连接失败: {e}")
+                return
+            with self._cond:
+                self._total += 1
+                self._stats['created'] += 1
+                self._idle.append(_PoolEntry(conn))
+
+    def acquire(self):
+        """从池中借出一个连接"""
+        deadline = time.time() + self.timeout
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                while not self._idle and self._total >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise psycopg2.pool.PoolError(
+                            f"数据库连接池已耗尽（max_size={self.max_size}），等待{self.timeout}秒超时")
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    entry = self._idle.pop()  # 后进先出，优先使用最近活跃的连接
+                else:
+                    self._total += 1
+                    create = True
+
+            if create:
+                try:
+                    entry = _PoolEntry(_create_raw_connection())
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                    self._stats['checkouts'] += 1
+                entry.depth = 1
+                return entry
+
+            if self._is_healthy(entry):
+                with self._cond:
+                    self._stats['checkouts'] += 1
+                    self._stats['reused'] += 1
+                entry.depth = 1
+                return entry
+
+            self._discard(entry, 'discarded')
+
+    def _is_healthy(self, entry):
+        """借出前检查连接是否可用"""
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if time.time() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.info(f"连接健康检查失败，丢弃连接: {e}")
+            return False
+
+    def _discard(self, entry, reason):
+        """关闭并移除一个底层连接"""
+        try:
+            if not entry.conn.closed:
+                entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._stats[reason] += 1
+            self._cond.notify()
+
+    def release(self, entry):
+        """归还连接：回滚未提交事务、恢复默认设置，必要时重建"""
+        entry.depth = 0
+        conn = entry.conn
+        try:
+            if conn.closed:
+                self._discard(entry, 'discarded')
+                return
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except Exception as e:
+            logger.info(f"归还连接时重置失败，丢弃连接: {e}")
+            self._discard(entry, 'discarded')
+            return
+
+        entry.uses += 1
+        entry.last_used = time.time()
+        if self.max_uses and entry.uses >= self.max_uses:
+            self._discard(entry, 'recycled')
+            return
+
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def stats(self):
+        """连接池统计信息"""
+        with self._cond:
+            result = dict(self._stats)
+            result.update({
+                'db_type': 'postgres',
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'max_uses': self.max_uses,
+                'open_connections': self._total,
+                'idle_connections': len(self._idle),
+                'in_use_connections': self._total - len(self._idle),
+            })
+        return result
+
+
+class SQLiteThreadLocalPool:
+    """SQLite线程级连接复用
+
+    sqlite3连接默认只能在创建它的线程中使用，因此每个线程持有一个连接。
+    同一线程内嵌套获取连接时共享同一个底层连接，只有最外层close()时
+    才回滚未提交的事务，避免内层调用误回滚外层的写入。
+    """
+
+    def __init__(self, max_uses=500, health_check_interval=30):
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'reused': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def acquire(self):
+        """获取当前线程的连接"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is not None and entry.depth == 0 and not self._is_healthy(entry):
+            self._close(entry, 'discarded')
+            entry = None
+
+        if entry is None:
+            entry = _PoolEntry(_create_raw_connection())
+            self._local.entry = entry
+            self._count('created')
+        else:
+            self._count('reused')
+
+        entry.depth += 1
+        self._count('checkouts')
+        return entry
+
+    def _is_healthy(self, entry):
+        if time.time() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            entry.conn.execute('SELECT 1').fetchone()
+            return True
+        except Exception as e:
+            logger.info(f"SQLite连接健康检查失败，重新建立连接: {e}")
+            return False
+
+    def _close(self, entry, reason):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        if getattr(self._local, 'entry', None) is entry:
+            self._local.entry = None
+        self._count(reason)
+
+    def release(self, entry):
+        """归还连接：仅在最外层归还时重置事务状态"""
+        entry.depth -= 1
+        if entry.depth > 0:
+            return
+        entry.depth = 0
+        try:
+            if entry.conn.in_transaction:
+                entry.conn.rollback()
+        except Exception as e:
+            logger.info(f"归还SQLite连接时回滚失败，关闭连接: {e}")
+            self._close(entry, 'discarded')
+            return
+
+        entry.uses += 1
+        entry.last_used = time.time()
+        if self.max_uses and entry.uses >= self.max_uses:
+            self._close(entry, 'recycled')
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+        result.update({
+            'db_type': 'sqlite',
+            'max_uses': self.max_uses,
+            'open_connections': result['created'] - result['recycled'] - result['discarded'],
+        })
+        return result
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """获取当前进程的连接池（gunicorn fork之后每个worker各自建立连接池）"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            # fork继承来的连接不能在子进程中使用，也不能关闭（会影响父进程），直接丢弃引用
+            if DB_TYPE == 'postgres':
+                _pool = PostgresConnectionPool(
+                    min_size=DB_POOL_CONFIG['min_size'],
+                    max_size=DB_POOL_CONFIG['max_size'],
+                    max_uses=DB_POOL_CONFIG['max_uses'],
+                    health_check_interval=DB_POOL_CONFIG['health_check_interval'],
+                    timeout=DB_POOL_CONFIG['timeout'],
+                )
+            elif DB_TYPE == 'sqlite':
+                _pool = SQLiteThreadLocalPool(
+                    max_uses=DB_POOL_CONFIG['max_uses'],
+                    health_check_interval=DB_POOL_CONFIG['health_check_interval'],
+                )
+            else:
+                raise ValueError(f"不支持的数据库类型: {DB_TYPE}")
+            _pool_pid = pid
+    return _pool
+
+
+def get_db_connection():
+    """获取数据库连接实例
+
+    Returns:
+        connection: 配置好的数据库连接对象
+        支持PostgreSQL和SQLite两种数据库类型
+        启用连接池时返回PooledConnection代理，close()会归还连接
+
+    Raises:
+        ValueError: 当配置的数据库类型不被支持时抛出异常
+        psycopg2.pool.PoolError: PostgreSQL连接池耗尽且等待超时
+    """
+    if not DB_POOL_CONFIG['enabled']:
+        return _create_raw_connection()
+
+    pool = _get_pool()
+    return PooledConnection(pool, pool.acquire())
+
+
+def get_pool_stats():
+    """获取连接池统计信息
+
+    Returns:
+        dict: 连接池统计；未启用连接池时只返回 {'enabled': False}
+    """
+    if not DB_POOL_CONFIG['enabled']:
+        return {'enabled': False, 'db_type': DB_TYPE}
+    stats = _get_pool().stats()
+    stats['enabled'] = True
+    return stats
@@ -71,23 +71,22 @@ print(f'✅ SQLite 数据库文件已创建: {db_path}')
     fi
 fi
 
-# 初始化数据库表（如果需要）
-echo "🗄️ 检查数据库表..."
+# 执行未执行的数据库迁移（版本记录在schema_version表，已是最新版本时只做一次版本查询）
+echo "🗄️ 检查数据库版本..."
 python3 -c "
 import sys
 import os
 sys.path.append('/app')
 
 try:
-    # 尝试导入应用并初始化数据库
     import rebugtracker
-    if hasattr(rebugtracker, 'init_db'):
-        rebugtracker.init_db()
-        print('✅ 数据库表初始化完成')
+    applied = rebugtracker.init_db()
+    if applied:
+        print(f'✅ 已执行数据库迁移: {applied}')
     else:
-        print('ℹ️ 跳过数据库初始化（未找到 init_db 函数）')
+        print('✅ 数据库已是最新版本')
 except Exception as e:
-    print(f'⚠️ 数据库初始化警告: {e}')
+    print(f'⚠️ 数据库迁移警告: {e}')
     # 不退出，让应用自己处理数据库初始化
 "
 
@@ -141,18 +140,23 @@ echo "🚀 启动应用: ${APP_MODULE}:${APP_OBJECT}"
 
 # 设置 Gunicorn 配置
 WORKERS=${GUNICORN_WORKERS:-4}
+# 每个工作进程的线程数（实时通知流为长连接，使用gthread避免占满同步worker）
+THREADS=${GUNICORN_THREADS:-16}
 TIMEOUT=${GUNICORN_TIMEOUT:-120}
 BIND_ADDRESS="0.0.0.0:${SERVER_PORT:-5000}"
 
 echo "⚙️ Gunicorn 配置:"
 echo "   绑定地址: $BIND_ADDRESS"
 echo "   工作进程: $WORKERS"
+echo "   每进程线程: $THREADS"
 echo "   超时时间: $TIMEOUT 秒"
 
 # 启动应用
 exec gunicorn \
     --bind "$BIND_ADDRESS" \
     --workers "$WORKERS" \
+    --worker-class gthread \
+    --threads "$THREADS" \
     --timeout "$TIMEOUT" \
     --access-logfile - \
     --error-logfile - \
@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+"""
+后台导出任务
+请求只写入一条export_jobs记录并返回任务ID，由有界的后台线程生成文件到 uploads/exports/，
+前端轮询进度后通过下载接口获取文件；文件过期后由后台线程删除。
+相同类型、格式和参数的请求在复用期内直接返回已生成（或正在生成）的任务。
+
+导出类型通过 register_export_kind 注册，数据来源（查询、字段、行转换）由注册方提供。
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import report_export
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 状态：pending 等待生成 / running 生成中 / done 已完成 / failed 失败
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# 每个进程的导出线程数
+EXPORT_JOB_WORKERS = _env_int('EXPORT_JOB_WORKERS', 1)
+# 导出文件保留时间（秒），过期后删除文件，下载链接失效
+EXPORT_JOB_TTL = _env_int('EXPORT_JOB_TTL', 3600)
+# 完成后多少秒内相同参数的请求直接复用该文件（即复用报表数据的最大延迟）
+EXPORT_JOB_REUSE_SECONDS = _env_int('EXPORT_JOB_REUSE_SECONDS', 300)
+# 每写入多少行更新一次进度
+PROGRESS_EVERY = _env_int('EXPORT_JOB_PROGRESS_EVERY', 1000)
+
+# 导出类型 -> 数据来源函数
+# 数据来源函数接收任务参数，返回 {'query', 'params', 'fields', 'transform', 'sheet_title'}
+_export_kinds: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def register_export_kind(kind: str, source: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """注册导出类型"""
+    _export_kinds[kind] = source
+
+
+def get_exports_folder() -> str:
+    """导出文件目录（UPLOAD_FOLDER/exports）"""
+    from config_adapter import UPLOAD_FOLDER
+    folder = os.path.join(UPLOAD_FOLDER, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _now_str() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def _job_key(kind: str, format_type: str, params: Dict[str, Any]) -> str:
+    """任务参数的摘要，用于复用相同请求的导出文件"""
+    payload = json.dumps({'kind': kind, 'format': format_type, 'params': params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+JOB_COLUMNS = ('id', 'kind', 'format', 'filename', 'status', 'progress', 'total_rows',
+               'file_path', 'file_size', 'error', 'created_by', 'created_at',
+               'started_at', 'finished_at', 'expires_at')
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    """任务记录转为字典，时间统一为字符串并计算完成百分比"""
+    job = dict(zip(JOB_COLUMNS, row))
+    for key in ('created_at', 'started_at', 'finished_at', 'expires_at'):
+        if job[key] is not None and not isinstance(job[key], str):
+            job[key] = job[key].strftime(TIME_FORMAT)
+    if job['status'] == STATUS_DONE:
+        job['percent'] = 100
+    elif job['total_rows']:
+        job['percent'] = min(99, int(job['progress'] * 100 / job['total_rows']))
+    else:
+        job['percent'] = 0
+    return job
+
+
+class ExportJobManager:
+    """导出任务的提交、查询和后台生成
+
+    - workers: 后台线程数（有界，导出不再占用请求线程）
+    - ttl: 文件保留秒数，过期后删除文件和任务记录
+    - reuse_seconds: 完成后多少秒内相同参数的请求复用该文件
+    - lock_timeout: 生成中任务超过该秒数没有进度（进程崩溃等）会被重新领取
+    """
+
+    def __init__(self, workers: int = EXPORT_JOB_WORKERS, ttl: int = EXPORT_JOB_TTL,
+                 reuse_seconds: int = EXPORT_JOB_REUSE_SECONDS, poll_interval: float = 5,
+                 lock_timeout: int = 600, purge_interval: int = 600):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.reuse_seconds = min(reuse_seconds, ttl)
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self.purge_interval = purge_interval
+
+        self._threads: List[threading.Thread] = []
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._last_purge = 0.0
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'reused': 0, 'completed': 0, 'failed': 0, 'purged': 0}
+
+    # ---------- 提交与查询 ----------
+
+    def submit(self, kind: str, params: Dict[str, Any], format_type: str = 'excel',
+               filename: str = None, created_by: Any = None, force: bool = False) -> Dict[str, Any]:
+        """提交导出任务；复用期内有相同请求的任务时直接返回该任务
+
+        Returns:
+            Dict: {'job': 任务信息, 'reused': 是否复用已有任务}
+        """
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+        from config import DB_TYPE
+
+        if kind not in _export_kinds:
+            raise ValueError(f'不支持的导出类型: {kind}')
+        if format_type not in report_export.EXTENSIONS:
+            raise ValueError(f'不支持的导出格式: {format_type}')
+
+        job_key = _job_key(kind, format_type, params)
+        now = _now_str()
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            if not force:
+                existing = self._find_reusable(cursor, job_key)
+                if existing is not None:
+                    self._count('reused')
+                    return {'job': existing, 'reused': True}
+
+            insert_sql = """
+                INSERT INTO export_jobs (job_key, kind, format, filename, params, status, progress,
+                                         created_by, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, 0, %s, %s)
+            """
+            insert_params = (job_key, kind, format_type, filename or kind,
+                             json.dumps(params, ensure_ascii=False, default=str),
+                             STATUS_PENDING, created_by, now)
+            if DB_TYPE == 'postgres':
+                query, query_params = adapt_sql(insert_sql + ' RETURNING id', insert_params)
+                cursor.execute(query, query_params)
+                job_id = cursor.fetchone()[0]
+            else:
+                query, query_params = adapt_sql(insert_sql, insert_params)
+                cursor.execute(query, query_params)
+                job_id = cursor.lastrowid
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._count('submitted')
+        self.start()
+        self._wake_event.set()
+        return {'job': self.get_job(job_id), 'reused': False}
+
+    def _find_reusable(self, cursor, job_key: str) -> Optional[Dict[str, Any]]:
+        """查找相同参数的排队中、生成中或在复用期内完成的任务（已完成的任务要求文件仍存在）"""
+        from sql_adapter import adapt_sql
+
+        reuse_after = (datetime.now() - timedelta(seconds=self.reuse_seconds)).strftime(TIME_FORMAT)
+        query, params = adapt_sql(f"""
+            SELECT {', '.join(JOB_COLUMNS)} FROM export_jobs
+            WHERE job_key = %s
+              AND (status IN (%s, %s) OR (status = %s AND finished_at >= %s))
+            ORDER BY id DESC
+            LIMIT 1
+        """, (job_key, STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, reuse_after))
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = _row_to_job(row)
+        if job['status'] == STATUS_DONE and not (job['file_path'] and os.path.exists(job['file_path'])):
+            return None
+        return job
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """查询任务状态和进度"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql(f"SELECT {', '.join(JOB_COLUMNS)} FROM export_jobs WHERE id = %s", (job_id,))
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return _row_to_job(row)
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动后台线程（每个进程只启动一次，fork后的子进程会重新启动）"""
+        with self._start_lock:
+            pid = os.getpid()
+            if self._pid == pid and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = pid
+            self._stop_event.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run_loop, daemon=True, name=f"ExportJob-{i}")
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Export job worker started with {self.workers} threads")
+
+    def stop(self, timeout: float = 5):
+        """停止后台线程"""
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                processed = self.process_once()
+                self.maybe_purge_expired()
+            except Exception as e:
+                logger.error(f"Error in export job loop: {e}")
+                processed = False
+
+            if not processed:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+
+    # ---------- 领取与生成 ----------
+
+    def process_once(self) -> bool:
+        """领取并生成一个任务，没有待处理任务时返回False"""
+        job = self._claim()
+        if job is None:
+            return False
+        self._run_job(job)
+        return True
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """领取一个待处理任务（PostgreSQL使用SKIP LOCKED，SQLite依赖单写锁）"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+        from config import DB_TYPE
+
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        now = datetime.now()
+        now_str = now.strftime(TIME_FORMAT)
+        stale_before = (now - timedelta(seconds=self.lock_timeout)).strftime(TIME_FORMAT)
+        skip_locked = 'FOR UPDATE SKIP LOCKED' if DB_TYPE == 'postgres' else ''
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql(f"""
+                UPDATE export_jobs
+                SET status = %s, locked_by = %s, locked_at = %s, started_at = %s, progress = 0
+                WHERE id IN (
+                    SELECT id FROM export_jobs
+                    WHERE status = %s OR (status = %s AND locked_at < %s)
+                    ORDER BY id
+                    LIMIT 1
+                    {skip_locked}
+                )
+            """, (STATUS_RUNNING, token, now_str, now_str, STATUS_PENDING, STATUS_RUNNING, stale_before))
+            cursor.execute(query, params)
+            if cursor.rowcount == 0:
+                conn.commit()
+                return None
+
+            query, params = adapt_sql("""
+                SELECT id, kind, format, filename, params, job_key FROM export_jobs
+                WHERE locked_by = %s AND status = %s
+            """, (token, STATUS_RUNNING))
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'format': row[2], 'filename': row[3],
+                'params': json.loads(row[4]), 'job_key': row[5], 'token': token}
+
+    def _run_job(self, job: Dict[str, Any]):
+        """查询数据并写入导出文件"""
+        extension = report_export.EXTENSIONS[job['format']]
+        path = os.path.join(get_exports_folder(), f"export_{job['id']}_{uuid.uuid4().hex}.{extension}")
+        started = time.time()
+        try:
+            source = _export_kinds[job['kind']](job['params'])
+            total = self._count_rows(source['query'], source['params'])
+            self._update(job, total_rows=total)
+
+            rows = self._iter_rows(job, source)
+            if job['format'] == 'csv':
+                count = report_export.write_csv(rows, source['fields'], path)
+            else:
+                count = report_export.write_xlsx(rows, source['fields'], path,
+                                                 sheet_title=source.get('sheet_title', '问题列表'))
+
+            expires_at = (datetime.now() + timedelta(seconds=self.ttl)).strftime(TIME_FORMAT)
+            self._update(job, status=STATUS_DONE, progress=count, file_path=path,
+                         file_size=os.path.getsize(path), finished_at=_now_str(), expires_at=expires_at,
+                         locked_by=None)
+            self._count('completed')
+            logger.info(f"Export job {job['id']} ({job['kind']}) wrote {count} rows "
+                        f"in {time.time() - started:.2f}s")
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            self._update(job, status=STATUS_FAILED, error=str(e)[:1000], finished_at=_now_str(),
+                         expires_at=_now_str(), locked_by=None)
+            self._count('failed')
+            logger.error(f"Export job {job['id']} ({job['kind']}) failed: {e}")
+
+    def _iter_rows(self, job: Dict[str, Any], source: Dict[str, Any]):
+        """通过服务器端游标逐批读取行，每PROGRESS_EVERY行更新一次进度（同时刷新锁时间）"""
+        from db_factory import get_db_connection
+
+        transform = source.get('transform') or (lambda row: row)
+        conn = get_db_connection()
+        try:
+            cursor = report_export.open_stream_cursor(conn)
+            cursor.execute(source['query'], source['params'])
+            count = 0
+            for row in report_export.iter_cursor_rows(cursor):
+                yield transform(row)
+                count += 1
+                if count % PROGRESS_EVERY == 0:
+                    self._update(job, progress=count, locked_at=_now_str())
+            cursor.close()
+        finally:
+            conn.close()
+
+    def _count_rows(self, query: str, params) -> int:
+        from db_factory import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM ({query}) export_rows", params)
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def _update(self, job: Dict[str, Any], **values):
+        """更新任务字段（只更新仍由本线程持有的任务）"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        assignments = ', '.join(f'{column} = %s' for column in values)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql(f"""
+                UPDATE export_jobs SET {assignments}
+                WHERE id = %s AND locked_by = %s
+            """, tuple(values.values()) + (job['id'], job['token']))
+            cursor.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------- 过期清理 ----------
+
+    def maybe_purge_expired(self) -> int:
+        """距上次清理超过purge_interval秒时执行一次过期清理"""
+        if time.time() - self._last_purge < self.purge_interval:
+            return 0
+        self._last_purge = time.time()
+        return self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """删除过期任务的文件和记录，返回删除的任务数"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                SELECT id, file_path FROM export_jobs
+                WHERE status IN (%s, %s) AND expires_at < %s
+            """, (STATUS_DONE, STATUS_FAILED, _now_str()))
+            cursor.execute(query, params)
+            expired = cursor.fetchall()
+            for job_id, file_path in expired:
+                if file_path and os.path.exists(file_path):
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        logger.warning(f"Failed to remove expired export file {file_path}: {e}")
+                        continue
+                query, params = adapt_sql("DELETE FROM export_jobs WHERE id = %s", (job_id,))
+                cursor.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if expired:
+            with self._stats_lock:
+                self._stats['purged'] += len(expired)
+            logger.info(f"Purged {len(expired)} expired export jobs")
+        return len(expired)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各状态任务数和本进程计数"""
+        from db_factory import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM export_jobs GROUP BY status")
+            by_status = {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+        with self._stats_lock:
+            process_stats = dict(self._stats)
+        return {
+            'by_status': by_status,
+            'workers': self.workers,
+            'ttl': self.ttl,
+            'reuse_seconds': self.reuse_seconds,
+            'process_stats': process_stats
+        }
+
+
+# 全局导出任务管理器
+export_job_manager = ExportJobManager()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+图片附件的缩略图/中图变体
+附件列表显示缩略图（thumb），图片查看器显示中图（medium），原图只在点击下载时传输。
+
+- 变体缓存在 uploads/variants/<尺寸>/<前2位>/<键>.<格式>：按内容寻址的文件以SHA-256为键，
+  旧上传以 文件名+大小+修改时间 的哈希为键（文件被替换后自动生成新的变体）
+- 上传时由后台线程生成（variant_worker.submit），不占用请求线程；
+  请求 /uploads/<filename>?size=thumb 时变体不存在（旧文件、后台尚未完成）则当场生成
+- 生成失败（不是图片、图片损坏或超过像素上限）时返回None，由调用方返回原文件
+"""
+
+import os
+import time
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# 尺寸名 -> 最长边像素
+VARIANT_SIZES: Dict[str, int] = {
+    'thumb': _env_int('IMAGE_THUMB_SIZE', 320),
+    'medium': _env_int('IMAGE_MEDIUM_SIZE', 1280),
+}
+# 变体格式：webp 或 jpeg（Pillow不支持WebP时使用jpeg）
+IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', 'webp').lower()
+IMAGE_VARIANT_QUALITY = _env_int('IMAGE_VARIANT_QUALITY', 80)
+# 每个进程生成变体的后台线程数，0表示只在请求时生成
+IMAGE_VARIANT_WORKERS = _env_int('IMAGE_VARIANT_WORKERS', 1)
+
+VARIANT_DIR = 'variants'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+_MIMETYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+_format = None
+
+
+def variant_format() -> str:
+    """实际使用的变体格式"""
+    global _format
+    if _format is None:
+        fmt = IMAGE_VARIANT_FORMAT if IMAGE_VARIANT_FORMAT in _MIMETYPES else 'webp'
+        if fmt == 'webp':
+            try:
+                from PIL import features
+                if not features.check('webp'):
+                    fmt = 'jpeg'
+            except ImportError:
+                pass
+        _format = fmt
+    return _format
+
+
+def variant_mimetype() -> str:
+    return _MIMETYPES[variant_format()]
+
+
+def is_image(filename: str) -> bool:
+    return os.path.splitext(filename or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def source_key(source_path: str, sha256: Optional[str] = None) -> str:
+    """变体缓存的键：按内容寻址的文件用SHA-256，旧上传用文件名、大小和修改时间"""
+    if sha256:
+        return sha256
+    stat = os.stat(source_path)
+    raw = f'{os.path.basename(source_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def variant_path(upload_folder: str, key: str, size: str) -> str:
+    return os.path.join(upload_folder, VARIANT_DIR, size, key[:2], f'{key}.{variant_format()}')
+
+
+def generate_variant(source_path: str, dest_path: str, max_edge: int) -> bool:
+    """生成一个变体（先写临时文件再重命名），返回是否成功"""
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge))
+            fmt = variant_format()
+            if fmt == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+                # JPEG不支持透明通道：透明部分铺白色背景
+                image = image.convert('RGBA')
+                if fmt == 'jpeg':
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel('A'))
+                    image = background
+
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    image.save(tmp, format=fmt.upper(), quality=IMAGE_VARIANT_QUALITY)
+                os.replace(tmp_path, dest_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return True
+    except Exception as e:
+        logger.warning("Image variant generation failed for %s: %s", source_path, e)
+        return False
+
+
+def generate_variants(upload_folder: str, source_path: str, key: str) -> List[str]:
+    """生成缺少的全部尺寸变体，返回生成成功的尺寸"""
+    generated = []
+    for size, max_edge in VARIANT_SIZES.items():
+        dest_path = variant_path(upload_folder, key, size)
+        if os.path.exists(dest_path) or generate_variant(source_path, dest_path, max_edge):
+            generated.append(size)
+    return generated
+
+
+def get_variant(upload_folder: str, source_path: str, size: str, sha256: Optional[str] = None) -> Optional[str]:
+    """变体文件路径；缓存中没有时当场生成，失败时返回None"""
+    if size not in VARIANT_SIZES or not os.path.exists(source_path):
+        return None
+    dest_path = variant_path(upload_folder, source_key(source_path, sha256), size)
+    if os.path.exists(dest_path) or generate_variant(source_path, dest_path, VARIANT_SIZES[size]):
+        return dest_path
+    return None
+
+
+def delete_variants(upload_folder: str, key: str) -> None:
+    """删除一个文件的全部变体"""
+    for size in VARIANT_SIZES:
+        path = variant_path(upload_folder, key, size)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class ImageVariantWorker:
+    """上传后在后台线程生成变体（有界线程数，同一文件排队中时不重复提交）"""
+
+    def __init__(self, workers: int = IMAGE_VARIANT_WORKERS):
+        self.workers = workers
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+
+    def start(self):
+        """启动后台线程（每个进程只启动一次，fork后的子进程会重新启动）"""
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = pid
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run_loop, daemon=True, name=f"ImageVariant-{i}")
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, upload_folder: str, source_path: str, key: str) -> bool:
+        """提交生成任务，返回是否已提交（未启用后台线程或已在排队中时返回False）"""
+        if self.workers <= 0:
+            return False
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self.start()
+        self._queue.put((upload_folder, source_path, key))
+        return True
+
+    def wait_idle(self, timeout: float = 10) -> bool:
+        """等待已提交的任务完成（测试和关闭时使用），返回是否全部完成"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.02)
+        return False
+
+    def _run_loop(self):
+        while True:
+            upload_folder, source_path, key = self._queue.get()
+            try:
+                generate_variants(upload_folder, source_path, key)
+            except Exception as e:
+                logger.error("Image variant worker error for %s: %s", source_path, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
+
+
+variant_worker = ImageVariantWorker()
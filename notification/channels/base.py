@@ -4,8 +4,11 @@
 定义所有通知器的统一接口
 """
 
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
 
 class BaseNotifier(ABC):
     """通知器基类"""
@@ -28,6 +31,31 @@ class BaseNotifier(ABC):
         """
         pass
     
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """
+        批量发送通知，默认逐条调用send，子类可覆盖为真正的批量实现
+
+        Args:
+            messages: 消息列表，每项包含 title、content、recipient、priority、metadata
+
+        Returns:
+            List[bool]: 与messages一一对应的发送结果
+        """
+        results = []
+        for message in messages:
+            try:
+                results.append(bool(self.send(
+                    title=message['title'],
+                    content=message['content'],
+                    recipient=message['recipient'],
+                    priority=message.get('priority', 1),
+                    metadata=message.get('metadata')
+                )))
+            except Exception as e:
+                logger.error(f"Error sending {self.__class__.__name__} notification to {message['recipient'].get('id')}: {e}")
+                results.append(False)
+        return results
+    
     def is_enabled(self) -> bool:
         """
         检查通知器是否启用
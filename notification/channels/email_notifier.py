@@ -6,47 +6,166 @@
 
 import smtplib
 import logging
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
 
 from .base import BaseNotifier
 
 logger = logging.getLogger(__name__)
 
+# 空闲超过该秒数的SMTP连接在下次发送前关闭重建（多数服务器会在几分钟后主动断开空闲连接）
+SMTP_IDLE_TIMEOUT = int(os.getenv('SMTP_IDLE_TIMEOUT', '60'))
+# 建立连接的超时时间（秒）
+SMTP_CONNECT_TIMEOUT = int(os.getenv('SMTP_CONNECT_TIMEOUT', '30'))
+
+
+class SMTPSession:
+    """可复用的SMTP会话
+
+    - 连接（含SSL/STARTTLS握手和登录）建立后在多次发送之间复用
+    - 空闲超过idle_timeout或配置变化时关闭重建
+    - 发送时连接已被服务器断开，则重连后重试一次
+    - 内部加锁，多个发送线程共享同一会话时串行发送
+    """
+
+    def __init__(self, idle_timeout: int = SMTP_IDLE_TIMEOUT, connect_timeout: int = SMTP_CONNECT_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._lock = threading.RLock()
+        self._server = None
+        self._server_key = None
+        self._last_used = 0.0
+        self._stats = {'connects': 0, 'reconnects': 0, 'sent': 0}
+
+    def send_messages(self, config: Dict[str, Any], messages: List[MIMEMultipart]) -> List[bool]:
+        """在同一会话上依次发送多封邮件，返回与messages对应的结果"""
+        results = []
+        with self._lock:
+            for msg in messages:
+                try:
+                    self._send_one(config, msg)
+                    results.append(True)
+                except Exception as e:
+                    logger.error(f"Failed to send email to {msg['To']}: {str(e)}")
+                    results.append(False)
+                    # 连接状态未知，下一封邮件重新建立连接
+                    self.close()
+        return results
+
+    def close(self):
+        """关闭当前连接"""
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except Exception:
+                    try:
+                        self._server.close()
+                    except Exception:
+                        pass
+            self._server = None
+            self._server_key = None
+
+    def close_if_idle(self):
+        """空闲超时后关闭连接（可由定时任务调用，及时释放服务器端连接）"""
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                logger.debug("Closing idle SMTP connection")
+                self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """会话统计"""
+        with self._lock:
+            return dict(self._stats, connected=self._server is not None)
+
+    def _send_one(self, config: Dict[str, Any], msg: MIMEMultipart):
+        server = self._get_server(config)
+        try:
+            server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+            # 服务器已断开空闲连接等情况：重连后重试一次
+            logger.info(f"SMTP connection lost ({e.__class__.__name__}), reconnecting")
+            self.close()
+            self._stats['reconnects'] += 1
+            server = self._get_server(config)
+            server.send_message(msg)
+        self._last_used = time.monotonic()
+        self._stats['sent'] += 1
+
+    def _get_server(self, config: Dict[str, Any]):
+        key = (config['smtp_server'], config['smtp_port'], config['use_tls'],
+               config['username'], config['password'])
+        if self._server is not None:
+            if key != self._server_key or time.monotonic() - self._last_used > self.idle_timeout:
+                self.close()
+        if self._server is None:
+            self._server = self._connect(config)
+            self._server_key = key
+            self._last_used = time.monotonic()
+            self._stats['connects'] += 1
+        return self._server
+
+    def _connect(self, config: Dict[str, Any]):
+        # 根据端口和TLS设置选择连接方式
+        if config['smtp_port'] == 465 and not config['use_tls']:
+            # SSL模式 (465端口)
+            server = smtplib.SMTP_SSL(config['smtp_server'], config['smtp_port'], timeout=self.connect_timeout)
+        else:
+            # TLS模式 (587端口) 或普通模式
+            server = smtplib.SMTP(config['smtp_server'], config['smtp_port'], timeout=self.connect_timeout)
+            if config['use_tls']:
+                server.starttls()
+
+        try:
+            if config['username'] and config['password']:
+                server.login(config['username'], config['password'])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+
 class EmailNotifier(BaseNotifier):
     """邮件通知器"""
     
     def __init__(self):
-        # 从数据库读取配置
-        self.config = self._load_config_from_db()
+        # 从数据库读取配置（随system_config缓存刷新而重建）
+        self._config = None
+        self._config_generation = None
+        # 复用的SMTP会话
+        self.session = SMTPSession()
+
+        logger.debug("Email notifier initialized: enabled=%s", self.config['enabled'])
 
-        logger.debug(f"Email notifier initialized: enabled={self.config['enabled']}")
+    @property
+    def config(self) -> Dict[str, Any]:
+        """邮件配置，system_config缓存重新加载后自动重建"""
+        try:
+            from system_config_cache import system_config
+            generation = system_config.generation
+        except Exception:
+            generation = None
+        if self._config is None or generation != self._config_generation:
+            self._config = self._load_config_from_db()
+            self._config_generation = generation
+        return self._config
 
     def _load_config_from_db(self):
         """从数据库加载邮件配置"""
         try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
-
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            from system_config_cache import system_config
 
-            # 查询邮件相关配置
-            query, params = adapt_sql('''
-                SELECT config_key, config_value FROM system_config
-                WHERE config_key LIKE %s
-            ''', ('notification_email_%',))
-
-            cursor.execute(query, params)
-            db_configs = cursor.fetchall()
-            conn.close()
+            # 读取邮件相关配置
+            db_configs = system_config.get_prefix('notification_email_')
 
             # 构建配置字典
             config = {}
-            for key, value in db_configs:
+            for key, value in db_configs.items():
                 if key == 'notification_email_enabled':
                     config['enabled'] = value.lower() == 'true'
                 elif key == 'notification_email_smtp_server':
@@ -109,55 +228,76 @@ class EmailNotifier(BaseNotifier):
     def send(self, title: str, content: str, recipient: Dict[str, Any], 
              priority: int = 1, metadata: Dict[str, Any] = None) -> bool:
         """发送邮件通知"""
+        return self.send_batch([{
+            'title': title,
+            'content': content,
+            'recipient': recipient,
+            'priority': priority,
+            'metadata': metadata
+        }])[0]
+    
+    def send_bulk(self, title: str, content: str, recipients: List[Dict[str, Any]],
+                  priority: int = 1, metadata: Dict[str, Any] = None) -> List[bool]:
+        """把同一条通知发送给多个接收者（共用一个SMTP会话）"""
+        return self.send_batch([{
+            'title': title,
+            'content': content,
+            'recipient': recipient,
+            'priority': priority,
+            'metadata': metadata
+        } for recipient in recipients])
+    
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """批量发送邮件，整批只检查一次开关并复用同一个SMTP会话"""
+        results = [False] * len(messages)
         
         if not self.is_enabled():
             logger.debug("Email notifications disabled")
-            return False
+            return results
         
-        if not self.validate_recipient(recipient):
-            logger.warning(f"Invalid recipient for email: {recipient}")
-            return False
+        config = self.config
+        indexes = []
+        mails = []
+        for index, message in enumerate(messages):
+            recipient = message.get('recipient')
+            if not self.validate_recipient(recipient):
+                logger.warning(f"Invalid recipient for email: {recipient}")
+                continue
+            try:
+                mails.append(self._build_message(config, message['title'], message['content'],
+                                                 recipient, message.get('metadata')))
+                indexes.append(index)
+            except Exception as e:
+                logger.error(f"Failed to build email for {recipient.get('email', 'unknown')}: {str(e)}")
         
-        try:
-            # 创建邮件
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.config['from_name']} <{self.config['from_email']}>"
-            msg['To'] = recipient['email']
-            msg['Subject'] = Header(title, 'utf-8')
-            
-            # 生成HTML和文本版本
-            text_content = self._generate_text_content(title, content, metadata)
-            html_content = self._generate_html_content(title, content, metadata)
-            
-            # 添加邮件内容
-            msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
-            msg.attach(MIMEText(html_content, 'html', 'utf-8'))
-            
-            # 发送邮件
-            # 根据端口和TLS设置选择连接方式
-            if self.config['smtp_port'] == 465 and not self.config['use_tls']:
-                # SSL模式 (465端口)
-                with smtplib.SMTP_SSL(self.config['smtp_server'], self.config['smtp_port']) as server:
-                    if self.config['username'] and self.config['password']:
-                        server.login(self.config['username'], self.config['password'])
-                    server.send_message(msg)
-            else:
-                # TLS模式 (587端口) 或普通模式
-                with smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port']) as server:
-                    if self.config['use_tls']:
-                        server.starttls()
-
-                    if self.config['username'] and self.config['password']:
-                        server.login(self.config['username'], self.config['password'])
-
-                    server.send_message(msg)
-            
-            logger.info(f"Email sent to {recipient['email']}: {title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {recipient.get('email', 'unknown')}: {str(e)}")
-            return False
+        if not mails:
+            return results
+        
+        from request_logging import log_sampled
+        for index, success in zip(indexes, self.session.send_messages(config, mails)):
+            results[index] = success
+            if success:
+                log_sampled(logger, logging.INFO, 'email.sent', "Email sent to %s: %s",
+                            messages[index]['recipient']['email'], messages[index]['title'])
+        
+        return results
+    
+    def _build_message(self, config: Dict[str, Any], title: str, content: str,
+                       recipient: Dict[str, Any], metadata: Dict[str, Any] = None) -> MIMEMultipart:
+        """创建邮件"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = f"{config['from_name']} <{config['from_email']}>"
+        msg['To'] = recipient['email']
+        msg['Subject'] = Header(title, 'utf-8')
+        
+        # 生成HTML和文本版本
+        text_content = self._generate_text_content(title, content, metadata)
+        html_content = self._generate_html_content(title, content, metadata)
+        
+        # 添加邮件内容
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+        return msg
     
     def _generate_text_content(self, title: str, content: str, metadata: Dict[str, Any]) -> str:
         """生成文本版本邮件内容"""
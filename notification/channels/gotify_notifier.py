@@ -6,63 +6,188 @@ Gotify通知器
 
 import requests
 import logging
-from typing import Dict, Any
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
 import os
 
 from .base import BaseNotifier
 
 logger = logging.getLogger(__name__)
 
+# 单次推送超时（秒）
+GOTIFY_TIMEOUT = float(os.getenv('GOTIFY_TIMEOUT', '10'))
+# 每个Gotify服务器同时进行的推送请求上限（同时也是连接池大小）
+GOTIFY_MAX_CONCURRENCY_PER_HOST = int(os.getenv('GOTIFY_MAX_CONCURRENCY_PER_HOST', '4'))
+# 熔断: 连续失败次数达到该值后断开 / 断开后等待多少秒再放行一次探测请求
+GOTIFY_BREAKER_FAILURES = int(os.getenv('GOTIFY_BREAKER_FAILURES', '5'))
+GOTIFY_BREAKER_RESET_SECONDS = float(os.getenv('GOTIFY_BREAKER_RESET_SECONDS', '30'))
+
+
+class CircuitBreaker:
+    """简单熔断器
+
+    - closed: 正常放行，连续失败达到阈值后转为open
+    - open: 拒绝请求，reset_timeout秒后转为half_open
+    - half_open: 只放行一个探测请求，成功则closed，失败则重新open
+    """
+
+    def __init__(self, failure_threshold: int = GOTIFY_BREAKER_FAILURES,
+                 reset_timeout: float = GOTIFY_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = 'half_open'
+                self._probe_in_flight = False
+            if self._state == 'closed':
+                return True
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    logger.warning(f"Gotify circuit opened after {self._failures} consecutive failures")
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self._state, 'consecutive_failures': self._failures, 'rejected': self._rejected}
+
+
+class LatencyStats:
+    """推送耗时统计（保留最近的样本）"""
+
+    def __init__(self, max_samples: int = 500):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)
+        self._counts = {'sent': 0, 'failed': 0}
+
+    def record(self, seconds: float, success: bool):
+        with self._lock:
+            self._samples.append(seconds)
+            self._counts['sent' if success else 'failed'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            counts = dict(self._counts)
+        if not samples:
+            return dict(counts, latency_avg_ms=0.0, latency_p95_ms=0.0, latency_max_ms=0.0)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return dict(counts,
+                    latency_avg_ms=round(sum(samples) / len(samples) * 1000, 1),
+                    latency_p95_ms=round(p95 * 1000, 1),
+                    latency_max_ms=round(samples[-1] * 1000, 1))
+
+
+def _create_http_session() -> requests.Session:
+    """创建带连接池的keep-alive会话"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=GOTIFY_MAX_CONCURRENCY_PER_HOST)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 进程内共享的HTTP会话、线程池和按服务器划分的熔断器/并发限制
+_http_session = _create_http_session()
+latency_stats = LatencyStats()
+_registry_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_executor = None
+
+
+def _get_breaker(host: str) -> CircuitBreaker:
+    with _registry_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+def _get_host_semaphore(host: str) -> threading.BoundedSemaphore:
+    with _registry_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(GOTIFY_MAX_CONCURRENCY_PER_HOST)
+        return _host_semaphores[host]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """并发推送使用的线程池（首次使用时创建）"""
+    global _executor
+    with _registry_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GOTIFY_MAX_CONCURRENCY_PER_HOST * 2,
+                                           thread_name_prefix='gotify-send')
+        return _executor
+
+
 class GotifyNotifier(BaseNotifier):
     """Gotify通知器"""
     
     def __init__(self):
-        self.config = self._load_config()
-        self.server_url = self.config['server_url'].rstrip('/')
+        # 配置随system_config缓存刷新而重建
+        self._config = None
+        self._config_generation = None
 
         logger.debug(f"Gotify notifier initialized: enabled={self.config['enabled']}, "
                     f"server={self.server_url}")
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Gotify配置，system_config缓存重新加载后自动重建"""
+        try:
+            from system_config_cache import system_config
+            generation = system_config.generation
+        except Exception:
+            generation = None
+        if self._config is None or generation != self._config_generation:
+            self._config = self._load_config()
+            self._config_generation = generation
+        return self._config
+
+    @property
+    def server_url(self) -> str:
+        return self.config['server_url'].rstrip('/')
+
     def _load_config(self) -> Dict[str, Any]:
         """从数据库加载Gotify配置，回退到环境变量"""
         try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
-            from config import DB_TYPE
-
-            conn = get_db_connection()
-
-            # 根据数据库类型设置cursor
-            if DB_TYPE == 'postgres':
-                from psycopg2.extras import DictCursor
-                cursor = conn.cursor(cursor_factory=DictCursor)
-            else:
-                cursor = conn.cursor()
+            from system_config_cache import system_config
 
             # 获取Gotify相关配置
-            query, params = adapt_sql("""
-                SELECT config_key, config_value
-                FROM system_config
-                WHERE config_key LIKE %s
-            """, ('notification_gotify_%',))
-
-            cursor.execute(query, params)
-            configs = cursor.fetchall()
-            conn.close()
-
-            # 解析配置
-            config_dict = {}
-            for config in configs:
-                # 兼容不同数据库的返回格式
-                if hasattr(config, 'keys'):  # DictCursor
-                    key = config['config_key'].replace('notification_gotify_', '')
-                    value = config['config_value']
-                else:  # 普通tuple
-                    key = config[0].replace('notification_gotify_', '')
-                    value = config[1]
-                config_dict[key] = value
+            config_dict = {
+                key.replace('notification_gotify_', ''): value
+                for key, value in system_config.get_prefix('notification_gotify_').items()
+            }
 
-            logger.debug(f"Loaded Gotify config from database: {list(config_dict.keys())}")
+            logger.debug("Loaded Gotify config from database: %s", list(config_dict.keys()))
 
             # 构建最终配置
             return {
@@ -117,57 +242,63 @@ class GotifyNotifier(BaseNotifier):
                 logger.warning(f"No user-specific Gotify token for {recipient.get('name')}, using global token with recipient marking")
                 return self._send_with_global_token(title, content, recipient, priority, metadata)
 
-            url = f"{self.server_url}/message"
+            return self._post_message(title, content, recipient, metadata, user_app_token)
 
-            # 所有Gotify通知都使用最高优先级10
-            gotify_priority = 10
-
-            # 格式化内容为Markdown
-            formatted_content = self._format_content_markdown(content, metadata)
-
-            data = {
-                "title": title,
-                "message": formatted_content,
-                "priority": gotify_priority
-            }
+        except Exception as e:
+            logger.error(f"Failed to send Gotify notification: {str(e)}")
+            return False
 
-            # 添加额外信息
-            if metadata:
-                data["extras"] = {
-                    "client::display": {
-                        "contentType": "text/markdown"
-                    },
-                    "rebugtracker": {
-                        "event_type": metadata.get('event_type', ''),
-                        "bug_id": metadata.get('bug_id', ''),
-                        "timestamp": metadata.get('timestamp', ''),
-                        "recipient_id": recipient.get('id', '')
-                    }
-                }
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """并发推送一批通知
 
-            headers = {
-                "X-Gotify-Key": user_app_token,  # 使用用户专属Token
-                "Content-Type": "application/json"
-            }
+        用户专属Token一次查询取出，请求在线程池中并发发送，
+        每个Gotify服务器的并发数受GOTIFY_MAX_CONCURRENCY_PER_HOST限制
+        """
+        results = [False] * len(messages)
 
-            response = requests.post(url, json=data, headers=headers, timeout=10)
+        if not self.is_enabled():
+            logger.debug("Gotify notifications disabled or not configured")
+            return results
 
-            if response.status_code == 200:
-                logger.info(f"Gotify notification sent to {recipient.get('name', 'unknown')} (user token): {title}")
-                return True
+        valid = []
+        for index, message in enumerate(messages):
+            if self.validate_recipient(message.get('recipient')):
+                valid.append(index)
             else:
-                logger.error(f"Gotify API error: {response.status_code} - {response.text}")
-                return False
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send Gotify notification (network error): {str(e)}")
-            return False
-        except Exception as e:
-            logger.error(f"Failed to send Gotify notification: {str(e)}")
-            return False
+                logger.warning(f"Invalid recipient for Gotify: {message.get('recipient')}")
+        if not valid:
+            return results
+
+        user_tokens = self._get_user_app_tokens([messages[index]['recipient']['id'] for index in valid])
+
+        def _deliver(message):
+            recipient = message['recipient']
+            token = user_tokens.get(str(recipient['id']))
+            if token:
+                return self._post_message(message['title'], message['content'], recipient,
+                                          message.get('metadata'), token)
+            logger.warning(f"No user-specific Gotify token for {recipient.get('name')}, using global token with recipient marking")
+            return self._send_with_global_token(message['title'], message['content'], recipient,
+                                                message.get('priority', 1), message.get('metadata'))
+
+        if len(valid) == 1:
+            results[valid[0]] = _deliver(messages[valid[0]])
+            return results
+
+        futures = {index: _get_executor().submit(_deliver, messages[index]) for index in valid}
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to send Gotify notification: {str(e)}")
+        return results
 
     def _get_user_app_token(self, user_id: str) -> str:
         """获取用户专属的Gotify App Token"""
+        return self._get_user_app_tokens([user_id]).get(str(user_id))
+
+    def _get_user_app_tokens(self, user_ids: List[str]) -> Dict[str, str]:
+        """批量获取用户专属的Gotify App Token，返回 {用户ID(字符串): token}"""
         try:
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
@@ -175,72 +306,112 @@ class GotifyNotifier(BaseNotifier):
             conn = get_db_connection()
             cursor = conn.cursor()
 
-            query, params = adapt_sql("SELECT gotify_app_token FROM users WHERE id = %s", (user_id,))
+            placeholders = ', '.join(['%s'] * len(user_ids))
+            query, params = adapt_sql(f"SELECT id, gotify_app_token FROM users WHERE id IN ({placeholders})",
+                                      tuple(user_ids))
             cursor.execute(query, params)
-            result = cursor.fetchone()
+            rows = cursor.fetchall()
             conn.close()
 
-            return result[0] if result and result[0] else None
+            return {str(row[0]): row[1] for row in rows if row[1]}
 
         except Exception as e:
-            logger.error(f"Failed to get user app token for {user_id}: {e}")
-            return None
+            logger.error(f"Failed to get user app tokens for {user_ids}: {e}")
+            return {}
 
     def _send_with_global_token(self, title: str, content: str, recipient: Dict[str, Any],
                                priority: int = 1, metadata: Dict[str, Any] = None) -> bool:
         """使用全局Token发送（标明接收者）"""
         try:
-            url = f"{self.server_url}/message"
-
             # 在标题和内容中明确标识接收者
             recipient_name = recipient.get('name', '用户')
             marked_title = f"[{recipient_name}] {title}"
             marked_content = f"@{recipient_name}\n{content}"
 
-            # 所有Gotify通知都使用最高优先级10
-            gotify_priority = 10
-
-            # 格式化内容为Markdown
-            formatted_content = self._format_content_markdown(marked_content, metadata)
+            return self._post_message(marked_title, marked_content, recipient, metadata,
+                                      self.config['app_token'], global_token=True)
 
-            data = {
-                "title": marked_title,
-                "message": formatted_content,
-                "priority": gotify_priority
-            }
+        except Exception as e:
+            logger.error(f"Failed to send Gotify notification with global token: {str(e)}")
+            return False
 
-            # 添加额外信息
-            if metadata:
-                data["extras"] = {
-                    "client::display": {
-                        "contentType": "text/markdown"
-                    },
-                    "rebugtracker": {
-                        "event_type": metadata.get('event_type', ''),
-                        "bug_id": metadata.get('bug_id', ''),
-                        "timestamp": metadata.get('timestamp', ''),
-                        "recipient_id": recipient.get('id', ''),
-                        "global_token_used": True
-                    }
+    def _post_message(self, title: str, content: str, recipient: Dict[str, Any],
+                      metadata: Dict[str, Any], app_token: str, global_token: bool = False) -> bool:
+        """构造消息并通过共享会话推送（经过熔断和并发限制）"""
+        url = f"{self.server_url}/message"
+
+        # 所有Gotify通知都使用最高优先级10
+        gotify_priority = 10
+
+        # 格式化内容为Markdown
+        formatted_content = self._format_content_markdown(content, metadata)
+
+        data = {
+            "title": title,
+            "message": formatted_content,
+            "priority": gotify_priority
+        }
+
+        # 添加额外信息
+        if metadata:
+            data["extras"] = {
+                "client::display": {
+                    "contentType": "text/markdown"
+                },
+                "rebugtracker": {
+                    "event_type": metadata.get('event_type', ''),
+                    "bug_id": metadata.get('bug_id', ''),
+                    "timestamp": metadata.get('timestamp', ''),
+                    "recipient_id": recipient.get('id', '')
                 }
-
-            headers = {
-                "X-Gotify-Key": self.config['app_token'],  # 使用全局Token
-                "Content-Type": "application/json"
             }
+            if global_token:
+                data["extras"]["rebugtracker"]["global_token_used"] = True
+
+        headers = {
+            "X-Gotify-Key": app_token,
+            "Content-Type": "application/json"
+        }
+
+        host = self.server_url
+        breaker = _get_breaker(host)
+        if not breaker.allow():
+            logger.warning(f"Gotify circuit open for {host}, skipping notification to {recipient.get('name', 'unknown')}")
+            return False
 
-            response = requests.post(url, json=data, headers=headers, timeout=10)
-
-            if response.status_code == 200:
-                logger.info(f"Gotify notification sent to {recipient_name} (global token): {marked_title}")
-                return True
-            else:
-                logger.error(f"Gotify API error: {response.status_code} - {response.text}")
-                return False
-
-        except Exception as e:
-            logger.error(f"Failed to send Gotify notification with global token: {str(e)}")
+        started = time.perf_counter()
+        try:
+            with _get_host_semaphore(host):
+                response = _http_session.post(url, json=data, headers=headers, timeout=GOTIFY_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            latency_stats.record(time.perf_counter() - started, False)
+            breaker.record_failure()
+            logger.error(f"Failed to send Gotify notification (network error): {str(e)}")
             return False
+        latency_stats.record(time.perf_counter() - started, response.status_code == 200)
+
+        # 5xx视为服务器故障计入熔断，4xx（如Token错误）不影响熔断
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if response.status_code == 200:
+            from request_logging import log_sampled
+            log_sampled(logger, logging.INFO, 'gotify.sent', "Gotify notification sent to %s (%s): %s",
+                        recipient.get('name', 'unknown'), 'global token' if global_token else 'user token', title)
+            return True
+
+        logger.error(f"Gotify API error: {response.status_code} - {response.text}")
+        return False
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """推送耗时和熔断状态（进程内所有GotifyNotifier共享）"""
+        stats = latency_stats.get_stats()
+        with _registry_lock:
+            stats['circuits'] = {host: breaker.get_stats() for host, breaker in _breakers.items()}
+        return stats
     
     def _format_content_markdown(self, content: str, metadata: Dict[str, Any]) -> str:
         """格式化内容为Markdown格式"""
@@ -267,7 +438,7 @@ class GotifyNotifier(BaseNotifier):
         
         try:
             url = f"{self.server_url}/version"
-            response = requests.get(url, timeout=5)
+            response = _http_session.get(url, timeout=5)
             
             if response.status_code == 200:
                 logger.info("Gotify connection test successful")
@@ -6,7 +6,7 @@
 
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from .base import BaseNotifier
 
@@ -25,10 +25,38 @@ class InAppNotifier(BaseNotifier):
     def send(self, title: str, content: str, recipient: Dict[str, Any], 
              priority: int = 1, metadata: Dict[str, Any] = None) -> bool:
         """发送应用内通知"""
-        
-        if not self.validate_recipient(recipient):
-            logger.warning(f"Invalid recipient for in-app notification: {recipient}")
-            return False
+        return self.send_batch([{
+            'title': title,
+            'content': content,
+            'recipient': recipient,
+            'priority': priority,
+            'metadata': metadata
+        }])[0]
+    
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """批量保存应用内通知
+
+        一次连接内完成：一条多行INSERT和一条计数UPSERT，超出上限的旧通知由后台清理
+        """
+        results = [False] * len(messages)
+        rows = []
+        for index, message in enumerate(messages):
+            recipient = message.get('recipient')
+            if not self.validate_recipient(recipient):
+                logger.warning(f"Invalid recipient for in-app notification: {recipient}")
+                continue
+            metadata = message.get('metadata') or {}
+            rows.append((index, (
+                recipient['id'],
+                message['title'],
+                message['content'],
+                False,  # 未读状态
+                datetime.now(),
+                metadata.get('bug_id')
+            )))
+
+        if not rows:
+            return results
         
         try:
             from db_factory import get_db_connection
@@ -37,116 +65,79 @@ class InAppNotifier(BaseNotifier):
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # 插入通知记录
-            query, params = adapt_sql("""
+            # 一条多行INSERT插入整批通知记录
+            values_sql = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+            query, params = adapt_sql(f"""
                 INSERT INTO notifications 
                 (user_id, title, content, read_status, created_at, related_bug_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                recipient['id'],
-                title,
-                content,
-                False,  # 未读状态
-                datetime.now(),
-                metadata.get('bug_id') if metadata else None
-            ))
+                VALUES {values_sql}
+            """, tuple(value for _, row in rows for value in row))
             
             cursor.execute(query, params)
             
-            # 清理旧通知（保持最新的通知数量）
-            self._cleanup_old_notifications(cursor, recipient['id'])
+            # 累加每用户通知计数；超出上限的旧通知由后台清理线程删除，不在发送路径上执行
+            self._increment_counters(cursor, [row[0] for _, row in rows])
             
             conn.commit()
             conn.close()
             
-            logger.info(f"In-app notification saved for user {recipient['id']}: {title}")
+            logger.info(f"In-app notifications saved for {len(rows)} recipients")
             
-            # 如果有实时推送需求，可以在这里添加WebSocket推送
-            self._push_realtime_notification(recipient['id'], {
-                'title': title,
-                'content': content,
-                'timestamp': datetime.now().isoformat(),
-                'metadata': metadata
-            })
-            
-            return True
+            for index, _ in rows:
+                results[index] = True
+            self._push_realtime_notification([row[0] for _, row in rows])
             
         except Exception as e:
-            logger.error(f"Failed to save in-app notification for user {recipient.get('id', 'unknown')}: {str(e)}")
-            return False
+            logger.error(f"Failed to save in-app notifications for {len(rows)} recipients: {str(e)}")
+        
+        return results
     
-    def _cleanup_old_notifications(self, cursor, user_id: str):
-        """清理旧通知，保持最新的通知"""
-        try:
-            from sql_adapter import adapt_sql
-
-            # 从配置中获取最大通知数量
-            max_notifications = self._get_max_notifications_per_user()
-
-            # 删除超出限制的旧通知
-            query, params = adapt_sql("""
-                DELETE FROM notifications
-                WHERE user_id = %s
-                AND id NOT IN (
-                    SELECT id FROM (
-                        SELECT id FROM notifications
-                        WHERE user_id = %s
-                        ORDER BY created_at DESC
-                        LIMIT %s
-                    ) AS recent_notifications
-                )
-            """, (user_id, user_id, max_notifications))
-
-            cursor.execute(query, params)
-
-            deleted_count = cursor.rowcount
-            if deleted_count > 0:
-                logger.debug(f"Cleaned up {deleted_count} old notifications for user {user_id} (limit: {max_notifications})")
+    def _increment_counters(self, cursor, user_ids: List[str]):
+        """一条UPSERT语句累加整批用户的通知总数、未读数和版本号"""
+        from sql_adapter import adapt_sql
 
-        except Exception as e:
-            logger.error(f"Failed to cleanup old notifications for user {user_id}: {str(e)}")
+        counts: Dict[str, int] = {}
+        for user_id in user_ids:
+            counts[str(user_id)] = counts.get(str(user_id), 0) + 1
 
-    def _get_max_notifications_per_user(self) -> int:
-        """从配置中获取每用户最大通知数量"""
-        try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
+        values_sql = ', '.join(['(%s, %s, %s, 1)'] * len(counts))
+        query, params = adapt_sql(f"""
+            INSERT INTO notification_counters (user_id, total_count, unread_count, version)
+            VALUES {values_sql}
+            ON CONFLICT (user_id) DO UPDATE
+            SET total_count = notification_counters.total_count + excluded.total_count,
+                unread_count = notification_counters.unread_count + excluded.unread_count,
+                version = notification_counters.version + 1
+        """, tuple(value for user_id, count in counts.items() for value in (user_id, count, count)))
+        cursor.execute(query, params)
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
+    def _decrement_unread(self, cursor, user_id: str, count: Optional[int] = None):
+        """减少用户未读数（count为None时清零）并递增版本号"""
+        from sql_adapter import adapt_sql
 
+        if count is None:
             query, params = adapt_sql("""
-                SELECT config_value FROM system_config
-                WHERE config_key = %s
-            """, ('notification_max_per_user',))
-
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.close()
+                UPDATE notification_counters
+                SET unread_count = 0, version = version + 1
+                WHERE user_id = %s
+            """, (user_id,))
+        else:
+            query, params = adapt_sql("""
+                UPDATE notification_counters
+                SET unread_count = CASE WHEN unread_count > %s THEN unread_count - %s ELSE 0 END,
+                    version = version + 1
+                WHERE user_id = %s
+            """, (count, count, user_id))
+        cursor.execute(query, params)
 
-            if result:
-                return int(result[0])
-            else:
-                return 100  # 默认100条
+    def _push_realtime_notification(self, user_ids: List[str]):
+        """唤醒这些用户的实时通知流（/api/notifications/stream）
 
-        except Exception as e:
-            logger.error(f"Failed to get max notifications config: {e}")
-            return 100  # 默认100条
-    
-    def _push_realtime_notification(self, user_id: str, notification_data: Dict[str, Any]):
-        """实时推送通知（WebSocket）"""
+        本进程内的订阅立即刷新；其他worker的订阅由各自的轮询线程通过计数版本号感知
+        """
         try:
-            # 这里可以集成WebSocket推送
-            # 目前只记录日志，后续可以扩展
-            logger.debug(f"Real-time notification for user {user_id}: {notification_data['title']}")
-            
-            # TODO: 实现WebSocket推送
-            # if websocket_manager:
-            #     websocket_manager.send_to_user(user_id, {
-            #         'type': 'notification',
-            #         'data': notification_data
-            #     })
-            
+            from notification.realtime import notification_hub
+            notification_hub.publish(user_ids)
         except Exception as e:
             logger.error(f"Failed to push real-time notification: {str(e)}")
     
@@ -196,17 +187,29 @@ class InAppNotifier(BaseNotifier):
             query, params = adapt_sql("""
                 UPDATE notifications 
                 SET read_status = %s, read_at = %s
-                WHERE id = %s AND user_id = %s
-            """, (True, datetime.now(), notification_id, user_id))
+                WHERE id = %s AND user_id = %s AND read_status = %s
+            """, (True, datetime.now(), notification_id, user_id, False))
             
             cursor.execute(query, params)
-            success = cursor.rowcount > 0
+            changed = cursor.rowcount > 0
+            
+            if changed:
+                self._decrement_unread(cursor, user_id, cursor.rowcount)
+                success = True
+            else:
+                # 已读通知重复标记仍视为成功
+                query, params = adapt_sql("""
+                    SELECT 1 FROM notifications WHERE id = %s AND user_id = %s
+                """, (notification_id, user_id))
+                cursor.execute(query, params)
+                success = cursor.fetchone() is not None
             
             conn.commit()
             conn.close()
             
-            if success:
-                logger.debug(f"Notification {notification_id} marked as read for user {user_id}")
+            if changed:
+                logger.debug("Notification %s marked as read for user %s", notification_id, user_id)
+                self._push_realtime_notification([user_id])
             
             return success
             
@@ -215,7 +218,7 @@ class InAppNotifier(BaseNotifier):
             return False
     
     def get_unread_count(self, user_id: str) -> int:
-        """获取用户未读通知数量"""
+        """获取用户未读通知数量（读取notification_counters维护的计数，不扫描notifications）"""
         try:
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
@@ -224,15 +227,15 @@ class InAppNotifier(BaseNotifier):
             cursor = conn.cursor()
             
             query, params = adapt_sql("""
-                SELECT COUNT(*) FROM notifications 
-                WHERE user_id = %s AND read_status = %s
-            """, (user_id, False))
+                SELECT unread_count FROM notification_counters
+                WHERE user_id = %s
+            """, (user_id,))
             
             cursor.execute(query, params)
-            count = cursor.fetchone()[0]
+            row = cursor.fetchone()
             conn.close()
             
-            return count
+            return row[0] if row else 0
             
         except Exception as e:
             logger.error(f"Failed to get unread count for user {user_id}: {str(e)}")
@@ -255,12 +258,15 @@ class InAppNotifier(BaseNotifier):
 
             cursor.execute(query, params)
             success = cursor.rowcount > 0
+            if success:
+                self._decrement_unread(cursor, user_id)
 
             conn.commit()
             conn.close()
 
             if success:
-                logger.debug(f"All notifications marked as read for user {user_id}")
+                logger.debug("All notifications marked as read for user %s", user_id)
+                self._push_realtime_notification([user_id])
 
             return True  # 即使没有未读通知也返回成功
 
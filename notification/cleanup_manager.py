@@ -4,21 +4,37 @@
 负责清理过期通知和维护通知数量限制
 """
 
+import os
 import logging
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+# 每个删除块的最大行数（每块一个事务）
+CLEANUP_CHUNK_SIZE = int(os.getenv('NOTIFICATION_CLEANUP_CHUNK_SIZE', '1000'))
+# 块之间的停顿（秒）
+CLEANUP_CHUNK_PAUSE = float(os.getenv('NOTIFICATION_CLEANUP_CHUNK_PAUSE', '0.05'))
+# 用户通知数超过 上限+TRIM_SLACK 时才触发裁剪，避免每条新通知都执行一次删除
+TRIM_SLACK = int(os.getenv('NOTIFICATION_TRIM_SLACK', '20'))
+# 后台裁剪的最小间隔（秒）
+TRIM_INTERVAL = float(os.getenv('NOTIFICATION_TRIM_INTERVAL', '60'))
+
 class NotificationCleanupManager:
     """通知清理管理器"""
     
-    def __init__(self):
+    def __init__(self, chunk_size: int = CLEANUP_CHUNK_SIZE, chunk_pause: float = CLEANUP_CHUNK_PAUSE):
         self._cleanup_thread = None
         self._stop_event = threading.Event()
         self._running = False
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_pause = chunk_pause
+        self._stats_lock = threading.Lock()
+        self._last_runs: Dict[str, Dict[str, Any]] = {}
+        self._trim_lock = threading.Lock()
+        self._last_trim = 0.0
         
     def start_cleanup_scheduler(self, interval_hours: int = 24):
         """启动清理调度器
@@ -73,8 +89,11 @@ class NotificationCleanupManager:
                 # 出错时等待1小时后重试
                 self._stop_event.wait(3600)
     
-    def cleanup_expired_notifications(self) -> Dict[str, Any]:
-        """清理过期通知
+    def cleanup_expired_notifications(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期通知（按块删除，每块一个短事务）
+        
+        Args:
+            dry_run: 为True时只统计将被删除的数量，不删除
         
         Returns:
             Dict: 清理结果统计
@@ -89,48 +108,76 @@ class NotificationCleanupManager:
                 logger.debug("Retention days is 0 or negative, skipping cleanup")
                 return {'deleted_count': 0, 'retention_days': retention_days}
             
+            # 计算过期时间
+            cutoff_date = datetime.now() - timedelta(days=retention_days)
+            
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # 计算过期时间
-            cutoff_date = datetime.now() - timedelta(days=retention_days)
+            if dry_run:
+                query, params = adapt_sql("SELECT COUNT(*) FROM notifications WHERE created_at < %s", (cutoff_date,))
+                cursor.execute(query, params)
+                would_delete = cursor.fetchone()[0]
+                conn.close()
+                return {
+                    'dry_run': True,
+                    'deleted_count': 0,
+                    'would_delete': would_delete,
+                    'retention_days': retention_days,
+                    'cutoff_date': cutoff_date.isoformat()
+                }
             
-            # 删除过期通知
+            # 删除过期通知，每块提交一次，避免长时间持有写锁
             query, params = adapt_sql("""
-                DELETE FROM notifications 
-                WHERE created_at < %s
-            """, (cutoff_date,))
-            
-            cursor.execute(query, params)
-            deleted_count = cursor.rowcount
+                DELETE FROM notifications
+                WHERE id IN (
+                    SELECT id FROM notifications
+                    WHERE created_at < %s
+                    LIMIT %s
+                )
+            """, (cutoff_date, self.chunk_size))
             
-            conn.commit()
+            run = self._run_chunked(conn, cursor, [(query, params)])
+            if run['deleted'] > 0:
+                self._refresh_counters(conn, cursor)
             conn.close()
+            self._record_run('expired', run)
             
+            deleted_count = run['deleted']
             if deleted_count > 0:
-                logger.info(f"Cleaned up {deleted_count} expired notifications (older than {retention_days} days)")
+                logger.info(f"Cleaned up {deleted_count} expired notifications (older than {retention_days} days) "
+                            f"in {run['chunks']} chunks, {run['rows_per_second']} rows/s")
             else:
-                logger.debug(f"No expired notifications found (retention: {retention_days} days)")
+                logger.debug("No expired notifications found (retention: %s days)", retention_days)
             
             return {
                 'deleted_count': deleted_count,
                 'retention_days': retention_days,
-                'cutoff_date': cutoff_date.isoformat()
+                'cutoff_date': cutoff_date.isoformat(),
+                'chunks': run['chunks'],
+                'duration_seconds': run['duration_seconds'],
+                'rows_per_second': run['rows_per_second']
             }
             
         except Exception as e:
             logger.error(f"Failed to cleanup expired notifications: {e}")
             return {'error': str(e), 'deleted_count': 0}
     
-    def cleanup_excess_notifications(self) -> Dict[str, Any]:
+    def cleanup_excess_notifications(self, dry_run: bool = False) -> Dict[str, Any]:
         """清理超出数量限制的通知
         
+        先用一次分组查询找出超限用户，再按用户分批执行窗口函数删除
+        （ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC)），
+        每条DELETE最多删除chunk_size行并立即提交，避免长事务
+        
+        Args:
+            dry_run: 为True时只统计将被删除的数量，不删除
+        
         Returns:
             Dict: 清理结果统计
         """
         try:
             from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
             
             # 获取最大通知数量配置
             max_notifications = self._get_max_notifications_per_user()
@@ -138,76 +185,226 @@ class NotificationCleanupManager:
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # 获取所有用户
-            query, params = adapt_sql("SELECT DISTINCT user_id FROM notifications", ())
-            cursor.execute(query, params)
-            user_ids = [row[0] for row in cursor.fetchall()]
-            
-            total_deleted = 0
-            user_cleanup_stats = {}
+            # 超限用户及各自的超出数量
+            user_excess = self._get_user_excess(cursor, max_notifications)
             
-            for user_id in user_ids:
-                # 为每个用户清理超出限制的通知
-                query, params = adapt_sql("""
-                    DELETE FROM notifications 
-                    WHERE user_id = %s 
-                    AND id NOT IN (
-                        SELECT id FROM (
-                            SELECT id FROM notifications 
-                            WHERE user_id = %s 
-                            ORDER BY created_at DESC 
-                            LIMIT %s
-                        ) AS recent_notifications
-                    )
-                """, (user_id, user_id, max_notifications))
-                
-                cursor.execute(query, params)
-                deleted_count = cursor.rowcount
-                
-                if deleted_count > 0:
-                    total_deleted += deleted_count
-                    user_cleanup_stats[user_id] = deleted_count
-                    logger.debug(f"Cleaned up {deleted_count} excess notifications for user {user_id}")
+            if dry_run:
+                conn.close()
+                return {
+                    'dry_run': True,
+                    'total_deleted': 0,
+                    'would_delete': sum(user_excess.values()),
+                    'max_notifications': max_notifications,
+                    'affected_users': len(user_excess),
+                    'user_stats': user_excess
+                }
             
-            conn.commit()
+            statements = [self._excess_delete_statement(user_ids, max_notifications)
+                          for user_ids in self._group_users(user_excess)]
+            run = self._run_chunked(conn, cursor, statements)
+            if user_excess:
+                self._refresh_counters(conn, cursor, list(user_excess))
             conn.close()
+            self._record_run('excess', run)
             
+            total_deleted = run['deleted']
             if total_deleted > 0:
-                logger.info(f"Cleaned up {total_deleted} excess notifications for {len(user_cleanup_stats)} users")
+                logger.info(f"Cleaned up {total_deleted} excess notifications for {len(user_excess)} users "
+                            f"in {run['chunks']} chunks, {run['rows_per_second']} rows/s")
             
             return {
                 'total_deleted': total_deleted,
                 'max_notifications': max_notifications,
-                'affected_users': len(user_cleanup_stats),
-                'user_stats': user_cleanup_stats
+                'affected_users': len(user_excess),
+                'user_stats': user_excess,
+                'chunks': run['chunks'],
+                'duration_seconds': run['duration_seconds'],
+                'rows_per_second': run['rows_per_second']
             }
             
         except Exception as e:
             logger.error(f"Failed to cleanup excess notifications: {e}")
             return {'error': str(e), 'total_deleted': 0}
     
-    def _get_retention_days(self) -> int:
-        """获取通知保留天数配置"""
+    def trim_over_cap_users(self, slack: int = None) -> Dict[str, Any]:
+        """裁剪通知数超过 上限+slack 的用户（依据notification_counters，不扫描notifications）
+        
+        Args:
+            slack: 允许超出上限的条数，默认NOTIFICATION_TRIM_SLACK
+        
+        Returns:
+            Dict: 裁剪结果统计
+        """
         try:
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
             
+            max_notifications = self._get_max_notifications_per_user()
+            slack = TRIM_SLACK if slack is None else slack
+            
             conn = get_db_connection()
             cursor = conn.cursor()
             
             query, params = adapt_sql("""
-                SELECT config_value FROM system_config 
-                WHERE config_key = %s
-            """, ('notification_retention_days',))
-            
+                SELECT user_id, total_count FROM notification_counters
+                WHERE total_count > %s
+            """, (max_notifications + slack,))
             cursor.execute(query, params)
-            result = cursor.fetchone()
+            user_excess = {row[0]: row[1] - max_notifications for row in cursor.fetchall()}
+            
+            if not user_excess:
+                conn.close()
+                return {'trimmed_users': 0, 'total_deleted': 0, 'max_notifications': max_notifications}
+            
+            statements = [self._excess_delete_statement(user_ids, max_notifications)
+                          for user_ids in self._group_users(user_excess)]
+            run = self._run_chunked(conn, cursor, statements)
+            self._refresh_counters(conn, cursor, list(user_excess))
             conn.close()
+            self._record_run('trim', run)
             
-            if result:
-                return int(result[0])
-            else:
-                return 30  # 默认30天
+            logger.info(f"Trimmed {run['deleted']} notifications for {len(user_excess)} users over cap "
+                        f"{max_notifications}+{slack}")
+            return {
+                'trimmed_users': len(user_excess),
+                'total_deleted': run['deleted'],
+                'max_notifications': max_notifications,
+                'chunks': run['chunks'],
+                'rows_per_second': run['rows_per_second']
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to trim notifications over cap: {e}")
+            return {'error': str(e), 'total_deleted': 0}
+    
+    def maybe_trim_over_cap(self) -> bool:
+        """距上次裁剪超过NOTIFICATION_TRIM_INTERVAL秒时执行一次裁剪（供后台线程在空闲时调用）"""
+        if not self._trim_lock.acquire(blocking=False):
+            return False
+        try:
+            if time.monotonic() - self._last_trim < TRIM_INTERVAL:
+                return False
+            self._last_trim = time.monotonic()
+            self.trim_over_cap_users()
+            return True
+        finally:
+            self._trim_lock.release()
+    
+    def _refresh_counters(self, conn, cursor, user_ids: List[Any] = None):
+        """按notifications的实际数量校正总数和未读数（user_ids为空时校正全部用户）
+
+        删除的通知中可能包含未读通知，校正后递增版本号使实时通知流刷新未读数
+        """
+        from sql_adapter import adapt_sql
+        
+        refresh_sql = """
+            UPDATE notification_counters
+            SET total_count = (
+                SELECT COUNT(*) FROM notifications n
+                WHERE n.user_id = notification_counters.user_id
+            ),
+            unread_count = (
+                SELECT COUNT(*) FROM notifications n
+                WHERE n.user_id = notification_counters.user_id AND n.read_status = %s
+            ),
+            version = version + 1
+        """
+        if user_ids is None:
+            query, params = adapt_sql(refresh_sql, (False,))
+            cursor.execute(query, params)
+            conn.commit()
+            return
+        
+        for start in range(0, len(user_ids), 500):
+            batch = user_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(batch))
+            query, params = adapt_sql(refresh_sql + f" WHERE user_id IN ({placeholders})", (False,) + tuple(batch))
+            cursor.execute(query, params)
+            conn.commit()
+    
+    def _get_user_excess(self, cursor, max_notifications: int) -> Dict[Any, int]:
+        """返回 {user_id: 超出数量}，只包含超限的用户"""
+        from sql_adapter import adapt_sql
+
+        query, params = adapt_sql("""
+            SELECT user_id, COUNT(*) FROM notifications
+            GROUP BY user_id
+            HAVING COUNT(*) > %s
+        """, (max_notifications,))
+        cursor.execute(query, params)
+        return {row[0]: row[1] - max_notifications for row in cursor.fetchall()}
+    
+    def _group_users(self, user_excess: Dict[Any, int]) -> List[List[Any]]:
+        """把超限用户分组，每组的超出总数尽量不超过chunk_size"""
+        groups, current, current_rows = [], [], 0
+        for user_id, excess in sorted(user_excess.items(), key=lambda item: item[0]):
+            if current and current_rows + excess > self.chunk_size:
+                groups.append(current)
+                current, current_rows = [], 0
+            current.append(user_id)
+            current_rows += excess
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _excess_delete_statement(self, user_ids: List[Any], max_notifications: int):
+        """一组用户的窗口函数删除语句（每次最多删除chunk_size行，从最旧的开始）"""
+        from sql_adapter import adapt_sql
+
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        return adapt_sql(f"""
+            DELETE FROM notifications
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY user_id ORDER BY created_at DESC, id DESC
+                    ) AS rn
+                    FROM notifications
+                    WHERE user_id IN ({placeholders})
+                ) AS ranked_notifications
+                WHERE rn > %s
+                ORDER BY rn DESC
+                LIMIT %s
+            )
+        """, tuple(user_ids) + (max_notifications, self.chunk_size))
+    
+    def _run_chunked(self, conn, cursor, statements) -> Dict[str, Any]:
+        """逐条执行删除语句，每条重复执行直到删除数不足chunk_size，每块单独提交"""
+        started = time.perf_counter()
+        deleted = 0
+        chunks = 0
+        for query, params in statements:
+            while True:
+                cursor.execute(query, params)
+                rowcount = cursor.rowcount
+                conn.commit()
+                chunks += 1
+                deleted += max(rowcount, 0)
+                if rowcount < self.chunk_size:
+                    break
+                if self.chunk_pause:
+                    # 块之间短暂让出写锁，让在线请求的写入有机会执行
+                    time.sleep(self.chunk_pause)
+        duration = time.perf_counter() - started
+        return {
+            'deleted': deleted,
+            'chunks': chunks,
+            'duration_seconds': round(duration, 3),
+            'rows_per_second': round(deleted / duration, 1) if duration > 0 else 0.0,
+            'finished_at': datetime.now().isoformat()
+        }
+    
+    def _record_run(self, cleanup_type: str, run: Dict[str, Any]):
+        """记录最近一次清理的吞吐量，供统计接口展示"""
+        with self._stats_lock:
+            self._last_runs[cleanup_type] = run
+    
+    def _get_retention_days(self) -> int:
+        """获取通知保留天数配置"""
+        try:
+            from system_config_cache import system_config
+            
+            return system_config.get_int('notification_retention_days', 30)  # 默认30天
                 
         except Exception as e:
             logger.error(f"Failed to get retention days config: {e}")
@@ -216,25 +413,9 @@ class NotificationCleanupManager:
     def _get_max_notifications_per_user(self) -> int:
         """获取每用户最大通知数量配置"""
         try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
+            from system_config_cache import system_config
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            query, params = adapt_sql("""
-                SELECT config_value FROM system_config
-                WHERE config_key = %s
-            """, ('notification_max_per_user',))
-
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.close()
-
-            if result:
-                return int(result[0])
-            else:
-                return 100  # 默认100条
+            return system_config.get_int('notification_max_per_user', 100)  # 默认100条
 
         except Exception as e:
             logger.error(f"Failed to get max notifications config: {e}")
@@ -243,25 +424,9 @@ class NotificationCleanupManager:
     def _is_auto_cleanup_enabled(self) -> bool:
         """检查是否启用自动清理"""
         try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
-
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            from system_config_cache import system_config
 
-            query, params = adapt_sql("""
-                SELECT config_value FROM system_config
-                WHERE config_key = %s
-            """, ('notification_auto_cleanup_enabled',))
-
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.close()
-
-            if result:
-                return result[0].lower() == 'true'
-
-            return False  # 默认关闭
+            return system_config.get_bool('notification_auto_cleanup_enabled', False)  # 默认关闭
 
         except Exception as e:
             logger.error(f"Failed to get auto cleanup config: {e}")
@@ -313,32 +478,35 @@ class NotificationCleanupManager:
 
             # 计算过量记录数
             max_per_user = self._get_max_notifications_per_user()
-            excess_count = 0
+            user_excess = {}
             if max_per_user > 0:
-                query, params = adapt_sql("""
-                    SELECT user_id, COUNT(*) as count
-                    FROM notifications
-                    GROUP BY user_id
-                    HAVING COUNT(*) > %s
-                """, (max_per_user,))
-                cursor.execute(query, params)
-                excess_users = cursor.fetchall()
-
-                # 计算总的过量记录数
-                for user_id, count in excess_users:
-                    excess_count += count - max_per_user
+                user_excess = self._get_user_excess(cursor, max_per_user)
+            excess_count = sum(user_excess.values())
 
             conn.close()
 
+            with self._stats_lock:
+                last_runs = {key: dict(value) for key, value in self._last_runs.items()}
+
             return {
                 'total_notifications': total_notifications,
                 'user_count': len(user_distribution),
                 'user_distribution': [{'user_id': row[0], 'count': row[1]} for row in user_distribution],
-                'oldest_notification': oldest_notification.isoformat() if oldest_notification else None,
+                'oldest_notification': oldest_notification.isoformat() if hasattr(oldest_notification, 'isoformat') else oldest_notification,
                 'retention_days': retention_days,
                 'max_per_user': max_per_user,
                 'expired_count': expired_count,
-                'excess_count': excess_count
+                'excess_count': excess_count,
+                # 试运行：立即执行清理时将删除的数量和分块情况
+                'dry_run': {
+                    'expired_count': expired_count,
+                    'excess_count': excess_count,
+                    'excess_users': len(user_excess),
+                    'chunk_size': self.chunk_size,
+                    'estimated_chunks': -(-(expired_count + excess_count) // self.chunk_size)
+                },
+                # 最近一次实际清理的吞吐量
+                'last_runs': last_runs
             }
 
         except Exception as e:
@@ -13,13 +13,14 @@ class FlowNotificationRules:
     """流转通知规则"""
     
     @staticmethod
-    def get_notification_targets(event_type: str, event_data: Dict) -> Set[str]:
+    def get_notification_targets(event_type: str, event_data: Dict, raise_on_error: bool = False) -> Set[str]:
         """
         获取通知目标用户ID
         
         Args:
             event_type: 事件类型
             event_data: 事件数据
+            raise_on_error: 为True时查询失败抛出异常（发件箱据此重试），否则记录日志并返回已得到的目标
             
         Returns:
             Set[str]: 目标用户ID集合
@@ -32,31 +33,31 @@ class FlowNotificationRules:
                 assigned_manager_id = event_data.get('assigned_manager_id')
                 if assigned_manager_id:
                     targets.add(str(assigned_manager_id))
-                    logger.debug(f"Bug created notification target: assigned manager {assigned_manager_id}")
+                    logger.debug("Bug created notification target: assigned manager %s", assigned_manager_id)
                 else:
                     # 如果没有指定负责人，则通知所有负责人（兼容旧逻辑）
-                    targets.update(FlowNotificationRules._get_users_by_roles(['fzr']))
-                    logger.debug(f"Bug created notification targets (fallback): {len(targets)} managers")
+                    targets.update(FlowNotificationRules._get_users_by_roles(['fzr'], raise_on_error))
+                    logger.debug("Bug created notification targets (fallback): %s managers", len(targets))
                 
             elif event_type == "bug_assigned":
                 # 问题分配：负责人分配给组内成员，通知被分配者
                 assignee_id = event_data.get('assignee_id')
                 if assignee_id:
                     targets.add(str(assignee_id))
-                    logger.debug(f"Bug assigned notification target: {assignee_id}")
+                    logger.debug("Bug assigned notification target: %s", assignee_id)
 
             elif event_type == "bug_rejected":
                 # 问题驳回：负责人驳回问题，通知提出人
                 creator_id = event_data.get('creator_id')
                 if creator_id:
                     targets.add(str(creator_id))
-                    logger.debug(f"Bug rejected notification target: creator {creator_id}")
+                    logger.debug("Bug rejected notification target: creator %s", creator_id)
 
                 # 如果问题之前已分配给某人，也通知被分配者
                 old_assignee_id = event_data.get('old_assignee_id')
                 if old_assignee_id:
                     targets.add(str(old_assignee_id))
-                    logger.debug(f"Bug rejected notification target: old assignee {old_assignee_id}")
+                    logger.debug("Bug rejected notification target: old assignee %s", old_assignee_id)
                     
             elif event_type == "bug_status_changed":
                 # 状态变更：通知创建者、分配者、当前处理人、相关产品经理
@@ -71,11 +72,11 @@ class FlowNotificationRules:
 
                 # 通知相关产品经理
                 if product_line_id:
-                    product_managers = FlowNotificationRules._get_product_managers_by_product_line(product_line_id)
+                    product_managers = FlowNotificationRules._get_product_managers_by_product_line(product_line_id, raise_on_error)
                     targets.update(product_managers)
-                    logger.debug(f"Added {len(product_managers)} product managers for product line {product_line_id}")
+                    logger.debug("Added %s product managers for product line %s", len(product_managers), product_line_id)
 
-                logger.debug(f"Bug status changed notification targets: {len(targets)} users")
+                logger.debug("Bug status changed notification targets: %s users", len(targets))
                     
             elif event_type == "bug_resolved":
                 # 问题解决：通知创建者和特定负责人
@@ -87,20 +88,20 @@ class FlowNotificationRules:
 
                 # 优先通知特定负责人
                 if resolver_id:
-                    manager_id = FlowNotificationRules._get_manager_by_assignee(resolver_id)
+                    manager_id = FlowNotificationRules._get_manager_by_assignee(resolver_id, raise_on_error)
                     if manager_id:
                         targets.add(str(manager_id))
-                        logger.debug(f"Bug resolved notification target: specific manager {manager_id}")
+                        logger.debug("Bug resolved notification target: specific manager %s", manager_id)
                     else:
                         # 如果找不到特定负责人，则通知所有负责人作为后备
-                        targets.update(FlowNotificationRules._get_users_by_roles(['fzr']))
+                        targets.update(FlowNotificationRules._get_users_by_roles(['fzr'], raise_on_error))
                         logger.warning(f"Could not find a specific manager for resolver {resolver_id}, falling back to all managers.")
                 else:
                     # 如果没有提供resolver_id，也通知所有负责人
-                    targets.update(FlowNotificationRules._get_users_by_roles(['fzr']))
+                    targets.update(FlowNotificationRules._get_users_by_roles(['fzr'], raise_on_error))
                     logger.warning("resolver_id not found in event_data, falling back to all managers.")
                 
-                logger.debug(f"Bug resolved notification targets: {len(targets)} users")
+                logger.debug("Bug resolved notification targets: %s users", len(targets))
                 
             elif event_type == "bug_closed":
                 # 问题关闭：通知相关负责人和组内成员
@@ -116,23 +117,25 @@ class FlowNotificationRules:
                     targets.add(str(assignee_id))
 
                     # 通过组内成员找到对应的负责人
-                    manager_id = FlowNotificationRules._get_manager_by_assignee(assignee_id)
+                    manager_id = FlowNotificationRules._get_manager_by_assignee(assignee_id, raise_on_error)
                     if manager_id:
                         targets.add(str(manager_id))
-                        logger.debug(f"Found manager {manager_id} for assignee {assignee_id}")
+                        logger.debug("Found manager %s for assignee %s", manager_id, assignee_id)
 
-                logger.debug(f"Bug closed notification targets: {len(targets)} users (creator: {creator_id}, assignee: {assignee_id})")
+                logger.debug("Bug closed notification targets: %s users (creator: %s, assignee: %s)", len(targets), creator_id, assignee_id)
             
             else:
                 logger.warning(f"Unknown event type: {event_type}")
         
         except Exception as e:
             logger.error(f"Error getting notification targets for {event_type}: {e}")
+            if raise_on_error:
+                raise
         
         return targets
     
     @staticmethod
-    def _get_users_by_roles(roles: List[str]) -> List[str]:
+    def _get_users_by_roles(roles: List[str], raise_on_error: bool = False) -> List[str]:
         """
         根据角色获取用户ID列表
 
@@ -164,16 +167,18 @@ class FlowNotificationRules:
             conn.close()
 
             user_ids = [str(user[0]) for user in users]
-            logger.debug(f"Found {len(user_ids)} users for roles {roles}")
+            logger.debug("Found %s users for roles %s", len(user_ids), roles)
 
             return user_ids
 
         except Exception as e:
             logger.error(f"Error getting users by roles {roles}: {e}")
+            if raise_on_error:
+                raise
             return []
 
     @staticmethod
-    def _get_manager_by_assignee(assignee_id: str) -> str:
+    def _get_manager_by_assignee(assignee_id: str, raise_on_error: bool = False) -> str:
         """
         根据被分配者ID找到对应的负责人ID
 
@@ -217,7 +222,7 @@ class FlowNotificationRules:
 
             if manager_result:
                 manager_id = str(manager_result[0])
-                logger.debug(f"Found manager {manager_id} for assignee {assignee_id} in team {assignee_team}")
+                logger.debug("Found manager %s for assignee %s in team %s", manager_id, assignee_id, assignee_team)
                 return manager_id
             else:
                 logger.warning(f"No manager found for team {assignee_team}")
@@ -225,6 +230,8 @@ class FlowNotificationRules:
 
         except Exception as e:
             logger.error(f"Error getting manager for assignee {assignee_id}: {e}")
+            if raise_on_error:
+                raise
             return None
     
     @staticmethod
@@ -265,7 +272,7 @@ class FlowNotificationRules:
         return user_role in participants
 
     @staticmethod
-    def _get_product_managers_by_product_line(product_line_id: int) -> set:
+    def _get_product_managers_by_product_line(product_line_id: int, raise_on_error: bool = False) -> set:
         """根据产品线ID获取相关产品经理的ID列表"""
         try:
             from db_factory import get_db_connection
@@ -288,22 +295,25 @@ class FlowNotificationRules:
 
             product_line_name = result[0]
 
-            # 查询团队包含该产品线的产品经理
+            # 查询团队包含该产品线的产品经理（通过user_teams关系表）
             query, params = adapt_sql("""
-                SELECT id
-                FROM users
-                WHERE role_en = 'pm' AND (team LIKE %s OR team LIKE %s OR team LIKE %s OR team = %s)
-            """, (f"%{product_line_name},%", f"%,{product_line_name},%", f"%,{product_line_name}", product_line_name))
+                SELECT u.id
+                FROM user_teams ut
+                JOIN users u ON u.id = ut.user_id
+                WHERE ut.team = %s AND u.role_en = 'pm'
+            """, (product_line_name,))
 
             cursor.execute(query, params)
             results = cursor.fetchall()
             conn.close()
 
             product_managers = {str(row[0]) for row in results}
-            logger.debug(f"Found {len(product_managers)} product managers for product line {product_line_name}")
+            logger.debug("Found %s product managers for product line %s", len(product_managers), product_line_name)
 
             return product_managers
 
         except Exception as e:
             logger.error(f"Error getting product managers for product line {product_line_id}: {e}")
+            if raise_on_error:
+                raise
             return set()
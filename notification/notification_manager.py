@@ -5,7 +5,7 @@
 """
 
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -21,30 +21,12 @@ class NotificationManager:
             bool: 通知功能是否启用
         """
         try:
-            from db_factory import get_db_connection
-            from sql_adapter import adapt_sql
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # 检查系统配置表
-            query, params = adapt_sql("""
-                SELECT config_value FROM system_config 
-                WHERE config_key = %s
-            """, ('notification_enabled',))
+            from system_config_cache import system_config
             
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                enabled = result[0].lower() == 'true'
-                logger.debug(f"Server notification enabled: {enabled}")
-                return enabled
-            
-            # 默认开启
-            logger.debug("No notification config found, defaulting to enabled")
-            return True
+            # 检查系统配置（进程内缓存，默认开启）
+            enabled = system_config.get_bool('notification_enabled', True)
+            logger.debug("Server notification enabled: %s", enabled)
+            return enabled
             
         except Exception as e:
             logger.error(f"Error checking notification status: {e}")
@@ -64,6 +46,7 @@ class NotificationManager:
         try:
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
+            from system_config_cache import system_config, bump_config_version
 
             conn = get_db_connection()
             cursor = conn.cursor()
@@ -72,21 +55,25 @@ class NotificationManager:
             config_value = 'true' if enabled else 'false'
 
             # 先尝试更新
-            cursor.execute("""
+            query, params = adapt_sql("""
                 UPDATE system_config
                 SET config_value = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE config_key = 'notification_enabled'
             """, (config_value,))
+            cursor.execute(query, params)
 
             # 如果没有更新任何行，则插入新记录
             if cursor.rowcount == 0:
-                cursor.execute("""
+                query, params = adapt_sql("""
                     INSERT INTO system_config (config_key, config_value, description)
                     VALUES ('notification_enabled', %s, '服务器通知功能开关')
                 """, (config_value,))
+                cursor.execute(query, params)
 
+            bump_config_version(cursor)
             conn.commit()
             conn.close()
+            system_config.invalidate()
 
             logger.info(f"Server notification {'enabled' if enabled else 'disabled'}")
             return True
@@ -110,25 +97,9 @@ class NotificationManager:
             bool: 该类型通知是否全局启用
         """
         try:
-            from db_factory import get_db_connection
-
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            config_key = f'{notification_type}_global_enabled'
-            cursor.execute("""
-                SELECT config_value
-                FROM system_config
-                WHERE config_key = %s
-            """, (config_key,))
-
-            result = cursor.fetchone()
-            conn.close()
+            from system_config_cache import system_config
 
-            if result:
-                return result[0].lower() == 'true'
-            else:
-                return True  # 默认启用
+            return system_config.get_bool(f'{notification_type}_global_enabled', True)  # 默认启用
 
         except Exception as e:
             logger.error(f"Failed to check global {notification_type} notification status: {e}")
@@ -168,18 +139,67 @@ class NotificationManager:
                     'gotify': result[1],
                     'inapp': result[2]
                 }
-                logger.debug(f"User {user_id} notification preferences: {preferences}")
+                logger.debug("User %s notification preferences: %s", user_id, preferences)
                 return preferences
             
             # 默认全部开启
             default_prefs = {'email': True, 'gotify': True, 'inapp': True}
-            logger.debug(f"No preferences found for user {user_id}, using defaults")
+            logger.debug("No preferences found for user %s, using defaults", user_id)
             return default_prefs
             
         except Exception as e:
             logger.error(f"Error checking user notification preferences for {user_id}: {e}")
             return {'email': True, 'gotify': True, 'inapp': True}
     
+    @staticmethod
+    def get_users_notification_preferences(user_ids: List[str], raise_on_error: bool = False) -> Dict[str, Dict[str, bool]]:
+        """
+        批量获取多个用户的通知开关状态（一次查询）
+
+        Args:
+            user_ids: 用户ID列表
+            raise_on_error: 为True时查询失败抛出异常，否则记录日志并按默认开关返回
+
+        Returns:
+            Dict[str, Dict[str, bool]]: 用户ID(字符串) -> 各渠道开关状态，未设置的用户默认全部开启
+        """
+        default_prefs = {'email': True, 'gotify': True, 'inapp': True}
+        preferences = {str(user_id): dict(default_prefs) for user_id in user_ids}
+        if not user_ids:
+            return preferences
+
+        try:
+            from db_factory import get_db_connection
+            from sql_adapter import adapt_sql
+
+            conn = get_db_connection()
+            cursor = conn.cursor()
+
+            placeholders = ', '.join(['%s'] * len(user_ids))
+            query, params = adapt_sql(f"""
+                SELECT user_id, email_enabled, gotify_enabled, inapp_enabled
+                FROM user_notification_preferences
+                WHERE user_id IN ({placeholders})
+            """, tuple(user_ids))
+
+            cursor.execute(query, params)
+            for row in cursor.fetchall():
+                preferences[str(row[0])] = {
+                    'email': row[1],
+                    'gotify': row[2],
+                    'inapp': row[3]
+                }
+            conn.close()
+
+            logger.debug("Loaded notification preferences for %s users", len(user_ids))
+
+        except Exception as e:
+            logger.error(f"Error loading notification preferences for {len(user_ids)} users: {e}")
+            if raise_on_error:
+                raise
+
+        return preferences
+
     @staticmethod
     def set_server_notification(enabled: bool, admin_user_id: str) -> bool:
         """
@@ -200,6 +220,7 @@ class NotificationManager:
             
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
+            from system_config_cache import system_config, bump_config_version
             
             conn = get_db_connection()
             cursor = conn.cursor()
@@ -223,8 +244,10 @@ class NotificationManager:
                 
                 cursor.execute(query, params)
             
+            bump_config_version(cursor)
             conn.commit()
             conn.close()
+            system_config.invalidate()
             
             logger.info(f"Server notification {'enabled' if enabled else 'disabled'} by admin {admin_user_id}")
             return True
@@ -341,7 +364,7 @@ class NotificationManager:
             conn.close()
             
             is_admin = result and result[0] == 'gly'
-            logger.debug(f"User {user_id} admin check: {is_admin}")
+            logger.debug("User %s admin check: %s", user_id, is_admin)
             return is_admin
             
         except Exception as e:
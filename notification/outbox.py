@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+流转通知发件箱
+业务请求在自己的事务中写入notification_outbox表，由有界的后台工作线程
+（或独立进程 python -m notification.worker）取出并发送，支持重试、退避和死信
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 状态：pending 等待发送 / processing 已被工作线程领取 / sent 已发送 / dead 重试耗尽
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+
+def _now_str() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """兼容SQLite字符串和PostgreSQL datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value)[:19], TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def enqueue_flow_notification(cursor, event_type: str, event_data: Dict[str, Any]) -> None:
+    """在调用方的事务中写入一条待发送的流转通知
+
+    调用方负责提交事务；事务回滚时通知也随之丢弃，不会出现“数据未保存但通知已发出”的情况。
+
+    Args:
+        cursor: 业务请求正在使用的数据库游标
+        event_type: 事件类型（bug_created/bug_assigned/bug_resolved/bug_rejected/bug_closed）
+        event_data: 事件数据，需可JSON序列化（无法序列化的值按字符串保存）
+    """
+    from sql_adapter import adapt_sql
+
+    now = _now_str()
+    query, params = adapt_sql("""
+        INSERT INTO notification_outbox (event_type, payload, status, attempts, next_attempt_at, created_at)
+        VALUES (%s, %s, %s, 0, %s, %s)
+    """, (event_type, json.dumps(event_data, ensure_ascii=False, default=str), STATUS_PENDING, now, now))
+    cursor.execute(query, params)
+
+
+class NotificationOutboxWorker:
+    """发件箱工作器
+
+    - workers: 工作线程数（有界，不再为每个事件创建线程）
+    - batch_size: 每次领取的记录数
+    - max_attempts: 最大尝试次数，超过后进入死信（status='dead'）
+    - base_backoff/max_backoff: 指数退避的基数和上限（秒）
+    - lock_timeout: 领取后超过该秒数仍未完成的记录（进程崩溃等）会被重新领取
+    """
+
+    def __init__(self, workers: int = 2, batch_size: int = 20, poll_interval: float = 5,
+                 max_attempts: int = 5, base_backoff: int = 30, max_backoff: int = 3600,
+                 lock_timeout: int = 300, sent_retention_days: int = 7):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock_timeout = lock_timeout
+        self.sent_retention_days = sent_retention_days
+
+        self._threads: List[threading.Thread] = []
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._last_purge = 0.0
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'processed': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动工作线程（每个进程只启动一次，fork后的子进程会重新启动）"""
+        with self._start_lock:
+            pid = os.getpid()
+            if self._pid == pid and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = pid
+            self._stop_event.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run_loop, daemon=True,
+                                          name=f"NotificationOutbox-{i}")
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Notification outbox worker started with {self.workers} threads")
+
+    def stop(self, timeout: float = 5):
+        """停止工作线程"""
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        self._threads = []
+        self._pid = None
+        logger.info("Notification outbox worker stopped")
+
+    def wake(self):
+        """通知工作线程有新记录（请求提交事务后调用，降低发送延迟）"""
+        self._wake_event.set()
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                processed = self.process_once()
+                self._maybe_purge_sent()
+            except Exception as e:
+                logger.error(f"Error in notification outbox loop: {e}")
+                processed = 0
+
+            if processed == 0:
+                self._idle_maintenance()
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+
+    def _idle_maintenance(self):
+        """队列空闲时的维护：释放超时的SMTP连接，裁剪超出上限的应用内通知"""
+        try:
+            from .simple_notifier import simple_notifier
+            email_notifier = simple_notifier.notifiers.get('email')
+            if email_notifier is not None and hasattr(email_notifier, 'session'):
+                email_notifier.session.close_if_idle()
+        except Exception as e:
+            logger.debug("Failed to close idle notifier connections: %s", e)
+
+        try:
+            from .cleanup_manager import cleanup_manager
+            cleanup_manager.maybe_trim_over_cap()
+        except Exception as e:
+            logger.error(f"Failed to trim notifications: {e}")
+
+    # ---------- 领取与处理 ----------
+
+    def process_once(self) -> int:
+        """领取一批到期记录并发送
+
+        Returns:
+            int: 本次处理的记录数
+        """
+        rows = self._claim_batch()
+        for row in rows:
+            self._process_row(row)
+        return len(rows)
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """领取一批待发送记录（PostgreSQL使用SKIP LOCKED，SQLite依赖单写锁）"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+        from config import DB_TYPE
+
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        now = datetime.now()
+        now_str = now.strftime(TIME_FORMAT)
+        stale_before = (now - timedelta(seconds=self.lock_timeout)).strftime(TIME_FORMAT)
+        skip_locked = 'FOR UPDATE SKIP LOCKED' if DB_TYPE == 'postgres' else ''
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql(f"""
+                UPDATE notification_outbox
+                SET status = %s, locked_by = %s, locked_at = %s, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM notification_outbox
+                    WHERE (status = %s AND next_attempt_at <= %s)
+                       OR (status = %s AND locked_at < %s)
+                    ORDER BY id
+                    LIMIT %s
+                    {skip_locked}
+                )
+            """, (STATUS_PROCESSING, token, now_str,
+                  STATUS_PENDING, now_str, STATUS_PROCESSING, stale_before, self.batch_size))
+            cursor.execute(query, params)
+            if cursor.rowcount == 0:
+                conn.commit()
+                return []
+
+            query, params = adapt_sql("""
+                SELECT id, event_type, payload, attempts, created_at
+                FROM notification_outbox
+                WHERE locked_by = %s AND status = %s
+                ORDER BY id
+            """, (token, STATUS_PROCESSING))
+            cursor.execute(query, params)
+            rows = [{
+                'id': row[0], 'event_type': row[1], 'payload': row[2],
+                'attempts': row[3], 'created_at': row[4]
+            } for row in cursor.fetchall()]
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _process_row(self, row: Dict[str, Any]):
+        """发送单条通知并记录结果"""
+        from .simple_notifier import simple_notifier
+
+        try:
+            event_data = json.loads(row['payload'])
+            simple_notifier.send_flow_notification(row['event_type'], event_data, raise_on_error=True)
+        except Exception as e:
+            self._mark_failed(row, e)
+            return
+        self._mark_sent(row)
+
+    def _mark_sent(self, row: Dict[str, Any]):
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                UPDATE notification_outbox
+                SET status = %s, sent_at = %s, locked_by = NULL, last_error = NULL
+                WHERE id = %s
+            """, (STATUS_SENT, _now_str(), row['id']))
+            cursor.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+        self._count('processed', 'sent')
+        from request_logging import log_sampled
+        log_sampled(logger, logging.INFO, 'outbox.sent', "Outbox notification %s (%s) sent", row['id'], row['event_type'])
+
+    def _mark_failed(self, row: Dict[str, Any], error: Exception):
+        """失败后按指数退避重新排队，超过最大尝试次数进入死信"""
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        attempts = row['attempts']
+        if attempts >= self.max_attempts:
+            status, next_attempt_at = STATUS_DEAD, _now_str()
+        else:
+            delay = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+            status = STATUS_PENDING
+            next_attempt_at = (datetime.now() + timedelta(seconds=delay)).strftime(TIME_FORMAT)
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                UPDATE notification_outbox
+                SET status = %s, next_attempt_at = %s, locked_by = NULL, last_error = %s
+                WHERE id = %s
+            """, (status, next_attempt_at, str(error)[:1000], row['id']))
+            cursor.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if status == STATUS_DEAD:
+            self._count('processed', 'dead')
+            logger.error(f"Outbox notification {row['id']} ({row['event_type']}) moved to dead letter "
+                         f"after {attempts} attempts: {error}")
+        else:
+            self._count('processed', 'retried')
+            logger.warning(f"Outbox notification {row['id']} ({row['event_type']}) failed "
+                           f"(attempt {attempts}), retry at {next_attempt_at}: {error}")
+
+    def _maybe_purge_sent(self):
+        """每小时删除一次超过保留天数的已发送记录"""
+        if time.time() - self._last_purge < 3600:
+            return
+        self._last_purge = time.time()
+
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        cutoff = (datetime.now() - timedelta(days=self.sent_retention_days)).strftime(TIME_FORMAT)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                DELETE FROM notification_outbox WHERE status = %s AND sent_at < %s
+            """, (STATUS_SENT, cutoff))
+            cursor.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _count(self, *keys):
+        with self._stats_lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    # ---------- 运维 ----------
+
+    def retry_dead(self) -> int:
+        """把所有死信记录重新放回队列
+
+        Returns:
+            int: 重新排队的记录数
+        """
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                UPDATE notification_outbox
+                SET status = %s, attempts = 0, next_attempt_at = %s
+                WHERE status = %s
+            """, (STATUS_PENDING, _now_str(), STATUS_DEAD))
+            cursor.execute(query, params)
+            count = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        self.wake()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """队列深度和延迟指标
+
+        Returns:
+            Dict: 各状态记录数、最早待发送记录的等待时间、最近发送记录的延迟，以及本进程计数
+        """
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql("""
+                SELECT status, COUNT(*) FROM notification_outbox GROUP BY status
+            """, ())
+            cursor.execute(query, params)
+            counts = {row[0]: row[1] for row in cursor.fetchall()}
+
+            query, params = adapt_sql("""
+                SELECT MIN(created_at) FROM notification_outbox WHERE status IN (%s, %s)
+            """, (STATUS_PENDING, STATUS_PROCESSING))
+            cursor.execute(query, params)
+            oldest_pending = _to_datetime(cursor.fetchone()[0])
+
+            query, params = adapt_sql("""
+                SELECT created_at, sent_at FROM notification_outbox
+                WHERE status = %s
+                ORDER BY id DESC
+                LIMIT 200
+            """, (STATUS_SENT,))
+            cursor.execute(query, params)
+            latencies = []
+            for created_at, sent_at in cursor.fetchall():
+                created_at, sent_at = _to_datetime(created_at), _to_datetime(sent_at)
+                if created_at and sent_at:
+                    latencies.append((sent_at - created_at).total_seconds())
+        finally:
+            conn.close()
+
+        latencies.sort()
+        with self._stats_lock:
+            process_stats = dict(self._stats)
+
+        return {
+            'pending': counts.get(STATUS_PENDING, 0),
+            'processing': counts.get(STATUS_PROCESSING, 0),
+            'sent': counts.get(STATUS_SENT, 0),
+            'dead': counts.get(STATUS_DEAD, 0),
+            'oldest_pending_age_seconds': (datetime.now() - oldest_pending).total_seconds() if oldest_pending else 0,
+            'latency_avg_seconds': round(sum(latencies) / len(latencies), 2) if latencies else 0,
+            'latency_p95_seconds': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+            'latency_max_seconds': latencies[-1] if latencies else 0,
+            'worker_running': any(t.is_alive() for t in self._threads),
+            'worker_threads': self.workers,
+            'process_stats': process_stats
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# 是否在Web进程内启动发件箱工作线程；使用独立进程（python -m notification.worker）时设为false
+OUTBOX_INPROCESS = os.getenv('NOTIFICATION_OUTBOX_INPROCESS', 'true').lower() == 'true'
+
+# 全局发件箱工作器实例
+outbox_worker = NotificationOutboxWorker(
+    workers=_env_int('NOTIFICATION_OUTBOX_WORKERS', 2),
+    batch_size=_env_int('NOTIFICATION_OUTBOX_BATCH_SIZE', 20),
+    max_attempts=_env_int('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5),
+    base_backoff=_env_int('NOTIFICATION_OUTBOX_BACKOFF_SECONDS', 30),
+)
+
+
+def start_inprocess_worker():
+    """Web进程收到请求前调用：进程内模式下确保本进程的工作线程已启动
+
+    重启后遗留的待发送、退避中和处理超时的记录不必等到下一次流转事件才投递；
+    本进程已启动时只比较一次pid（gunicorn fork出的worker进程会各自启动）
+    """
+    if OUTBOX_INPROCESS and outbox_worker._pid != os.getpid():
+        outbox_worker.start()
+
+
+def notify_outbox():
+    """请求提交包含发件箱记录的事务后调用：按需启动进程内工作线程并唤醒"""
+    if not OUTBOX_INPROCESS:
+        return
+    outbox_worker.start()
+    outbox_worker.wake()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+应用内通知实时推送（Server-Sent Events）
+每个进程一个NotificationHub：/api/notifications/stream 的连接在这里订阅用户的未读数变化。
+变化的来源是notification_counters.version（新增通知、标记已读、清理校正时递增）：
+- 本进程写入通知后调用publish()，立即刷新订阅用户的状态
+- 其他gunicorn worker或独立的通知进程写入的通知，由本进程的轮询线程每POLL_INTERVAL秒
+  用一条查询（只查询有订阅的用户）感知，查询次数与连接数无关
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Set
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# 轮询notification_counters的间隔（秒），即跨worker推送的最大延迟
+POLL_INTERVAL = _env_float('NOTIFICATION_STREAM_POLL_INTERVAL', 2)
+# 无变化时发送保活注释的间隔（秒），避免代理关闭空闲连接
+KEEPALIVE_INTERVAL = _env_float('NOTIFICATION_STREAM_KEEPALIVE', 15)
+# 单个连接的最长时间（秒），到期后由浏览器EventSource自动重连，释放gunicorn线程
+STREAM_LIFETIME = _env_float('NOTIFICATION_STREAM_LIFETIME', 300)
+# 每个worker允许的最大连接数，超过时返回503，前端退回轮询未读数
+MAX_CLIENTS = int(_env_float('NOTIFICATION_STREAM_MAX_CLIENTS', 8))
+# 浏览器断线重连的等待时间（毫秒）
+RETRY_MS = 3000
+
+
+class Subscription:
+    """一个SSE连接对用户未读数的订阅"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        """等待状态变化，返回是否有变化"""
+        changed = self._event.wait(timeout)
+        self._event.clear()
+        return changed
+
+
+class NotificationHub:
+    """进程内的未读数订阅中心"""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, max_clients: int = MAX_CLIENTS):
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        # user_id -> {'unread_count': int, 'version': int}
+        self._states: Dict[str, Dict[str, int]] = {}
+        self._wake_event = threading.Event()
+        self._poller = None
+        self._pid = None
+        self._stats = {'polls': 0, 'publishes': 0, 'pushes': 0, 'rejected': 0}
+
+    # ---------- 订阅 ----------
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """订阅用户的未读数变化；本worker的连接数已满时返回None"""
+        user_id = str(user_id)
+        with self._lock:
+            if self._client_count() >= self.max_clients:
+                self._stats['rejected'] += 1
+                return None
+            subscription = Subscription(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+                self._states.pop(subscription.user_id, None)
+
+    def publish(self, user_ids: Iterable[Any]):
+        """本进程写入通知或标记已读后调用：有订阅的用户立即刷新"""
+        with self._lock:
+            if not any(str(user_id) in self._subscribers for user_id in user_ids):
+                return
+            self._stats['publishes'] += 1
+        self._wake_event.set()
+
+    def get_state(self, user_id: str) -> Dict[str, int]:
+        """返回用户当前的未读数和版本号（优先使用轮询线程的缓存）"""
+        user_id = str(user_id)
+        with self._lock:
+            state = self._states.get(user_id)
+        if state is not None:
+            return dict(state)
+        state = self._load_states([user_id]).get(user_id, {'unread_count': 0, 'version': 0})
+        with self._lock:
+            if user_id in self._subscribers:
+                self._states.setdefault(user_id, state)
+        return dict(state)
+
+    def _client_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    # ---------- 轮询 ----------
+
+    def _ensure_poller(self):
+        """按需启动轮询线程（fork后的子进程会重新启动）"""
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid and self._poller is not None and self._poller.is_alive():
+                return
+            self._pid = pid
+            self._poller = threading.Thread(target=self._poll_loop, daemon=True,
+                                            name="NotificationStreamPoller")
+            self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            with self._lock:
+                user_ids = list(self._subscribers)
+                if not user_ids:
+                    # 没有连接时退出，下一次订阅时重新启动
+                    self._poller = None
+                    return
+            try:
+                self.poll_once(user_ids)
+            except Exception as e:
+                logger.error(f"Error in notification stream poller: {e}")
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+    def poll_once(self, user_ids: Optional[List[str]] = None) -> int:
+        """查询订阅用户的计数版本号，唤醒有变化的连接，返回唤醒的连接数"""
+        if user_ids is None:
+            with self._lock:
+                user_ids = list(self._subscribers)
+        if not user_ids:
+            return 0
+
+        latest = self._load_states(user_ids)
+        woken = []
+        with self._lock:
+            self._stats['polls'] += 1
+            for user_id in user_ids:
+                state = latest.get(user_id, {'unread_count': 0, 'version': 0})
+                if user_id in self._subscribers and self._states.get(user_id) != state:
+                    self._states[user_id] = state
+                    woken.extend(self._subscribers[user_id])
+            self._stats['pushes'] += len(woken)
+        for subscription in woken:
+            subscription.notify()
+        return len(woken)
+
+    def _load_states(self, user_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        from db_factory import get_db_connection
+        from sql_adapter import adapt_sql
+
+        states = {}
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            for start in range(0, len(user_ids), 500):
+                batch = user_ids[start:start + 500]
+                placeholders = ', '.join(['%s'] * len(batch))
+                query, params = adapt_sql(f"""
+                    SELECT user_id, unread_count, version FROM notification_counters
+                    WHERE user_id IN ({placeholders})
+                """, tuple(batch))
+                cursor.execute(query, params)
+                for row in cursor.fetchall():
+                    states[str(row[0])] = {'unread_count': row[1], 'version': row[2]}
+        finally:
+            conn.close()
+        return states
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'clients': self._client_count(),
+                'users': len(self._subscribers),
+                'max_clients': self.max_clients,
+                'poll_interval': self.poll_interval,
+                'poller_running': self._poller is not None and self._poller.is_alive(),
+                **self._stats
+            }
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Any = None) -> str:
+    """格式化一条SSE消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_unread_events(hub: 'NotificationHub', subscription: Subscription,
+                         keepalive: float = KEEPALIVE_INTERVAL,
+                         lifetime: float = STREAM_LIFETIME) -> Iterator[str]:
+    """SSE生成器：连接时先发送当前未读数，之后每次变化发送一次unread事件
+
+    客户端断开或到达lifetime后退出并取消订阅
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        state = hub.get_state(subscription.user_id)
+        yield format_event('unread', state, state['version'])
+
+        deadline = time.monotonic() + lifetime
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if subscription.wait(min(keepalive, remaining)):
+                latest = hub.get_state(subscription.user_id)
+                if latest != state:
+                    state = latest
+                    yield format_event('unread', state, state['version'])
+            else:
+                yield ': keepalive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+# 全局实例（每个gunicorn worker一个）
+notification_hub = NotificationHub()
@@ -29,8 +29,13 @@ class SimpleNotifier:
         
         logger.info("Simple notifier initialized with channels: email, gotify, inapp")
     
-    def send_flow_notification(self, event_type: str, event_data: Dict[str, Any]):
-        """发送流转通知"""
+    def send_flow_notification(self, event_type: str, event_data: Dict[str, Any], raise_on_error: bool = False):
+        """发送流转通知
+
+        Args:
+            raise_on_error: 为True时，获取通知目标、收件人信息和通知偏好等整体性错误会抛出，便于发件箱重试；
+                单个用户/渠道的发送失败不会抛出，避免重试时重复通知已成功的用户
+        """
         try:
             # 检查服务器通知开关
             if not NotificationManager.is_notification_enabled():
@@ -38,70 +43,87 @@ class SimpleNotifier:
                 return
             
             # 获取通知目标
-            target_user_ids = FlowNotificationRules.get_notification_targets(event_type, event_data)
+            target_user_ids = FlowNotificationRules.get_notification_targets(event_type, event_data, raise_on_error)
             
             if not target_user_ids:
-                logger.debug(f"No notification targets for event: {event_type}")
+                logger.debug("No notification targets for event: %s", event_type)
                 return
             
             logger.info(f"Sending {event_type} notification to {len(target_user_ids)} users")
             
-            # 为每个目标用户发送通知
-            success_count = 0
-            for user_id in target_user_ids:
-                if self._send_to_user(event_type, event_data, user_id):
-                    success_count += 1
+            # 批量发送给所有目标用户
+            success_count = self._send_to_users(event_type, event_data, target_user_ids, raise_on_error)
             
             logger.info(f"Successfully sent notifications to {success_count}/{len(target_user_ids)} users")
                 
         except Exception as e:
             logger.error(f"Error sending flow notification for {event_type}: {e}")
+            if raise_on_error:
+                raise
     
-    def _send_to_user(self, event_type: str, event_data: Dict[str, Any], user_id: str) -> bool:
-        """向单个用户发送通知"""
-        try:
-            # 获取用户信息
-            user_info = self._get_user_info(user_id)
-            if not user_info:
+    def _send_to_users(self, event_type: str, event_data: Dict[str, Any], user_ids: List[str],
+                       raise_on_error: bool = False) -> int:
+        """批量向目标用户发送通知
+
+        用户信息和通知偏好各用一次查询加载，每个渠道调用一次send_batch
+
+        Returns:
+            int: 至少一个渠道发送成功的用户数
+        """
+        users_info = self._get_users_info(user_ids, raise_on_error)
+        for user_id in user_ids:
+            if str(user_id) not in users_info:
                 logger.warning(f"User not found: {user_id}")
-                return False
-            
-            # 检查用户通知开关
-            user_preferences = NotificationManager.is_user_notification_enabled(user_id)
-            
-            # 生成通知内容
+        if not users_info:
+            return 0
+        
+        # 检查用户通知开关
+        preferences = NotificationManager.get_users_notification_preferences(list(users_info.keys()), raise_on_error)
+        
+        # 生成通知内容，并按渠道分组
+        channel_messages: Dict[str, List[Dict[str, Any]]] = {}
+        for user_key, user_info in users_info.items():
             content = self._generate_content(event_type, event_data, user_info)
-            
-            # 按渠道发送
-            sent_any = False
-            for channel, enabled in user_preferences.items():
+            message = {
+                'title': content['title'],
+                'content': content['content'],
+                'recipient': user_info,
+                'priority': content['priority'],
+                'metadata': content.get('metadata', {})
+            }
+            for channel, enabled in preferences.get(user_key, {}).items():
                 if enabled and channel in self.notifiers:
-                    try:
-                        success = self.notifiers[channel].send(
-                            title=content['title'],
-                            content=content['content'],
-                            recipient=user_info,
-                            priority=content['priority'],
-                            metadata=content.get('metadata', {})
-                        )
-                        
-                        if success:
-                            sent_any = True
-                            logger.debug(f"Sent {channel} notification to {user_info['name']}")
-                        else:
-                            logger.warning(f"Failed to send {channel} notification to {user_info['name']}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error sending {channel} notification to {user_id}: {e}")
-            
-            return sent_any
+                    channel_messages.setdefault(channel, []).append(message)
+        
+        # 按渠道批量发送
+        sent_users = set()
+        for channel, messages in channel_messages.items():
+            try:
+                results = self.notifiers[channel].send_batch(messages)
+            except Exception as e:
+                logger.error(f"Error sending {channel} notifications to {len(messages)} users: {e}")
+                continue
             
-        except Exception as e:
-            logger.error(f"Error sending notification to user {user_id}: {e}")
-            return False
+            for message, success in zip(messages, results):
+                user_name = message['recipient']['name']
+                if success:
+                    sent_users.add(message['recipient']['id'])
+                    logger.debug("Sent %s notification to %s", channel, user_name)
+                else:
+                    logger.warning(f"Failed to send {channel} notification to {user_name}")
+        
+        return len(sent_users)
     
-    def _get_user_info(self, user_id: str) -> Dict[str, Any]:
-        """获取用户信息"""
+    def _get_users_info(self, user_ids: List[str], raise_on_error: bool = False) -> Dict[str, Dict[str, Any]]:
+        """批量获取用户信息（一次查询）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 用户ID(字符串) -> 用户信息，保持user_ids的顺序
+        """
+        users_info = {}
+        if not user_ids:
+            return users_info
+        
         try:
             from db_factory import get_db_connection
             from sql_adapter import adapt_sql
@@ -109,28 +131,33 @@ class SimpleNotifier:
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            query, params = adapt_sql("""
+            placeholders = ', '.join(['%s'] * len(user_ids))
+            query, params = adapt_sql(f"""
                 SELECT id, username, chinese_name, email, phone, role_en 
-                FROM users WHERE id = %s
-            """, (user_id,))
+                FROM users WHERE id IN ({placeholders})
+            """, tuple(user_ids))
             
             cursor.execute(query, params)
-            user = cursor.fetchone()
+            users = {str(user[0]): user for user in cursor.fetchall()}
             conn.close()
             
-            if user:
-                return {
-                    'id': user[0],
-                    'username': user[1],
-                    'name': user[2] or user[1],
-                    'email': user[3],
-                    'phone': user[4],
-                    'role': user[5]
-                }
+            for user_id in user_ids:
+                user = users.get(str(user_id))
+                if user and str(user_id) not in users_info:
+                    users_info[str(user_id)] = {
+                        'id': user[0],
+                        'username': user[1],
+                        'name': user[2] or user[1],
+                        'email': user[3],
+                        'phone': user[4],
+                        'role': user[5]
+                    }
         except Exception as e:
-            logger.error(f"Error getting user info for {user_id}: {e}")
+            logger.error(f"Error getting user info for {len(user_ids)} users: {e}")
+            if raise_on_error:
+                raise
         
-        return None
+        return users_info
     
     def _generate_content(self, event_type: str, event_data: Dict[str, Any], user_info: Dict[str, Any]) -> Dict[str, Any]:
         """生成通知内容"""
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+独立的通知发件箱处理进程
+
+用法:
+    python -m notification.worker [--workers 2] [--once]
+
+与Web进程分开部署时，Web进程设置 NOTIFICATION_OUTBOX_INPROCESS=false，
+由本进程负责发送notification_outbox中的流转通知。
+"""
+
+import sys
+import signal
+import logging
+import argparse
+import threading
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='ReBugTracker 通知发件箱处理进程')
+    parser.add_argument('--workers', type=int, default=None, help='工作线程数（默认读取NOTIFICATION_OUTBOX_WORKERS）')
+    parser.add_argument('--once', action='store_true', help='处理完当前到期的记录后退出')
+    parser.add_argument('--retry-dead', action='store_true', help='把死信记录重新放回队列后退出')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logger = logging.getLogger('notification.worker')
+
+    from .outbox import outbox_worker
+
+    if args.workers:
+        outbox_worker.workers = max(1, args.workers)
+
+    if args.retry_dead:
+        count = outbox_worker.retry_dead()
+        logger.info(f"Requeued {count} dead-letter notifications")
+        return 0
+
+    if args.once:
+        total = 0
+        while True:
+            processed = outbox_worker.process_once()
+            if processed == 0:
+                break
+            total += processed
+        logger.info(f"Processed {total} outbox notifications")
+        return 0
+
+    stop_event = threading.Event()
+
+    def _handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, stopping")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+
+    outbox_worker.start()
+    logger.info("Notification outbox worker process running")
+    while not stop_event.is_set():
+        stop_event.wait(1)
+    outbox_worker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
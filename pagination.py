@@ -0,0 +1,143 @@
+# pagination.py: 问题列表分页模块，提供基于(created_at, id)的键集（游标）分页
+# 翻页通过 WHERE (b.created_at, b.id) < (游标) 定位，不使用OFFSET，翻到任意深度的代价都相同
+# 总数使用有上限的计数（最多数到COUNT_CAP条），避免每次请求都扫描整张表
+
+import base64
+import json
+import os
+
+from sql_adapter import adapt_sql
+
+DEFAULT_PAGE_SIZE = int(os.getenv('BUG_LIST_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = 200
+# 总数计数上限：超过该值时页面显示为 "COUNT_CAP+"
+COUNT_CAP = int(os.getenv('BUG_LIST_COUNT_CAP', '10000'))
+
+
+def encode_cursor(created_at, row_id):
+    """把(created_at, id)编码为URL安全的游标字符串"""
+    raw = json.dumps([str(created_at) if created_at is not None else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """解析游标字符串，格式不正确时返回None（按第一页处理）"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if created_at is None:
+            return None
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_page_args(args, default_page_size=DEFAULT_PAGE_SIZE):
+    """从请求参数中读取分页参数
+
+    支持的参数：
+        page_size: 每页条数（1 ~ MAX_PAGE_SIZE）
+        after: 下一页游标（取比游标更早的记录）
+        before: 上一页游标（取比游标更新的记录）
+
+    Returns:
+        dict: {'page_size', 'after', 'before'}
+    """
+    try:
+        page_size = int(args.get('page_size', default_page_size))
+    except (TypeError, ValueError):
+        page_size = default_page_size
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    after = decode_cursor(args.get('after'))
+    before = None if after else decode_cursor(args.get('before'))
+    return {'page_size': page_size, 'after': after, 'before': before}
+
+
+def fetch_keyset_page(cursor, select_sql, where_sql, params, page,
+                      created_column='b.created_at', id_column='b.id',
+                      created_key='created_at', id_key='id'):
+    """按(created_at DESC, id DESC)执行一页查询
+
+    Args:
+        cursor: 数据库游标
+        select_sql: SELECT ... FROM ... JOIN ... 部分（不含WHERE/ORDER BY）
+        where_sql: 过滤条件（不含WHERE关键字），没有条件时传空字符串
+        params: where_sql中的参数
+        page: parse_page_args() 的返回值
+        created_key/id_key: 结果行中用于生成游标的字段名
+
+    Returns:
+        tuple: (当前页行列表, 分页信息dict)
+    """
+    conditions = [f'({where_sql})'] if where_sql else []
+    query_params = list(params)
+    page_size = page['page_size']
+
+    if page['before']:
+        # 向前翻页：按升序取比游标更新的记录，再反转为降序
+        conditions.append(f'({created_column}, {id_column}) > (%s, %s)')
+        query_params.extend(page['before'])
+        order = f'{created_column} ASC, {id_column} ASC'
+    else:
+        if page['after']:
+            conditions.append(f'({created_column}, {id_column}) < (%s, %s)')
+            query_params.extend(page['after'])
+        order = f'{created_column} DESC, {id_column} DESC'
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f'{select_sql} {where_clause} ORDER BY {order} LIMIT %s'
+    query_params.append(page_size + 1)  # 多取一条用于判断是否还有更多
+
+    adapted_query, adapted_params = adapt_sql(query, tuple(query_params))
+    cursor.execute(adapted_query, adapted_params)
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if page['before']:
+        rows = list(reversed(rows))
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = page['after'] is not None, has_more
+
+    pagination = {
+        'page_size': page_size,
+        'count': len(rows),
+        'has_prev': has_prev and bool(rows),
+        'has_next': has_next and bool(rows),
+        'prev_cursor': encode_cursor(rows[0][created_key], rows[0][id_key]) if rows else None,
+        'next_cursor': encode_cursor(rows[-1][created_key], rows[-1][id_key]) if rows else None,
+    }
+    return rows, pagination
+
+
+def count_capped(cursor, from_sql, where_sql, params, cap=COUNT_CAP):
+    """有上限的计数：最多数到cap+1条即停止
+
+    Args:
+        from_sql: FROM ... JOIN ... 部分
+        where_sql: 过滤条件（不含WHERE关键字）
+
+    Returns:
+        dict: {'total': 计数, 'total_is_estimate': 是否达到上限, 'total_display': 显示文本}
+    """
+    where_clause = f'WHERE {where_sql}' if where_sql else ''
+    query = f'SELECT COUNT(*) FROM (SELECT 1 {from_sql} {where_clause} LIMIT %s) capped'
+    adapted_query, adapted_params = adapt_sql(query, tuple(params) + (cap + 1,))
+    cursor.execute(adapted_query, adapted_params)
+    total = cursor.fetchone()[0]
+    if total > cap:
+        return {'total': cap, 'total_is_estimate': True, 'total_display': f'{cap}+'}
+    return {'total': total, 'total_is_estimate': False, 'total_display': str(total)}
+
+
+def format_datetime_value(value):
+    """统一时间字段显示：兼容SQLite字符串和PostgreSQL datetime"""
+    if isinstance(value, str):
+        return value
+    if value:
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return '--'
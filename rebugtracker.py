@@ -2,19 +2,34 @@
 # 基于Flask的缺陷跟踪系统，支持用户注册、登录、问题提交、分配和解决等功能
 # 支持PostgreSQL和SQLite两种数据库类型
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort, make_response, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort, make_response, send_from_directory, g
 from config import DB_TYPE, ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, DATABASE_CONFIG
-from config_adapter import UPLOAD_FOLDER, SECRET_KEY, FLASK_DEBUG
+from config_adapter import UPLOAD_FOLDER, SECRET_KEY, FLASK_DEBUG, SESSION_TIMEOUT
 import psycopg2
 from psycopg2.extras import DictCursor
 from functools import wraps
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
 from datetime import datetime, timedelta
-from db_factory import get_db_connection
+from db_factory import get_db_connection, get_pool_stats
 from sql_adapter import adapt_sql
+from pagination import parse_page_args, fetch_keyset_page, count_capped, format_datetime_value
+from system_config_cache import system_config, bump_config_version
+from session_versions import session_versions, MISSING as MISSING_USER
+import report_export
+import report_query
+import bug_stats
+import schema_migrations
+import request_logging
+from request_logging import log_debug
+import export_jobs
+import upload_store
+import image_variants
 import traceback
+import mimetypes
+import threading
+import time
 from urllib.parse import quote, unquote
 
 def safe_get(obj, key, default=None):
@@ -59,13 +74,27 @@ app.config.update(
     ALLOWED_EXTENSIONS=ALLOWED_EXTENSIONS,  # 从config_adapter加载
     MAX_CONTENT_LENGTH=MAX_CONTENT_LENGTH,  # 从config_adapter加载
     JSON_AS_ASCII=False,  # 确保JSON响应不使用ASCII编码
-    DEFAULT_CHARSET='utf-8'  # 设置默认字符集
+    DEFAULT_CHARSET='utf-8',  # 设置默认字符集
+    SESSION_COOKIE_HTTPONLY=True,  # 登录会话（签名的用户快照）不允许脚本读取
+    SESSION_COOKIE_SAMESITE='Lax',
+    PERMANENT_SESSION_LIFETIME=timedelta(seconds=SESSION_TIMEOUT)  # 会话空闲超时（每个请求刷新）
 )
 
+# 请求ID与请求级日志字段（见request_logging）
+request_logging.init_app(app)
+
+# 进程内通知发件箱：每个Web进程收到第一个请求时启动工作线程（不在导入时启动，避免同步/维护工具导入本模块时发送通知）
+@app.before_request
+def ensure_outbox_worker():
+    from notification.outbox import start_inprocess_worker
+    start_inprocess_worker()
+
 # 添加响应头中间件确保所有响应使用UTF-8
 @app.after_request
 def add_charset(response):
-    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    # 实时通知流需要保留text/event-stream，否则浏览器EventSource会拒绝连接；下载文件保留各自的类型
+    if response.mimetype != 'text/event-stream' and 'Content-Disposition' not in response.headers:
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
     return response
 
 # 错误处理函数
@@ -106,66 +135,92 @@ def datetimeformat_filter(value, format='%Y-%m-%d %H:%M:%S'):
         print(f"时间格式化错误: {str(e)} | 原始值: {value} ({type(value)})")
         return str(value)  # 异常时返回原始值的字符串形式
 
-def get_current_user():
-    """从cookie获取当前用户信息"""
-    try:
-        user_id = request.cookies.get('user_id')
-        username = request.cookies.get('username')
-        role_en = request.cookies.get('role_en')
-        team = request.cookies.get('team')
-        chinese_name = request.cookies.get('chinese_name')
-
-        # 解码URL编码的cookie值
-        if team:
-            team = unquote(team)
-        if chinese_name:
-            chinese_name = unquote(chinese_name)
-
-        if not all([user_id, username, role_en]):
-            app.logger.debug(f"获取用户信息失败 - 缺少必要cookie: user_id={user_id}, username={username}, role_en={role_en}")
-            return None
+# 角色映射（英文标识 -> 中文角色）
+ROLE_NAMES = {
+    'gly': '管理员',
+    'fzr': '负责人',
+    'zncy': '组内成员',
+    'ssz': '实施组',
+    'pm': '产品经理'
+}
+
+# 旧版本登录时写入的明文身份cookie（已不再信任，登录/登出时清除）
+LEGACY_IDENTITY_COOKIES = ('user_id', 'username', 'role_en', 'team', 'team_en', 'chinese_name')
+
+def make_session_user(user):
+    """登录时生成写入签名会话的用户快照（只包含身份信息和用户版本，用户被修改或删除后失效）"""
+    return {
+        'id': user['id'],
+        'username': user['username'],
+        'chinese_name': safe_get(user, 'chinese_name') or user['username'],
+        'role_en': (user['role_en'] or '').lower(),
+        'team': safe_get(user, 'team') or 'Unknown',
+        'ver': int(safe_get(user, 'session_version') or 0)
+    }
 
-        # 添加调试信息
-        app.logger.debug(f"当前用户cookie - user_id: {user_id}, username: {username}, role_en: {role_en}, team: {team}, chinese_name: {chinese_name}")
+def bump_session_version(c, user_id):
+    """用户的角色、团队、密码等被修改时调用（与修改在同一事务中），使该用户已登录的会话失效
 
-        # 角色映射
-        role_mapping = {
-            'gly': '管理员',
-            'fzr': '负责人',
-            'zncy': '组内成员',
-            'ssz': '实施组',
-            'pm': '产品经理'
-        }
+    提交事务后调用 session_versions.invalidate(user_id) 使本进程立即生效
+    """
+    query, params = adapt_sql('UPDATE users SET session_version = session_version + 1 WHERE id = %s', (user_id,))
+    c.execute(query, params)
 
-        role_en_lower = role_en.lower() if role_en else None
-        role_cn = role_mapping.get(role_en_lower, role_en_lower)
+def refresh_own_session(c, user_id):
+    """修改的是当前登录用户本人时，用新的用户信息和版本重写会话快照（避免把自己登出）"""
+    current = get_current_user()
+    if not current or current['id'] != int(user_id):
+        return
+    query, params = adapt_sql('SELECT * FROM users WHERE id = %s', (user_id,))
+    c.execute(query, params)
+    user = c.fetchone()
+    if user and user['role_en']:
+        session['user'] = make_session_user(user)
 
+def get_current_user():
+    """获取当前登录用户
+
+    用户快照保存在Flask签名会话中（SECRET_KEY签名，客户端无法伪造），
+    每个请求只解析一次并缓存在flask.g，装饰器和视图重复调用直接返回缓存结果
+    """
+    if 'current_user' in g:
+        return g.current_user
+
+    user_data = None
+    snapshot = session.get('user')
+    if isinstance(snapshot, dict) and snapshot.get('id') and snapshot.get('username') and snapshot.get('role_en'):
+        role_en = snapshot['role_en']
+        # 用户已删除，或登录后角色/团队/密码被修改：会话失效
+        version = session_versions.get(int(snapshot['id']))
+        if version is MISSING_USER or version != int(snapshot.get('ver') or 0):
+            session.pop('user', None)
+            g.current_user = None
+            return None
         user_data = {
-            'id': int(user_id),
-            'username': username,
-            'chinese_name': chinese_name,
-            'role': role_cn,  # 中文角色
-            'role_en': role_en_lower,  # 英文角色
-            'team': team
+            'id': int(snapshot['id']),
+            'username': snapshot['username'],
+            'chinese_name': snapshot.get('chinese_name'),
+            'role': ROLE_NAMES.get(role_en, role_en),  # 中文角色
+            'role_en': role_en,  # 英文角色
+            'team': snapshot.get('team')
         }
-        app.logger.debug(f"返回用户数据: {user_data}")
-        return user_data
-    except Exception as e:
-        app.logger.error(f"获取用户信息异常: {str(e)}")
-        return None
+    g.current_user = user_data
+    return user_data
+
+def clear_login_cookies(resp):
+    """清除登录会话和旧版本的明文身份cookie"""
+    session.pop('user', None)
+    for name in LEGACY_IDENTITY_COOKIES:
+        if name in request.cookies:
+            resp.delete_cookie(name)
+    return resp
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         user = get_current_user()
         if not user:
-            resp = make_response(redirect('/login'))
-            resp.delete_cookie('user_id')
-            resp.delete_cookie('username')
-            resp.delete_cookie('role_en')
-            resp.delete_cookie('team')
-            resp.delete_cookie('chinese_name')
-            return resp
+            return clear_login_cookies(make_response(redirect('/login')))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -175,72 +230,141 @@ def role_required(role):
         def decorated_function(*args, **kwargs):
             user = get_current_user()
             if not user or not safe_get(user, 'role'):
-                app.logger.debug(f"权限检查失败 - 用户未登录或缺少角色信息")
                 abort(403)
 
             user_role = safe_get(user, 'role_en', '').lower()
             required_role = role.lower()
 
-            app.logger.debug(f"权限检查 - 用户角色: {user_role}, 要求角色: {required_role}")
-
             # 管理员拥有所有权限
             if user_role == 'gly':
-                app.logger.debug("权限检查通过 - 管理员权限")
                 return f(*args, **kwargs)
 
             # 允许更高权限角色访问
             if required_role == 'zncy' and user_role in ['zncy', 'fzr', 'ssz']:
-                app.logger.debug(f"权限检查通过 - 用户角色 {user_role} 满足要求 {required_role}")
                 return f(*args, **kwargs)
 
             # 产品经理权限检查
             if required_role == 'pm' and user_role == 'pm':
-                app.logger.debug(f"权限检查通过 - 产品经理权限")
                 return f(*args, **kwargs)
 
             if required_role == 'fzr' and user_role in ['fzr', 'ssz']:
-                app.logger.debug(f"权限检查通过 - 用户角色 {user_role} 满足要求 {required_role}")
                 return f(*args, **kwargs)
 
             if required_role == 'ssz' and user_role == 'ssz':
-                app.logger.debug(f"权限检查通过 - 用户角色 {user_role} 匹配要求 {required_role}")
                 return f(*args, **kwargs)
 
             if user_role == required_role:
-                app.logger.debug(f"权限检查通过 - 用户角色 {user_role} 匹配要求 {required_role}")
                 return f(*args, **kwargs)
 
-            app.logger.debug(f"权限检查失败 - 用户角色 {user_role} 不满足要求 {required_role}")
+            log_debug(app.logger, "权限检查失败 - 用户角色 %s 不满足要求 %s", user_role, required_role)
             abort(403)
         return decorated_function
     return decorator
 
-# 数据库初始化函数
-def init_db():
-    """初始化数据库结构
-
-    功能：
-    - 根据数据库类型创建完整的数据库表结构
-    - 创建users表（包含通知相关字段）
-    - 创建bugs表（包含外键约束）
-    - 创建bug_images表（问题图片）
-    - 创建system_config表（系统配置）
-    - 创建user_notification_preferences表（用户通知偏好）
-    - 创建notifications表（通知记录）
-    - 添加缺失的字段（如role_en, team_en, chinese_name, email, phone等）
-    - 更新现有数据的角色英文标识
-    - 创建表达式索引以实现大小写不敏感的用户名唯一约束
-    - 确保存在默认管理员账户
+# 性能索引定义：(索引名, 表名, 列)
+# 覆盖首页各角色列表（按created_at, id键集分页）、产品经理问题列表和报表筛选条件
+PERFORMANCE_INDEXES = [
+    # 管理员全量列表 / 负责人列表：按创建时间倒序翻页；报表日期范围（created_at半开区间）
+    ('idx_bugs_created_at_id', 'bugs', '(created_at, id)'),
+    # 实施组：自己创建的问题
+    ('idx_bugs_created_by_created_at', 'bugs', '(created_by, created_at, id)'),
+    # 组内成员 / 产品经理：指派给某人的问题，以及待分配（assigned_to IS NULL AND status = '待处理'）
+    ('idx_bugs_assigned_to_status', 'bugs', '(assigned_to, status, created_at)'),
+    # 状态筛选（报表、组内成员待处理/已解决）
+    ('idx_bugs_status_created_at', 'bugs', '(status, created_at)'),
+    # 报表：类型、产品线筛选
+    ('idx_bugs_type_created_at', 'bugs', '(type, created_at)'),
+    ('idx_bugs_product_line_created_at', 'bugs', '(product_line_id, created_at)'),
+    # 用户表：按团队关联、按角色+团队查找负责人/成员
+    ('idx_users_team', 'users', '(team)'),
+    ('idx_users_role_en_team', 'users', '(role_en, team)'),
+    # 通知清理：按用户分区、按创建时间倒序编号
+    ('idx_notifications_user_created_at', 'notifications', '(user_id, created_at, id)'),
+    # 报表导出：按问题统计附件数量
+    ('idx_bug_images_bug_id', 'bug_images', '(bug_id)'),
+]
+
+def ensure_performance_indexes(c):
+    """创建缺失的性能索引（SQLite和PostgreSQL通用）
+
+    Args:
+        c: 数据库游标（PostgreSQL需处于autocommit模式，单个索引失败不影响其他索引）
+
+    Returns:
+        list: 本次新建的索引名列表
     """
-    # 获取数据库连接
-    conn = get_db_connection()
-    # 对于SQLite，设置自动提交模式（SQLite没有显式的事务，所以设置autocommit为True没有实际作用，但为了兼容性保留）
     if DB_TYPE == 'postgres':
-        conn.autocommit = True
-        c = conn.cursor(cursor_factory=DictCursor)
+        c.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
     else:
-        c = conn.cursor()
+        c.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in c.fetchall()}
 
+    created = []
+    for name, table, columns in PERFORMANCE_INDEXES:
+        if name in existing:
+            continue
+        try:
+            c.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} {columns}')
+            created.append(name)
+        except Exception as e:
+            print(f"创建索引 {name} 时出错: {e}")
+
+    if created:
+        # 让查询规划器立即获得新索引的统计信息
+        c.execute('ANALYZE')
+        print(f"已创建索引: {', '.join(created)}")
+    return created
+
+def parse_team_names(team):
+    """拆分users.team中逗号分隔的团队名（去除空白和重复，保持原顺序）"""
+    if not team:
+        return []
+    names = []
+    for name in team.split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def sync_user_teams(c, user_id, team, update_stats=True):
+    """按users.team的值重写该用户在user_teams中的团队关系
+
+    过渡期内users.team与user_teams两种表示同时保留，
+    所有修改users.team的地方都应在同一事务中调用本函数。
+    指派给该用户的问题在每日统计汇总中按团队计数，随团队关系一起更新
+    （数据库迁移回填时update_stats=False，之后的迁移统一重建汇总表）。
+    """
+    if update_stats:
+        bug_stats.remove_assignee(c, user_id)
+    query, params = adapt_sql('DELETE FROM user_teams WHERE user_id = %s', (user_id,))
+    c.execute(query, params)
+    for name in parse_team_names(team):
+        query, params = adapt_sql('INSERT INTO user_teams (user_id, team) VALUES (%s, %s)', (user_id, name))
+        c.execute(query, params)
+    if update_stats:
+        bug_stats.add_assignee(c, user_id)
+
+def backfill_user_teams(c):
+    """为还没有user_teams记录的用户，从users.team回填团队关系
+
+    Returns:
+        int: 回填的用户数
+    """
+    c.execute('''
+        SELECT u.id, u.team FROM users u
+        WHERE u.team IS NOT NULL AND u.team <> ''
+          AND NOT EXISTS (SELECT 1 FROM user_teams ut WHERE ut.user_id = u.id)
+    ''')
+    rows = c.fetchall()
+    for row in rows:
+        sync_user_teams(c, row[0], row[1], update_stats=False)
+    return len(rows)
+
+# 数据库结构迁移（版本记录在schema_version表，见schema_migrations模块）
+# 已发布的迁移不再修改；新增表、字段、索引（包括PERFORMANCE_INDEXES中的新条目）或数据修正时，
+# 在SCHEMA_MIGRATIONS末尾追加新的版本号
+def _migrate_base_schema(c):
+    """基础表结构：users、bugs、bug_images、projects、product_lines、system_config、通知相关表，默认管理员和示例产品线"""
     # 创建用户表（兼容SQLite和PostgreSQL）
     if DB_TYPE == 'postgres':
         # PostgreSQL建表语句 - 与当前数据库结构保持一致
@@ -303,48 +427,7 @@ def init_db():
         except Exception as e:
             print(f"添加列{col}时出错: {str(e)}")
             if DB_TYPE == 'postgres':
-                conn.rollback()
-
-    # 更新现有数据的角色英文缩写（仅当有数据时）
-    if DB_TYPE == 'postgres':
-        # 使用CASE语句将中文角色转换为英文标识
-        c.execute('''
-            UPDATE users SET
-                role_en = CASE role
-                    WHEN '管理员' THEN 'gly'
-                    WHEN '负责人' THEN 'fzr'
-                    WHEN '组内成员' THEN 'zncy'
-                    WHEN '实施组' THEN 'ssz'
-                    WHEN '产品经理' THEN 'pm'
-                    ELSE role
-                END
-        ''')
-    else:
-        # SQLite版本
-        c.execute('''
-            UPDATE users SET
-                role_en = CASE role
-                    WHEN '管理员' THEN 'gly'
-                    WHEN '负责人' THEN 'fzr'
-                    WHEN '组内成员' THEN 'zncy'
-                    WHEN '实施组' THEN 'ssz'
-                    WHEN '产品经理' THEN 'pm'
-                    ELSE role
-                END
-        ''')
-
-    # 创建索引（仅PostgreSQL需要，SQLite会自动创建必要索引）
-    if DB_TYPE == 'postgres':
-        # 为notifications表创建索引（与当前数据库结构保持一致）
-        try:
-            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications (created_at)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_read_status ON notifications (read_status)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_related_bug_id ON notifications (related_bug_id)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications (user_id)')
-        except Exception as e:
-            print(f"创建索引时出错: {e}")
-            if DB_TYPE == 'postgres':
-                conn.rollback()
+                c.connection.rollback()
 
     # 检查并添加默认管理员账户(如果不存在)
     # 查询用户名为admin的用户
@@ -442,7 +525,7 @@ def init_db():
         except Exception as e:
             # 外键约束可能已存在，忽略错误
             if DB_TYPE == 'postgres':
-                conn.rollback()
+                c.connection.rollback()
     else:
         c.execute('''
             CREATE TABLE IF NOT EXISTS bug_images (
@@ -596,50 +679,426 @@ def init_db():
             )
         ''')
 
+    # 为notifications表创建索引（仅PostgreSQL需要，SQLite会自动创建必要索引）
+    if DB_TYPE == 'postgres':
+        try:
+            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications (created_at)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_read_status ON notifications (read_status)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_related_bug_id ON notifications (related_bug_id)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications (user_id)')
+        except Exception as e:
+            print(f"创建索引时出错: {e}")
+            if DB_TYPE == 'postgres':
+                c.connection.rollback()
+
     # 为bugs表添加product_line_id字段（如果不存在）
-    try:
+    if DB_TYPE == 'postgres':
+        c.execute('ALTER TABLE bugs ADD COLUMN IF NOT EXISTS product_line_id INTEGER REFERENCES product_lines(id)')
+    else:
+        # SQLite需要先检查列是否存在
+        c.execute("PRAGMA table_info(bugs)")
+        columns = [info[1] for info in c.fetchall()]
+        if 'product_line_id' not in columns:
+            c.execute('ALTER TABLE bugs ADD COLUMN product_line_id INTEGER')
+
+    # 插入示例产品线数据
+    sample_products = [
+        ('实施组', '实施组产品线'),
+        ('实施组研发', '实施组研发产品线'),
+        ('新能源', '新能源产品线'),
+        ('网络分析', '网络分析产品线'),
+        ('第三道防线', '第三道防线产品线'),
+        ('智能告警', '智能告警产品线'),
+        ('操作票及防误', '操作票及防误产品线'),
+        ('电量', '电量产品线'),
+        ('消纳', '消纳产品线'),
+        ('自动发电控制', '自动发电控制产品线')
+    ]
+
+    for name, description in sample_products:
         if DB_TYPE == 'postgres':
-            c.execute('ALTER TABLE bugs ADD COLUMN IF NOT EXISTS product_line_id INTEGER REFERENCES product_lines(id)')
+            query = "INSERT INTO product_lines (name, description) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING"
         else:
-            # SQLite需要先检查列是否存在
-            c.execute("PRAGMA table_info(bugs)")
-            columns = [info[1] for info in c.fetchall()]
-            if 'product_line_id' not in columns:
-                c.execute('ALTER TABLE bugs ADD COLUMN product_line_id INTEGER')
-    except Exception as e:
-        print(f"添加product_line_id字段时出错: {e}")
+            query = "INSERT OR IGNORE INTO product_lines (name, description) VALUES (?, ?)"
 
-    # 插入示例产品线数据
-    try:
-        sample_products = [
-            ('实施组', '实施组产品线'),
-            ('实施组研发', '实施组研发产品线'),
-            ('新能源', '新能源产品线'),
-            ('网络分析', '网络分析产品线'),
-            ('第三道防线', '第三道防线产品线'),
-            ('智能告警', '智能告警产品线'),
-            ('操作票及防误', '操作票及防误产品线'),
-            ('电量', '电量产品线'),
-            ('消纳', '消纳产品线'),
-            ('自动发电控制', '自动发电控制产品线')
-        ]
-
-        for name, description in sample_products:
-            if DB_TYPE == 'postgres':
-                query = "INSERT INTO product_lines (name, description) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING"
-            else:
-                query = "INSERT OR IGNORE INTO product_lines (name, description) VALUES (?, ?)"
+        if DB_TYPE == 'postgres':
+            c.execute(query, (name, description))
+        else:
+            c.execute(query, (name, description))
 
-            if DB_TYPE == 'postgres':
-                c.execute(query, (name, description))
-            else:
-                c.execute(query, (name, description))
-    except Exception as e:
-        print(f"插入示例产品线数据时出错: {e}")
+def _migrate_role_en(c):
+    """按中文角色回填users.role_en（旧版本数据只有中文角色）"""
+    # 更新现有数据的角色英文缩写（仅当有数据时）
+    if DB_TYPE == 'postgres':
+        # 使用CASE语句将中文角色转换为英文标识
+        c.execute('''
+            UPDATE users SET
+                role_en = CASE role
+                    WHEN '管理员' THEN 'gly'
+                    WHEN '负责人' THEN 'fzr'
+                    WHEN '组内成员' THEN 'zncy'
+                    WHEN '实施组' THEN 'ssz'
+                    WHEN '产品经理' THEN 'pm'
+                    ELSE role
+                END
+        ''')
+    else:
+        # SQLite版本
+        c.execute('''
+            UPDATE users SET
+                role_en = CASE role
+                    WHEN '管理员' THEN 'gly'
+                    WHEN '负责人' THEN 'fzr'
+                    WHEN '组内成员' THEN 'zncy'
+                    WHEN '实施组' THEN 'ssz'
+                    WHEN '产品经理' THEN 'pm'
+                    ELSE role
+                END
+        ''')
+
+def _migrate_user_teams(c):
+    """创建user_teams表并从users.team回填团队关系"""
+    # 创建用户-团队关系表（替代users.team中逗号分隔的多团队写法，过渡期两者同步维护）
+    if DB_TYPE == 'postgres':
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS user_teams (
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                team TEXT NOT NULL,
+                PRIMARY KEY (user_id, team)
+            )
+        ''')
+    else:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS user_teams (
+                user_id INTEGER NOT NULL,
+                team TEXT NOT NULL,
+                PRIMARY KEY (user_id, team),
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+            )
+        ''')
+    # 按团队查成员
+    c.execute('CREATE INDEX IF NOT EXISTS idx_user_teams_team ON user_teams (team, user_id)')
+
+    # 汇总表在之后的迁移中从bugs全量重建，这里不更新汇总
+    backfilled = backfill_user_teams(c)
+    if backfilled:
+        print(f"已从users.team回填 {backfilled} 个用户的团队关系")
+
+def _migrate_notification_outbox(c):
+    """创建notification_outbox表"""
+    # 创建通知发件箱表（流转通知与业务数据在同一事务中写入，由后台工作线程发送）
+    if DB_TYPE == 'postgres':
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id SERIAL PRIMARY KEY,
+                event_type VARCHAR(50) NOT NULL,
+                payload TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP NOT NULL,
+                locked_by VARCHAR(100),
+                locked_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP NOT NULL,
+                sent_at TIMESTAMP
+            )
+        ''')
+    else:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP NOT NULL,
+                locked_by TEXT,
+                locked_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP NOT NULL,
+                sent_at TIMESTAMP
+            )
+        ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_notification_outbox_status ON notification_outbox (status, next_attempt_at)')
+
+def _migrate_notification_counters(c):
+    """创建notification_counters表并从notifications回填"""
+    # 创建每用户通知计数表（插入通知时累加，后台清理超出上限的用户时按实际数量校正）
+    # unread_count为未读数，version在每次新增/已读时递增，供实时通知流判断是否有变化
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS notification_counters (
+            user_id INTEGER PRIMARY KEY,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    if DB_TYPE == 'postgres':
+        c.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'notification_counters'")
+        counter_columns = [row[0] for row in c.fetchall()]
+    else:
+        c.execute("PRAGMA table_info(notification_counters)")
+        counter_columns = [row[1] for row in c.fetchall()]
+    # 逐列检查：PostgreSQL下init_db为autocommit，两次ALTER之间失败时重新执行只补缺少的列
+    for column in ('unread_count', 'version'):
+        if column not in counter_columns:
+            c.execute(f'ALTER TABLE notification_counters ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+    # 按实际未读数重算（迁移记录版本前中断时重新执行也能得到正确的值）
+    unread_query, unread_params = adapt_sql('''
+        UPDATE notification_counters
+        SET unread_count = (
+            SELECT COUNT(*) FROM notifications n
+            WHERE n.user_id = notification_counters.user_id AND n.read_status = %s
+        )
+    ''', (False,))
+    c.execute(unread_query, unread_params)
+    c.execute('SELECT COUNT(*) FROM notification_counters')
+    if c.fetchone()[0] == 0:
+        backfill_query, backfill_params = adapt_sql('''
+            INSERT INTO notification_counters (user_id, total_count, unread_count)
+            SELECT user_id, COUNT(*), SUM(CASE WHEN read_status = %s THEN 1 ELSE 0 END)
+            FROM notifications GROUP BY user_id
+        ''', (False,))
+        c.execute(backfill_query, backfill_params)
+
+def _migrate_export_jobs(c):
+    """创建export_jobs表"""
+    # 创建后台导出任务表（文件写入 uploads/exports/，过期后由后台线程删除）
+    if DB_TYPE == 'postgres':
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS export_jobs (
+                id SERIAL PRIMARY KEY,
+                job_key VARCHAR(64) NOT NULL,
+                kind VARCHAR(50) NOT NULL,
+                format VARCHAR(20) NOT NULL,
+                filename TEXT,
+                params TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                progress INTEGER NOT NULL DEFAULT 0,
+                total_rows INTEGER,
+                file_path TEXT,
+                file_size BIGINT,
+                error TEXT,
+                created_by INTEGER,
+                created_at TIMESTAMP NOT NULL,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                expires_at TIMESTAMP,
+                locked_by VARCHAR(100),
+                locked_at TIMESTAMP
+            )
+        ''')
+    else:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS export_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                format TEXT NOT NULL,
+                filename TEXT,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                progress INTEGER NOT NULL DEFAULT 0,
+                total_rows INTEGER,
+                file_path TEXT,
+                file_size INTEGER,
+                error TEXT,
+                created_by INTEGER,
+                created_at TIMESTAMP NOT NULL,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                expires_at TIMESTAMP,
+                locked_by TEXT,
+                locked_at TIMESTAMP
+            )
+        ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_export_jobs_key ON export_jobs (job_key, status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_export_jobs_status ON export_jobs (status, expires_at)')
+
+def _migrate_bug_daily_stats(c):
+    """创建bug_daily_stats表并从bugs全量重建"""
+    # 创建问题每日统计汇总表（问题生命周期接口增量维护，看板类接口读取，见bug_stats模块）
+    day_type = 'DATE' if DB_TYPE == 'postgres' else 'TEXT'
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS bug_daily_stats (
+            day {day_type} NOT NULL,
+            team TEXT NOT NULL DEFAULT '',
+            product_line_id INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT '',
+            type TEXT NOT NULL DEFAULT '',
+            bug_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, team, product_line_id, status, type)
+        )
+    ''')
+    # 按团队统计
+    c.execute('CREATE INDEX IF NOT EXISTS idx_bug_daily_stats_team ON bug_daily_stats (team, status)')
+    rows = bug_stats.rebuild(c)
+    if rows:
+        print(f"已从bugs回填 {rows} 行问题每日统计")
+
+def _migrate_performance_indexes(c):
+    """创建bugs/users等表的性能索引（见PERFORMANCE_INDEXES）"""
+    ensure_performance_indexes(c)
+
+# 增量同步跟踪变更的表（见database_tools/sync_tools/sync_pipeline.py）
+SYNC_TRACKED_TABLES = ('users', 'projects', 'bugs', 'bug_images', 'notifications')
+
+def _migrate_sync_tracking(c):
+    """增量同步的变更跟踪：sync_updated_at列由触发器在插入/更新时写入，删除时写入sync_tombstones
+
+    sync_updated_at只用于同步（projects.updated_at等业务字段不变），已有数据为NULL，由首次全量同步复制
+    """
+    if DB_TYPE == 'postgres':
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS sync_tombstones (
+                id BIGSERIAL PRIMARY KEY,
+                table_name VARCHAR(50) NOT NULL,
+                row_id INTEGER NOT NULL,
+                deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # clock_timestamp()为语句执行时间（比事务开始时间更接近提交时间）
+        c.execute('''
+            CREATE OR REPLACE FUNCTION sync_touch_row() RETURNS trigger AS $$
+            BEGIN
+                NEW.sync_updated_at = clock_timestamp();
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql
+        ''')
+        c.execute('''
+            CREATE OR REPLACE FUNCTION sync_record_tombstone() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO sync_tombstones (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+                RETURN OLD;
+            END $$ LANGUAGE plpgsql
+        ''')
+        for table in SYNC_TRACKED_TABLES:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS sync_updated_at TIMESTAMP')
+            c.execute(f'DROP TRIGGER IF EXISTS {table}_sync_touch ON {table}')
+            c.execute(f'''
+                CREATE TRIGGER {table}_sync_touch BEFORE INSERT OR UPDATE ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE sync_touch_row()
+            ''')
+            c.execute(f'DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}')
+            c.execute(f'''
+                CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE sync_record_tombstone()
+            ''')
+    else:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS sync_tombstones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 毫秒精度的UTC时间（触发器内的UPDATE不会再次触发触发器，recursive_triggers默认关闭）
+        now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        for table in SYNC_TRACKED_TABLES:
+            c.execute(f"PRAGMA table_info({table})")
+            if 'sync_updated_at' not in [info[1] for info in c.fetchall()]:
+                c.execute(f'ALTER TABLE {table} ADD COLUMN sync_updated_at TEXT')
+            for event in ('INSERT', 'UPDATE'):
+                c.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_sync_{event.lower()} AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE {table} SET sync_updated_at = {now} WHERE id = NEW.id;
+                    END
+                ''')
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_sync_tombstone AFTER DELETE ON {table}
+                BEGIN
+                    INSERT INTO sync_tombstones (table_name, row_id) VALUES ('{table}', OLD.id);
+                END
+            ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_sync_tombstones_table ON sync_tombstones (table_name, id)')
+    for table in SYNC_TRACKED_TABLES:
+        c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_sync_updated_at ON {table} (sync_updated_at)')
+
+def _migrate_upload_blobs(c):
+    """按内容寻址的上传文件：upload_blobs登记文件，bug_image_blobs记录附件引用的文件（见upload_store）"""
+    if DB_TYPE == 'postgres':
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS upload_blobs (
+                sha256 CHAR(64) PRIMARY KEY,
+                size_bytes BIGINT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS bug_image_blobs (
+                bug_image_id INTEGER PRIMARY KEY REFERENCES bug_images (id) ON DELETE CASCADE,
+                sha256 CHAR(64) NOT NULL REFERENCES upload_blobs (sha256),
+                original_name TEXT
+            )
+        ''')
+    else:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS upload_blobs (
+                sha256 TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS bug_image_blobs (
+                bug_image_id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                original_name TEXT,
+                FOREIGN KEY (bug_image_id) REFERENCES bug_images (id) ON DELETE CASCADE,
+                FOREIGN KEY (sha256) REFERENCES upload_blobs (sha256)
+            )
+        ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_bug_image_blobs_sha256 ON bug_image_blobs (sha256)')
+
+def _migrate_session_version(c):
+    """users.session_version：登录会话快照中的用户版本，修改角色/团队/密码时加1（见session_versions）"""
+    if DB_TYPE == 'postgres':
+        c.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS session_version INTEGER NOT NULL DEFAULT 0')
+    else:
+        c.execute("PRAGMA table_info(users)")
+        if 'session_version' not in [info[1] for info in c.fetchall()]:
+            c.execute('ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0')
+
+SCHEMA_MIGRATIONS = [
+    (1, '基础表结构', _migrate_base_schema),
+    (2, '回填users.role_en', _migrate_role_en),
+    (3, '用户-团队关系表', _migrate_user_teams),
+    (4, '通知发件箱表', _migrate_notification_outbox),
+    (5, '每用户通知计数表', _migrate_notification_counters),
+    (6, '后台导出任务表', _migrate_export_jobs),
+    (7, '问题每日统计汇总表', _migrate_bug_daily_stats),
+    (8, '性能索引', _migrate_performance_indexes),
+    (9, '增量同步变更跟踪', _migrate_sync_tracking),
+    (10, '按内容寻址的上传文件', _migrate_upload_blobs),
+    (11, '登录会话的用户版本', _migrate_session_version),
+]
+
+# 数据库初始化函数
+def init_db():
+    """初始化数据库结构
+
+    读取schema_version中的当前版本，已是最新时直接返回；
+    否则按顺序执行未执行的迁移（SCHEMA_MIGRATIONS），每个迁移只执行一次。
+    旧版本创建的数据库（没有schema_version表）会从第1个迁移开始执行，各迁移均可在已有结构上重复执行。
+
+    Returns:
+        list: 本次执行的迁移版本号
+    """
+    # 获取数据库连接
+    conn = get_db_connection()
+    if DB_TYPE == 'postgres':
+        # 单条DDL失败不影响其他语句（与逐条执行CREATE ... IF NOT EXISTS的行为一致）
+        conn.autocommit = True
+        c = conn.cursor(cursor_factory=DictCursor)
+    else:
+        c = conn.cursor()
+    try:
+        return schema_migrations.run_migrations(conn, c, SCHEMA_MIGRATIONS)
+    finally:
+        conn.close()
 
-    # 提交事务并关闭连接
-    conn.commit()
-    conn.close()
 @app.route('/bug/complete/<int:bug_id>', methods=['POST'])
 @login_required
 @role_required('ssz')
@@ -677,45 +1136,31 @@ def complete_bug(bug_id):
                 'resolution': bug[9], 'image_path': bug[10]
             }
 
-        # 更新问题状态为"已完成"
+        # 更新问题状态为"已完成"（同时更新每日统计汇总）
+        bug_stats.remove_bugs(c, [bug_id])
         query, params = adapt_sql('''
             UPDATE bugs
             SET status = '已完成'
             WHERE id = %s
         ''', (bug_id,))
         c.execute(query, params)
-        conn.commit()
+        bug_stats.add_bugs(c, [bug_id])
 
-        # 异步发送通知（在后台处理）
-        def send_closure_notification_async():
-            try:
-                app.logger.info(f"后台发送问题关闭通知 - bug_id: {bug_id}")
-                from notification.simple_notifier import simple_notifier
-                from datetime import datetime
-
-                notification_data = {
-                    'bug_id': bug_id,
-                    'title': bug_info['title'],
-                    'description': bug_info['description'],
-                    'close_reason': '实施组确认闭环',
-                    'closer_name': user['chinese_name'] or user['username'],
-                    'closed_time': datetime.now().isoformat(),
-                    'creator_id': bug_info['created_by'],
-                    'assignee_id': bug_info.get('assigned_to')
-                }
-
-                simple_notifier.send_flow_notification('bug_closed', notification_data)
-                app.logger.info(f"问题关闭通知发送完成 - bug_id: {bug_id}")
-            except Exception as e:
-                app.logger.error(f"后台关闭通知发送失败 - bug_id: {bug_id}, 错误: {e}")
-                import traceback
-                app.logger.error(f"关闭通知发送错误详情: {traceback.format_exc()}")
-
-        # 启动后台通知任务
-        import threading
-        notification_thread = threading.Thread(target=send_closure_notification_async)
-        notification_thread.daemon = True
-        notification_thread.start()
+        from notification.outbox import enqueue_flow_notification, notify_outbox
+        # 写入通知发件箱（与状态更新在同一事务中，提交后由后台工作线程发送）
+        enqueue_flow_notification(c, 'bug_closed', {
+            'bug_id': bug_id,
+            'title': bug_info['title'],
+            'description': bug_info['description'],
+            'close_reason': '实施组确认闭环',
+            'closer_name': user['chinese_name'] or user['username'],
+            'closed_time': datetime.now().isoformat(),
+            'creator_id': bug_info['created_by'],
+            'assignee_id': bug_info.get('assigned_to')
+        })
+        conn.commit()
+        invalidate_team_stats_cache()
+        notify_outbox()
 
         return jsonify({'success': True, 'message': '问题已成功闭环'})
     except Exception as e:
@@ -728,12 +1173,7 @@ def complete_bug(bug_id):
 @app.route('/logout')
 def logout():
     """用户登出"""
-    resp = make_response(redirect('/login'))
-    resp.delete_cookie('user_id')
-    resp.delete_cookie('username')
-    resp.delete_cookie('role_en')
-    resp.delete_cookie('team_en')
-    return resp
+    return clear_login_cookies(make_response(redirect('/login')))
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -812,6 +1252,9 @@ def register():
             c.execute(query, params)
             user_id = c.lastrowid
 
+        # 同步用户-团队关系
+        sync_user_teams(c, user_id, team)
+
         # 创建用户通知偏好设置
         try:
             from notification.notification_manager import NotificationManager
@@ -829,6 +1272,7 @@ def register():
         # 这里不需要额外的产品线分配逻辑，因为团队就是产品线
 
         conn.commit()
+        invalidate_team_stats_cache()
         return jsonify({
             'success': True,
             'redirect': '/login',
@@ -850,10 +1294,10 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        app.logger.debug(f"登录请求: username={username}, password={'*' * len(password) if password else None}")
+        log_debug(app.logger, "登录请求: username=%s", username)
 
         if not username or not password:
-            app.logger.debug("用户名或密码为空")
+            log_debug(app.logger, "用户名或密码为空")
             return jsonify({'success': False, 'message': '用户名和密码不能为空'}), 400
 
         conn = None
@@ -884,14 +1328,11 @@ def login():
                         'role': user['role_en']
                     }
                 }))
-                resp.set_cookie('user_id', str(user['id']))
-                resp.set_cookie('username', user['username'])
-                chinese_name = safe_get(user, 'chinese_name') or user['username'] or 'Unknown'
-                resp.set_cookie('chinese_name', quote(str(chinese_name)))
-                resp.set_cookie('role_en', role_en)
-                team_name = safe_get(user, 'team') or 'Unknown'
-                resp.set_cookie('team', quote(str(team_name)))
-                app.logger.info(f"用户 {user['username']} 登录成功，设置cookie: user_id={user['id']}, username={user['username']}, role_en={role_en}")
+                # 用户快照写入签名会话（替代旧版本的明文身份cookie）
+                clear_login_cookies(resp)
+                session['user'] = make_session_user(user)
+                session.permanent = True  # 空闲超过SESSION_TIMEOUT后需要重新登录
+                app.logger.info(f"用户 {user['username']} 登录成功: user_id={user['id']}, role_en={role_en}")
                 return resp
             else:
                 return jsonify({'success': False, 'message': '用户名或密码错误'}), 401
@@ -1060,6 +1501,48 @@ def login():
 #                              pagination=None,
 #                              user=user)
 
+# 首页状态卡片对应的状态筛选（all表示不筛选）
+BUG_STATUSES = ['待处理', '已分配', '处理中', '已解决', '已驳回', '已完成']
+INDEX_STATUS_FILTERS = {
+    'all': BUG_STATUSES,
+    'not-completed': [status for status in BUG_STATUSES if status != '已完成'],
+    'pending': ['待处理'],
+    'assigned': ['已分配'],
+    'processing': ['处理中'],
+    'resolved': ['已解决'],
+    'rejected': ['已驳回'],
+    'completed': ['已完成'],
+}
+
+def parse_index_status_filter(args, default_filter):
+    """读取首页的状态筛选参数
+
+    ?filter=<卡片> 对应INDEX_STATUS_FILTERS中的一组状态；?status=<状态>（可重复）为复选框选择的状态，优先于filter
+
+    Returns:
+        tuple: (选中的状态列表, 激活的卡片（与选中状态一致的卡片，没有时为None）, 追加到分页链接的查询参数)
+    """
+    statuses = [status for status in BUG_STATUSES if status in args.getlist('status')]
+    if statuses:
+        extra = ''.join(f'&status={quote(status)}' for status in statuses)
+    else:
+        key = args.get('filter')
+        if key not in INDEX_STATUS_FILTERS:
+            key = default_filter
+        statuses = INDEX_STATUS_FILTERS[key]
+        extra = f'&filter={key}'
+    active = next((key for key, values in INDEX_STATUS_FILTERS.items() if values == statuses), None)
+    return statuses, active, extra
+
+def count_bugs_by_status(c, from_sql, where_sql, params):
+    """按状态统计当前角色可见的问题数量：{状态: 数量}"""
+    if not where_sql:
+        # 全部问题：读取每日统计汇总表
+        return bug_stats.status_counts(c)
+    query, query_params = adapt_sql(f'SELECT b.status, COUNT(*) {from_sql} WHERE {where_sql} GROUP BY b.status', tuple(params))
+    c.execute(query, query_params)
+    return {row[0]: int(row[1]) for row in c.fetchall() if row[0]}
+
 # 首页路由
 @app.route('/')
 @login_required
@@ -1086,100 +1569,77 @@ def index():
     else:
         c = conn.cursor()
 
+    from_sql = '''
+        FROM bugs b
+        LEFT JOIN users u1 ON b.created_by = u1.id
+        LEFT JOIN users u2 ON b.assigned_to = u2.id
+        LEFT JOIN product_lines pl ON b.product_line_id = pl.id
+    '''
+    select_sql = '''
+        SELECT b.*, COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name,
+               b.created_at as local_created_at, b.resolved_at as local_resolved_at, pl.name as product_line_name
+    ''' + from_sql
+
     if user['role_en'] == 'fzr':
         # 负责人看到自己团队的所有问题和待分配问题
-        query = '''
-            SELECT b.*, COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name,
-                   b.created_at as local_created_at, b.resolved_at as local_resolved_at, pl.name as product_line_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            LEFT JOIN product_lines pl ON b.product_line_id = pl.id
-            WHERE (b.assigned_to IS NULL OR u2.team = %s) OR u1.team = %s
-            ORDER BY b.created_at DESC
-        '''
-        adapted_query, adapted_params = adapt_sql(query, (user['team'], user['team']))
-        c.execute(adapted_query, adapted_params)
+        where_sql = '(b.assigned_to IS NULL OR u2.team = %s) OR u1.team = %s'
+        params = (user['team'], user['team'])
     elif user['role_en'] == 'ssz':
         # 实施组只能看到自己创建的问题
-        query = '''
-            SELECT b.*, COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name,
-                   b.created_at as local_created_at, b.resolved_at as local_resolved_at, pl.name as product_line_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            LEFT JOIN product_lines pl ON b.product_line_id = pl.id
-            WHERE b.created_by = %s
-            ORDER BY b.created_at DESC
-        '''
-        adapted_query, adapted_params = adapt_sql(query, (user['id'],))
-        c.execute(adapted_query, adapted_params)
+        where_sql = 'b.created_by = %s'
+        params = (user['id'],)
     elif user['role_en'] == 'pm':
-        # 产品经理看到自己团队相关的问题（通过assigned_to联合users表的team字段）
-        user_teams = user.get('team', '')
-        if user_teams:
-            team_names = [team.strip() for team in user_teams.split(',') if team.strip()]
-            placeholders = ','.join(['%s'] * len(team_names))
-            query = f'''
+        # 产品经理看到自己团队相关的问题（指派给与自己同团队成员的问题，通过user_teams关联）
+        team_names = parse_team_names(user.get('team', ''))
+        if team_names:
+            select_sql = '''
                 SELECT b.*, COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name,
                        b.created_at as local_created_at, b.resolved_at as local_resolved_at, u2.team as product_line_name
-                FROM bugs b
-                LEFT JOIN users u1 ON b.created_by = u1.id
-                LEFT JOIN users u2 ON b.assigned_to = u2.id
-                WHERE u2.team IN ({placeholders}) OR b.created_by = %s
-                ORDER BY b.created_at DESC
+            ''' + from_sql
+            where_sql = '''
+                b.assigned_to IN (
+                    SELECT ut_m.user_id FROM user_teams ut_p
+                    JOIN user_teams ut_m ON ut_m.team = ut_p.team
+                    WHERE ut_p.user_id = %s
+                ) OR b.created_by = %s
             '''
-            # 参数包括团队名称和当前用户ID（显示自己创建的问题）
-            params = tuple(team_names) + (user['id'],)
-            adapted_query, adapted_params = adapt_sql(query, params)
-            c.execute(adapted_query, adapted_params)
+            # 参数为当前用户ID（团队成员的问题 + 自己创建的问题）
+            params = (user['id'], user['id'])
         else:
             # 如果没有团队信息，显示空结果
-            bugs = []
+            where_sql = '1 = 0'
+            params = ()
     else:
         # 其他角色（主要是管理员）看到所有问题
-        query = '''
-            SELECT b.*, COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name,
-                   b.created_at as local_created_at, b.resolved_at as local_resolved_at, pl.name as product_line_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            LEFT JOIN product_lines pl ON b.product_line_id = pl.id
-            ORDER BY b.created_at DESC
-        '''
-        adapted_query, adapted_params = adapt_sql(query, ())
-        c.execute(adapted_query, adapted_params)
-
-    # 获取bugs数据（如果还没有设置的话）
-    if 'bugs' not in locals():
-        bugs = c.fetchall()
-    elif bugs != []:  # 如果bugs不是空列表，说明需要从数据库获取
-        bugs = c.fetchall()
+        where_sql = ''
+        params = ()
+
+    # 状态卡片和复选框的筛选在服务端进行（负责人默认不显示已完成的问题）
+    status_counts = count_bugs_by_status(c, from_sql, where_sql, params)
+    statuses, active_filter, pagination_extra = parse_index_status_filter(
+        request.args, 'not-completed' if user['role_en'] == 'fzr' else 'all')
+    list_where_sql, list_params = where_sql, params
+    if statuses != BUG_STATUSES:
+        status_sql = f"b.status IN ({', '.join(['%s'] * len(statuses))})"
+        list_where_sql = f'({where_sql}) AND {status_sql}' if where_sql else status_sql
+        list_params = tuple(params) + tuple(statuses)
+
+    page = parse_page_args(request.args)
+    rows, pagination = fetch_keyset_page(c, select_sql, list_where_sql, list_params, page)
+    pagination.update(count_capped(c, from_sql, list_where_sql, list_params))
+    conn.close()
 
-    # 格式化问题创建时间和解决时间
-    formatted_bugs = []
-    for bug in bugs:
+    # 格式化问题创建时间和解决时间（只处理当前页）
+    bugs = []
+    for bug in rows:
         bug_dict = dict(bug)
-        # 处理created_at
-        if isinstance(bug_dict['created_at'], str):
-            bug_dict['created_at'] = bug_dict['created_at']  # 已经是字符串则直接使用
-        elif bug_dict['created_at']:
-            bug_dict['created_at'] = bug_dict['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            bug_dict['created_at'] = '--'
-
-        # 处理resolved_at
-        if isinstance(bug_dict['resolved_at'], str):
-            bug_dict['resolved_at'] = bug_dict['resolved_at']  # 已经是字符串则直接使用
-        elif bug_dict['resolved_at']:
-            bug_dict['resolved_at'] = bug_dict['resolved_at'].strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            bug_dict['resolved_at'] = '--'
+        bug_dict['created_at'] = format_datetime_value(bug_dict['created_at'])
+        bug_dict['resolved_at'] = format_datetime_value(bug_dict['resolved_at'])
+        bugs.append(bug_dict)
 
-        formatted_bugs.append(bug_dict)
-
-    conn.close()
-    return render_template('index.html', bugs=bugs, user=user)
+    return render_template('index.html', bugs=bugs, user=user, pagination=pagination,
+                           status_counts=status_counts, selected_statuses=statuses,
+                           active_filter=active_filter, pagination_extra=pagination_extra)
 
 # 组内成员问题列表
 @app.route('/admin/users', methods=['GET', 'POST', 'PUT'])
@@ -1234,7 +1694,10 @@ def admin_users():
                 ''', (username, chinese_name, hashed_password, role, team))
                 c.execute(query, params)
                 user_id = c.lastrowid
+            # 同步用户-团队关系
+            sync_user_teams(c, user_id, team)
             conn.commit()
+            invalidate_team_stats_cache()
             return jsonify({'success': True, 'user_id': user_id})
         except Exception as e:
             conn.rollback()
@@ -1279,7 +1742,14 @@ def admin_users():
                 ''', (username, chinese_name, role, team, user_id))
                 c.execute(query, params)
 
+            # 同步用户-团队关系
+            sync_user_teams(c, user_id, team)
+            # 该用户已登录的会话失效（本人修改自己时重写会话）
+            bump_session_version(c, user_id)
+            refresh_own_session(c, user_id)
             conn.commit()
+            session_versions.invalidate(int(user_id))
+            invalidate_team_stats_cache()
             return jsonify({'success': True})
         except Exception as e:
             conn.rollback()
@@ -1381,7 +1851,14 @@ def user_detail(user_id):
             ''', (username, role, role_en, team, team_en, chinese_name, email, phone, user_id))
             c.execute(query, params)
 
+        # 同步用户-团队关系
+        sync_user_teams(c, user_id, team)
+        # 该用户已登录的会话失效（本人修改自己时重写会话）
+        bump_session_version(c, user_id)
+        refresh_own_session(c, user_id)
         conn.commit()
+        session_versions.invalidate(user_id)
+        invalidate_team_stats_cache()
         return jsonify({'success': True})
     except Exception as e:
         conn.rollback()
@@ -1416,10 +1893,17 @@ def delete_user(user_id):
         if not c.fetchone():
             return jsonify({'success': False, 'message': '用户不存在'}), 404
 
-        # 删除用户
+        # 删除用户（SQLite默认不启用外键级联，显式删除团队关系；指派给该用户的问题在统计汇总中不再属于其团队）
+        bug_stats.remove_assignee(c, user_id)
+        query, params = adapt_sql('DELETE FROM user_teams WHERE user_id = %s', (user_id,))
+        c.execute(query, params)
         query, params = adapt_sql('DELETE FROM users WHERE id = %s', (user_id,))
         c.execute(query, params)
+        bug_stats.add_assignee(c, user_id)
         conn.commit()
+        # 该用户已登录的会话在本进程立即失效（其他进程在版本检查间隔内失效）
+        session_versions.invalidate(user_id)
+        invalidate_team_stats_cache()
         return jsonify({'success': True})
     except Exception as e:
         conn.rollback()
@@ -1431,45 +1915,40 @@ def delete_user(user_id):
 @login_required
 @role_required('gly')
 def admin_bugs():
-    """获取所有问题数据(API)"""
+    """获取所有问题数据(API)
+
+    分页参数：page_size、after（下一页游标）、before（上一页游标）
+    """
     conn = get_db_connection()
     if DB_TYPE == 'postgres':
         c = conn.cursor(cursor_factory=DictCursor)
     else:
         c = conn.cursor()
-    query = '''
-        SELECT b.id, b.title, b.status, b.created_at, b.resolved_at, b.assigned_to,
-               COALESCE(u1.chinese_name, u1.username) as creator_name,
-               COALESCE(u2.chinese_name, u2.username) as assignee_name
+    from_sql = '''
         FROM bugs b
         LEFT JOIN users u1 ON b.created_by = u1.id
         LEFT JOIN users u2 ON b.assigned_to = u2.id
-        ORDER BY b.created_at DESC
     '''
-    adapted_query, adapted_params = adapt_sql(query, ())
-    c.execute(adapted_query, adapted_params)
+    select_sql = '''
+        SELECT b.id, b.title, b.status, b.created_at, b.resolved_at, b.assigned_to,
+               COALESCE(u1.chinese_name, u1.username) as creator_name,
+               COALESCE(u2.chinese_name, u2.username) as assignee_name
+    ''' + from_sql
+    page = parse_page_args(request.args)
+    rows, pagination = fetch_keyset_page(c, select_sql, '', (), page)
+    # 全部问题的总数读取每日统计汇总表
+    total_bugs = sum(bug_stats.status_counts(c).values())
+    pagination.update({'total': total_bugs, 'total_is_estimate': False, 'total_display': str(total_bugs)})
+    conn.close()
+
     bugs = []
-    for row in c.fetchall():
+    for row in rows:
         bug = dict(row)
-        # 处理created_at - 兼容SQLite字符串和PostgreSQL datetime
-        if bug['created_at']:
-            if isinstance(bug['created_at'], str):
-                bug['created_at'] = bug['created_at']  # SQLite已经是字符串格式
-            else:
-                bug['created_at'] = bug['created_at'].strftime('%Y-%m-%d %H:%M:%S')  # PostgreSQL datetime
-        else:
-            bug['created_at'] = '--'
-        # 处理resolved_at - 兼容SQLite字符串和PostgreSQL datetime
-        if bug['resolved_at']:
-            if isinstance(bug['resolved_at'], str):
-                bug['resolved_at'] = bug['resolved_at']  # SQLite已经是字符串格式
-            else:
-                bug['resolved_at'] = bug['resolved_at'].strftime('%Y-%m-%d %H:%M:%S')  # PostgreSQL datetime
-        else:
-            bug['resolved_at'] = '--'
+        # 处理时间字段 - 兼容SQLite字符串和PostgreSQL datetime
+        bug['created_at'] = format_datetime_value(bug['created_at'])
+        bug['resolved_at'] = format_datetime_value(bug['resolved_at'])
         bugs.append(bug)
-    conn.close()
-    return jsonify(bugs)
+    return jsonify({'success': True, 'bugs': bugs, 'pagination': pagination})
 
 # 用户设置页面路由
 @app.route('/user-settings')
@@ -1525,8 +2004,12 @@ def change_password():
         hashed_password = generate_password_hash(new_password)
         query, params = adapt_sql('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user['id']))
         c.execute(query, params)
+        # 其他设备上的会话失效，当前会话保留
+        bump_session_version(c, user['id'])
+        refresh_own_session(c, user['id'])
         conn.commit()
         conn.close()
+        session_versions.invalidate(user['id'])
 
         return jsonify({'success': True, 'message': '密码修改成功'})
 
@@ -1613,39 +2096,28 @@ def admin():
     # 获取总用户数
     total_users = len(users)
 
-    # 获取所有问题
-    query, params = adapt_sql('''
+    # 获取问题（键集分页，只加载当前页）
+    select_sql = '''
         SELECT b.id, b.title, b.status, b.created_at, b.resolved_at, b.assigned_to,
                COALESCE(u1.chinese_name, u1.username) as creator_name,
                COALESCE(u2.chinese_name, u2.username) as assignee_name
         FROM bugs b
         LEFT JOIN users u1 ON b.created_by = u1.id
         LEFT JOIN users u2 ON b.assigned_to = u2.id
-        ORDER BY b.created_at DESC
-    ''', ())
-    c.execute(query, params)
-    bugs = c.fetchall()
+    '''
+    page = parse_page_args(request.args)
+    bugs, pagination = fetch_keyset_page(c, select_sql, '', (), page)
+    # 总数和各状态数量读取每日统计汇总表（精确值，不扫描bugs表）
+    bug_status_counts = bug_stats.status_counts(c)
+    total_bugs = sum(bug_status_counts.values())
+    pagination.update({'total': total_bugs, 'total_is_estimate': False, 'total_display': str(total_bugs)})
 
     # 格式化问题创建时间和解决时间
     formatted_bugs = []
     for bug in bugs:
         bug_dict = dict(bug)
-        # 处理created_at
-        if isinstance(bug_dict['created_at'], str):
-            bug_dict['created_at'] = bug_dict['created_at']  # 已经是字符串则直接使用
-        elif bug_dict['created_at']:
-            bug_dict['created_at'] = bug_dict['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            bug_dict['created_at'] = '--'
-
-        # 处理resolved_at
-        if isinstance(bug_dict['resolved_at'], str):
-            bug_dict['resolved_at'] = bug_dict['resolved_at']  # 已经是字符串则直接使用
-        elif bug_dict['resolved_at']:
-            bug_dict['resolved_at'] = bug_dict['resolved_at'].strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            bug_dict['resolved_at'] = '--'
-
+        bug_dict['created_at'] = format_datetime_value(bug_dict['created_at'])
+        bug_dict['resolved_at'] = format_datetime_value(bug_dict['resolved_at'])
         formatted_bugs.append(bug_dict)
 
     # 获取所有项目
@@ -1655,7 +2127,8 @@ def admin():
 
     conn.close()
 
-    return render_template('admin.html', users=users, bugs=formatted_bugs, projects=projects, user=user, total_users=total_users)
+    return render_template('admin.html', users=users, bugs=formatted_bugs, projects=projects, user=user, total_users=total_users,
+                           pagination=pagination, bug_status_counts=bug_status_counts)
 
 @app.route('/product-manager')
 @login_required
@@ -1682,7 +2155,7 @@ def get_my_teams():
             return jsonify({'success': True, 'data': []})
 
         # 解析团队列表
-        team_names = [team.strip() for team in user_teams.split(',') if team.strip()]
+        team_names = parse_team_names(user_teams)
 
         conn = get_db_connection()
         if DB_TYPE == 'postgres':
@@ -1695,9 +2168,9 @@ def get_my_teams():
             # 统计团队成员数量
             query, params = adapt_sql('''
                 SELECT COUNT(*) as member_count
-                FROM users
-                WHERE team = %s OR team LIKE %s OR team LIKE %s OR team LIKE %s
-            ''', (team_name, f'{team_name},%', f'%,{team_name},%', f'%,{team_name}'))
+                FROM user_teams
+                WHERE team = %s
+            ''', (team_name,))
             c.execute(query, params)
             member_result = c.fetchone()
             member_count = member_result[0] if not isinstance(member_result, dict) else member_result['member_count']
@@ -1712,8 +2185,8 @@ def get_my_teams():
                     SUM(CASE WHEN b.status = '已解决' THEN 1 ELSE 0 END) as resolved,
                     SUM(CASE WHEN b.status = '已完成' THEN 1 ELSE 0 END) as closed
                 FROM bugs b
-                LEFT JOIN users u ON b.assigned_to = u.id
-                WHERE u.team = %s OR b.created_by = %s
+                WHERE b.assigned_to IN (SELECT ut.user_id FROM user_teams ut WHERE ut.team = %s)
+                   OR b.created_by = %s
             ''', (team_name, user['id']))
             c.execute(query, params)
             bug_result = c.fetchone()
@@ -1763,7 +2236,7 @@ def get_product_manager_bugs():
             return jsonify({'success': False, 'message': '用户未登录'})
         
         # 获取用户的团队信息并处理
-        teams = [team.strip() for team in user.get('team', '').split(',') if team.strip()]
+        teams = parse_team_names(user.get('team', ''))
         if not teams:
             return jsonify({'success': False, 'message': '用户没有关联的团队'})
 
@@ -1774,8 +2247,7 @@ def get_product_manager_bugs():
         else:
             c = conn.cursor()
 
-        # 构建查询
-        placeholders = ','.join(['%s'] * len(teams))
+        # 构建查询（通过user_teams找到与自己同团队的成员）
         base_query = """
             SELECT 
                 b.id, b.title, b.description, b.status, b.created_at, b.resolved_at,
@@ -1787,12 +2259,18 @@ def get_product_manager_bugs():
             FROM bugs b
             LEFT JOIN users u1 ON b.created_by = u1.id
             LEFT JOIN users u2 ON b.assigned_to = u2.id
-            WHERE (u2.team IN ({}) OR b.created_by = %s)
+            WHERE (
+                b.assigned_to IN (
+                    SELECT ut_m.user_id FROM user_teams ut_p
+                    JOIN user_teams ut_m ON ut_m.team = ut_p.team
+                    WHERE ut_p.user_id = %s
+                ) OR b.created_by = %s
+            )
             ORDER BY b.created_at DESC
-        """.format(placeholders)
+        """
             
         # 适配不同数据库的SQL语法和参数
-        query, params = adapt_sql(base_query, tuple(teams) + (user['id'],))
+        query, params = adapt_sql(base_query, (user['id'], user['id']))
         
         # 执行查询
         c.execute(query, params)
@@ -1879,50 +2357,41 @@ def get_product_manager_statistics():
                 'total': 0, 'pending': 0, 'processing': 0, 'resolved': 0, 'closed': 0
             }})
 
-        # 解析团队列表
-        team_names = [team.strip() for team in user_teams.split(',') if team.strip()]
-
         conn = get_db_connection()
         if DB_TYPE == 'postgres':
             c = conn.cursor(cursor_factory=DictCursor)
         else:
             c = conn.cursor()
 
-        # 构建IN查询的占位符
-        placeholders = ','.join(['%s'] * len(team_names))
-
-        query, params = adapt_sql(f'''
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN b.status = '待处理' THEN 1 ELSE 0 END) as pending,
-                SUM(CASE WHEN b.status = '处理中' THEN 1 ELSE 0 END) as processing,
-                SUM(CASE WHEN b.status = '已解决' THEN 1 ELSE 0 END) as resolved,
-                SUM(CASE WHEN b.status = '已完成' THEN 1 ELSE 0 END) as closed
-            FROM bugs b
-            LEFT JOIN users u ON b.assigned_to = u.id
-            WHERE u.team IN ({placeholders}) OR b.created_by = %s
-        ''', tuple(team_names) + (user['id'],))
+        try:
+            # 所在团队的问题：读取每日统计汇总表（处理人同时属于该产品经理的多个团队时按团队分别计数）
+            query, params = adapt_sql('SELECT team FROM user_teams WHERE user_id = %s', (user['id'],))
+            c.execute(query, params)
+            counts = bug_stats.status_counts(c, [row[0] for row in c.fetchall()])
 
-        c.execute(query, params)
-        result = c.fetchone()
-        conn.close()
+            # 自己创建、但处理人不在所在团队中的问题（按创建人索引查询，数量很少）
+            query, params = adapt_sql('''
+                SELECT b.status, COUNT(*) FROM bugs b
+                WHERE b.created_by = %s AND NOT EXISTS (
+                    SELECT 1 FROM user_teams ut_m
+                    JOIN user_teams ut_p ON ut_p.team = ut_m.team
+                    WHERE ut_m.user_id = b.assigned_to AND ut_p.user_id = %s
+                )
+                GROUP BY b.status
+            ''', (user['id'], user['id']))
+            c.execute(query, params)
+            for row in c.fetchall():
+                counts[row[0]] = counts.get(row[0], 0) + row[1]
+        finally:
+            conn.close()
 
-        if isinstance(result, dict):
-            stats = {
-                'total': result['total'] or 0,
-                'pending': result['pending'] or 0,
-                'processing': result['processing'] or 0,
-                'resolved': result['resolved'] or 0,
-                'closed': result['closed'] or 0
-            }
-        else:
-            stats = {
-                'total': result[0] or 0,
-                'pending': result[1] or 0,
-                'processing': result[2] or 0,
-                'resolved': result[3] or 0,
-                'closed': result[4] or 0
-            }
+        stats = {
+            'total': sum(counts.values()),
+            'pending': counts.get('待处理', 0),
+            'processing': counts.get('处理中', 0),
+            'resolved': counts.get('已解决', 0),
+            'closed': counts.get('已完成', 0)
+        }
 
         return jsonify({'success': True, 'data': stats})
 
@@ -1936,11 +2405,8 @@ def get_product_manager_statistics():
 def team_issues():
     """组内成员问题列表"""
     try:
-        app.logger.debug("开始处理team-issues请求")
         user = get_current_user()
-        app.logger.debug(f"当前用户: {user}")
         if not user:
-            app.logger.debug("用户未登录，重定向到登录页面")
             return redirect('/login')
 
         conn = get_db_connection()
@@ -1948,54 +2414,44 @@ def team_issues():
             c = conn.cursor(cursor_factory=DictCursor)
         else:
             c = conn.cursor()
-        query, params = adapt_sql('''
+        from_sql = '''
+            FROM bugs b
+            LEFT JOIN users u1 ON b.created_by = u1.id
+            LEFT JOIN users u2 ON b.assigned_to = u2.id
+        '''
+        select_sql = '''
             SELECT b.id, b.title, b.description, b.status, b.type, b.assigned_to, b.created_by, b.project,
                    b.created_at as local_created_at,
                    b.resolved_at as local_resolved_at,
                    b.resolution, b.image_path,
                    COALESCE(u1.chinese_name, u1.username) as creator_name, COALESCE(u2.chinese_name, u2.username) as assignee_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            WHERE (
-                (b.assigned_to = %s)
-                OR
-                (b.status = '待处理' AND b.assigned_to IS NULL AND u1.team = %s)
-                OR
-                (b.status = '已解决' AND b.assigned_to = %s)
-            )
-            ORDER BY b.created_at DESC
-        ''', (user['id'], user['team'], user['id']))
-        c.execute(query, params)
-        bugs = c.fetchall()
+        ''' + from_sql
+        where_sql = '''
+            (b.assigned_to = %s)
+            OR
+            (b.status = '待处理' AND b.assigned_to IS NULL AND u1.team = %s)
+            OR
+            (b.status = '已解决' AND b.assigned_to = %s)
+        '''
+        params = (user['id'], user['team'], user['id'])
+        page = parse_page_args(request.args)
+        bugs, pagination = fetch_keyset_page(c, select_sql, where_sql, params, page,
+                                             created_key='local_created_at')
+        pagination.update(count_capped(c, from_sql, where_sql, params))
 
         # 格式化问题创建时间和解决时间
         formatted_bugs = []
         for bug in bugs:
             bug_dict = dict(bug)
             # 处理local_created_at (别名为created_at)
-            created_at = bug_dict.get('local_created_at')
-            if isinstance(created_at, str):
-                bug_dict['created_at'] = created_at  # 已经是字符串则直接使用
-            elif created_at:
-                bug_dict['created_at'] = created_at.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                bug_dict['created_at'] = '--'
-
+            bug_dict['created_at'] = format_datetime_value(bug_dict.get('local_created_at'))
             # 处理local_resolved_at (别名为resolved_at)
-            resolved_at = bug_dict.get('local_resolved_at')
-            if isinstance(resolved_at, str):
-                bug_dict['resolved_at'] = resolved_at  # 已经是字符串则直接使用
-            elif resolved_at:
-                bug_dict['resolved_at'] = resolved_at.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                bug_dict['resolved_at'] = '--'
-
+            bug_dict['resolved_at'] = format_datetime_value(bug_dict.get('local_resolved_at'))
             formatted_bugs.append(bug_dict)
 
         conn.close()
-        app.logger.debug(f"Rendering team_issues.html with user role: {user['role']} and bugs: {formatted_bugs}")
-        return render_template('team_issues.html', bugs=formatted_bugs, user=user)
+        log_debug(app.logger, "Rendering team_issues.html: role=%s, bugs=%d", user['role'], len(formatted_bugs))
+        return render_template('team_issues.html', bugs=formatted_bugs, user=user, pagination=pagination)
     except Exception as e:
         error_msg = f"team_issues页面错误: {str(e)}"
         print(error_msg)
@@ -2019,6 +2475,29 @@ def team_issues():
         </html>
         """, 500
 
+def bug_image_path(stored):
+    """附件路径：上传目录名/对外文件名（与/uploads/<filename>路由对应）"""
+    return f"{os.path.basename(app.config['UPLOAD_FOLDER'])}/{stored['name']}"
+
+def save_bug_images(c, bug_id, stored_files, created_at):
+    """保存问题附件到bug_images表，并记录附件引用的文件（与问题在同一事务中）"""
+    for stored in stored_files:
+        query, params = adapt_sql('''
+            INSERT INTO bug_images (bug_id, image_path, created_at)
+            VALUES (%s, %s, %s)
+            RETURNING id
+        ''', (bug_id, bug_image_path(stored), created_at))
+        c.execute(query, params)
+        upload_store.attach_blob(c, c.fetchone()[0], stored)
+
+def schedule_image_variants(stored_files):
+    """提交后由后台线程生成图片附件的缩略图和中图"""
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for stored in stored_files:
+        if image_variants.is_image(stored['name']):
+            image_variants.variant_worker.submit(
+                upload_folder, upload_store.blob_file_path(upload_folder, stored['sha256']), stored['sha256'])
+
 # 提交问题页面
 @app.route('/submit', methods=['GET', 'POST'])
 @login_required
@@ -2046,16 +2525,11 @@ def submit_page():
         ''', ('fzr',))
         c.execute(query, params)
         managers = [row['display_name'] for row in c.fetchall()]
-        app.logger.debug(f"获取到的负责人列表: {managers}")
-
-        # 调试：打印实际查询到的负责人显示名称
-        app.logger.debug(f"实际负责人显示名称: {managers}")
 
         # 获取项目列表
         query, params = adapt_sql('SELECT name FROM projects ORDER BY name', ())
         c.execute(query, params)
         projects = [row['name'] if DB_TYPE == 'postgres' else row[0] for row in c.fetchall()]
-        app.logger.debug(f"获取到的项目列表: {projects}")
 
         # 获取产品线列表
         query, params = adapt_sql("SELECT id, name FROM product_lines WHERE status = 'active' ORDER BY name", ())
@@ -2064,7 +2538,6 @@ def submit_page():
             product_lines = c.fetchall()
         else:
             product_lines = [{'id': row[0], 'name': row[1]} for row in c.fetchall()]
-        app.logger.debug(f"获取到的产品线列表: {product_lines}")
 
         return render_template('submit.html', managers=managers, projects=projects, product_lines=product_lines, user=user)
     finally:
@@ -2072,29 +2545,25 @@ def submit_page():
 
 def submit_bug_handler(user):
     """处理问题提交的逻辑"""
-    app.logger.debug(f"收到问题提交请求，表单数据: {request.form}")
 
     title = request.form.get('title')
     description = request.form.get('description')
     created_by = user['id']
-    app.logger.debug(f"提交用户ID: {created_by}, 标题: {title}, 描述: {description}")
+    log_debug(app.logger, "收到问题提交请求: user_id=%s, title=%s", created_by, title)
 
     if not title or not description:
         return redirect('/submit?error=标题和描述不能为空')
 
-    # 处理图片上传
+    # 处理图片上传（按内容寻址保存，相同内容只保存一份）
     image_path = None
+    stored_files = []
     if 'image' in request.files:
         file = request.files['image']
         if file and file.filename and allowed_file(file.filename):
-            upload_dir = app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_dir):
-                os.makedirs(upload_dir, mode=0o777, exist_ok=True)
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(upload_dir, filename)
-            file.save(filepath)
-            image_path = f'/uploads/{filename}'
-            app.logger.debug(f"文件保存成功: {filepath}")
+            stored = upload_store.store_upload(file, app.config['UPLOAD_FOLDER'])
+            stored_files.append(stored)
+            image_path = f"/uploads/{stored['name']}"
+            log_debug(app.logger, "文件保存成功: %s (新文件: %s)", stored['name'], stored['created'])
 
     # 存入数据库
     conn = get_db_connection()
@@ -2145,38 +2614,25 @@ def submit_bug_handler(user):
             ''', (title, description, created_by, project_id, image_path, manager_id, bug_type, current_time, product_line_id))
             c.execute(query, params)
             bug_id = c.lastrowid
+        bug_stats.add_bugs(c, [bug_id])
+        save_bug_images(c, bug_id, stored_files, current_time)
 
+        from notification.outbox import enqueue_flow_notification, notify_outbox
+        # 写入通知发件箱（与问题在同一事务中，提交后由后台工作线程发送）
+        enqueue_flow_notification(c, 'bug_created', {
+            'bug_id': bug_id,
+            'title': title,
+            'description': description,
+            'creator_name': user['chinese_name'] or user['username'],
+            'created_time': datetime.now().isoformat(),
+            'creator_id': created_by,
+            'assigned_manager_id': manager_id,
+            'product_line_id': product_line_id
+        })
         conn.commit()
-
-        # 异步发送通知（在后台处理）
-        def send_creation_notification_async():
-            try:
-                app.logger.info(f"后台发送问题创建通知 - bug_id: {bug_id}, manager_id: {manager_id}")
-                from notification.simple_notifier import simple_notifier
-                from datetime import datetime
-
-                notification_data = {
-                    'bug_id': bug_id,
-                    'title': title,
-                    'description': description,
-                    'creator_name': user['chinese_name'] or user['username'],
-                    'created_time': datetime.now().isoformat(),
-                    'creator_id': created_by,
-                    'assigned_manager_id': manager_id,
-                    'product_line_id': product_line_id
-                }
-
-                simple_notifier.send_flow_notification('bug_created', notification_data)
-                app.logger.info(f"问题创建通知发送完成 - bug_id: {bug_id}")
-            except Exception as e:
-                app.logger.error(f"后台创建通知发送失败 - bug_id: {bug_id}, 错误: {e}")
-                import traceback
-                app.logger.error(f"创建通知发送错误详情: {traceback.format_exc()}")
-
-        # 启动后台线程发送通知
-        import threading
-        notification_thread = threading.Thread(target=send_creation_notification_async, daemon=True)
-        notification_thread.start()
+        invalidate_team_stats_cache()
+        notify_outbox()
+        schedule_image_variants(stored_files)
 
         app.logger.info(f"问题提交成功，通知已提交后台处理 - bug_id: {bug_id}")
         return redirect(f'/?message=问题提交成功')
@@ -2195,7 +2651,6 @@ def submit_bug_handler(user):
 @app.route('/bug/submit', methods=['POST'])
 @login_required
 def submit_bug():
-    app.logger.debug(f"收到问题提交请求，表单数据: {request.form}")
     user = get_current_user()
     if not user:
         app.logger.warning("提交问题失败: 用户未登录")
@@ -2204,79 +2659,34 @@ def submit_bug():
     title = request.form.get('title')
     description = request.form.get('description')
     created_by = user['id']
-    app.logger.debug(f"提交用户ID: {created_by}, 标题: {title}, 描述: {description}")
+    log_debug(app.logger, "收到问题提交请求: user_id=%s, title=%s", created_by, title)
 
     if not title or not description:
         return jsonify({'success': False, 'message': '标题和描述不能为空'}), 400
 
-    # 处理多图片上传
-    image_paths = []
-    main_image_path = None
-
-    app.logger.debug(f"请求文件字段: {list(request.files.keys())}")
+    # 处理多图片上传（按内容寻址保存，相同内容只保存一份）
+    upload_dir = app.config['UPLOAD_FOLDER']
+    stored_files = []
 
     if 'images' in request.files:
         app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
         files = request.files.getlist('images')
-        app.logger.debug(f"接收到 {len(files)} 个图片文件")
-
-        upload_dir = app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir, mode=0o777, exist_ok=True)
+        log_debug(app.logger, "接收到 %d 个图片文件", len(files))
 
-        for i, file in enumerate(files):
+        for file in files:
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(upload_dir, filename)
-                
-                # 检查文件名冲突，如果冲突则添加后缀
-                counter = 1
-                original_filepath = filepath
-                while os.path.exists(filepath):
-                    name, ext = os.path.splitext(original_filepath)
-                    filepath = f"{name}_{counter}{ext}"
-                    counter += 1
-                    
-                file.save(filepath)
-
-                # 存储相对于 static 目录的路径
-                relative_path = os.path.join(os.path.basename(upload_dir), os.path.basename(filepath))
-                image_paths.append(relative_path)
-
-                # 第一张图片作为主图片（向后兼容）
-                if i == 0:
-                    main_image_path = relative_path
-
-                app.logger.debug(f"文件保存成功: {filepath}")
-
-        app.logger.debug(f"多图片上传完成，共保存 {len(image_paths)} 张图片")
+                stored_files.append(upload_store.store_upload(file, upload_dir))
+
+        log_debug(app.logger, "多图片上传完成，共保存 %d 张图片", len(stored_files))
 
     # 向后兼容：如果没有使用新的多图片上传，检查旧的单图片上传
     elif 'image' in request.files:
-        app.logger.debug("使用旧版单图片上传")
         file = request.files['image']
         if file and file.filename and allowed_file(file.filename):
-            upload_dir = app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_dir):
-                os.makedirs(upload_dir, mode=0o777, exist_ok=True)
+            stored_files.append(upload_store.store_upload(file, upload_dir))
 
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(upload_dir, filename)
-            
-            # 检查文件名冲突
-            counter = 1
-            original_filepath = filepath
-            while os.path.exists(filepath):
-                name, ext = os.path.splitext(original_filepath)
-                filepath = f"{name}_{counter}{ext}"
-                counter += 1
-                
-            file.save(filepath)
-
-            relative_path = os.path.join(os.path.basename(upload_dir), os.path.basename(filepath))
-            main_image_path = relative_path
-            image_paths.append(main_image_path)
-            app.logger.debug(f"文件保存成功: {filepath}")
+    # 第一张图片作为主图片（向后兼容）
+    main_image_path = bug_image_path(stored_files[0]) if stored_files else None
 
     # 存入数据库
     conn = get_db_connection()
@@ -2313,17 +2723,26 @@ def submit_bug():
         c.execute(query, params)
 
         bug_id = c.fetchone()['id']
+        bug_stats.add_bugs(c, [bug_id])
 
         # 保存所有图片到bug_images表
-        if image_paths:
-            for image_path in image_paths:
-                image_query, image_params = adapt_sql('''
-                    INSERT INTO bug_images (bug_id, image_path, created_at)
-                    VALUES (%s, %s, %s)
-                ''', (bug_id, image_path, current_time))
-                c.execute(image_query, image_params)
+        save_bug_images(c, bug_id, stored_files, current_time)
 
+        from notification.outbox import enqueue_flow_notification, notify_outbox
+        # 写入通知发件箱（与问题在同一事务中，提交后由后台工作线程发送）
+        enqueue_flow_notification(c, 'bug_created', {
+            'bug_id': bug_id,
+            'title': title,
+            'description': description,
+            'creator_name': user['chinese_name'] or user['username'],
+            'created_time': datetime.now().isoformat(),
+            'creator_id': created_by,
+            'assigned_manager_id': manager_id
+        })
         conn.commit()
+        invalidate_team_stats_cache()
+        notify_outbox()
+        schedule_image_variants(stored_files)
 
         # 立即返回响应，不等待通知发送
         response_data = {
@@ -2332,35 +2751,6 @@ def submit_bug():
             'redirect': f'/bug/{bug_id}'
         }
 
-        # 异步发送通知（在后台处理）
-        def send_notification_async():
-            try:
-                app.logger.info(f"后台发送问题创建通知 - bug_id: {bug_id}, manager_id: {manager_id}")
-                from notification.simple_notifier import simple_notifier
-                from datetime import datetime
-
-                notification_data = {
-                    'bug_id': bug_id,
-                    'title': title,
-                    'description': description,
-                    'creator_name': user['chinese_name'] or user['username'],
-                    'created_time': datetime.now().isoformat(),
-                    'creator_id': created_by,
-                    'assigned_manager_id': manager_id
-                }
-
-                simple_notifier.send_flow_notification('bug_created', notification_data)
-                app.logger.info(f"问题创建通知发送完成 - bug_id: {bug_id}")
-            except Exception as e:
-                app.logger.error(f"后台通知发送失败 - bug_id: {bug_id}, 错误: {e}")
-                import traceback
-                app.logger.error(f"通知发送错误详情: {traceback.format_exc()}")
-
-        # 启动后台线程发送通知
-        import threading
-        notification_thread = threading.Thread(target=send_notification_async, daemon=True)
-        notification_thread.start()
-
         app.logger.info(f"问题提交成功，通知已提交后台处理 - bug_id: {bug_id}")
 
         return jsonify(response_data)
@@ -2417,19 +2807,22 @@ def bug_detail(bug_id):
         bug_dict = dict(bug)
 
         # 查询所有相关附件
-        attachments_query, params = adapt_sql(
-            'SELECT image_path FROM bug_images WHERE bug_id = %s ORDER BY id ASC',
-            (bug_id,)
-        )
+        attachments_query, params = adapt_sql('''
+            SELECT i.image_path, r.original_name
+            FROM bug_images i
+            LEFT JOIN bug_image_blobs r ON r.bug_image_id = i.id
+            WHERE i.bug_id = %s ORDER BY i.id ASC
+        ''', (bug_id,))
         c.execute(attachments_query, params)
         
         attachments = []
         for row in c.fetchall():
-            path = row[0] if DB_TYPE == 'sqlite' else row['image_path']
+            path = row[0]
             if path:
+                # 按内容寻址保存的文件显示原始文件名
                 attachments.append({
                     'path': path.replace('\\', '/'), # 确保路径分隔符
-                    'name': os.path.basename(path)
+                    'name': row[1] or os.path.basename(path)
                 })
 
         # 向后兼容：如果新表没有附件，但旧的 image_path 字段有，则添加它
@@ -2527,7 +2920,8 @@ def assign_bug(bug_id):
     c.execute(query, params)
     bug_info = c.fetchone()
 
-    # 更新问题状态
+    # 更新问题状态（同时更新每日统计汇总）
+    bug_stats.remove_bugs(c, [bug_id])
     query, params = adapt_sql('''
         UPDATE bugs
         SET status = '已分配',
@@ -2535,7 +2929,22 @@ def assign_bug(bug_id):
         WHERE id = %s
     ''', (assigned_to, bug_id))
     c.execute(query, params)
+    bug_stats.add_bugs(c, [bug_id])
+
+    from notification.outbox import enqueue_flow_notification, notify_outbox
+    # 写入通知发件箱（与指派在同一事务中，提交后由后台工作线程发送）
+    enqueue_flow_notification(c, 'bug_assigned', {
+        'bug_id': bug_id,
+        'title': bug_info['title'],
+        'description': bug_info['description'],
+        'assignee_id': assigned_to,
+        'assigner_name': user['chinese_name'] or user['username'],
+        'assigned_time': datetime.now().isoformat(),
+        'creator_id': bug_info['created_by']
+    })
     conn.commit()
+    invalidate_team_stats_cache()
+    notify_outbox()
 
     # 获取被指派人用户名
     query, params = adapt_sql('SELECT username FROM users WHERE id = %s', (assigned_to,))
@@ -2543,35 +2952,6 @@ def assign_bug(bug_id):
     assignee_name = c.fetchone()['username']
     conn.close()
 
-    # 异步发送通知（在后台处理）
-    def send_assignment_notification_async():
-        try:
-            app.logger.info(f"后台发送问题分配通知 - bug_id: {bug_id}, assignee_id: {assigned_to}")
-            from notification.simple_notifier import simple_notifier
-            from datetime import datetime
-
-            notification_data = {
-                'bug_id': bug_id,
-                'title': bug_info['title'],
-                'description': bug_info['description'],
-                'assignee_id': assigned_to,
-                'assigner_name': user['chinese_name'] or user['username'],
-                'assigned_time': datetime.now().isoformat(),
-                'creator_id': bug_info['created_by']
-            }
-
-            simple_notifier.send_flow_notification('bug_assigned', notification_data)
-            app.logger.info(f"问题分配通知发送完成 - bug_id: {bug_id}")
-        except Exception as e:
-            app.logger.error(f"后台分配通知发送失败 - bug_id: {bug_id}, 错误: {e}")
-            import traceback
-            app.logger.error(f"分配通知发送错误详情: {traceback.format_exc()}")
-
-    # 启动后台线程发送通知
-    import threading
-    notification_thread = threading.Thread(target=send_assignment_notification_async, daemon=True)
-    notification_thread.start()
-
     # 立即返回响应，不等待通知发送
     response_data = {
         'success': True,
@@ -2626,7 +3006,8 @@ def reject_bug(bug_id):
                 'resolution': bug[9], 'image_path': bug[10]
             }
 
-        # 更新问题状态为"已驳回"，清除指派人，并记录驳回原因
+        # 更新问题状态为"已驳回"，清除指派人，并记录驳回原因（同时更新每日统计汇总）
+        bug_stats.remove_bugs(c, [bug_id])
         query, params = adapt_sql('''
             UPDATE bugs
             SET status = '已驳回',
@@ -2635,38 +3016,24 @@ def reject_bug(bug_id):
             WHERE id = %s
         ''', (f'驳回原因：{reject_reason}', bug_id))
         c.execute(query, params)
+        bug_stats.add_bugs(c, [bug_id])
+
+        from notification.outbox import enqueue_flow_notification, notify_outbox
+        # 写入通知发件箱（与驳回在同一事务中，提交后由后台工作线程发送）
+        enqueue_flow_notification(c, 'bug_rejected', {
+            'bug_id': bug_id,
+            'title': bug_info['title'],
+            'description': bug_info['description'],
+            'reject_reason': reject_reason,
+            'rejector_name': user['chinese_name'] or user['username'],
+            'rejected_time': datetime.now().isoformat(),
+            'creator_id': bug_info['created_by'],
+            'old_assignee_id': bug_info.get('assigned_to')
+        })
         conn.commit()
+        invalidate_team_stats_cache()
         conn.close()
-
-        # 异步发送通知（在后台处理）
-        def send_reject_notification_async():
-            try:
-                app.logger.info(f"后台发送问题驳回通知 - bug_id: {bug_id}")
-                from notification.simple_notifier import simple_notifier
-                from datetime import datetime
-
-                notification_data = {
-                    'bug_id': bug_id,
-                    'title': bug_info['title'],
-                    'description': bug_info['description'],
-                    'reject_reason': reject_reason,
-                    'rejector_name': user['chinese_name'] or user['username'],
-                    'rejected_time': datetime.now().isoformat(),
-                    'creator_id': bug_info['created_by'],
-                    'old_assignee_id': bug_info.get('assigned_to')
-                }
-
-                simple_notifier.send_flow_notification('bug_rejected', notification_data)
-                app.logger.info(f"问题驳回通知发送完成 - bug_id: {bug_id}")
-
-            except Exception as e:
-                app.logger.error(f"发送问题驳回通知失败 - bug_id: {bug_id}, error: {str(e)}")
-
-        # 在后台线程中发送通知
-        import threading
-        notification_thread = threading.Thread(target=send_reject_notification_async)
-        notification_thread.daemon = True
-        notification_thread.start()
+        notify_outbox()
 
         return jsonify({
             'success': True,
@@ -2732,10 +3099,12 @@ def delete_bug(bug_id):
     if user['role_en'] != 'gly' and user['id'] != bug['created_by']:
         return jsonify({'success': False, 'message': '无权删除此问题'})
 
-    # 执行删除
+    # 执行删除（先从每日统计汇总中减去）
+    bug_stats.remove_bugs(c, [bug_id])
     query, params = adapt_sql('DELETE FROM bugs WHERE id = %s', (bug_id,))
     c.execute(query, params)
     conn.commit()
+    invalidate_team_stats_cache()
     conn.close()
 
     return jsonify({'success': True})
@@ -2767,14 +3136,17 @@ def confirm_receive(bug_id):
         conn.close()
         return jsonify({'success': False, 'message': '无权操作此问题'})
 
-    # 更新问题状态为"处理中"
+    # 更新问题状态为"处理中"（同时更新每日统计汇总）
+    bug_stats.remove_bugs(c, [bug_id])
     query, params = adapt_sql('''
         UPDATE bugs
         SET status = '处理中'
         WHERE id = %s
     ''', (bug_id,))
     c.execute(query, params)
+    bug_stats.add_bugs(c, [bug_id])
     conn.commit()
+    invalidate_team_stats_cache()
     conn.close()
     return jsonify({'success': True})
 
@@ -2833,6 +3205,8 @@ def resolve_bug(bug_id):
     from datetime import datetime
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
+    # 同时更新每日统计汇总
+    bug_stats.remove_bugs(c, [bug_id])
     if DB_TYPE == 'postgres':
         query, params = adapt_sql('''
             UPDATE bugs
@@ -2846,8 +3220,26 @@ def resolve_bug(bug_id):
             WHERE id = %s AND assigned_to = %s
         ''', (resolution, current_time, bug_id, user['id']))
     c.execute(query, params)
+    updated = c.rowcount
+    bug_stats.add_bugs(c, [bug_id])
+
+    from notification.outbox import enqueue_flow_notification, notify_outbox
+    # 写入通知发件箱（仅在确实更新了问题时；与更新在同一事务中，提交后由后台工作线程发送）
+    if updated and bug_info:
+        enqueue_flow_notification(c, 'bug_resolved', {
+            'bug_id': bug_id,
+            'title': bug_info['title'],
+            'description': bug_info['description'],
+            'solution': resolution,
+            'resolver_name': user['chinese_name'] or user['username'],
+            'resolved_time': datetime.now().isoformat(),
+            'creator_id': bug_info['created_by'],
+            'resolver_id': user['id']
+        })
     conn.commit()
+    invalidate_team_stats_cache()
     conn.close()
+    notify_outbox()
 
     # 立即返回响应，不等待通知发送
     response_data = {
@@ -2855,36 +3247,6 @@ def resolve_bug(bug_id):
         'redirect': f'/bug/{bug_id}'
     }
 
-    # 异步发送通知（在后台处理）
-    def send_resolution_notification_async():
-        try:
-            app.logger.info(f"后台发送问题解决通知 - bug_id: {bug_id}")
-            from notification.simple_notifier import simple_notifier
-            from datetime import datetime
-
-            notification_data = {
-                'bug_id': bug_id,
-                'title': bug_info['title'],
-                'description': bug_info['description'],
-                'solution': resolution,
-                'resolver_name': user['chinese_name'] or user['username'],
-                'resolved_time': datetime.now().isoformat(),
-                'creator_id': bug_info['created_by'],
-                'resolver_id': user['id']
-            }
-
-            simple_notifier.send_flow_notification('bug_resolved', notification_data)
-            app.logger.info(f"问题解决通知发送完成 - bug_id: {bug_id}")
-        except Exception as e:
-            app.logger.error(f"后台解决通知发送失败 - bug_id: {bug_id}, 错误: {e}")
-            import traceback
-            app.logger.error(f"解决通知发送错误详情: {traceback.format_exc()}")
-
-    # 启动后台线程发送通知
-    import threading
-    notification_thread = threading.Thread(target=send_resolution_notification_async, daemon=True)
-    notification_thread.start()
-
     app.logger.info(f"问题解决成功，通知已提交后台处理 - bug_id: {bug_id}")
     return jsonify(response_data)
 
@@ -3015,11 +3377,39 @@ def admin_notification_stats():
 
         conn.close()
 
+        # 通知发件箱队列深度和发送延迟
+        try:
+            from notification.outbox import outbox_worker
+            outbox = outbox_worker.get_stats()
+        except Exception as e:
+            app.logger.error(f"获取通知发件箱统计失败: {e}")
+            outbox = None
+
+        # Gotify推送耗时和熔断状态（本进程）
+        try:
+            from notification.channels.gotify_notifier import GotifyNotifier
+            gotify = GotifyNotifier.get_stats()
+        except Exception as e:
+            app.logger.error(f"获取Gotify推送统计失败: {e}")
+            gotify = None
+
+        # 实时通知流连接数和轮询统计（本进程）
+        try:
+            from notification.realtime import notification_hub
+            realtime = notification_hub.get_stats()
+        except Exception as e:
+            app.logger.error(f"获取实时通知统计失败: {e}")
+            realtime = None
+
         return jsonify({
             'total': total,
             'unread': unread,
             'enabled_users': enabled_users,
-            'today': today
+            'today': today,
+            'outbox': outbox,
+            'config_cache': system_config.get_stats(),
+            'gotify': gotify,
+            'realtime': realtime
         })
 
     except Exception as e:
@@ -3031,6 +3421,31 @@ def admin_notification_stats():
             'today': 0
         })
 
+@app.route('/admin/db-pool-stats')
+@login_required
+@role_required('gly')
+def admin_db_pool_stats():
+    """获取数据库连接池统计信息"""
+    try:
+        return jsonify({'success': True, 'stats': get_pool_stats()})
+    except Exception as e:
+        app.logger.error(f"获取连接池统计失败: {e}")
+        return jsonify({'success': False, 'message': f'获取连接池统计失败: {str(e)}'}), 500
+
+@app.route('/admin/notification-outbox/retry-dead', methods=['POST'])
+@login_required
+@role_required('gly')
+def admin_retry_dead_notifications():
+    """把发送失败（死信）的流转通知重新放回发件箱队列"""
+    try:
+        from notification.outbox import outbox_worker, notify_outbox
+        count = outbox_worker.retry_dead()
+        notify_outbox()
+        return jsonify({'success': True, 'message': f'已重新排队 {count} 条通知', 'count': count})
+    except Exception as e:
+        app.logger.error(f"重新排队死信通知失败: {e}")
+        return jsonify({'success': False, 'message': f'操作失败: {str(e)}'}), 500
+
 @app.route('/admin/toggle-notification', methods=['POST'])
 @login_required
 @role_required('gly')
@@ -3105,22 +3520,27 @@ def admin_toggle_global_notification():
         config_value = 'true' if enabled else 'false'
 
         # 更新或插入配置
-        cursor.execute("""
+        query, params = adapt_sql("""
             UPDATE system_config
             SET config_value = %s, updated_at = CURRENT_TIMESTAMP
             WHERE config_key = %s
         """, (config_value, config_key))
+        cursor.execute(query, params)
 
         # 如果没有更新任何行，则插入新记录
         if cursor.rowcount == 0:
             description = f'全局{notification_type}通知开关'
-            cursor.execute("""
+            query, params = adapt_sql("""
                 INSERT INTO system_config (config_key, config_value, description)
                 VALUES (%s, %s, %s)
             """, (config_key, config_value, description))
+            cursor.execute(query, params)
 
+        # 更新配置版本，各进程的配置缓存随之刷新
+        bump_config_version(cursor)
         conn.commit()
         conn.close()
+        system_config.invalidate()
 
         return jsonify({'success': True, 'message': '设置成功'})
 
@@ -3141,9 +3561,9 @@ def api_get_notifications():
         return jsonify({'success': False, 'message': '未登录'})
 
     try:
-        from notification.channels.inapp_notifier import InAppNotifier
+        from notification.simple_notifier import simple_notifier
 
-        inapp_notifier = InAppNotifier()
+        inapp_notifier = simple_notifier.notifiers['inapp']
 
         # 获取最新的10条通知
         notifications = inapp_notifier.get_user_notifications(str(user['id']), limit=10)
@@ -3161,6 +3581,54 @@ def api_get_notifications():
         app.logger.error(f"获取通知失败: {e}")
         return jsonify({'success': False, 'message': '获取通知失败'})
 
+@app.route('/api/notifications/unread-count')
+@login_required
+def api_notification_unread_count():
+    """获取未读通知数量（读取计数表，供不支持SSE的客户端轮询）"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'success': False, 'message': '未登录'})
+
+    try:
+        from notification.realtime import notification_hub
+
+        state = notification_hub.get_state(str(user['id']))
+        return jsonify({'success': True, 'unread_count': state['unread_count'], 'version': state['version']})
+
+    except Exception as e:
+        app.logger.error(f"获取未读通知数量失败: {e}")
+        return jsonify({'success': False, 'message': '获取未读数量失败'})
+
+@app.route('/api/notifications/stream')
+@login_required
+def api_notification_stream():
+    """未读通知数量的Server-Sent Events推送
+
+    连接后立即发送当前未读数，之后每次变化发送一次unread事件；
+    连接最长NOTIFICATION_STREAM_LIFETIME秒，浏览器EventSource会自动重连
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'success': False, 'message': '未登录'}), 401
+
+    from flask import Response
+    from notification.realtime import notification_hub, stream_unread_events
+
+    subscription = notification_hub.subscribe(str(user['id']))
+    if subscription is None:
+        # 本worker的连接数已满，前端退回轮询 /api/notifications/unread-count
+        return jsonify({'success': False, 'message': '实时通知连接数已满'}), 503
+
+    return Response(
+        stream_unread_events(notification_hub, subscription),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # 禁用Nginx代理缓冲，事件立即送达浏览器
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/api/notifications/read', methods=['POST'])
 @login_required
 def api_mark_notification_read():
@@ -3176,9 +3644,9 @@ def api_mark_notification_read():
         if not notification_id:
             return jsonify({'success': False, 'message': '缺少通知ID'})
 
-        from notification.channels.inapp_notifier import InAppNotifier
+        from notification.simple_notifier import simple_notifier
 
-        inapp_notifier = InAppNotifier()
+        inapp_notifier = simple_notifier.notifiers['inapp']
         success = inapp_notifier.mark_as_read(notification_id, str(user['id']))
 
         if success:
@@ -3199,9 +3667,9 @@ def api_mark_all_notifications_read():
         return jsonify({'success': False, 'message': '未登录'})
 
     try:
-        from notification.channels.inapp_notifier import InAppNotifier
+        from notification.simple_notifier import simple_notifier
 
-        inapp_notifier = InAppNotifier()
+        inapp_notifier = simple_notifier.notifiers['inapp']
         success = inapp_notifier.mark_all_as_read(str(user['id']))
 
         if success:
@@ -3371,8 +3839,11 @@ def save_notification_config():
 
             cursor.execute(query, params)
 
+        # 更新配置版本，各进程的配置缓存随之刷新
+        bump_config_version(cursor)
         conn.commit()
         conn.close()
+        system_config.invalidate()
 
         return jsonify({'success': True, 'message': '通知配置保存成功'})
 
@@ -3588,6 +4059,7 @@ def admin_cleanup_notifications():
     try:
         data = request.get_json() or {}
         cleanup_type = data.get('type', 'all')  # 'expired', 'excess', 'all'
+        dry_run = bool(data.get('dry_run', False))  # 试运行：只统计不删除
 
         from notification.cleanup_manager import cleanup_manager
 
@@ -3595,14 +4067,24 @@ def admin_cleanup_notifications():
 
         if cleanup_type in ['expired', 'all']:
             # 清理过期通知
-            expired_result = cleanup_manager.cleanup_expired_notifications()
+            expired_result = cleanup_manager.cleanup_expired_notifications(dry_run=dry_run)
             results['expired'] = expired_result
 
         if cleanup_type in ['excess', 'all']:
             # 清理超量通知
-            excess_result = cleanup_manager.cleanup_excess_notifications()
+            excess_result = cleanup_manager.cleanup_excess_notifications(dry_run=dry_run)
             results['excess'] = excess_result
 
+        if dry_run:
+            would_delete = sum(result.get('would_delete', 0) for result in results.values())
+            return jsonify({
+                'success': True,
+                'message': f'试运行：将删除 {would_delete} 条通知',
+                'dry_run': True,
+                'would_delete': would_delete,
+                'results': results
+            })
+
         # 计算总清理数量
         total_deleted = 0
         if 'expired' in results:
@@ -3751,79 +4233,49 @@ def admin_projects():
     finally:
         conn.close()
 
+PROJECT_EXPORT_QUERY = '''
+    SELECT name, type, city, start_date, factory_acceptance_date,
+           site_acceptance_date, practical_date, description, created_at
+    FROM projects
+    ORDER BY created_at DESC
+'''
+
+def _project_export_row(project):
+    """项目导出行：日期字段统一为 YYYY-MM-DD"""
+    project = dict(project)
+    for date_field in ['start_date', 'factory_acceptance_date', 'site_acceptance_date', 'practical_date', 'created_at']:
+        if project.get(date_field):
+            try:
+                if isinstance(project[date_field], str):
+                    # 如果是字符串，尝试解析
+                    dt = datetime.strptime(project[date_field][:10], '%Y-%m-%d')
+                    project[date_field] = dt.strftime('%Y-%m-%d')
+                else:
+                    # 如果是datetime对象，直接格式化
+                    project[date_field] = project[date_field].strftime('%Y-%m-%d')
+            except:
+                project[date_field] = str(project[date_field]) if project[date_field] else ''
+        else:
+            project[date_field] = ''
+    return project
+
 @app.route('/admin/projects/export', methods=['GET'])
 @login_required
 @role_required('gly')
 def export_projects():
-    """导出项目数据为Excel"""
+    """导出项目数据为Excel（流式导出；页面上使用后台导出任务 /admin/export-jobs）"""
     try:
-        from datetime import datetime
-
-        conn = get_db_connection()
-        if DB_TYPE == 'postgres':
-            c = conn.cursor(cursor_factory=DictCursor)
-        else:
-            c = conn.cursor()
-
-        # 获取所有项目数据
-        query = '''
-            SELECT name, type, city, start_date, factory_acceptance_date,
-                   site_acceptance_date, practical_date, description, created_at
-            FROM projects
-            ORDER BY created_at DESC
-        '''
-        adapted_query, adapted_params = adapt_sql(query, ())
-        c.execute(adapted_query, adapted_params)
-
-        # 转换为字典列表
-        projects_data = []
-        for row in c.fetchall():
-            project = dict(row)
-            # 处理日期格式
-            for date_field in ['start_date', 'factory_acceptance_date', 'site_acceptance_date', 'practical_date', 'created_at']:
-                if project.get(date_field):
-                    try:
-                        if isinstance(project[date_field], str):
-                            # 如果是字符串，尝试解析
-                            dt = datetime.strptime(project[date_field][:10], '%Y-%m-%d')
-                            project[date_field] = dt.strftime('%Y-%m-%d')
-                        else:
-                            # 如果是datetime对象，直接格式化
-                            project[date_field] = project[date_field].strftime('%Y-%m-%d')
-                    except:
-                        project[date_field] = str(project[date_field]) if project[date_field] else ''
-                else:
-                    project[date_field] = ''
-            projects_data.append(project)
-
-        conn.close()
-
-        # 定义导出字段
-        fields = [
-            {'key': 'name', 'label': '项目名称'},
-            {'key': 'type', 'label': '项目类型'},
-            {'key': 'city', 'label': '地市名称'},
-            {'key': 'start_date', 'label': '启动时间'},
-            {'key': 'factory_acceptance_date', 'label': '工厂验收时间'},
-            {'key': 'site_acceptance_date', 'label': '现场验收时间'},
-            {'key': 'practical_date', 'label': '实用化时间'},
-            {'key': 'description', 'label': '项目描述'},
-            {'key': 'created_at', 'label': '创建时间'}
-        ]
-
         # 生成文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'项目列表_{timestamp}'
 
-        # 使用报表导出的Excel方法
-        return export_to_excel(projects_data, fields, filename)
+        query, params = adapt_sql(PROJECT_EXPORT_QUERY, ())
+        return stream_report_export(query, params, PROJECT_EXPORT_FIELDS, filename, 'excel',
+                                    transform=_project_export_row)
 
     except Exception as e:
         app.logger.error(f"导出项目数据错误: {e}")
         return jsonify({'success': False, 'message': f'导出失败: {str(e)}'})
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @app.route('/admin/projects/<int:project_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
@@ -3963,13 +4415,30 @@ def favicon():
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     upload_folder = app.config['UPLOAD_FOLDER']
-    file_path = os.path.join(upload_folder, filename)
+    blob_path = upload_store.resolve_blob(upload_folder, filename)
+    size = request.args.get('size')
+    if size and size not in image_variants.VARIANT_SIZES:
+        abort(400)
+    # 按内容寻址的文件内容不会变化，允许浏览器长期缓存
+    max_age = 31536000 if blob_path else None
+
+    if size and image_variants.is_image(filename):
+        # 缩略图/中图：缓存中没有时当场生成（旧上传），生成失败时返回原文件
+        source_path = blob_path or safe_join(upload_folder, filename)
+        sha256 = os.path.basename(blob_path) if blob_path else None
+        variant = image_variants.get_variant(upload_folder, source_path, size, sha256) if source_path else None
+        if variant:
+            return send_from_directory(os.path.dirname(variant), os.path.basename(variant),
+                                       mimetype=image_variants.variant_mimetype(), max_age=max_age)
+
+    if blob_path:
+        if not os.path.exists(blob_path):
+            app.logger.error(f"文件不存在: {blob_path}")
+            abort(404)
+        return send_from_directory(os.path.dirname(blob_path), os.path.basename(blob_path),
+                                   mimetype=mimetypes.guess_type(filename)[0], max_age=max_age)
 
-    # 调试信息
-    app.logger.debug(f"请求文件: {filename}")
-    app.logger.debug(f"上传目录: {upload_folder}")
-    app.logger.debug(f"完整路径: {file_path}")
-    app.logger.debug(f"文件是否存在: {os.path.exists(file_path)}")
+    file_path = os.path.join(upload_folder, filename)
 
     if not os.path.exists(file_path):
         app.logger.error(f"文件不存在: {file_path}")
@@ -4053,95 +4522,104 @@ def get_product_managers():
         app.logger.error(f"获取产品经理列表失败: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+# 团队统计缓存：统计结果短时间缓存，问题或用户变更时由写入方调用invalidate_team_stats_cache()失效
+# 多个gunicorn worker各自缓存，其他worker的数据最多延迟TEAM_STATS_CACHE_TTL秒
+TEAM_STATS_CACHE_TTL = 30
+# generation在每次失效时加1：查询开始后发生过失效的结果不写入缓存（避免缓存失效前读到的旧数据）
+_team_stats_cache = {'data': None, 'expires_at': 0, 'generation': 0}
+_team_stats_cache_lock = threading.Lock()
+
+def invalidate_team_stats_cache():
+    """使团队统计缓存失效"""
+    with _team_stats_cache_lock:
+        _team_stats_cache['data'] = None
+        _team_stats_cache['expires_at'] = 0
+        _team_stats_cache['generation'] += 1
+
+def load_team_statistics(c):
+    """一次性汇总所有团队的成员、产品经理和问题统计
+
+    团队列表来自产品线和user_teams中的实际数据（只包含管理员的团队不显示）
+
+    Returns:
+        tuple: (按顺序排列的团队名列表, {团队名: 统计数据})
+    """
+    if DB_TYPE == 'postgres':
+        pm_agg = "string_agg(CASE WHEN u.role = '产品经理' OR u.role_en = 'pm' THEN COALESCE(u.chinese_name, u.username) END, ',')"
+    else:
+        pm_agg = "group_concat(CASE WHEN u.role = '产品经理' OR u.role_en = 'pm' THEN COALESCE(u.chinese_name, u.username) END, ',')"
+
+    # 查询1：各团队成员数和产品经理
+    query, params = adapt_sql(f'''
+        SELECT ut.team,
+               COUNT(*) as member_count,
+               SUM(CASE WHEN u.role_en = 'gly' THEN 0 ELSE 1 END) as non_admin_count,
+               {pm_agg} as product_managers
+        FROM user_teams ut
+        JOIN users u ON u.id = ut.user_id
+        GROUP BY ut.team
+    ''', ())
+    c.execute(query, params)
+    member_rows = {row[0]: row for row in c.fetchall()}
+
+    # 查询2：各团队问题状态统计（按被指派人所在团队，读取每日统计汇总表）
+    bug_rows = bug_stats.team_status_counts(c)
+
+    # 团队顺序：产品线在前（按创建顺序），其余有成员的团队按名称排序
+    query, params = adapt_sql('SELECT name FROM product_lines ORDER BY id', ())
+    c.execute(query, params)
+    teams = [row[0] for row in c.fetchall()]
+    extra_teams = sorted(name for name, row in member_rows.items()
+                         if name not in teams and (row[2] or 0) > 0)
+    teams.extend(extra_teams)
+
+    team_stats = {}
+    for team_name in teams:
+        member = member_rows.get(team_name)
+        bug = bug_rows.get(team_name, {})
+        team_stats[team_name] = {
+            'memberCount': member[1] if member else 0,
+            'productManagers': member[3].split(',') if member and member[3] else [],
+            'bugStats': {
+                'total': sum(bug.values()),
+                'pending': bug.get('待处理', 0),
+                'processing': bug.get('已分配', 0) + bug.get('处理中', 0),
+                'resolved': bug.get('已解决', 0)
+            }
+        }
+    return teams, team_stats
+
 @app.route('/api/team-statistics', methods=['GET'])
 @login_required
 @role_required('gly')
 def get_team_statistics():
-    """获取团队统计数据"""
+    """获取团队统计数据（成员GROUP BY查询 + 每日统计汇总表，结果短时间缓存）"""
     try:
-        # 固定的团队列表
-        fixed_teams = [
-            '实施组', '实施组研发', '新能源', '网络分析', '第三道防线',
-            '智能告警', '操作票及防误', '电量', '消纳', '自动发电控制'
-        ]
+        now = time.time()
+        with _team_stats_cache_lock:
+            cached = _team_stats_cache['data']
+            if cached is not None and _team_stats_cache['expires_at'] > now:
+                return jsonify({'success': True, 'teams': cached[0], 'data': cached[1], 'cached': True})
+            generation = _team_stats_cache['generation']
 
         conn = get_db_connection()
-        if DB_TYPE == 'postgres':
-            c = conn.cursor(cursor_factory=DictCursor)
-        else:
-            c = conn.cursor()
-
-        team_stats = {}
-
-        for team_name in fixed_teams:
-            # 统计团队成员数量（包括多团队的产品经理）
-            query, params = adapt_sql('''
-                SELECT COUNT(*) as member_count
-                FROM users
-                WHERE team = %s OR team LIKE %s OR team LIKE %s OR team LIKE %s
-            ''', (team_name, f'{team_name},%', f'%,{team_name},%', f'%,{team_name}'))
-            c.execute(query, params)
-            member_count = c.fetchone()
-            if isinstance(member_count, dict):
-                member_count = member_count['member_count']
-            else:
-                member_count = member_count[0]
-
-            # 获取产品经理列表
-            query, params = adapt_sql('''
-                SELECT chinese_name
-                FROM users
-                WHERE role = '产品经理' AND (team = %s OR team LIKE %s OR team LIKE %s OR team LIKE %s)
-            ''', (team_name, f'{team_name},%', f'%,{team_name},%', f'%,{team_name}'))
-            c.execute(query, params)
-            pm_results = c.fetchall()
-            product_managers = []
-            for pm in pm_results:
-                if isinstance(pm, dict):
-                    product_managers.append(pm['chinese_name'])
-                else:
-                    product_managers.append(pm[0])
-
-            # 统计Bug数量 - 通过assigned_to联合users表的team字段
-            query, params = adapt_sql('''
-                SELECT
-                    COUNT(*) as total,
-                    SUM(CASE WHEN b.status = '待处理' THEN 1 ELSE 0 END) as pending,
-                    SUM(CASE WHEN b.status IN ('已分配', '处理中') THEN 1 ELSE 0 END) as processing,
-                    SUM(CASE WHEN b.status = '已解决' THEN 1 ELSE 0 END) as resolved
-                FROM bugs b
-                LEFT JOIN users u ON b.assigned_to = u.id
-                WHERE u.team = %s
-            ''', (team_name,))
-            c.execute(query, params)
-            bug_stats = c.fetchone()
-
-            if isinstance(bug_stats, dict):
-                total = bug_stats['total'] or 0
-                pending = bug_stats['pending'] or 0
-                processing = bug_stats['processing'] or 0
-                resolved = bug_stats['resolved'] or 0
+        try:
+            if DB_TYPE == 'postgres':
+                c = conn.cursor(cursor_factory=DictCursor)
             else:
-                total = bug_stats[0] or 0
-                pending = bug_stats[1] or 0
-                processing = bug_stats[2] or 0
-                resolved = bug_stats[3] or 0
-
-            team_stats[team_name] = {
-                'memberCount': member_count,
-                'productManagers': product_managers,
-                'bugStats': {
-                    'total': total,
-                    'pending': pending,
-                    'processing': processing,
-                    'resolved': resolved
-                }
-            }
+                c = conn.cursor()
+            teams, team_stats = load_team_statistics(c)
+        finally:
+            conn.close()
 
-        conn.close()
+        with _team_stats_cache_lock:
+            if _team_stats_cache['generation'] == generation:
+                _team_stats_cache['data'] = (teams, team_stats)
+                _team_stats_cache['expires_at'] = now + TEAM_STATS_CACHE_TTL
 
         return jsonify({
             'success': True,
+            'teams': teams,
             'data': team_stats
         })
     except Exception as e:
@@ -4545,77 +5023,8 @@ def admin_reports_preview():
         filters = data.get('filters', {})
         fields = data.get('fields', [])
 
-        # 构建查询
-        query_parts = []
-        params = []
-
-        # 基础查询
-        base_query = '''
-            SELECT b.id, b.title, b.description, b.status, b.type, b.project,
-                   b.created_at, b.resolved_at, b.resolution, b.image_path,
-                   u1.username as creator_username, u1.chinese_name as creator_name,
-                   u2.username as assignee_username, u2.chinese_name as assignee_name,
-                   u2.team as assignee_team,
-                   u3.username as manager_username, u3.chinese_name as manager_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            LEFT JOIN users u3 ON u2.team = u3.team AND u3.role_en = 'fzr'
-        '''
-
-        # 添加筛选条件
-        where_conditions = []
-
-        # 日期范围筛选
-        if filters.get('dateRange'):
-            date_range = filters['dateRange']
-            if date_range.get('start'):
-                where_conditions.append('DATE(b.created_at) >= %s')
-                params.append(date_range['start'])
-            if date_range.get('end'):
-                where_conditions.append('DATE(b.created_at) <= %s')
-                params.append(date_range['end'])
-
-        # 状态筛选
-        if filters.get('status'):
-            status_list = filters['status']
-            if status_list:
-                placeholders = ','.join(['%s'] * len(status_list))
-                where_conditions.append(f'b.status IN ({placeholders})')
-                params.extend(status_list)
-
-        # 项目筛选
-        if filters.get('project'):
-            where_conditions.append('b.project = %s')
-            params.append(filters['project'])
-
-        # 创建者筛选
-        if filters.get('creator'):
-            where_conditions.append('b.created_by = %s')
-            params.append(filters['creator'])
-
-        # 分配者筛选
-        if filters.get('assignee'):
-            where_conditions.append('b.assigned_to = %s')
-            params.append(filters['assignee'])
-
-        # 类型筛选
-        if filters.get('type'):
-            type_list = filters['type']
-            if type_list:
-                placeholders = ','.join(['%s'] * len(type_list))
-                where_conditions.append(f'b.type IN ({placeholders})')
-                params.extend(type_list)
-
-        # 组合查询
-        if where_conditions:
-            query = base_query + ' WHERE ' + ' AND '.join(where_conditions)
-        else:
-            query = base_query
-
-        query += ' ORDER BY b.created_at DESC LIMIT 100'  # 预览限制100条
-
-        # 执行查询
+        # 执行查询（预览限制100条；团队和附件数量在同一条查询中取得）
+        query, params = report_query.ReportQuery(filters).rows_query(limit=100)
         conn = get_db_connection()
         if DB_TYPE == 'postgres':
             from psycopg2.extras import DictCursor
@@ -4623,210 +5032,12 @@ def admin_reports_preview():
         else:
             cursor = conn.cursor()
 
-        query, params = adapt_sql(query, params)
         cursor.execute(query, params)
-
         results = cursor.fetchall()
         conn.close()
 
-        # 转换数据格式 - 兼容PostgreSQL和SQLite
-        preview_data = []
-        assignee_usernames = set()  # 收集所有分配者用户名
-        bug_ids = []  # 收集所有bug ID，用于查询附件数量
-
-        for row in results:
-            # 统一转换为字典格式
-            if DB_TYPE == 'postgres':
-                # PostgreSQL DictCursor 返回字典风格的行
-                row_data = dict(row)
-            else:
-                # SQLite Row 对象（已设置row_factory = sqlite3.Row）
-                if hasattr(row, 'keys'):
-                    row_data = dict(row)
-                else:
-                    # 兜底：普通tuple格式
-                    row_data = {
-                        'id': row[0],
-                        'title': row[1],
-                        'description': row[2],
-                        'status': row[3],
-                        'project': row[4],
-                        'created_at': row[5],
-                        'resolved_at': row[6],
-                        'resolution': row[7],
-                        'image_path': row[8],
-                        'creator_username': row[9],
-                        'creator_name': row[10],
-                        'assignee_username': row[11],
-                        'assignee_name': row[12],
-                        'assignee_team': row[13],
-                        'manager_username': row[14],
-                        'manager_name': row[15]
-                    }
-
-            # 添加前端需要的字段映射
-            row_data['creator'] = row_data.get('creator_name') or row_data.get('creator_username') or '未知'
-            row_data['assignee'] = row_data.get('assignee_name') or row_data.get('assignee_username') or '未分配'
-            row_data['manager'] = row_data.get('manager_name') or row_data.get('manager_username') or '未分配'
-
-            # 处理时间格式 - 转换为字符串格式
-            created_at = row_data.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'strftime'):
-                    # datetime对象，转换为字符串
-                    row_data['created_at'] = created_at.strftime('%Y-%m-%d %H:%M:%S')
-                    row_data['create_time'] = row_data['created_at']
-                else:
-                    # 已经是字符串
-                    row_data['create_time'] = str(created_at)
-            else:
-                row_data['create_time'] = ''
-
-            resolved_at = row_data.get('resolved_at')
-            if resolved_at:
-                if hasattr(resolved_at, 'strftime'):
-                    # datetime对象，转换为字符串
-                    row_data['resolved_at'] = resolved_at.strftime('%Y-%m-%d %H:%M:%S')
-                    row_data['resolve_time'] = row_data['resolved_at']
-                else:
-                    # 已经是字符串
-                    row_data['resolve_time'] = str(resolved_at)
-            else:
-                row_data['resolve_time'] = ''
-
-            # 默认产品线值
-            row_data['team'] = '暂无'
-
-            # 收集分配者用户名，用于后续查询团队信息
-            if row_data.get('assignee_username'):
-                assignee_usernames.add(row_data.get('assignee_username'))
-
-            # 收集bug ID，用于查询附件数量
-            if row_data.get('id'):
-                bug_ids.append(row_data.get('id'))
-
-            # 附件数量（默认值，后续会更新）
-            row_data['attachments'] = '0'
-
-            preview_data.append(row_data)
-
-        # 批量查询用户团队信息
-        if assignee_usernames:
-            try:
-                app.logger.info(f"开始查询用户团队，用户名: {assignee_usernames}")
-
-                # 创建新的数据库连接
-                user_conn = get_db_connection()
-                if DB_TYPE == 'postgres':
-                    from psycopg2.extras import DictCursor
-                    user_cursor = user_conn.cursor(cursor_factory=DictCursor)
-                else:
-                    user_cursor = user_conn.cursor()
-
-                # 构建查询参数
-                placeholders = ', '.join(['%s'] * len(assignee_usernames))
-                user_query, user_params = adapt_sql(f"SELECT username, team FROM users WHERE username IN ({placeholders})", tuple(assignee_usernames))
-                user_cursor.execute(user_query, user_params)
-
-                # 创建用户名到团队的映射
-                user_teams = {}
-                team_results = user_cursor.fetchall()
-                app.logger.info(f"团队查询结果数量: {len(team_results)}")
-
-                for user_row in team_results:
-                    if DB_TYPE == 'postgres':
-                        username = user_row['username']
-                        team = user_row['team']
-                    else:
-                        username = user_row[0]
-                        team = user_row[1]
-
-                    user_teams[username] = team
-                    app.logger.info(f"用户团队映射: {username} -> {team}")
-
-                # 更新每条记录的团队信息
-                updated_count = 0
-                for row_data in preview_data:
-                    assignee_username = row_data.get('assignee_username')
-                    if assignee_username in user_teams and user_teams[assignee_username]:
-                        row_data['team'] = user_teams[assignee_username]
-                        updated_count += 1
-
-                app.logger.info(f"更新了 {updated_count} 条记录的团队信息")
-
-                # 关闭连接
-                user_cursor.close()
-                user_conn.close()
-
-            except Exception as e:
-                app.logger.error(f"批量获取用户团队失败: {e}")
-                import traceback
-                app.logger.error(f"详细错误: {traceback.format_exc()}")
-                # 出错时保持默认值
-
-        # 批量查询附件数量
-        if bug_ids:
-            try:
-                app.logger.info(f"开始查询附件数量，bug数量: {len(bug_ids)}")
-
-                # 创建新的数据库连接
-                attachment_conn = get_db_connection()
-                if DB_TYPE == 'postgres':
-                    from psycopg2.extras import DictCursor
-                    attachment_cursor = attachment_conn.cursor(cursor_factory=DictCursor)
-                else:
-                    attachment_cursor = attachment_conn.cursor()
-
-                # 构建查询参数
-                placeholders = ', '.join(['%s'] * len(bug_ids))
-                attachment_query, attachment_params = adapt_sql(f"""
-                    SELECT bug_id, COUNT(*) as attachment_count
-                    FROM bug_images
-                    WHERE bug_id IN ({placeholders})
-                    GROUP BY bug_id
-                """, tuple(bug_ids))
-                attachment_cursor.execute(attachment_query, attachment_params)
-
-                # 创建bug ID到附件数量的映射
-                attachment_counts = {}
-                attachment_results = attachment_cursor.fetchall()
-                app.logger.info(f"附件查询结果数量: {len(attachment_results)}")
-
-                for attachment_row in attachment_results:
-                    if DB_TYPE == 'postgres':
-                        bug_id = attachment_row['bug_id']
-                        count = attachment_row['attachment_count']
-                    else:
-                        if hasattr(attachment_row, 'keys'):
-                            attachment_dict = dict(attachment_row)
-                            bug_id = attachment_dict['bug_id']
-                            count = attachment_dict['attachment_count']
-                        else:
-                            bug_id = attachment_row[0]
-                            count = attachment_row[1]
-
-                    attachment_counts[bug_id] = count
-                    app.logger.info(f"Bug {bug_id} 附件数量: {count}")
-
-                # 更新每条记录的附件数量
-                updated_attachment_count = 0
-                for row_data in preview_data:
-                    bug_id = row_data.get('id')
-                    if bug_id in attachment_counts:
-                        row_data['attachments'] = str(attachment_counts[bug_id])
-                        updated_attachment_count += 1
-
-                app.logger.info(f"更新了 {updated_attachment_count} 条记录的附件数量")
-
-                # 关闭连接
-                attachment_cursor.close()
-                attachment_conn.close()
-
-            except Exception as e:
-                app.logger.error(f"批量获取附件数量失败: {e}")
-                import traceback
-                app.logger.error(f"详细错误: {traceback.format_exc()}")
-                # 出错时保持默认值
+        # 转换为前端需要的字段（与导出相同）
+        preview_data = [_report_export_row(dict(row)) for row in results]
 
         # 确保所有datetime对象都已转换为字符串
         for row in preview_data:
@@ -4855,168 +5066,13 @@ def admin_reports_chart_data():
         data = request.get_json()
         filters = data.get('filters', {})
 
-        # 构建查询（与预览查询相同的筛选条件）
-        query_parts = []
-        params = []
-
-        # 基础查询
-        base_query = '''
-            SELECT b.id, b.title, b.status, b.type, b.project,
-                   b.created_at, b.resolved_at,
-                   u1.username as creator_username, u1.chinese_name as creator_name,
-                   u2.username as assignee_username, u2.chinese_name as assignee_name,
-                   u1.team as creator_team, u2.team as assignee_team
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-        '''
-
-        # 添加筛选条件（与预览接口相同的逻辑）
-        where_conditions = []
-
-        # 日期范围筛选
-        if filters.get('dateRange'):
-            date_range = filters['dateRange']
-            if date_range.get('start'):
-                where_conditions.append('DATE(b.created_at) >= %s')
-                params.append(date_range['start'])
-            if date_range.get('end'):
-                where_conditions.append('DATE(b.created_at) <= %s')
-                params.append(date_range['end'])
-
-        # 状态筛选
-        if filters.get('status'):
-            status_list = filters['status']
-            if status_list:
-                placeholders = ','.join(['%s'] * len(status_list))
-                where_conditions.append(f'b.status IN ({placeholders})')
-                params.extend(status_list)
-
-        # 项目筛选
-        if filters.get('project'):
-            where_conditions.append('b.project = %s')
-            params.append(filters['project'])
-
-        # 创建者筛选
-        if filters.get('creator'):
-            where_conditions.append('b.created_by = %s')
-            params.append(filters['creator'])
-
-        # 分配者筛选
-        if filters.get('assignee'):
-            where_conditions.append('b.assigned_to = %s')
-            params.append(filters['assignee'])
-
-        # 类型筛选
-        if filters.get('type'):
-            type_list = filters['type']
-            if type_list:
-                placeholders = ','.join(['%s'] * len(type_list))
-                where_conditions.append(f'b.type IN ({placeholders})')
-                params.extend(type_list)
-
-        # 组合查询
-        if where_conditions:
-            query = base_query + ' WHERE ' + ' AND '.join(where_conditions)
-        else:
-            query = base_query
-
-        # 执行查询
+        # 统计全部在数据库中按 GROUP BY 完成，只取回聚合结果
         conn = get_db_connection()
-        if DB_TYPE == 'postgres':
-            from psycopg2.extras import DictCursor
-            cursor = conn.cursor(cursor_factory=DictCursor)
-        else:
+        try:
             cursor = conn.cursor()
-
-        query, params = adapt_sql(query, params)
-        cursor.execute(query, params)
-
-        results = cursor.fetchall()
-        conn.close()
-
-        # 统计数据（只统计已完成的问题）
-        creator_stats = {'bug': {}, '需求': {}}  # 提交人统计（按类型分别统计）
-        assignee_stats = {'bug': {}, '需求': {}}  # 处理人统计（按类型分别统计）
-        type_stats = {}  # 类型统计
-
-        for row in results:
-            # 统一转换为字典格式
-            if DB_TYPE == 'postgres':
-                row_data = dict(row)
-            else:
-                if hasattr(row, 'keys'):
-                    row_data = dict(row)
-                else:
-                    # 兜底：普通tuple格式
-                    row_data = {
-                        'id': row[0],
-                        'title': row[1],
-                        'status': row[2],
-                        'type': row[3],
-                        'project': row[4],
-                        'created_at': row[5],
-                        'resolved_at': row[6],
-                        'creator_username': row[7],
-                        'creator_name': row[8],
-                        'assignee_username': row[9],
-                        'assignee_name': row[10],
-                        'creator_team': row[11],
-                        'assignee_team': row[12]
-                    }
-
-            # 获取问题类型
-            bug_type = row_data.get('type') or 'bug'
-
-            # 统计类型分布
-            type_stats[bug_type] = type_stats.get(bug_type, 0) + 1
-
-            # 只统计已完成状态的问题
-            if row_data.get('status') == '已完成' and row_data.get('resolved_at'):
-                # 统计提交人数据（按类型分别统计）
-                creator_name = row_data.get('creator_name') or row_data.get('creator_username') or '未知'
-                if bug_type not in creator_stats:
-                    creator_stats[bug_type] = {}
-                creator_stats[bug_type][creator_name] = creator_stats[bug_type].get(creator_name, 0) + 1
-
-                # 统计处理人数据（按类型分别统计）
-                assignee_name = row_data.get('assignee_name') or row_data.get('assignee_username') or '未分配'
-                if assignee_name != '未分配':
-                    if bug_type not in assignee_stats:
-                        assignee_stats[bug_type] = {}
-                    assignee_stats[bug_type][assignee_name] = assignee_stats[bug_type].get(assignee_name, 0) + 1
-
-        # 转换为图表数据格式（按类型分别统计）
-        creator_chart_data = {}
-        assignee_chart_data = {}
-
-        # 处理提交人统计数据
-        for bug_type, stats in creator_stats.items():
-            if stats:  # 只有当该类型有数据时才添加
-                creator_chart_data[bug_type] = {
-                    'labels': list(stats.keys()),
-                    'values': list(stats.values())
-                }
-
-        # 处理处理人统计数据
-        for bug_type, stats in assignee_stats.items():
-            if stats:  # 只有当该类型有数据时才添加
-                assignee_chart_data[bug_type] = {
-                    'labels': list(stats.keys()),
-                    'values': list(stats.values())
-                }
-
-        # 类型分布图表数据
-        type_chart_data = {
-            'labels': list(type_stats.keys()),
-            'values': list(type_stats.values())
-        }
-
-        chart_data = {
-            'creator': creator_chart_data,
-            'assignee': assignee_chart_data,
-            'type': type_chart_data
-        }
+            chart_data = report_query.ReportQuery(filters).chart_data(cursor)
+        finally:
+            conn.close()
 
         return jsonify({'success': True, 'data': chart_data})
 
@@ -5063,6 +5119,10 @@ def admin_reports_projects():
         app.logger.error(f"获取项目列表失败: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+def build_report_export_query(filters):
+    """根据报表筛选条件构建导出查询（已适配数据库），返回 (query, params)"""
+    return report_query.ReportQuery(filters).rows_query()
+
 @app.route('/admin/reports/export', methods=['POST'])
 @login_required
 @role_required('gly')
@@ -5076,383 +5136,196 @@ def admin_reports_export():
         format_type = data.get('format', 'excel')
         filename = data.get('filename', '问题列表报表')
 
-        # 获取完整数据（不限制条数）
-        conn = get_db_connection()
-        if DB_TYPE == 'postgres':
-            from psycopg2.extras import DictCursor
-            cursor = conn.cursor(cursor_factory=DictCursor)
-        else:
-            cursor = conn.cursor()
-
-        # 构建查询（与预览相同，但不限制条数）
-        base_query = '''
-            SELECT b.id, b.title, b.description, b.status, b.type, b.project,
-                   b.created_at, b.resolved_at, b.resolution, b.image_path,
-                   u1.username as creator_username, u1.chinese_name as creator_name,
-                   u2.username as assignee_username, u2.chinese_name as assignee_name,
-                   u2.team as assignee_team,
-                   u3.username as manager_username, u3.chinese_name as manager_name
-            FROM bugs b
-            LEFT JOIN users u1 ON b.created_by = u1.id
-            LEFT JOIN users u2 ON b.assigned_to = u2.id
-            LEFT JOIN users u3 ON u2.team = u3.team AND u3.role_en = 'fzr'
-        '''
+        if format_type not in report_export.EXTENSIONS:
+            return jsonify({'error': '不支持的导出格式'}), 400
 
-        # 添加筛选条件
-        where_conditions = []
-        params = []
-
-        # 日期范围筛选
-        if filters.get('dateRange'):
-            date_range = filters['dateRange']
-            if date_range.get('start'):
-                where_conditions.append('DATE(b.created_at) >= %s')
-                params.append(date_range['start'])
-            if date_range.get('end'):
-                where_conditions.append('DATE(b.created_at) <= %s')
-                params.append(date_range['end'])
-
-        # 状态筛选
-        if filters.get('status'):
-            status_list = filters['status']
-            if status_list:
-                placeholders = ','.join(['%s'] * len(status_list))
-                where_conditions.append(f'b.status IN ({placeholders})')
-                params.extend(status_list)
-
-        # 项目筛选
-        if filters.get('project'):
-            where_conditions.append('b.project = %s')
-            params.append(filters['project'])
-
-        # 创建者筛选
-        if filters.get('creator'):
-            where_conditions.append('b.created_by = %s')
-            params.append(filters['creator'])
-
-        # 分配者筛选
-        if filters.get('assignee'):
-            where_conditions.append('b.assigned_to = %s')
-            params.append(filters['assignee'])
-
-        # 类型筛选
-        if filters.get('type'):
-            type_list = filters['type']
-            if type_list:
-                placeholders = ','.join(['%s'] * len(type_list))
-                where_conditions.append(f'b.type IN ({placeholders})')
-                params.extend(type_list)
-
-        # 组合查询
-        if where_conditions:
-            query = base_query + ' WHERE ' + ' AND '.join(where_conditions)
-        else:
-            query = base_query
+        query, params = build_report_export_query(filters)
+        return stream_report_export(query, params, fields, filename, format_type)
 
-        query += ' ORDER BY b.created_at DESC'
+    except Exception as e:
+        app.logger.error(f"导出报表数据失败: {e}")
+        return jsonify({'error': '导出失败', 'message': str(e)}), 500
 
-        # 执行查询
-        query, params = adapt_sql(query, params)
+def _report_export_row(row_data):
+    """把报表查询的一行转换为导出字段（creator/assignee/manager/create_time等）"""
+    row_data['creator'] = row_data.get('creator_name') or row_data.get('creator_username') or '未知'
+    row_data['assignee'] = row_data.get('assignee_name') or row_data.get('assignee_username') or '未分配'
+    row_data['manager'] = row_data.get('manager_name') or row_data.get('manager_username') or '未分配'
+    row_data['create_time'] = report_export.cell_value(row_data.get('created_at'))
+    row_data['resolve_time'] = report_export.cell_value(row_data.get('resolved_at'))
+    # 产品线取负责人所在团队
+    row_data['team'] = row_data.get('assignee_team') or '暂无'
+    row_data['attachments'] = str(row_data.get('attachment_count') or 0)
+    return row_data
+
+def _iter_report_export_rows(query, params, transform=_report_export_row):
+    """通过服务器端游标逐批读取报表行，生成器结束（或客户端断开）时关闭连接"""
+    conn = get_db_connection()
+    try:
+        cursor = report_export.open_stream_cursor(conn)
         cursor.execute(query, params)
-        results = cursor.fetchall()
+        for row in report_export.iter_cursor_rows(cursor):
+            yield transform(row)
+        cursor.close()
+    finally:
         conn.close()
 
-        # 转换数据格式 - 兼容PostgreSQL和SQLite
-        export_data = []
-        assignee_usernames = set()  # 收集所有分配者用户名
-        bug_ids = []  # 收集所有bug ID，用于查询附件数量
-
-        for row in results:
-            # 统一转换为字典格式
-            if DB_TYPE == 'postgres':
-                # PostgreSQL DictCursor 返回字典风格的行
-                row_data = dict(row)
-            else:
-                # SQLite Row 对象（已设置row_factory = sqlite3.Row）
-                if hasattr(row, 'keys'):
-                    row_data = dict(row)
-                else:
-                    # 兜底：普通tuple格式
-                    row_data = {
-                        'id': row[0],
-                        'title': row[1],
-                        'description': row[2],
-                        'status': row[3],
-                        'project': row[4],
-                        'created_at': row[5],
-                        'resolved_at': row[6],
-                        'resolution': row[7],
-                        'image_path': row[8],
-                        'creator_username': row[9],
-                        'creator_name': row[10],
-                        'assignee_username': row[11],
-                        'assignee_name': row[12]
-                    }
-
-            # 添加前端需要的字段映射
-            row_data['creator'] = row_data.get('creator_name') or row_data.get('creator_username') or '未知'
-            row_data['assignee'] = row_data.get('assignee_name') or row_data.get('assignee_username') or '未分配'
-            row_data['manager'] = row_data.get('manager_name') or row_data.get('manager_username') or '未分配'
-
-            # 处理时间格式 - 转换为字符串格式
-            created_at = row_data.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'strftime'):
-                    # datetime对象，转换为字符串
-                    row_data['create_time'] = created_at.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    # 已经是字符串
-                    row_data['create_time'] = str(created_at)
-            else:
-                row_data['create_time'] = ''
-
-            resolved_at = row_data.get('resolved_at')
-            if resolved_at:
-                if hasattr(resolved_at, 'strftime'):
-                    # datetime对象，转换为字符串
-                    row_data['resolve_time'] = resolved_at.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    # 已经是字符串
-                    row_data['resolve_time'] = str(resolved_at)
-            else:
-                row_data['resolve_time'] = ''
-
-            # 默认产品线值
-            row_data['team'] = '暂无'
-
-            # 收集分配者用户名，用于后续查询团队信息
-            if row_data.get('assignee_username'):
-                assignee_usernames.add(row_data.get('assignee_username'))
-
-            # 收集bug ID，用于查询附件数量
-            if row_data.get('id'):
-                bug_ids.append(row_data.get('id'))
+def stream_report_export(query, params, fields, filename, format_type='excel', transform=_report_export_row):
+    """流式导出报表，内存占用与行数无关
 
-            # 附件数量（默认值，后续会更新）
-            row_data['attachments'] = '0'
-
-            export_data.append(row_data)
-
-        # 批量查询用户团队信息
-        if assignee_usernames:
-            try:
-                # 创建新的数据库连接
-                user_conn = get_db_connection()
-                if DB_TYPE == 'postgres':
-                    from psycopg2.extras import DictCursor
-                    user_cursor = user_conn.cursor(cursor_factory=DictCursor)
-                else:
-                    user_cursor = user_conn.cursor()
-
-                # 构建查询参数
-                placeholders = ', '.join(['%s'] * len(assignee_usernames))
-                user_query, user_params = adapt_sql(f"SELECT username, team FROM users WHERE username IN ({placeholders})", tuple(assignee_usernames))
-                user_cursor.execute(user_query, user_params)
-
-                # 创建用户名到团队的映射
-                user_teams = {}
-                team_results = user_cursor.fetchall()
-                app.logger.info(f"导出功能团队查询结果数量: {len(team_results)}")
-
-                for user_row in team_results:
-                    if DB_TYPE == 'postgres':
-                        username = user_row['username']
-                        team = user_row['team']
-                    else:
-                        if hasattr(user_row, 'keys'):
-                            user_dict = dict(user_row)
-                            username = user_dict['username']
-                            team = user_dict['team']
-                        else:
-                            username = user_row[0]
-                            team = user_row[1]
-
-                    user_teams[username] = team
-                    app.logger.info(f"导出功能用户团队映射: {username} -> {team}")
-
-                # 更新每条记录的团队信息
-                app.logger.info(f"用户团队映射: {user_teams}")
-                updated_count = 0
-                for row_data in export_data:
-                    assignee_username = row_data.get('assignee_username')
-                    app.logger.info(f"处理记录: ID={row_data.get('id')}, 分配者={assignee_username}")
-                    if assignee_username in user_teams and user_teams[assignee_username]:
-                        row_data['team'] = user_teams[assignee_username]
-                        updated_count += 1
-                        app.logger.info(f"  ✅ 更新产品线: {user_teams[assignee_username]}")
-                    else:
-                        app.logger.info(f"  ❌ 未找到产品线: {assignee_username}")
-
-                app.logger.info(f"共更新 {updated_count}/{len(export_data)} 条记录的产品线")
-
-                # 关闭连接
-                user_cursor.close()
-                user_conn.close()
-
-            except Exception as e:
-                app.logger.error(f"批量获取用户团队失败: {e}")
-                # 出错时保持默认值
-
-        # 批量查询附件数量
-        if bug_ids:
-            try:
-                app.logger.info(f"开始查询附件数量，bug数量: {len(bug_ids)}")
+    - csv：边读取边分块发送
+    - excel：write_only工作表写入临时文件后分块发送
+    """
+    from flask import Response
 
-                # 创建新的数据库连接
-                attachment_conn = get_db_connection()
-                if DB_TYPE == 'postgres':
-                    from psycopg2.extras import DictCursor
-                    attachment_cursor = attachment_conn.cursor(cursor_factory=DictCursor)
-                else:
-                    attachment_cursor = attachment_conn.cursor()
-
-                # 构建查询参数
-                placeholders = ', '.join(['%s'] * len(bug_ids))
-                attachment_query, attachment_params = adapt_sql(f"""
-                    SELECT bug_id, COUNT(*) as attachment_count
-                    FROM bug_images
-                    WHERE bug_id IN ({placeholders})
-                    GROUP BY bug_id
-                """, tuple(bug_ids))
-                attachment_cursor.execute(attachment_query, attachment_params)
-
-                # 创建bug ID到附件数量的映射
-                attachment_counts = {}
-                attachment_results = attachment_cursor.fetchall()
-                app.logger.info(f"附件查询结果数量: {len(attachment_results)}")
-
-                for attachment_row in attachment_results:
-                    if DB_TYPE == 'postgres':
-                        bug_id = attachment_row['bug_id']
-                        count = attachment_row['attachment_count']
-                    else:
-                        if hasattr(attachment_row, 'keys'):
-                            attachment_dict = dict(attachment_row)
-                            bug_id = attachment_dict['bug_id']
-                            count = attachment_dict['attachment_count']
-                        else:
-                            bug_id = attachment_row[0]
-                            count = attachment_row[1]
+    extension = report_export.EXTENSIONS[format_type]
+    rows = _iter_report_export_rows(query, params, transform)
 
-                    attachment_counts[bug_id] = count
-                    app.logger.info(f"Bug {bug_id} 附件数量: {count}")
+    if format_type == 'csv':
+        body = report_export.iter_csv(rows, fields)
+    else:
+        path = report_export.create_temp_path(f'.{extension}')
+        try:
+            started = time.time()
+            count = report_export.write_xlsx(rows, fields, path,
+                                             sheet_title='项目列表' if '项目列表' in filename else '问题列表')
+            app.logger.info(f"报表导出完成: {count} 行, 耗时 {time.time() - started:.2f} 秒")
+        except Exception:
+            os.remove(path)
+            raise
+        body = report_export.iter_file_chunks(path)
+
+    return Response(
+        body,
+        mimetype=report_export.MIMETYPES[format_type],
+        headers={
+            'Content-Disposition': report_export.content_disposition(filename, extension),
+            'Cache-Control': 'no-cache'
+        }
+    )
+
+# ==================== 后台导出任务 ====================
+
+PROJECT_EXPORT_FIELDS = [
+    {'key': 'name', 'label': '项目名称'},
+    {'key': 'type', 'label': '项目类型'},
+    {'key': 'city', 'label': '地市名称'},
+    {'key': 'start_date', 'label': '启动时间'},
+    {'key': 'factory_acceptance_date', 'label': '工厂验收时间'},
+    {'key': 'site_acceptance_date', 'label': '现场验收时间'},
+    {'key': 'practical_date', 'label': '实用化时间'},
+    {'key': 'description', 'label': '项目描述'},
+    {'key': 'created_at', 'label': '创建时间'}
+]
+
+def _report_export_source(params):
+    """问题列表报表的导出数据来源"""
+    query, query_params = build_report_export_query(params.get('filters') or {})
+    return {
+        'query': query,
+        'params': query_params,
+        'fields': params.get('fields') or [],
+        'transform': _report_export_row,
+        'sheet_title': '问题列表'
+    }
 
-                # 更新每条记录的附件数量
-                updated_attachment_count = 0
-                for row_data in export_data:
-                    bug_id = row_data.get('id')
-                    if bug_id in attachment_counts:
-                        row_data['attachments'] = str(attachment_counts[bug_id])
-                        updated_attachment_count += 1
+def _projects_export_source(params):
+    """项目列表的导出数据来源"""
+    query, query_params = adapt_sql(PROJECT_EXPORT_QUERY, ())
+    return {
+        'query': query,
+        'params': query_params,
+        'fields': PROJECT_EXPORT_FIELDS,
+        'transform': _project_export_row,
+        'sheet_title': '项目列表'
+    }
 
-                app.logger.info(f"更新了 {updated_attachment_count} 条记录的附件数量")
+export_jobs.register_export_kind('bug_report', _report_export_source)
+export_jobs.register_export_kind('projects', _projects_export_source)
+
+def _export_job_response(job, reused=False):
+    """导出任务的接口返回格式"""
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'format': job['format'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'total_rows': job['total_rows'],
+        'percent': job['percent'],
+        'file_size': job['file_size'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+        'expires_at': job['expires_at'],
+        'reused': reused,
+        'download_url': url_for('admin_export_job_download', job_id=job['id'])
+        if job['status'] == export_jobs.STATUS_DONE else None
+    }
 
-                # 关闭连接
-                attachment_cursor.close()
-                attachment_conn.close()
+@app.route('/admin/export-jobs', methods=['POST'])
+@login_required
+@role_required('gly')
+def admin_create_export_job():
+    """提交后台导出任务，立即返回任务ID；相同参数的未过期任务直接复用"""
+    try:
+        data = request.get_json() or {}
+        kind = data.get('kind', 'bug_report')
+        format_type = data.get('format', 'excel')
 
-            except Exception as e:
-                app.logger.error(f"批量获取附件数量失败: {e}")
-                import traceback
-                app.logger.error(f"详细错误: {traceback.format_exc()}")
-                # 出错时保持默认值
-
-        # 根据格式导出
-        if format_type == 'excel':
-            return export_to_excel(export_data, fields, filename)
+        if kind == 'bug_report':
+            params = {'filters': data.get('filters', {}), 'fields': data.get('fields', [])}
+            filename = data.get('filename', '问题列表报表')
+        elif kind == 'projects':
+            params = {}
+            filename = f"项目列表_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         else:
-            return jsonify({'error': '不支持的导出格式'}), 400
+            return jsonify({'success': False, 'message': f'不支持的导出类型: {kind}'}), 400
 
-    except Exception as e:
-        app.logger.error(f"导出报表数据失败: {e}")
-        return jsonify({'error': '导出失败', 'message': str(e)}), 500
+        if format_type not in report_export.EXTENSIONS:
+            return jsonify({'success': False, 'message': '不支持的导出格式'}), 400
 
-def export_to_excel(data, fields, filename):
-    """导出为Excel格式（使用openpyxl）"""
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from io import BytesIO
-
-        wb = Workbook()
-        ws = wb.active
-        # 根据文件名判断工作表标题
-        if '项目列表' in filename:
-            ws.title = "项目列表"
-        else:
-            ws.title = "问题列表"
-
-        # 设置表头样式
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-
-        # 写入表头
-        headers = [field.get('label', field.get('key', '')) for field in fields]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-
-        # 写入数据
-        for row_idx, row in enumerate(data, 2):
-            for col_idx, field in enumerate(fields, 1):
-                field_key = field.get('key')
-                value = row.get(field_key, '')
-                if value is None:
-                    value = ''
-                ws.cell(row=row_idx, column=col_idx, value=str(value))
-
-        # 自动调整列宽
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)  # 限制最大宽度
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # 保存到内存
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        # 返回文件
-        from flask import Response
-        import urllib.parse
-
-        # 处理中文文件名 - 使用RFC 5987标准
-        # 生成ASCII安全的文件名作为兜底
-        import re
-        ascii_filename = re.sub(r'[^a-zA-Z0-9\-_.]', '_', filename) + '.xlsx'
-        if ascii_filename == '.xlsx' or ascii_filename == '_.xlsx':
-            ascii_filename = 'bug_report.xlsx'  # 如果文件名全是特殊字符，使用默认名称
-
-        # UTF-8编码的完整文件名
-        encoded_filename = urllib.parse.quote(f'{filename}.xlsx'.encode('utf-8'))
-
-        # 创建响应
-        response = Response(
-            output.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={
-                'Content-Disposition': f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{encoded_filename}',
-                'Cache-Control': 'no-cache'
-            }
-        )
+        user = get_current_user()
+        result = export_jobs.export_job_manager.submit(
+            kind, params, format_type=format_type, filename=filename,
+            created_by=user['id'] if user else None, force=bool(data.get('force')))
 
-        return response
+        return jsonify({'success': True, 'job': _export_job_response(result['job'], result['reused'])})
 
-    except ImportError:
-        return jsonify({'error': 'Excel导出功能需要安装openpyxl库'}), 500
     except Exception as e:
-        app.logger.error(f"Excel导出失败: {e}")
-        return jsonify({'error': 'Excel导出失败', 'message': str(e)}), 500
+        app.logger.error(f"提交导出任务失败: {e}")
+        return jsonify({'success': False, 'message': f'提交导出任务失败: {str(e)}'}), 500
+
+@app.route('/admin/export-jobs/<int:job_id>', methods=['GET'])
+@login_required
+@role_required('gly')
+def admin_export_job_status(job_id):
+    """查询导出任务状态和进度"""
+    job = export_jobs.export_job_manager.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': '导出任务不存在或已过期'}), 404
+    return jsonify({'success': True, 'job': _export_job_response(job)})
+
+@app.route('/admin/export-jobs/<int:job_id>/download', methods=['GET'])
+@login_required
+@role_required('gly')
+def admin_export_job_download(job_id):
+    """下载已完成的导出文件"""
+    job = export_jobs.export_job_manager.get_job(job_id)
+    if not job or job['status'] != export_jobs.STATUS_DONE:
+        return jsonify({'success': False, 'message': '导出任务不存在或尚未完成'}), 404
+
+    file_path = job['file_path']
+    expires_at = datetime.strptime(job['expires_at'][:19], '%Y-%m-%d %H:%M:%S')
+    if expires_at < datetime.now() or not file_path or not os.path.exists(file_path):
+        return jsonify({'success': False, 'message': '导出文件已过期，请重新导出'}), 410
+
+    extension = report_export.EXTENSIONS[job['format']]
+    response = send_from_directory(os.path.dirname(file_path), os.path.basename(file_path),
+                                   mimetype=report_export.MIMETYPES[job['format']])
+    response.headers['Content-Disposition'] = report_export.content_disposition(job['filename'], extension)
+    return response
 
 
 
@@ -5495,6 +5368,10 @@ if __name__ == '__main__':
         from notification.cleanup_manager import cleanup_manager
         cleanup_manager.start_cleanup_scheduler(interval_hours=24)  # 每24小时清理一次
 
+        # 启动通知发件箱（投递重启前未发送的通知）
+        from notification.outbox import start_inprocess_worker
+        start_inprocess_worker()
+
         print(f"📡 应用程序将在 http://{HOST}:{PORT} 启动")
         app.run(host=HOST, port=PORT, debug=True, use_reloader=False)
     except KeyboardInterrupt:
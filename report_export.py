@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+报表流式导出
+按批从服务器端游标读取数据并逐批写出，内存占用与导出行数无关：
+- CSV：边查询边发送
+- Excel：openpyxl write_only 工作表写入临时文件，完成后按块发送
+列宽根据前 REPORT_EXPORT_WIDTH_SAMPLE 行估算，不再遍历全部单元格
+"""
+
+import os
+import re
+import csv
+import io
+import uuid
+import logging
+import tempfile
+import urllib.parse
+from datetime import datetime, date
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from config import DB_TYPE
+
+logger = logging.getLogger(__name__)
+
+# 服务器端游标每次读取的行数
+FETCH_SIZE = int(os.getenv('REPORT_EXPORT_FETCH_SIZE', '1000'))
+# 估算列宽使用的样本行数
+WIDTH_SAMPLE_ROWS = int(os.getenv('REPORT_EXPORT_WIDTH_SAMPLE', '200'))
+# 响应分块大小（字节）
+CHUNK_SIZE = 64 * 1024
+# 列宽上限（与原导出一致）
+MAX_COLUMN_WIDTH = 50
+
+MIMETYPES = {
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+EXTENSIONS = {'excel': 'xlsx', 'csv': 'csv'}
+
+
+def open_stream_cursor(conn):
+    """打开用于导出的游标
+
+    PostgreSQL使用命名（服务器端）游标，每次只向客户端传输itersize行；
+    SQLite游标本身按步读取，fetchmany不会一次载入全部结果
+    """
+    if DB_TYPE == 'postgres':
+        from psycopg2.extras import DictCursor
+        cursor = conn.cursor(name=f'report_export_{uuid.uuid4().hex[:12]}', cursor_factory=DictCursor)
+        cursor.itersize = FETCH_SIZE
+        return cursor
+    return conn.cursor()
+
+
+def iter_cursor_rows(cursor, fetch_size: int = FETCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """按fetch_size分批读取游标，逐行返回字典"""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row) if hasattr(row, 'keys') else row
+
+
+def cell_value(value: Any) -> Any:
+    """单元格取值：数字保持数字，时间格式化为字符串，空值为空字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def estimate_widths(headers: List[str], sample_rows: List[Dict[str, Any]], keys: List[str]) -> List[int]:
+    """根据表头和样本行估算列宽"""
+    widths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for index, key in enumerate(keys):
+            widths[index] = max(widths[index], len(str(cell_value(row.get(key)))))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_xlsx(rows: Iterable[Dict[str, Any]], fields: List[Dict[str, str]], path: str,
+               sheet_title: str = '问题列表', sample_size: int = WIDTH_SAMPLE_ROWS) -> int:
+    """以write_only模式把rows写入path，返回数据行数"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    keys = [field.get('key') for field in fields]
+    headers = [field.get('label', field.get('key', '')) for field in fields]
+
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    # write_only工作表必须在写入行之前设置列宽
+    for index, width in enumerate(estimate_widths(headers, sample, keys), 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    count = 0
+    for row in chain(sample, rows):
+        ws.append([cell_value(row.get(key)) for key in keys])
+        count += 1
+
+    wb.save(path)
+    return count
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], fields: List[Dict[str, str]],
+             chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """逐行生成CSV（UTF-8 BOM，Excel可直接打开），按chunk_size聚合后输出"""
+    keys = [field.get('key') for field in fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([field.get('label', field.get('key', '')) for field in fields])
+    for row in rows:
+        writer.writerow([cell_value(row.get(key)) for key in keys])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_csv(rows: Iterable[Dict[str, Any]], fields: List[Dict[str, str]], path: str) -> int:
+    """把rows写入CSV文件，返回数据行数"""
+    count = 0
+
+    def _counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with open(path, 'wb') as f:
+        for chunk in iter_csv(_counted(), fields):
+            f.write(chunk)
+    return count
+
+
+def iter_file_chunks(path: str, chunk_size: int = CHUNK_SIZE, delete: bool = True) -> Iterator[bytes]:
+    """按块读取文件，读取完成（或客户端断开）后删除临时文件"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+    finally:
+        if delete:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除临时导出文件失败 {path}: {e}")
+
+
+def create_temp_path(suffix: str) -> str:
+    """创建临时文件路径（写入完成后由iter_file_chunks删除）"""
+    fd, path = tempfile.mkstemp(prefix='rebugtracker_export_', suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def content_disposition(filename: str, extension: str, fallback: str = 'bug_report') -> str:
+    """生成下载文件名头：ASCII文件名兜底 + RFC 5987 UTF-8文件名"""
+    ascii_filename = re.sub(r'[^a-zA-Z0-9\-_.]', '_', filename) + f'.{extension}'
+    if ascii_filename in (f'.{extension}', f'_.{extension}'):
+        ascii_filename = f'{fallback}.{extension}'
+    encoded_filename = urllib.parse.quote(f'{filename}.{extension}'.encode('utf-8'))
+    return f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{encoded_filename}'
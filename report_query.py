@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+报表查询构建
+报表预览、图表和导出共用同一套筛选条件：ReportQuery把筛选条件编译一次，
+再生成明细查询（预览/导出）或 GROUP BY 聚合查询（图表），图表数据不再把每条问题取回Python统计。
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import bug_stats
+from sql_adapter import adapt_sql
+
+# 明细查询：负责人团队、所在团队负责人和附件数量在同一条查询中取得
+ROWS_SELECT = '''
+    SELECT b.id, b.title, b.description, b.status, b.type, b.project,
+           b.created_at, b.resolved_at, b.resolution, b.image_path,
+           u1.username as creator_username, u1.chinese_name as creator_name,
+           u2.username as assignee_username, u2.chinese_name as assignee_name,
+           u2.team as assignee_team,
+           u3.username as manager_username, u3.chinese_name as manager_name,
+           (SELECT COUNT(*) FROM bug_images bi WHERE bi.bug_id = b.id) as attachment_count
+    FROM bugs b
+    LEFT JOIN users u1 ON b.created_by = u1.id
+    LEFT JOIN users u2 ON b.assigned_to = u2.id
+    LEFT JOIN users u3 ON u2.team = u3.team AND u3.role_en = 'fzr'
+'''
+
+# 聚合查询只关联提交人和处理人（不关联负责人，避免一个团队多个负责人时重复计数）
+AGGREGATE_FROM = '''
+    FROM bugs b
+    LEFT JOIN users u1 ON b.created_by = u1.id
+    LEFT JOIN users u2 ON b.assigned_to = u2.id
+'''
+
+# 聚合维度 -> SQL表达式（空字符串与NULL同样处理，与原Python统计的 `or` 默认值一致）
+DIMENSIONS = {
+    'status': "b.status",
+    'type': "COALESCE(NULLIF(b.type, ''), 'bug')",
+    'team': "COALESCE(NULLIF(u2.team, ''), '暂无')",
+    'day': "DATE(b.created_at)",
+    'creator': "COALESCE(NULLIF(u1.chinese_name, ''), NULLIF(u1.username, ''), '未知')",
+    'assignee': "COALESCE(NULLIF(u2.chinese_name, ''), NULLIF(u2.username, ''), '未分配')",
+}
+
+# 已完成的问题（提交人/处理人统计只统计已完成的问题）
+COMPLETED_CONDITIONS = ("b.status = '已完成'", "b.resolved_at IS NOT NULL")
+# 每日统计汇总表可以直接回答的筛选条件（其余条件需要查询bugs表）
+ROLLUP_FILTERS = ('dateRange', 'status', 'type')
+
+# 有处理人
+ASSIGNED_CONDITION = "COALESCE(NULLIF(u2.chinese_name, ''), NULLIF(u2.username, '')) IS NOT NULL"
+
+
+def compile_filters(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    """把报表筛选条件编译为 WHERE 条件和参数（%s占位符，执行前由adapt_sql适配）"""
+    conditions = []
+    params = []
+
+    # 日期范围筛选：半开区间 [start, end+1天)，不对created_at套函数，可以使用created_at索引
+    date_range = filters.get('dateRange') or {}
+    if date_range.get('start'):
+        conditions.append('b.created_at >= %s')
+        params.append(_parse_date(date_range['start']).strftime('%Y-%m-%d'))
+    if date_range.get('end'):
+        conditions.append('b.created_at < %s')
+        params.append((_parse_date(date_range['end']) + timedelta(days=1)).strftime('%Y-%m-%d'))
+
+    # 状态筛选
+    if filters.get('status'):
+        placeholders = ','.join(['%s'] * len(filters['status']))
+        conditions.append(f'b.status IN ({placeholders})')
+        params.extend(filters['status'])
+
+    # 项目筛选
+    if filters.get('project'):
+        conditions.append('b.project = %s')
+        params.append(filters['project'])
+
+    # 创建者筛选
+    if filters.get('creator'):
+        conditions.append('b.created_by = %s')
+        params.append(filters['creator'])
+
+    # 分配者筛选
+    if filters.get('assignee'):
+        conditions.append('b.assigned_to = %s')
+        params.append(filters['assignee'])
+
+    # 类型筛选
+    if filters.get('type'):
+        placeholders = ','.join(['%s'] * len(filters['type']))
+        conditions.append(f'b.type IN ({placeholders})')
+        params.extend(filters['type'])
+
+    return conditions, params
+
+
+def _parse_date(value: str) -> date:
+    """解析前端传入的日期（YYYY-MM-DD，允许带时间部分）"""
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class ReportQuery:
+    """编译一次筛选条件，生成报表的明细查询和聚合查询"""
+
+    def __init__(self, filters: Optional[Dict[str, Any]] = None):
+        self.filters = filters or {}
+        self.conditions, self.params = compile_filters(self.filters)
+
+    def uses_rollup(self) -> bool:
+        """筛选条件只包含日期范围、状态和类型时，可以从bug_daily_stats读取按日期/状态/类型的计数"""
+        return all(not value for key, value in self.filters.items() if key not in ROLLUP_FILTERS)
+
+    def rollup_counts(self, cursor, dimension: str) -> List[Tuple[Any, int]]:
+        """从bug_daily_stats按维度（day/status/type）计数"""
+        date_range = self.filters.get('dateRange') or {}
+        start = _parse_date(date_range['start']).strftime('%Y-%m-%d') if date_range.get('start') else None
+        end = _parse_date(date_range['end']).strftime('%Y-%m-%d') if date_range.get('end') else None
+        rows = bug_stats.group_counts(cursor, dimension, start, end,
+                                      self.filters.get('status') or (), self.filters.get('type') or ())
+        return [(_label(label), total) for label, total in rows]
+
+    def _where(self, extra_conditions: Sequence[str] = ()) -> str:
+        conditions = list(self.conditions) + list(extra_conditions)
+        return ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+    def rows_query(self, limit: Optional[int] = None) -> Tuple[str, Any]:
+        """明细查询（按创建时间倒序），返回适配后的 (query, params)"""
+        query = ROWS_SELECT + self._where() + ' ORDER BY b.created_at DESC'
+        params = list(self.params)
+        if limit:
+            query += ' LIMIT %s'
+            params.append(limit)
+        return adapt_sql(query, params)
+
+    def group_query(self, dimensions: Sequence[str], extra_conditions: Sequence[str] = ()) -> Tuple[str, Any]:
+        """按dimensions分组计数，按数量倒序，返回适配后的 (query, params)"""
+        expressions = [DIMENSIONS[dimension] for dimension in dimensions]
+        select = ', '.join(f'{expression} AS {dimension}' for dimension, expression in zip(dimensions, expressions))
+        query = (f'SELECT {select}, COUNT(*) AS total' + AGGREGATE_FROM + self._where(extra_conditions)
+                 + f" GROUP BY {', '.join(expressions)} ORDER BY total DESC, {', '.join(expressions)}")
+        return adapt_sql(query, list(self.params))
+
+    def group_counts(self, cursor, dimensions: Sequence[str],
+                     extra_conditions: Sequence[str] = ()) -> List[Tuple[Any, ...]]:
+        """执行分组计数，返回 [(维度值..., 数量)]"""
+        query, params = self.group_query(dimensions, extra_conditions)
+        cursor.execute(query, params)
+        rows = [tuple(row) for row in cursor.fetchall()]
+        return [tuple(_label(value) for value in row[:-1]) + (row[-1],) for row in rows]
+
+    def chart_data(self, cursor) -> Dict[str, Any]:
+        """报表图表数据（全部由GROUP BY计算，不取回问题明细）
+
+        - type/status/team/day/assignee_total：按维度的问题数量
+          （筛选条件允许时type/status/day读取每日统计汇总表）
+        - creator/assignee：已完成问题按类型分别统计的提交人/处理人数量
+        """
+        data = {}
+        use_rollup = self.uses_rollup()
+        for dimension in ('type', 'status', 'team', 'day'):
+            if use_rollup and dimension != 'team':
+                data[dimension] = _series(self.rollup_counts(cursor, dimension))
+            else:
+                data[dimension] = _series(self.group_counts(cursor, [dimension]))
+        data['assignee_total'] = _series(self.group_counts(cursor, ['assignee'], [ASSIGNED_CONDITION]))
+        # 按日期的趋势按日期升序排列
+        day_points = sorted(zip(data['day']['labels'], data['day']['values']))
+        data['day'] = {'labels': [point[0] for point in day_points], 'values': [point[1] for point in day_points]}
+
+        data['creator'] = _series_by_type(self.group_counts(cursor, ['type', 'creator'], COMPLETED_CONDITIONS))
+        data['assignee'] = _series_by_type(self.group_counts(
+            cursor, ['type', 'assignee'], COMPLETED_CONDITIONS + (ASSIGNED_CONDITION,)))
+        return data
+
+
+def _label(value: Any) -> Any:
+    """维度值统一为字符串（PostgreSQL的DATE返回date对象）"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _series(rows: List[Tuple[Any, ...]]) -> Dict[str, list]:
+    return {'labels': [row[0] for row in rows], 'values': [row[1] for row in rows]}
+
+
+def _series_by_type(rows: List[Tuple[Any, ...]]) -> Dict[str, Dict[str, list]]:
+    """[(类型, 名称, 数量)] -> {类型: {'labels': [...], 'values': [...]}}"""
+    result: Dict[str, Dict[str, list]] = {}
+    for bug_type, name, total in rows:
+        series = result.setdefault(bug_type, {'labels': [], 'values': []})
+        series['labels'].append(name)
+        series['values'].append(total)
+    return result
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+请求级结构化日志
+- 每个请求分配request_id（沿用合法的X-Request-ID请求头，否则新生成），
+  日志记录自动带上request_id/user_id/path，响应头返回X-Request-ID
+- log_event：结构化日志（事件名 + key=value字段），级别未启用时不格式化任何字段
+- log_sampled：高频日志按 LOG_SAMPLE_EVERY 采样，每N条记录1条
+- DEBUG_LOGGING关闭时（生产默认，跟随FLASK_DEBUG）调试日志路径完全关闭：
+  log_debug()直接返回；参数需要计算的调试日志在调用点用 `if DEBUG_LOGGING:` 包住
+"""
+
+import os
+import re
+import uuid
+import logging
+import threading
+import itertools
+from typing import Any, Dict
+
+from config_adapter import FLASK_DEBUG
+
+# 调试日志开关（未设置时跟随FLASK_DEBUG）
+DEBUG_LOGGING = os.getenv('DEBUG_LOGGING', 'true' if FLASK_DEBUG else 'false').lower() == 'true'
+# 高频日志的采样间隔：每N条记录1条
+LOG_SAMPLE_EVERY = max(1, int(os.getenv('LOG_SAMPLE_EVERY', '100')))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# 接受外部传入的请求ID（如nginx的$request_id），只允许安全字符
+_REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{8,64}')
+
+LOG_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s [req=%(request_id)s user=%(user_id)s]: %(message)s'
+
+
+def log_debug(logger: logging.Logger, msg: str, *args: Any) -> None:
+    """调试日志：DEBUG_LOGGING关闭时直接返回，不检查日志级别、不格式化参数"""
+    if DEBUG_LOGGING:
+        logger.debug(msg, *args)
+
+
+class _Fields:
+    """key=value字段，只有在日志真正输出时才格式化"""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return ' '.join(f'{key}={value!r}' if isinstance(value, str) and ' ' in value else f'{key}={value}'
+                        for key, value in self.fields.items())
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """结构化日志：`事件名 key=value ...`，级别未启用时直接返回"""
+    if logger.isEnabledFor(level):
+        logger.log(level, '%s %s', event, _Fields(fields))
+
+
+class _Sampler:
+    """按key计数的采样器（itertools.count的next在GIL下是原子的）"""
+
+    def __init__(self):
+        self._counters: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, every: int):
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, itertools.count())
+        seen = next(counter) + 1
+        return (seen - 1) % every == 0, seen
+
+
+_sampler = _Sampler()
+
+
+def log_sampled(logger: logging.Logger, level: int, key: str, msg: str, *args: Any, every: int = 0) -> None:
+    """高频日志采样：同一key每every条（默认LOG_SAMPLE_EVERY）只输出第1条，并附上累计条数"""
+    if not logger.isEnabledFor(level):
+        return
+    every = every or LOG_SAMPLE_EVERY
+    hit, seen = _sampler.hit(key, every)
+    if hit:
+        if every > 1:
+            logger.log(level, msg + ' (sampled 1/%d, total %d)', *args, every, seen)
+        else:
+            logger.log(level, msg, *args)
+
+
+def current_request_id() -> str:
+    """当前请求ID（不在请求上下文中时返回'-'）"""
+    from flask import g, has_request_context
+    if has_request_context():
+        return g.get('request_id', '-')
+    return '-'
+
+
+class RequestContextFilter(logging.Filter):
+    """给日志记录添加request_id、user_id和path字段"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from flask import g, has_request_context, request
+        if has_request_context():
+            record.request_id = g.get('request_id', '-')
+            user = g.get('current_user')
+            record.user_id = user['id'] if user else '-'
+            record.path = request.path
+        else:
+            record.request_id = record.user_id = record.path = '-'
+        return True
+
+
+def _assign_request_id():
+    from flask import g, request
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = incoming if _REQUEST_ID_PATTERN.fullmatch(incoming) else uuid.uuid4().hex[:16]
+
+
+def _add_request_id_header(response):
+    from flask import g
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers.setdefault(REQUEST_ID_HEADER, request_id)
+    return response
+
+
+def init_app(app) -> None:
+    """注册请求ID钩子，并让Flask默认日志处理器输出请求上下文字段"""
+    from flask.logging import default_handler
+
+    app.before_request(_assign_request_id)
+    app.after_request(_add_request_id_header)
+
+    context_filter = RequestContextFilter()
+    default_handler.addFilter(context_filter)
+    default_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    # 通知模块等使用模块级logger，经根logger输出；给根logger已有的处理器加上同样的字段（不修改其格式）
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(context_filter)
+    if DEBUG_LOGGING:
+        app.logger.setLevel(logging.DEBUG)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+数据库结构版本与迁移
+- schema_version表记录已执行的迁移（版本号、说明、执行时间）
+- run_migrations() 先读取当前版本，已是最新时直接返回（启动时只有这一次查询）；
+  否则按版本号顺序执行未执行的迁移，每个迁移成功后立即记录版本号，失败时停止并抛出异常，
+  下次启动从失败的迁移继续
+- PostgreSQL下用advisory lock保证多个进程同时启动时只有一个执行迁移
+- 迁移定义为 (版本号, 说明, 函数)，函数接收数据库游标；
+  已发布的迁移不再修改，新增表、字段、索引或数据修正时追加新的版本号
+"""
+
+from typing import Any, Callable, List, Sequence, Tuple
+
+from config import DB_TYPE
+from sql_adapter import adapt_sql
+
+Migration = Tuple[int, str, Callable[[Any], None]]
+
+# PostgreSQL advisory lock的键（任意固定值，同一数据库内唯一即可）
+MIGRATION_LOCK_ID = 7209450112
+
+
+def _create_version_table(cursor) -> None:
+    """创建schema_version表（SQLite和PostgreSQL通用）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def get_schema_version(conn, cursor) -> int:
+    """当前数据库版本（schema_version表不存在时为0）"""
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        row = cursor.fetchone()
+    except Exception:
+        # 表不存在：PostgreSQL非autocommit模式下需要回滚失败的语句
+        conn.rollback()
+        return 0
+    return int(row[0] or 0)
+
+
+def run_migrations(conn, cursor, migrations: Sequence[Migration]) -> List[int]:
+    """执行未执行的迁移
+
+    Args:
+        conn: 数据库连接
+        cursor: 数据库游标（迁移函数使用同一个游标）
+        migrations: 按版本号升序排列的迁移列表
+
+    Returns:
+        list: 本次执行的版本号（已是最新版本时为空列表）
+    """
+    versions = [version for version, _, _ in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError(f"迁移版本号必须唯一且按升序排列: {versions}")
+    if not migrations or get_schema_version(conn, cursor) >= versions[-1]:
+        return []
+
+    if DB_TYPE == 'postgres':
+        cursor.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_ID,))
+    applied = []
+    try:
+        _create_version_table(cursor)
+        conn.commit()
+        # 持锁后重新读取，其他进程可能刚执行完迁移
+        current = get_schema_version(conn, cursor)
+        for version, description, migrate in migrations:
+            if version <= current:
+                continue
+            try:
+                migrate(cursor)
+                query, params = adapt_sql('INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                                          (version, description))
+                cursor.execute(query, params)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"❌ 数据库迁移 {version}（{description}）失败")
+                raise
+            applied.append(version)
+            print(f"已执行数据库迁移 {version}: {description}")
+        return applied
+    finally:
+        if DB_TYPE == 'postgres':
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_ID,))
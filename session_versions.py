@@ -0,0 +1,63 @@
+# session_versions.py: 登录会话的用户版本校验
+# 签名会话中的用户快照带有登录时的users.session_version；修改角色/团队/密码时版本加1，删除用户时行不存在，
+# 旧快照随即失效。每个进程缓存各用户的当前版本，最多每CHECK_INTERVAL秒按主键查询一次，
+# 因此其他进程/gunicorn worker感知用户变更的延迟有上限，本进程的修改通过invalidate立即生效
+
+import os
+import time
+import threading
+
+from sql_adapter import adapt_sql
+
+# 重新查询用户版本的间隔（秒），即其他进程中旧会话失效的最大延迟
+CHECK_INTERVAL = float(os.getenv('SESSION_VERSION_CHECK_INTERVAL', '5'))
+
+# 用户不存在（已删除）
+MISSING = object()
+
+
+class SessionVersionCache:
+    """users.session_version的进程内缓存"""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, user_id):
+        """用户当前的会话版本；用户不存在时返回MISSING"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(user_id)
+        if cached is not None and now - cached[1] < self.check_interval:
+            return cached[0]
+
+        version = self._load(user_id)
+        with self._lock:
+            self._versions[user_id] = (version, now)
+        return version
+
+    def invalidate(self, user_id=None):
+        """本进程立即失效（不传user_id时全部失效）"""
+        with self._lock:
+            if user_id is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(user_id, None)
+
+    def _load(self, user_id):
+        from db_factory import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql('SELECT session_version FROM users WHERE id = %s', (user_id,))
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return MISSING if row is None else int(row[0] or 0)
+        finally:
+            conn.close()
+
+
+# 全局缓存实例
+session_versions = SessionVersionCache()
@@ -0,0 +1,175 @@
+# system_config_cache.py: system_config表的进程内缓存，提供按类型读取的配置项
+# 整张表一次加载到内存（配置项只有几十条），在TTL内直接从内存读取
+# 写入配置时更新版本行(config_version)，其他进程/gunicorn worker最多每VERSION_CHECK_INTERVAL秒
+# 查询一次版本行，发现变化后重新加载，因此跨进程的配置陈旧时间有上限
+
+import os
+import time
+import uuid
+import logging
+import threading
+
+from sql_adapter import adapt_sql
+
+logger = logging.getLogger(__name__)
+
+# 版本行的配置键，每次写入system_config后更新为新值
+CONFIG_VERSION_KEY = 'config_version'
+# 整表重新加载的周期（秒）
+CACHE_TTL = int(os.getenv('SYSTEM_CONFIG_CACHE_TTL', '60'))
+# 检查版本行的间隔（秒），即其他进程感知配置变化的最大延迟
+VERSION_CHECK_INTERVAL = float(os.getenv('SYSTEM_CONFIG_VERSION_CHECK_INTERVAL', '5'))
+
+_TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+
+class SystemConfigCache:
+    """system_config缓存
+
+    - get / get_bool / get_int: 按类型读取单个配置项，缺失或无法解析时返回默认值
+    - get_prefix: 读取某个前缀下的全部配置项
+    - invalidate: 本进程立即失效，下次读取时重新加载
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, version_check_interval: float = VERSION_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._stats = {'loads': 0, 'version_checks': 0, 'hits': 0}
+
+    # ---------- 读取 ----------
+
+    def get(self, key, default=None):
+        """读取字符串配置"""
+        value = self._snapshot().get(key)
+        return default if value is None else value
+
+    def get_bool(self, key, default=False):
+        """读取布尔配置（'true'/'1'/'yes'/'on' 为真）"""
+        value = self._snapshot().get(key)
+        if value is None:
+            return default
+        return str(value).strip().lower() in _TRUE_VALUES
+
+    def get_int(self, key, default=0):
+        """读取整数配置"""
+        value = self._snapshot().get(key)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid integer config {key}={value!r}, using default {default}")
+            return default
+
+    def get_prefix(self, prefix):
+        """读取前缀下的全部配置，返回 {config_key: config_value}"""
+        return {key: value for key, value in self._snapshot().items() if key.startswith(prefix)}
+
+    @property
+    def generation(self):
+        """本进程的加载次数，每次重新加载后递增，可用于判断派生配置是否需要重建"""
+        self._snapshot()
+        return self._stats['loads']
+
+    # ---------- 失效 ----------
+
+    def invalidate(self):
+        """使本进程的缓存立即失效"""
+        with self._lock:
+            self._loaded_at = 0.0
+            self._checked_at = 0.0
+
+    def get_stats(self):
+        """缓存统计"""
+        with self._lock:
+            return dict(self._stats, keys=len(self._values or {}), version=self._version,
+                        age_seconds=round(time.monotonic() - self._loaded_at, 1) if self._values is not None else None)
+
+    # ---------- 内部实现 ----------
+
+    def _snapshot(self):
+        """返回当前配置字典，必要时检查版本或重新加载"""
+        now = time.monotonic()
+        with self._lock:
+            if self._values is not None and now - self._loaded_at < self.ttl:
+                if now - self._checked_at < self.version_check_interval:
+                    self._stats['hits'] += 1
+                    return self._values
+                try:
+                    self._checked_at = now
+                    self._stats['version_checks'] += 1
+                    if self._read_version() == self._version:
+                        return self._values
+                except Exception as e:
+                    logger.error(f"Failed to check system config version: {e}")
+                    return self._values
+
+            try:
+                self._load(now)
+            except Exception as e:
+                if self._values is None:
+                    raise
+                # 数据库暂时不可用时继续使用旧配置，避免每次调用都重试
+                logger.error(f"Failed to reload system config, keeping cached values: {e}")
+                self._loaded_at = self._checked_at = now
+            return self._values
+
+    def _load(self, now):
+        from db_factory import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT config_key, config_value FROM system_config')
+            values = {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        self._values = values
+        self._version = values.get(CONFIG_VERSION_KEY)
+        self._loaded_at = self._checked_at = now
+        self._stats['loads'] += 1
+        logger.debug(f"Loaded {len(values)} system config values (version {self._version})")
+
+    def _read_version(self):
+        from db_factory import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            query, params = adapt_sql('SELECT config_value FROM system_config WHERE config_key = %s',
+                                      (CONFIG_VERSION_KEY,))
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+
+def bump_config_version(cursor):
+    """在写入system_config的同一事务中更新版本行，通知其他进程重新加载
+
+    调用方提交事务后还应调用 system_config.invalidate() 使本进程立即生效
+    """
+    version = uuid.uuid4().hex
+    query, params = adapt_sql('''
+        UPDATE system_config SET config_value = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE config_key = %s
+    ''', (version, CONFIG_VERSION_KEY))
+    cursor.execute(query, params)
+    if cursor.rowcount == 0:
+        query, params = adapt_sql('''
+            INSERT INTO system_config (config_key, config_value, description)
+            VALUES (%s, %s, %s)
+        ''', (CONFIG_VERSION_KEY, version, '配置版本（写入配置时更新，用于通知各进程刷新缓存）'))
+        cursor.execute(query, params)
+    return version
+
+
+# 全局缓存实例
+system_config = SystemConfigCache()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后台导出任务（export_jobs模块和 /admin/export-jobs 接口）
+使用临时SQLite数据库和临时上传目录，校验进度、复用、下载和过期清理
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'export_jobs_test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmp_dir, 'uploads')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+os.environ['EXPORT_JOB_PROGRESS_EVERY'] = '200'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import rebugtracker
+import export_jobs
+from db_factory import get_db_connection
+from app_helpers import login_client
+
+BUG_COUNT = 1500
+FIELDS = [{'key': 'id', 'label': 'ID'}, {'key': 'title', 'label': '标题'}, {'key': 'status', 'label': '状态'}]
+
+
+def _seed():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.executemany('INSERT INTO bugs (title, description, status, created_at) VALUES (?, ?, ?, ?)',
+                  [(f'任务导出{i}', '描述', '待处理' if i % 2 else '已解决', '2024-03-01 08:00:00') for i in range(BUG_COUNT)])
+    c.executemany("INSERT INTO projects (name, type, city, created_at) VALUES (?, '类型', ?, '2024-03-01 08:00:00')",
+                  [(f'项目{i}', f'城市{i}') for i in range(5)])
+    conn.commit()
+    conn.close()
+
+
+def _wait(client, job_id, timeout=30):
+    """轮询任务状态直到结束"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = json.loads(client.get(f'/admin/export-jobs/{job_id}').data)['job']
+        if job['status'] not in ('pending', 'running'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f'export job {job_id} did not finish')
+
+
+def test_submit_and_download(client):
+    """提交任务立即返回，生成完成后可下载"""
+    print("🧪 测试提交和下载...")
+    from openpyxl import load_workbook
+
+    payload = {'kind': 'bug_report', 'filters': {'status': ['待处理']}, 'fields': FIELDS, 'filename': '待处理问题'}
+    result = json.loads(client.post('/admin/export-jobs', json=payload).data)
+    assert result['success'] and not result['job']['reused'], result
+    job = _wait(client, result['job']['id'])
+    assert job['status'] == 'done' and job['percent'] == 100, job
+    assert job['total_rows'] == BUG_COUNT // 2 and job['progress'] == BUG_COUNT // 2
+    assert job['file_size'] > 0
+
+    response = client.get(job['download_url'])
+    assert response.status_code == 200
+    assert "filename*=UTF-8''%E5%BE%85" in response.headers['Content-Disposition']
+    rows = list(load_workbook(io.BytesIO(response.data), read_only=True).active.iter_rows(values_only=True))
+    response.close()
+    assert len(rows) == BUG_COUNT // 2 + 1 and rows[0] == ('ID', '标题', '状态')
+    assert os.path.dirname(job_file(job['id'])) == export_jobs.get_exports_folder()
+    print(f"✅ 导出{job['progress']}行，文件{job['file_size']}字节")
+    return job
+
+
+def job_file(job_id):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('SELECT file_path FROM export_jobs WHERE id = ?', (job_id,))
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def test_reuse(client, job):
+    """相同参数复用已生成的文件，force时重新生成，不同格式单独生成"""
+    print("🧪 测试复用...")
+    payload = {'kind': 'bug_report', 'filters': {'status': ['待处理']}, 'fields': FIELDS, 'filename': '待处理问题'}
+    reused = json.loads(client.post('/admin/export-jobs', json=payload).data)['job']
+    assert reused['reused'] and reused['id'] == job['id'] and reused['download_url']
+
+    forced = json.loads(client.post('/admin/export-jobs', json=dict(payload, force=True)).data)['job']
+    assert forced['id'] != job['id']
+    _wait(client, forced['id'])
+
+    csv_job = json.loads(client.post('/admin/export-jobs', json=dict(payload, format='csv')).data)['job']
+    assert not csv_job['reused']
+    csv_job = _wait(client, csv_job['id'])
+    text = client.get(csv_job['download_url']).data.decode('utf-8-sig')
+    assert len(text.strip().splitlines()) == BUG_COUNT // 2 + 1
+    print("✅ 复用正常")
+
+
+def test_projects_and_failure(client):
+    """项目列表导出，以及数据来源出错时任务失败"""
+    print("🧪 测试项目导出和失败任务...")
+    job = _wait(client, json.loads(client.post('/admin/export-jobs', json={'kind': 'projects'}).data)['job']['id'])
+    assert job['status'] == 'done' and job['progress'] == 5
+
+    def _broken(params):
+        raise RuntimeError('数据来源不可用')
+
+    export_jobs.register_export_kind('broken', _broken)
+    result = export_jobs.export_job_manager.submit('broken', {})
+    failed = _wait(client, result['job']['id'])
+    assert failed['status'] == 'failed' and '数据来源不可用' in failed['error'], failed
+
+    response = client.post('/admin/export-jobs', json={'kind': 'unknown'})
+    assert response.status_code == 400
+    print("✅ 项目导出和失败任务正常")
+
+
+def test_expiry(client, job):
+    """过期任务的文件和记录被清理，下载返回404"""
+    print("🧪 测试过期清理...")
+    path = job_file(job['id'])
+    assert os.path.exists(path)
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("UPDATE export_jobs SET expires_at = '2000-01-01 00:00:00' WHERE id = ?", (job['id'],))
+    conn.commit()
+    conn.close()
+
+    assert client.get(job['download_url']).status_code == 410
+    assert export_jobs.export_job_manager.purge_expired() >= 1
+    assert not os.path.exists(path)
+    assert client.get(job['download_url']).status_code == 404
+    print("✅ 过期清理正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    _seed()
+    client = login_client('admin', 'admin')
+    job = test_submit_and_download(client)
+    test_reuse(client, job)
+    test_projects_and_failure(client)
+    test_expiry(client, job)
+    export_jobs.export_job_manager.stop()
+    print("🎉 后台导出任务测试全部通过")
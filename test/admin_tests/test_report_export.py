@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 /admin/reports/export 的流式导出（report_export模块）
+使用临时SQLite数据库，校验Excel/CSV内容、列宽估算和内存上限
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import tempfile
+import tracemalloc
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'report_export_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import rebugtracker
+import report_export
+from db_factory import get_db_connection
+from app_helpers import login_client
+
+BUG_COUNT = 2500
+FIELDS = [
+    {'key': 'id', 'label': 'ID'},
+    {'key': 'title', 'label': '标题'},
+    {'key': 'assignee', 'label': '处理人'},
+    {'key': 'team', 'label': '产品线'},
+    {'key': 'attachments', 'label': '附件数'},
+    {'key': 'create_time', 'label': '创建时间'},
+]
+
+
+def _seed():
+    """创建负责人、组内成员和问题，每3个问题中有1个带两张附件"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES ('export_fzr', 'x', '负责人', 'fzr', '网络分析', '负责人甲')")
+    c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES ('export_zncy', 'x', '组内成员', 'zncy', '网络分析', '成员乙')")
+    assignee_id = c.lastrowid
+    bugs = [(f'导出问题{i}', '描述', '待处理', assignee_id, f'2024-01-01 00:{i % 60:02d}:00') for i in range(BUG_COUNT)]
+    c.executemany('INSERT INTO bugs (title, description, status, assigned_to, created_at) VALUES (?, ?, ?, ?, ?)', bugs)
+    c.execute('SELECT id FROM bugs ORDER BY id')
+    bug_ids = [row[0] for row in c.fetchall()]
+    images = [(bug_id, f'uploads/{bug_id}_{n}.png') for bug_id in bug_ids[::3] for n in range(2)]
+    c.executemany('INSERT INTO bug_images (bug_id, image_path) VALUES (?, ?)', images)
+    conn.commit()
+    conn.close()
+
+
+def test_excel_export(client):
+    """Excel导出包含全部行、团队和附件数量，列宽来自样本"""
+    print("🧪 测试Excel流式导出...")
+    from openpyxl import load_workbook
+
+    response = client.post('/admin/reports/export', json={'filters': {}, 'fields': FIELDS, 'filename': '问题列表报表'})
+    assert response.status_code == 200
+    assert response.mimetype == report_export.MIMETYPES['excel']
+    assert 'filename*=UTF-8' in response.headers['Content-Disposition']
+
+    wb = load_workbook(io.BytesIO(response.data), read_only=True)
+    ws = wb['问题列表']
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == tuple(field['label'] for field in FIELDS)
+    assert len(rows) == BUG_COUNT + 1
+    with_images = [row for row in rows[1:] if row[4] == '2']
+    assert len(with_images) == (BUG_COUNT + 2) // 3, len(with_images)
+    assert all(row[2] == '成员乙' and row[3] == '网络分析' for row in rows[1:])
+    print(f"✅ 导出{len(rows) - 1}行")
+
+
+def test_csv_export(client):
+    """CSV导出分块发送，内容与Excel一致"""
+    print("🧪 测试CSV流式导出...")
+    response = client.post('/admin/reports/export', json={'filters': {}, 'fields': FIELDS, 'format': 'csv', 'filename': 'bugs'},
+                           buffered=False)
+    assert response.mimetype == 'text/csv'
+    chunks = list(response.iter_encoded())
+    response.close()
+    assert len(chunks) > 1, len(chunks)
+
+    text = b''.join(chunks).decode('utf-8-sig')
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == [field['label'] for field in FIELDS]
+    assert len(rows) == BUG_COUNT + 1
+    print(f"✅ CSV分{len(chunks)}块发送")
+
+    data = json.loads(client.post('/admin/reports/export', json={'filters': {}, 'fields': FIELDS, 'format': 'pdf'}).data)
+    assert data['error'] == '不支持的导出格式'
+
+
+def test_bounded_memory():
+    """write_xlsx的内存峰值不随行数增长"""
+    print("🧪 测试导出内存占用...")
+
+    def _rows(count):
+        for i in range(count):
+            yield {'id': i, 'title': f'问题标题{i}' * 3, 'assignee': '成员乙', 'team': '网络分析',
+                   'attachments': '0', 'create_time': '2024-01-01 00:00:00'}
+
+    peaks = []
+    for count in (2000, 20000):
+        path = report_export.create_temp_path('.xlsx')
+        tracemalloc.start()
+        assert report_export.write_xlsx(_rows(count), FIELDS, path, sample_size=50) == count
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        os.remove(path)
+    assert peaks[1] < peaks[0] * 2, peaks
+    print(f"✅ 2000行峰值{peaks[0] // 1024}KB，20000行峰值{peaks[1] // 1024}KB")
+
+
+def test_sample_widths():
+    """列宽只由表头和样本决定，且不超过上限"""
+    widths = report_export.estimate_widths(['ID', '标题'], [{'id': 1, 'title': 'x' * 80}], ['id', 'title'])
+    assert widths == [4, report_export.MAX_COLUMN_WIDTH]
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    _seed()
+    client = login_client('admin', 'admin')
+    test_excel_export(client)
+    test_csv_export(client)
+    test_bounded_memory()
+    test_sample_widths()
+    print("🎉 报表导出测试全部通过")
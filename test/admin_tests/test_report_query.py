@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报表查询构建（report_query模块）和 /admin/reports/preview、/admin/reports/chart-data 接口
+使用临时SQLite数据库，校验筛选条件和 GROUP BY 聚合结果
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'report_query_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import rebugtracker
+import report_query
+import bug_stats
+from db_factory import get_db_connection
+from app_helpers import login_client
+
+
+def _seed():
+    """两个团队的处理人、一个提交人，30个问题（每3个中1个已完成，每5个中1个为需求）"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES ('rq_ssz', 'x', '实施组', 'ssz', '', '提交人甲')")
+    creator_id = c.lastrowid
+    c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES ('rq_a', 'x', '组内成员', 'zncy', '网络分析', '成员甲')")
+    member_a = c.lastrowid
+    c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES ('rq_b', 'x', '组内成员', 'zncy', '实时数据', '')")
+    member_b = c.lastrowid
+    bugs = []
+    for i in range(30):
+        done = i % 3 == 0
+        bugs.append((
+            f'统计问题{i}', '描述', '已完成' if done else '待处理', '需求' if i % 5 == 0 else None,
+            creator_id, member_a if i % 2 else (member_b if i % 4 else None),
+            f'2024-02-{i % 3 + 1:02d} 10:00:00', '2024-02-10 10:00:00' if done else None,
+        ))
+    c.executemany('INSERT INTO bugs (title, description, status, type, created_by, assigned_to, created_at, resolved_at) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', bugs)
+    c.execute('SELECT id FROM bugs ORDER BY id LIMIT 1')
+    c.execute('INSERT INTO bug_images (bug_id, image_path) VALUES (?, ?)', (c.fetchone()[0], 'uploads/a.png'))
+    # 直接写入bugs表后重建每日统计汇总
+    bug_stats.rebuild(c)
+    conn.commit()
+    conn.close()
+    return bugs
+
+
+def _expected(bugs, key, rows=None):
+    counts = {}
+    for bug in rows if rows is not None else bugs:
+        counts[key(bug)] = counts.get(key(bug), 0) + 1
+    return counts
+
+
+def test_compile_filters():
+    """筛选条件只编译一次，参数顺序与条件一致"""
+    print("🧪 测试筛选条件编译...")
+    conditions, params = report_query.compile_filters({
+        'dateRange': {'start': '2024-02-01', 'end': ''}, 'status': ['已完成', '待处理'], 'type': ['需求']})
+    assert len(conditions) == 3 and params == ['2024-02-01', '已完成', '待处理', '需求'], (conditions, params)
+    # 日期范围为半开区间，created_at不被函数包裹
+    conditions, params = report_query.compile_filters({'dateRange': {'start': '2024-02-28', 'end': '2024-02-29'}})
+    assert conditions == ['b.created_at >= %s', 'b.created_at < %s'] and params == ['2024-02-28', '2024-03-01']
+    assert report_query.compile_filters({}) == ([], [])
+    query, _ = report_query.ReportQuery({'project': 'x'}).group_query(['team'])
+    assert 'GROUP BY' in query and '?' in query
+    print("✅ 筛选条件编译正常")
+
+
+def test_chart_data(client, bugs):
+    """图表数据与逐行统计结果一致"""
+    print("🧪 测试图表聚合...")
+    result = json.loads(client.post('/admin/reports/chart-data', json={'filters': {}}).data)
+    assert result['success'], result
+    data = result['data']
+
+    as_dict = lambda series: dict(zip(series['labels'], series['values']))
+    assert as_dict(data['type']) == _expected(bugs, lambda b: b[3] or 'bug')
+    assert as_dict(data['status']) == _expected(bugs, lambda b: b[2])
+    assert data['day']['labels'] == ['2024-02-01', '2024-02-02', '2024-02-03']
+    assert sum(data['day']['values']) == len(bugs)
+    assert sum(data['team']['values']) == len(bugs) and '暂无' in data['team']['labels']
+    # 未分配的问题不计入处理人统计；没有中文名时使用用户名
+    assert set(data['assignee_total']['labels']) == {'成员甲', 'rq_b'}
+
+    done = [b for b in bugs if b[2] == '已完成']
+    assert as_dict(data['creator']['bug']) == {'提交人甲': len([b for b in done if not b[3]])}
+    assert as_dict(data['creator']['需求']) == {'提交人甲': len([b for b in done if b[3]])}
+    assigned_done = [b for b in done if b[5]]
+    assert sum(sum(series['values']) for series in data['assignee'].values()) == len(assigned_done)
+    print(f"✅ 图表聚合正常: {data['status']}")
+
+
+def test_filtered_chart_and_preview(client, bugs):
+    """筛选条件同时作用于预览和图表"""
+    print("🧪 测试筛选后的预览和图表...")
+    filters = {'status': ['已完成'], 'dateRange': {'start': '2024-02-02', 'end': '2024-02-02'}}
+    chart = json.loads(client.post('/admin/reports/chart-data', json={'filters': filters}).data)['data']
+    assert chart['day']['labels'] == [] and chart['type']['values'] == []
+
+    filters = {'status': ['已完成'], 'dateRange': {'start': '2024-02-01', 'end': '2024-02-01'}}
+    chart = json.loads(client.post('/admin/reports/chart-data', json={'filters': filters}).data)['data']
+    assert chart['day'] == {'labels': ['2024-02-01'], 'values': [len([b for b in bugs if b[2] == '已完成'])]}
+
+    preview = json.loads(client.post('/admin/reports/preview', json={'filters': filters, 'fields': []}).data)
+    assert preview['success'] and preview['count'] == chart['day']['values'][0]
+    first = [row for row in preview['data'] if row['title'] == '统计问题0'][0]
+    assert first['attachments'] == '1' and first['team'] == '暂无' and first['assignee'] == '未分配'
+    assert first['create_time'] == '2024-02-01 10:00:00' and first['creator'] == '提交人甲'
+    assert all(row['team'] in ('网络分析', '实时数据', '暂无') for row in preview['data'])
+    print(f"✅ 预览{preview['count']}条，与图表一致")
+
+
+def test_date_range_boundaries(client):
+    """结束日期当天的最后一秒包含在内，次日零点不包含；日期条件可以使用created_at索引"""
+    print("🧪 测试日期范围边界...")
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.executemany("INSERT INTO bugs (title, description, status, created_at) VALUES (?, '描述', '待处理', ?)",
+                  [('边界问题0', '2024-05-01 00:00:00'), ('边界问题1', '2024-05-01 23:59:59'),
+                   ('边界问题2', '2024-05-02 00:00:00')])
+    bug_stats.rebuild(c)
+    conn.commit()
+
+    filters = {'dateRange': {'start': '2024-05-01', 'end': '2024-05-01'}}
+    preview = json.loads(client.post('/admin/reports/preview', json={'filters': filters, 'fields': []}).data)
+    assert sorted(row['title'] for row in preview['data']) == ['边界问题0', '边界问题1'], preview['data']
+
+    query, params = report_query.ReportQuery(filters).group_query(['status'])
+    c.execute('EXPLAIN QUERY PLAN ' + query, params)
+    plan = ' '.join(str(row[-1]) for row in c.fetchall())
+    conn.close()
+    assert 'created_at>' in plan, plan
+    print(f"✅ 日期范围边界正常，执行计划: {plan}")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    bugs = _seed()
+    client = login_client('admin', 'admin')
+    test_compile_filters()
+    test_chart_data(client, bugs)
+    test_filtered_chart_and_preview(client, bugs)
+    test_date_range_boundaries(client)
+    print("🎉 报表查询测试全部通过")
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+测试脚本共用的用户准备和登录辅助函数
+测试脚本先设置DB_TYPE、SQLITE_DB_PATH等环境变量并导入rebugtracker，再从本模块导入；
+本模块在函数内导入rebugtracker，导入本模块本身不会按默认配置加载应用
+"""
+
+import json
+
+# seed_users创建的测试用户的默认密码
+TEST_PASSWORD = 'pw'
+
+
+def seed_users(users, password=TEST_PASSWORD):
+    """插入测试用户并同步user_teams，返回 {用户名: 用户ID}
+
+    Args:
+        users: [(用户名, 中文名, 角色, 角色英文, 团队)]
+    """
+    from werkzeug.security import generate_password_hash
+
+    import rebugtracker
+    from db_factory import get_db_connection
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    ids = {}
+    for username, chinese_name, role, role_en, team in users:
+        c.execute('INSERT INTO users (username, chinese_name, password, role, role_en, team) VALUES (?, ?, ?, ?, ?, ?)',
+                  (username, chinese_name, generate_password_hash(password), role, role_en, team))
+        ids[username] = c.lastrowid
+        rebugtracker.sync_user_teams(c, c.lastrowid, team)
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def login_client(username, password=TEST_PASSWORD):
+    """登录并返回Flask测试客户端（登录失败时断言失败）"""
+    import rebugtracker
+
+    client = rebugtracker.app.test_client()
+    result = json.loads(client.post('/login', data={'username': username, 'password': password}).data)
+    assert result['success'], result
+    return client
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试通知清理的分块窗口函数删除、试运行和吞吐量统计
+使用临时SQLite数据库，不依赖运行中的服务
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'cleanup_chunked_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+from db_factory import get_db_connection
+from system_config_cache import system_config, bump_config_version
+from notification.cleanup_manager import NotificationCleanupManager
+
+MAX_PER_USER = 10
+# 用户ID -> 通知数量
+USER_COUNTS = {1: 5, 2: 40, 3: 11, 4: 250}
+
+
+def _seed():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('DELETE FROM notifications')
+    base = datetime.now() - timedelta(days=5)
+    rows = []
+    for user_id, count in USER_COUNTS.items():
+        for i in range(count):
+            rows.append((user_id, f'通知{i}', '内容', (base + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')))
+    # 过期通知（用户5，早于保留期）
+    old = (datetime.now() - timedelta(days=60)).strftime('%Y-%m-%d %H:%M:%S')
+    rows.extend((5, f'旧通知{i}', '内容', old) for i in range(30))
+    c.executemany('INSERT INTO notifications (user_id, title, content, created_at) VALUES (?, ?, ?, ?)', rows)
+    for key, value in {'notification_max_per_user': str(MAX_PER_USER), 'notification_retention_days': '30'}.items():
+        c.execute('INSERT OR REPLACE INTO system_config (config_key, config_value) VALUES (?, ?)', (key, value))
+    bump_config_version(c)
+    conn.commit()
+    conn.close()
+    system_config.invalidate()
+
+
+def _counts():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('SELECT user_id, COUNT(*), MIN(title) FROM notifications GROUP BY user_id')
+    result = {row[0]: row[1] for row in c.fetchall()}
+    conn.close()
+    return result
+
+
+def test_dry_run():
+    """试运行只统计不删除"""
+    print("🧪 测试试运行...")
+    _seed()
+    manager = NotificationCleanupManager(chunk_size=16, chunk_pause=0)
+    excess = manager.cleanup_excess_notifications(dry_run=True)
+    expired = manager.cleanup_expired_notifications(dry_run=True)
+    assert excess['would_delete'] == 30 + 1 + 240 + 20 and excess['affected_users'] == 4, excess
+    assert expired['would_delete'] == 30
+    assert _counts()[4] == 250
+    print("✅ 试运行正常")
+
+
+def test_chunked_excess_cleanup():
+    """分块删除后每个用户只保留最新的MAX_PER_USER条"""
+    print("🧪 测试分块清理超量通知...")
+    _seed()
+    manager = NotificationCleanupManager(chunk_size=16, chunk_pause=0)
+    result = manager.cleanup_excess_notifications()
+    assert result['total_deleted'] == 291, result
+    # 250条的用户需要多个块
+    assert result['chunks'] > 291 // 16, result
+
+    counts = _counts()
+    assert counts == {1: 5, 2: 10, 3: 10, 4: 10, 5: 10}, counts
+
+    # 保留的是最新的通知
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SELECT MIN(title) FROM notifications WHERE user_id = 4")
+    assert c.fetchone()[0] == '通知240'
+    conn.close()
+
+    stats = manager.get_cleanup_stats()
+    assert stats['excess_count'] == 0
+    assert stats['last_runs']['excess']['deleted'] == 291
+    print(f"✅ 删除{result['total_deleted']}条，{result['chunks']}块，{result['rows_per_second']}行/秒")
+
+
+def test_chunked_expired_cleanup():
+    """分块删除过期通知"""
+    print("🧪 测试分块清理过期通知...")
+    _seed()
+    manager = NotificationCleanupManager(chunk_size=7, chunk_pause=0)
+    result = manager.cleanup_expired_notifications()
+    assert result['deleted_count'] == 30 and result['chunks'] == 5, result
+    assert 5 not in _counts()
+    print("✅ 分块清理过期通知正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    test_dry_run()
+    test_chunked_excess_cleanup()
+    test_chunked_expired_cleanup()
+    print("🎉 分块清理测试全部通过")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试问题每日统计汇总表（bug_stats模块）
+使用临时SQLite数据库，走完提交、指派、确认、解决、闭环、驳回、删除流程，
+每一步校验增量维护的汇总表与全量重建结果一致，并校验看板接口读取汇总表，
+以及PostgreSQL下减去旧贡献前按固定顺序锁定问题行和处理人行
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'bug_daily_stats_test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmp_dir, 'uploads')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import rebugtracker
+import bug_stats
+from db_factory import get_db_connection
+from app_helpers import seed_users, login_client
+
+USERS = [
+    # (用户名, 中文名, 角色, 角色英文, 团队)
+    ('stats_ssz', '实施甲', '实施组', 'ssz', '实施组'),
+    ('stats_fzr', '负责人甲', '负责人', 'fzr', '网络分析'),
+    ('stats_zncy', '成员甲', '组内成员', 'zncy', '网络分析'),
+    ('stats_pm', '产品甲', '产品经理', 'pm', '网络分析'),
+]
+
+
+def _snapshot():
+    """汇总表中计数非零的行"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('SELECT day, team, product_line_id, status, type, bug_count FROM bug_daily_stats WHERE bug_count <> 0')
+    rows = sorted(tuple(row) for row in c.fetchall())
+    conn.close()
+    return rows
+
+
+def _assert_consistent(step):
+    """增量维护的结果与全量重建一致"""
+    incremental = _snapshot()
+    conn = get_db_connection()
+    c = conn.cursor()
+    bug_stats.rebuild(c)
+    conn.commit()
+    conn.close()
+    rebuilt = _snapshot()
+    assert incremental == rebuilt, (step, incremental, rebuilt)
+    print(f"✅ {step}: 汇总表与重建结果一致（{len(rebuilt)} 行）")
+
+
+def _status_counts(teams=None):
+    conn = get_db_connection()
+    c = conn.cursor()
+    counts = bug_stats.status_counts(c, teams)
+    conn.close()
+    return counts
+
+
+def test_lifecycle(ids):
+    """提交 -> 指派 -> 确认 -> 解决 -> 闭环；另一个问题驳回后删除"""
+    print("🧪 测试问题生命周期增量维护...")
+    ssz, fzr, zncy = login_client('stats_ssz'), login_client('stats_fzr'), login_client('stats_zncy')
+
+    bug_ids = []
+    for i in range(2):
+        result = json.loads(ssz.post('/bug/submit', data={
+            'title': f'统计问题{i}', 'description': '描述', 'manager': '负责人甲', 'type': '需求' if i else 'bug'}).data)
+        assert result['success'], result
+        bug_ids.append(result['bug_id'])
+    _assert_consistent('提交')
+    assert _status_counts() == {'待处理': 2}
+    assert _status_counts(['网络分析']) == {'待处理': 2}
+
+    assert json.loads(fzr.post(f'/bug/assign/{bug_ids[0]}', data={'assigned_to': ids['stats_zncy']}).data)['success']
+    _assert_consistent('指派')
+    assert json.loads(zncy.post(f'/bug/confirm/{bug_ids[0]}').data)['success']
+    _assert_consistent('确认接收')
+    assert json.loads(zncy.post(f'/bug/resolve/{bug_ids[0]}', data={'resolution': '已修复'}).data)['success']
+    _assert_consistent('解决')
+    assert json.loads(ssz.post(f'/bug/complete/{bug_ids[0]}').data)['success']
+    _assert_consistent('闭环')
+
+    assert json.loads(fzr.post(f'/bug/reject/{bug_ids[1]}', data={'reject_reason': '重复问题'}).data)['success']
+    _assert_consistent('驳回')
+    assert _status_counts() == {'已完成': 1, '已驳回': 1}
+    # 驳回后清除了处理人，不再计入团队
+    assert _status_counts(['网络分析']) == {'已完成': 1}
+
+    assert json.loads(ssz.post(f'/bug/delete/{bug_ids[1]}').data)['success']
+    _assert_consistent('删除')
+    assert _status_counts() == {'已完成': 1}
+    return bug_ids[0]
+
+
+def test_team_change(ids, bug_id):
+    """处理人调整团队后，其问题的团队计数随之移动"""
+    print("🧪 测试处理人团队变化...")
+    admin = login_client('admin', 'admin')
+    response = admin.put(f"/admin/users/{ids['stats_zncy']}", json={
+        'username': 'stats_zncy', 'chinese_name': '成员甲', 'role': '组内成员', 'team': '网络分析,实时数据'})
+    assert json.loads(response.data)['success']
+    _assert_consistent('调整团队')
+    assert _status_counts(['实时数据']) == {'已完成': 1}
+    assert _status_counts() == {'已完成': 1}
+
+
+def test_dashboards(ids):
+    """看板接口读取汇总表"""
+    print("🧪 测试看板接口...")
+    ssz = login_client('stats_ssz')
+    json.loads(ssz.post('/bug/submit', data={'title': '待处理问题', 'description': '描述', 'manager': '负责人甲'}).data)
+
+    admin = login_client('admin', 'admin')
+    rebugtracker.invalidate_team_stats_cache()
+    data = json.loads(admin.get('/api/team-statistics').data)
+    assert data['success']
+    team = data['data']['网络分析']['bugStats']
+    assert team == {'total': 2, 'pending': 1, 'processing': 0, 'resolved': 0}, team
+
+    html = admin.get('/admin').data.decode('utf-8')
+    assert 'id="completedBugs" data-total="1"' in html and 'id="pendingBugs" data-total="1"' in html
+    bugs = json.loads(admin.get('/admin/bugs').data)
+    assert bugs['pagination']['total'] == 2
+
+    pm = login_client('stats_pm')
+    stats = json.loads(pm.get('/api/product-manager/statistics').data)['data']
+    assert stats == {'total': 2, 'pending': 1, 'processing': 0, 'resolved': 0, 'closed': 1}, stats
+
+    chart = json.loads(admin.post('/admin/reports/chart-data', json={'filters': {'status': ['已完成', '待处理']}}).data)
+    assert chart['success'] and sorted(chart['data']['status']['labels']) == ['已完成', '待处理']
+    print("✅ 看板接口正常")
+
+
+def test_team_stats_cache_generation():
+    """查询团队统计期间缓存被失效时，查询结果不写入缓存"""
+    print("🧪 测试团队统计缓存失效...")
+    admin = login_client('admin', 'admin')
+    original = rebugtracker.load_team_statistics
+
+    def load_then_invalidate(c):
+        result = original(c)
+        # 模拟查询期间其他请求修改了问题
+        rebugtracker.invalidate_team_stats_cache()
+        return result
+
+    rebugtracker.invalidate_team_stats_cache()
+    rebugtracker.load_team_statistics = load_then_invalidate
+    try:
+        assert 'cached' not in json.loads(admin.get('/api/team-statistics').data)
+    finally:
+        rebugtracker.load_team_statistics = original
+    assert 'cached' not in json.loads(admin.get('/api/team-statistics').data)
+    assert json.loads(admin.get('/api/team-statistics').data)['cached']
+    print("✅ 团队统计缓存失效正常")
+
+
+class _RecordingCursor:
+    """只记录执行的SQL"""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append(' '.join(query.split()))
+
+    def fetchall(self):
+        return []
+
+
+def test_postgres_row_locks():
+    """PostgreSQL下remove_*先锁问题行再锁用户行，SQLite下不加锁"""
+    print("🧪 测试并发修改加锁...")
+    cursor = _RecordingCursor()
+    bug_stats.remove_bugs(cursor, [3])
+    assert not any('FOR UPDATE' in sql or 'FOR SHARE' in sql for sql in cursor.statements)
+
+    previous = bug_stats.DB_TYPE
+    bug_stats.DB_TYPE = 'postgres'
+    try:
+        cursor = _RecordingCursor()
+        bug_stats.remove_bugs(cursor, [3, 1])
+        bug_stats.add_bugs(cursor, [3, 1])
+        lock_bugs, lock_users, remove, lock_new_users, add = cursor.statements
+        assert lock_bugs.startswith('SELECT b.id FROM bugs b') and lock_bugs.endswith('ORDER BY b.id FOR UPDATE')
+        assert lock_users.startswith('SELECT u.id FROM users u') and lock_users.endswith('FOR SHARE')
+        assert remove.startswith('INSERT INTO bug_daily_stats') and lock_new_users == lock_users
+
+        cursor = _RecordingCursor()
+        bug_stats.remove_assignee(cursor, 5)
+        lock_bugs, lock_user, remove = cursor.statements
+        assert 'b.assigned_to' in lock_bugs and lock_bugs.endswith('FOR UPDATE')
+        assert lock_user.startswith('SELECT id FROM users') and lock_user.endswith('FOR UPDATE')
+    finally:
+        bug_stats.DB_TYPE = previous
+    print("✅ 并发修改加锁正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    ids = seed_users(USERS)
+    bug_id = test_lifecycle(ids)
+    test_team_change(ids, bug_id)
+    test_dashboards(ids)
+    test_team_stats_cache_generation()
+    test_postgres_row_locks()
+    print("🎉 问题每日统计测试全部通过")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库连接池（SQLite线程复用模式）
+使用临时数据库，不依赖运行中的服务
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'pool_test.db')
+os.environ['DB_POOL_ENABLED'] = 'true'
+os.environ['DB_POOL_MAX_USES'] = '3'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from db_factory import get_db_connection, get_pool_stats
+
+
+def test_same_thread_reuse():
+    """同一线程多次获取连接应复用同一个底层连接"""
+    print("🧪 测试同线程连接复用...")
+    conn1 = get_db_connection()
+    raw1 = conn1._entry.conn
+    conn1.close()
+
+    conn2 = get_db_connection()
+    raw2 = conn2._entry.conn
+    conn2.close()
+
+    assert raw1 is raw2, "同一线程应复用连接"
+    print("✅ 同线程复用正常")
+
+
+def test_uncommitted_rolled_back():
+    """归还连接时未提交的事务应被回滚"""
+    print("🧪 测试归还时回滚未提交事务...")
+    conn = get_db_connection()
+    conn.execute("CREATE TABLE IF NOT EXISTS pool_t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.commit()
+    conn.execute("INSERT INTO pool_t (v) VALUES ('uncommitted')")
+    conn.close()
+
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM pool_t").fetchone()[0]
+    conn.close()
+    assert count == 0, f"未提交的数据不应保留，实际 {count} 行"
+    print("✅ 未提交事务已回滚")
+
+
+def test_nested_checkout():
+    """嵌套获取连接时内层close不应回滚外层事务"""
+    print("🧪 测试嵌套获取连接...")
+    outer = get_db_connection()
+    outer.execute("INSERT INTO pool_t (v) VALUES ('outer')")
+
+    inner = get_db_connection()
+    inner.execute("SELECT 1").fetchone()
+    inner.close()
+
+    outer.commit()
+    outer.close()
+
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM pool_t WHERE v = 'outer'").fetchone()[0]
+    conn.close()
+    assert count == 1, "外层事务写入丢失"
+    print("✅ 嵌套获取正常")
+
+
+def test_recycle_after_max_uses():
+    """连接达到最大使用次数后应重建"""
+    print("🧪 测试连接回收重建...")
+    before = get_pool_stats()['recycled']
+    for _ in range(4):
+        get_db_connection().close()
+    after = get_pool_stats()['recycled']
+    assert after > before, "达到max_uses后应重建连接"
+    print(f"✅ 已回收 {after - before} 个连接")
+
+
+def test_per_thread_connections():
+    """不同线程使用各自的连接"""
+    print("🧪 测试多线程连接隔离...")
+    raws = []
+    errors = []
+
+    def worker():
+        try:
+            conn = get_db_connection()
+            conn.execute("SELECT COUNT(*) FROM pool_t").fetchone()
+            raws.append(id(conn._entry.conn))
+            conn.close()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, f"线程内使用连接失败: {errors}"
+    print("✅ 多线程使用正常")
+
+
+if __name__ == '__main__':
+    test_same_thread_reuse()
+    test_uncommitted_rolled_back()
+    test_nested_checkout()
+    test_recycle_after_max_uses()
+    test_per_thread_connections()
+    print(f"📊 连接池统计: {get_pool_stats()}")
+    print("🎉 连接池测试全部通过")
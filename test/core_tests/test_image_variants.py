@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试图片附件变体（image_variants模块）
+使用临时SQLite数据库和上传目录，校验上传后后台生成缩略图/中图、?size= 访问与缓存、
+旧上传按需生成、非图片和损坏图片回退原文件、JPEG变体去除透明通道，以及清理无引用文件时删除变体
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+UPLOAD_DIR = os.path.join(_tmp_dir, 'uploads')
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'image_variants_test.db')
+os.environ['UPLOAD_FOLDER'] = UPLOAD_DIR
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+from PIL import Image
+
+import rebugtracker
+import image_variants
+import upload_store
+from db_factory import get_db_connection
+from app_helpers import seed_users, login_client
+
+USERS = [
+    # (用户名, 中文名, 角色, 角色英文, 团队)
+    ('img_ssz', '实施丙', '实施组', 'ssz', '网络分析'),
+    ('img_fzr', '负责人丙', '负责人', 'fzr', '网络分析'),
+]
+
+
+def _png_bytes(size=(2000, 1500), mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _image_size(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size, image.format
+
+
+def test_variants_generated_on_upload():
+    """上传后后台线程生成缩略图和中图，?size= 返回缓存的变体"""
+    print("🧪 测试上传后生成变体...")
+    ssz = login_client('img_ssz')
+    screenshot = _png_bytes()
+    result = json.loads(ssz.post('/bug/submit', data={
+        'title': '截图问题', 'description': '描述', 'manager': '负责人丙',
+        'images': [(io.BytesIO(screenshot), 'screen.png')],
+    }, content_type='multipart/form-data').data)
+    assert result['success'], result
+    assert image_variants.variant_worker.wait_idle(10)
+
+    sha256 = hashlib.sha256(screenshot).hexdigest()
+    for size in image_variants.VARIANT_SIZES:
+        assert os.path.exists(image_variants.variant_path(UPLOAD_DIR, sha256, size)), size
+
+    fmt = image_variants.variant_format().upper()
+    thumb = ssz.get(f'/uploads/{sha256}.png?size=thumb')
+    assert thumb.status_code == 200 and thumb.mimetype == image_variants.variant_mimetype()
+    assert thumb.cache_control.max_age == 31536000
+    assert _image_size(thumb.data) == ((320, 240), fmt)
+    medium = ssz.get(f'/uploads/{sha256}.png?size=medium')
+    assert _image_size(medium.data) == ((1280, 960), fmt)
+    assert len(thumb.data) < len(medium.data) < len(screenshot)
+
+    assert ssz.get(f'/uploads/{sha256}.png').data == screenshot
+    assert ssz.get(f'/uploads/{sha256}.png?size=huge').status_code == 400
+    page = ssz.get(f"/bug/{result['bug_id']}").get_data(as_text=True)
+    assert f'/uploads/{sha256}.png?size=thumb' in page and f'/uploads/{sha256}.png?size=medium' in page
+    print("✅ 上传后生成变体正常")
+    return ssz, result['bug_id'], sha256
+
+
+def test_lazy_variants_for_legacy_files(ssz):
+    """旧上传：首次请求时生成变体并缓存；非图片和损坏图片返回原文件"""
+    print("🧪 测试旧上传按需生成...")
+    legacy = _png_bytes((800, 800), 'RGB')
+    with open(os.path.join(UPLOAD_DIR, 'legacy.png'), 'wb') as f:
+        f.write(legacy)
+    variants_dir = os.path.join(UPLOAD_DIR, image_variants.VARIANT_DIR, 'thumb')
+    before = sum(len(files) for _, _, files in os.walk(variants_dir))
+
+    response = ssz.get('/uploads/legacy.png?size=thumb')
+    assert response.status_code == 200 and _image_size(response.data)[0] == (320, 320)
+    assert sum(len(files) for _, _, files in os.walk(variants_dir)) == before + 1
+    assert ssz.get('/uploads/legacy.png?size=thumb').data == response.data
+    assert sum(len(files) for _, _, files in os.walk(variants_dir)) == before + 1
+
+    with open(os.path.join(UPLOAD_DIR, 'broken.png'), 'wb') as f:
+        f.write(b'not really a png')
+    assert ssz.get('/uploads/broken.png?size=thumb').data == b'not really a png'
+    with open(os.path.join(UPLOAD_DIR, 'notes.txt'), 'wb') as f:
+        f.write(b'plain text')
+    assert ssz.get('/uploads/notes.txt?size=thumb').data == b'plain text'
+    assert ssz.get('/uploads/missing.png?size=thumb').status_code == 404
+    print("✅ 旧上传按需生成正常")
+
+
+def test_jpeg_variant_flattens_alpha():
+    """JPEG变体：透明图片铺白色背景后保存"""
+    print("🧪 测试JPEG变体...")
+    source = os.path.join(_tmp_dir, 'alpha.png')
+    Image.new('RGBA', (400, 200), (0, 0, 0, 0)).save(source)
+    previous = image_variants._format
+    image_variants._format = 'jpeg'
+    try:
+        dest = image_variants.variant_path(UPLOAD_DIR, 'ab' * 32, 'thumb')
+        assert dest.endswith('.jpeg')
+        assert image_variants.generate_variant(source, dest, 100)
+        with Image.open(dest) as image:
+            assert image.format == 'JPEG' and image.size == (100, 50)
+            assert image.getpixel((10, 10)) == (255, 255, 255)
+    finally:
+        image_variants._format = previous
+    print("✅ JPEG变体正常")
+
+
+def test_gc_removes_variants(ssz, bug_id, sha256):
+    """清理无引用文件时同时删除其变体"""
+    print("🧪 测试清理变体...")
+    assert json.loads(ssz.post(f'/bug/delete/{bug_id}').data)['success']
+    conn = get_db_connection()
+    c = conn.cursor()
+    assert upload_store.delete_unreferenced_blobs(c, UPLOAD_DIR) == 1
+    conn.commit()
+    conn.close()
+    for size in image_variants.VARIANT_SIZES:
+        assert not os.path.exists(image_variants.variant_path(UPLOAD_DIR, sha256, size)), size
+    print("✅ 清理变体正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    seed_users(USERS)
+    ssz, bug_id, sha256 = test_variants_generated_on_upload()
+    test_lazy_variants_for_legacy_files(ssz)
+    test_jpeg_variant_flattens_alpha()
+    test_gc_removes_variants(ssz, bug_id, sha256)
+    print("🎉 图片附件变体测试全部通过")
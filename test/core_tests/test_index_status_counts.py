@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试首页状态卡片和状态筛选
+使用临时SQLite数据库，问题数量超过一页时，校验状态卡片显示当前角色可见的全部问题的数量（不只是当前页），
+点击卡片/勾选复选框在服务端筛选，翻页链接保留筛选条件，负责人默认不显示已完成的问题
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'index_status_counts_test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmp_dir, 'uploads')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import rebugtracker
+from db_factory import get_db_connection
+from app_helpers import seed_users, login_client
+
+# 状态 -> 数量（实施组创建，指派给负责人）
+SEEDED = {'待处理': 7, '处理中': 4, '已解决': 3, '已完成': 6}
+
+
+def _seed():
+    ids = seed_users([('idx_ssz', 'idx_ssz', '实施组', 'ssz', '网络分析'), ('idx_fzr', 'idx_fzr', '负责人', 'fzr', '网络分析')])
+    conn = get_db_connection()
+    c = conn.cursor()
+    n = 0
+    for status, count in SEEDED.items():
+        for _ in range(count):
+            n += 1
+            c.execute('INSERT INTO bugs (title, status, created_by, assigned_to, created_at) VALUES (?, ?, ?, ?, ?)',
+                      (f'问题{n}', status, ids['idx_ssz'], ids['idx_fzr'], f'2024-01-01 00:{n:02d}:00'))
+    conn.commit()
+    conn.close()
+
+
+def _stat(page, element_id):
+    return int(re.search(rf'id="{element_id}">(\d+)<', page).group(1))
+
+
+def _statuses(page):
+    return re.findall(r'class="bug-item" data-status="([^"]+)"', page)
+
+
+def test_counts_cover_all_pages():
+    """状态卡片统计全部问题，不受分页影响"""
+    print("🧪 测试状态卡片数量...")
+    page = login_client('idx_ssz').get('/?page_size=5').get_data(as_text=True)
+    assert len(_statuses(page)) == 5
+    assert _stat(page, 'totalBugs') == sum(SEEDED.values())
+    assert _stat(page, 'pendingBugs') == 7 and _stat(page, 'processingBugs') == 4
+    assert _stat(page, 'resolvedBugs') == 3 and _stat(page, 'completedBugs') == 6
+    assert _stat(page, 'assignedBugs') == 0
+    print("✅ 状态卡片数量正常")
+
+
+def test_server_side_filter():
+    """卡片和复选框筛选在服务端进行，翻页链接保留筛选条件"""
+    print("🧪 测试服务端状态筛选...")
+    client = login_client('idx_ssz')
+    page = client.get('/?filter=pending&page_size=5').get_data(as_text=True)
+    assert _statuses(page) == ['待处理'] * 5
+    assert 'active" data-status="pending"' in page
+    next_url = re.search(r'href="(\?after=[^"]+)"', page).group(1).replace('&amp;', '&')
+    assert '&filter=pending' in next_url
+    assert _statuses(client.get('/' + next_url).get_data(as_text=True)) == ['待处理'] * 2
+
+    page = client.get('/?status=处理中&status=已解决').get_data(as_text=True)
+    assert sorted(_statuses(page)) == sorted(['处理中'] * 4 + ['已解决'] * 3)
+    assert re.search(r'id="visibleBugsCount">7<', page)
+    # 状态卡片始终显示全部数量
+    assert _stat(page, 'totalBugs') == sum(SEEDED.values())
+
+    page = client.get('/?filter=unknown').get_data(as_text=True)
+    assert len(_statuses(page)) == sum(SEEDED.values())
+    print("✅ 服务端状态筛选正常")
+
+
+def test_manager_default_not_completed():
+    """负责人默认不显示已完成的问题，可以切换到全部"""
+    print("🧪 测试负责人默认筛选...")
+    client = login_client('idx_fzr')
+    page = client.get('/').get_data(as_text=True)
+    assert '已完成' not in _statuses(page) and len(_statuses(page)) == 14
+    assert _stat(page, 'notCompletedBugs') == 14 and 'active" data-status="not-completed"' in page
+    assert len(_statuses(client.get('/?filter=all').get_data(as_text=True))) == sum(SEEDED.values())
+    print("✅ 负责人默认筛选正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    _seed()
+    test_counts_cover_all_pages()
+    test_server_side_filter()
+    test_manager_default_not_completed()
+    print("🎉 首页状态统计测试全部通过")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试问题列表键集分页（pagination模块）
+使用内存SQLite数据库，不依赖运行中的服务
+"""
+
+import os
+import sys
+import sqlite3
+
+os.environ['DB_TYPE'] = 'sqlite'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from pagination import encode_cursor, decode_cursor, parse_page_args, fetch_keyset_page, count_capped
+
+
+def _create_db(total):
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE bugs (id INTEGER PRIMARY KEY, title TEXT, created_at TEXT)')
+    # 每10条使用同一个创建时间，验证相同时间下按id排序不丢不重
+    for i in range(total):
+        conn.execute('INSERT INTO bugs (title, created_at) VALUES (?, ?)',
+                     (f'bug{i}', f'2024-01-01 00:{i // 10:02d}:00'))
+    conn.commit()
+    return conn
+
+
+def test_cursor_roundtrip():
+    """游标编码解码"""
+    print("🧪 测试游标编码解码...")
+    token = encode_cursor('2024-01-01 00:00:00', 42)
+    assert decode_cursor(token) == ('2024-01-01 00:00:00', 42)
+    assert decode_cursor('not-a-cursor') is None
+    assert decode_cursor('') is None
+    print("✅ 游标编码解码正常")
+
+
+def test_page_size_bounds():
+    """page_size参数边界"""
+    print("🧪 测试page_size边界...")
+    assert parse_page_args({'page_size': '0'})['page_size'] == 1
+    assert parse_page_args({'page_size': '100000'})['page_size'] == 200
+    assert parse_page_args({'page_size': 'abc'}, default_page_size=20)['page_size'] == 20
+    print("✅ page_size边界正常")
+
+
+def test_walk_all_pages():
+    """向后翻完所有页，再向前翻回，记录不丢不重"""
+    print("🧪 测试前后翻页...")
+    conn = _create_db(95)
+    c = conn.cursor()
+    select_sql = 'SELECT b.id, b.title, b.created_at FROM bugs b'
+
+    pages = []
+    args = {'page_size': '20'}
+    while True:
+        rows, info = fetch_keyset_page(c, select_sql, '', (), parse_page_args(args))
+        pages.append([row['id'] for row in rows])
+        if not info['has_next']:
+            break
+        args = {'page_size': '20', 'after': info['next_cursor']}
+
+    ids = [i for page in pages for i in page]
+    assert len(pages) == 5
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 95
+
+    # 从最后一页向前翻
+    rows, info = fetch_keyset_page(c, select_sql, '', (), parse_page_args({'page_size': '20', 'before': info['prev_cursor']}))
+    assert [row['id'] for row in rows] == pages[-2]
+    assert info['has_prev'] and info['has_next']
+    print("✅ 前后翻页正常")
+
+
+def test_count_capped():
+    """计数达到上限时返回估计值"""
+    print("🧪 测试有上限计数...")
+    conn = _create_db(30)
+    c = conn.cursor()
+    assert count_capped(c, 'FROM bugs b', '', (), cap=100)['total'] == 30
+    result = count_capped(c, 'FROM bugs b', '', (), cap=10)
+    assert result['total_is_estimate'] and result['total_display'] == '10+'
+    print("✅ 有上限计数正常")
+
+
+if __name__ == '__main__':
+    test_cursor_roundtrip()
+    test_page_size_bounds()
+    test_walk_all_pages()
+    test_count_capped()
+    print("🎉 分页测试全部通过")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试请求级日志（request_logging模块）
+使用临时SQLite数据库，校验X-Request-ID的生成与透传、日志记录的请求字段、
+高频日志采样，以及日志未启用时不格式化参数
+"""
+
+import io
+import os
+import sys
+import logging
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'request_logging_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+import request_logging
+
+
+class _Explosive:
+    """被格式化时抛出异常，用于确认日志未启用时没有格式化参数"""
+
+    def __str__(self):
+        raise AssertionError('不应格式化')
+
+    __repr__ = __str__
+
+
+def _capture_logger(name, level):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(level)
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(request_logging.RequestContextFilter())
+    handler.setFormatter(logging.Formatter('%(request_id)s|%(user_id)s|%(path)s|%(message)s'))
+    logger.addHandler(handler)
+    return logger, stream
+
+
+def test_request_id_header():
+    """响应带X-Request-ID：没有传入时生成，传入合法值时沿用，非法值被替换"""
+    print("🧪 测试请求ID...")
+    client = rebugtracker.app.test_client()
+    generated = client.get('/login').headers.get('X-Request-ID')
+    assert generated and len(generated) == 16
+    assert client.get('/login').headers['X-Request-ID'] != generated
+
+    incoming = 'nginx-req-0123456789'
+    assert client.get('/login', headers={'X-Request-ID': incoming}).headers['X-Request-ID'] == incoming
+    replaced = client.get('/login', headers={'X-Request-ID': 'bad id; forged'}).headers['X-Request-ID']
+    assert replaced != 'bad id; forged' and len(replaced) == 16
+    print("✅ 请求ID正常")
+
+
+def test_context_fields():
+    """日志记录带上请求ID、当前用户和路径；请求外为'-'"""
+    print("🧪 测试日志字段...")
+    logger, stream = _capture_logger('test_request_logging.fields', logging.INFO)
+    app = rebugtracker.app
+    with app.test_request_context('/bugs', headers={'X-Request-ID': 'req-abcdef123'}):
+        request_logging._assign_request_id()
+        rebugtracker.session['user'] = {'id': 1, 'username': 'admin', 'role_en': 'zncy'}
+        rebugtracker.get_current_user()
+        logger.info('hello')
+        assert request_logging.current_request_id() == 'req-abcdef123'
+    logger.info('outside')
+    lines = stream.getvalue().splitlines()
+    assert lines == ['req-abcdef123|1|/bugs|hello', '-|-|-|outside'], lines
+    print("✅ 日志字段正常")
+
+
+def test_lazy_formatting():
+    """级别未启用或DEBUG_LOGGING关闭时不格式化参数"""
+    print("🧪 测试惰性格式化...")
+    logger, stream = _capture_logger('test_request_logging.lazy', logging.INFO)
+    original = request_logging.DEBUG_LOGGING
+    try:
+        request_logging.DEBUG_LOGGING = False
+        logger.setLevel(logging.DEBUG)
+        request_logging.log_debug(logger, '调试 %s', _Explosive())
+        assert stream.getvalue() == ''
+
+        request_logging.DEBUG_LOGGING = True
+        request_logging.log_debug(logger, '调试 %s', 'ok')
+        assert stream.getvalue().endswith('|调试 ok\n')
+    finally:
+        request_logging.DEBUG_LOGGING = original
+
+    logger.setLevel(logging.INFO)
+    request_logging.log_event(logger, logging.DEBUG, 'bug.saved', detail=_Explosive())
+    request_logging.log_event(logger, logging.INFO, 'bug.saved', bug_id=3, title='登录 报错')
+    assert stream.getvalue().splitlines()[-1].endswith("|bug.saved bug_id=3 title='登录 报错'")
+    print("✅ 惰性格式化正常")
+
+
+def test_sampling():
+    """高频日志每N条只输出1条，并附上累计条数"""
+    print("🧪 测试日志采样...")
+    logger, stream = _capture_logger('test_request_logging.sampled', logging.INFO)
+    for i in range(25):
+        request_logging.log_sampled(logger, logging.INFO, 'test.sent', 'sent %s', i, every=10)
+    messages = [line.split('|')[-1] for line in stream.getvalue().splitlines()]
+    assert messages == ['sent 0 (sampled 1/10, total 1)', 'sent 10 (sampled 1/10, total 11)',
+                        'sent 20 (sampled 1/10, total 21)'], messages
+
+    for i in range(3):
+        request_logging.log_sampled(logger, logging.INFO, 'test.every', 'each %s', i, every=1)
+    assert stream.getvalue().splitlines()[-3:] == ['-|-|-|each 0', '-|-|-|each 1', '-|-|-|each 2']
+
+    request_logging.log_sampled(logger, logging.DEBUG, 'test.disabled', 'x %s', _Explosive())
+    print("✅ 日志采样正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    test_request_id_header()
+    test_context_fields()
+    test_lazy_formatting()
+    test_sampling()
+    print("🎉 请求级日志测试全部通过")
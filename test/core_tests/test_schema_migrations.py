@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库结构迁移（schema_migrations模块 / init_db）
+使用临时SQLite数据库，校验首次启动执行全部迁移、再次启动只查询一次版本号、
+旧版本数据库（没有schema_version表）补齐迁移，迁移失败后从失败处继续，以及通知计数表的列补齐中断后重新执行
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'schema_migrations_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+import schema_migrations
+from db_factory import get_db_connection
+
+LATEST = rebugtracker.SCHEMA_MIGRATIONS[-1][0]
+
+
+def _query(sql):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(sql)
+    rows = [tuple(row) for row in c.fetchall()]
+    conn.close()
+    return rows
+
+
+def _execute(*statements):
+    conn = get_db_connection()
+    c = conn.cursor()
+    for sql in statements:
+        c.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_fresh_database():
+    """空数据库执行全部迁移并记录版本"""
+    print("🧪 测试首次初始化...")
+    applied = rebugtracker.init_db()
+    assert applied == [version for version, _, _ in rebugtracker.SCHEMA_MIGRATIONS], applied
+    assert _query('SELECT MAX(version) FROM schema_version') == [(LATEST,)]
+    tables = {row[0] for row in _query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ('users', 'bugs', 'user_teams', 'notification_outbox', 'notification_counters',
+                  'export_jobs', 'bug_daily_stats'):
+        assert table in tables, table
+    assert _query("SELECT role_en FROM users WHERE username = 'admin'") == [('gly',)]
+    print(f"✅ 已执行 {len(applied)} 个迁移")
+
+
+def test_second_boot_single_query():
+    """已是最新版本时只执行一次版本查询，不再改写users"""
+    print("🧪 测试再次启动...")
+    _execute("UPDATE users SET role_en = 'custom' WHERE username = 'admin'")
+
+    statements = []
+    original = rebugtracker.get_db_connection
+
+    def traced_connection():
+        conn = original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    rebugtracker.get_db_connection = traced_connection
+    try:
+        assert rebugtracker.init_db() == []
+    finally:
+        rebugtracker.get_db_connection = original
+    assert statements == ['SELECT MAX(version) FROM schema_version'], statements
+    assert _query("SELECT role_en FROM users WHERE username = 'admin'") == [('custom',)]
+    print("✅ 再次启动只检查版本")
+
+
+def test_legacy_database():
+    """旧版本数据库（已有表、没有schema_version）补齐全部迁移，角色回填执行一次"""
+    print("🧪 测试旧版本数据库...")
+    _execute('DROP TABLE schema_version', 'DELETE FROM bug_daily_stats')
+    assert rebugtracker.init_db() == [version for version, _, _ in rebugtracker.SCHEMA_MIGRATIONS]
+    assert _query("SELECT role_en FROM users WHERE username = 'admin'") == [('gly',)]
+    assert _query('SELECT COUNT(*) FROM schema_version') == [(len(rebugtracker.SCHEMA_MIGRATIONS),)]
+    print("✅ 旧版本数据库迁移正常")
+
+
+def test_failed_migration_resumes():
+    """迁移失败时停止且不记录版本，修复后从失败的迁移继续"""
+    print("🧪 测试迁移失败后继续...")
+    conn = sqlite3.connect(os.path.join(_tmp_dir, 'scratch.db'))
+    c = conn.cursor()
+    calls = []
+    broken = {'fail': True}
+
+    def create_a(cursor):
+        calls.append(1)
+        cursor.execute('CREATE TABLE a (id INTEGER)')
+
+    def create_b(cursor):
+        calls.append(2)
+        if broken['fail']:
+            raise RuntimeError('boom')
+        cursor.execute('CREATE TABLE b (id INTEGER)')
+
+    migrations = [(1, 'a', create_a), (2, 'b', create_b)]
+    try:
+        schema_migrations.run_migrations(conn, c, migrations)
+        raise AssertionError('迁移失败应抛出异常')
+    except RuntimeError:
+        pass
+    assert schema_migrations.get_schema_version(conn, c) == 1
+
+    broken['fail'] = False
+    assert schema_migrations.run_migrations(conn, c, migrations) == [2]
+    assert calls == [1, 2, 2]
+    assert schema_migrations.run_migrations(conn, c, migrations) == []
+
+    try:
+        schema_migrations.run_migrations(conn, c, [(2, 'b', create_b), (1, 'a', create_a)])
+        raise AssertionError('版本号乱序应报错')
+    except ValueError:
+        pass
+    conn.close()
+    print("✅ 迁移失败后继续正常")
+
+
+def test_notification_counters_partial_columns():
+    """通知计数表只加了unread_count就中断：重新执行时补上version并重算未读数"""
+    print("🧪 测试通知计数表迁移中断后继续...")
+    conn = sqlite3.connect(os.path.join(_tmp_dir, 'counters.db'))
+    c = conn.cursor()
+    c.execute('CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER, read_status BOOLEAN)')
+    c.executemany('INSERT INTO notifications (user_id, read_status) VALUES (?, ?)', [(1, 0), (1, 0), (1, 1), (2, 1)])
+    # 旧版本计数表 + 中断前已加上的unread_count（未回填）
+    c.execute('CREATE TABLE notification_counters (user_id INTEGER PRIMARY KEY, total_count INTEGER NOT NULL DEFAULT 0)')
+    c.executemany('INSERT INTO notification_counters (user_id, total_count) VALUES (?, ?)', [(1, 3), (2, 1)])
+    c.execute('ALTER TABLE notification_counters ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0')
+
+    rebugtracker._migrate_notification_counters(c)
+    c.execute('SELECT user_id, total_count, unread_count, version FROM notification_counters ORDER BY user_id')
+    assert c.fetchall() == [(1, 3, 2, 0), (2, 1, 0, 0)]
+    conn.close()
+    print("✅ 通知计数表迁移中断后继续正常")
+
+
+if __name__ == '__main__':
+    test_fresh_database()
+    test_second_boot_single_query()
+    test_legacy_database()
+    test_failed_migration_resumes()
+    test_notification_counters_partial_columns()
+    print("🎉 数据库迁移测试全部通过")
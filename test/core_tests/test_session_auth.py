@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试签名登录会话（get_current_user / login_required / role_required）
+使用临时SQLite数据库，校验登录写入签名会话、伪造的明文cookie和篡改的会话不被接受、每个请求只解析一次、
+用户被修改/删除后旧会话失效、会话空闲超时，以及未配置SECRET_KEY时自动生成并持久化密钥
+"""
+
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'session_auth_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+os.environ['SECRET_KEY_FILE'] = os.path.join(_tmp_dir, '.secret_key')
+os.environ.pop('SECRET_KEY', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # test/app_helpers.py
+
+import stat
+import json
+from datetime import timedelta
+
+import rebugtracker
+import config_adapter
+from app_helpers import seed_users, login_client
+
+# 修改密码要求至少6位
+PASSWORD = 'pw123456'
+
+SESSION_COOKIE = rebugtracker.app.config.get('SESSION_COOKIE_NAME', 'session')
+
+
+def _cookie_names(response):
+    return [header.split('=', 1)[0] for header in response.headers.getlist('Set-Cookie')]
+
+
+def test_login_sets_signed_session():
+    """登录只写入签名会话，不再写入明文身份cookie"""
+    print("🧪 测试登录会话...")
+    client = rebugtracker.app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin'})
+    names = _cookie_names(response)
+    assert SESSION_COOKIE in names and 'user_id' not in names and 'role_en' not in names, names
+    assert 'HttpOnly' in [h for h in response.headers.getlist('Set-Cookie') if h.startswith(SESSION_COOKIE)][0]
+
+    assert client.get('/admin').status_code == 200
+    print("✅ 登录会话正常")
+    return client
+
+
+def test_forged_cookies_rejected():
+    """伪造的明文身份cookie和篡改过的会话都视为未登录"""
+    print("🧪 测试伪造cookie...")
+    client = rebugtracker.app.test_client()
+    for name, value in (('user_id', '1'), ('username', 'admin'), ('role_en', 'gly'), ('team', 'x')):
+        client.set_cookie(name, value)
+    response = client.get('/admin')
+    assert response.status_code == 302 and response.headers['Location'].endswith('/login')
+    # 旧版本的明文cookie在跳转登录时被清除
+    assert 'user_id' in _cookie_names(response)
+
+    logged_in = rebugtracker.app.test_client()
+    logged_in.post('/login', data={'username': 'admin', 'password': 'admin'})
+    token = logged_in.get_cookie(SESSION_COOKIE).value
+    forged = rebugtracker.app.test_client()
+    forged.set_cookie(SESSION_COOKIE, token[:-2] + ('AA' if not token.endswith('AA') else 'BB'))
+    assert forged.get('/admin').status_code == 302
+    print("✅ 伪造cookie被拒绝")
+
+
+def test_user_cached_per_request():
+    """同一请求内只解析一次会话，之后直接返回flask.g中的用户"""
+    print("🧪 测试请求内缓存...")
+    app = rebugtracker.app
+    with app.test_request_context('/'):
+        rebugtracker.session['user'] = {'id': 1, 'username': 'admin', 'chinese_name': '用户七', 'role_en': 'pm', 'team': '网络分析'}
+        user = rebugtracker.get_current_user()
+        assert user['role'] == '产品经理' and user['id'] == 1
+        rebugtracker.session['user'] = {'id': 1, 'username': 'admin', 'role_en': 'gly'}
+        assert rebugtracker.get_current_user() is user
+    with app.test_request_context('/'):
+        assert rebugtracker.get_current_user() is None
+    print("✅ 请求内缓存正常")
+
+
+def test_user_changes_invalidate_sessions(admin):
+    """管理员修改角色或删除用户后，该用户的旧会话失效；管理员修改自己时会话保留"""
+    print("🧪 测试用户变更后会话失效...")
+    user_id = seed_users([('sess_pm', 'sess_pm', '产品经理', 'pm', '网络分析')], PASSWORD)['sess_pm']
+    pm = login_client('sess_pm', PASSWORD)
+    assert pm.get('/user-settings').status_code == 200
+
+    result = json.loads(admin.put(f'/admin/users/{user_id}', json={
+        'username': 'sess_pm', 'role': '组内成员', 'role_en': 'zncy', 'team': '网络分析', 'chinese_name': 'sess_pm'
+    }).data)
+    assert result['success'], result
+    assert pm.get('/user-settings').status_code == 302
+    # 重新登录后使用新角色
+    pm = login_client('sess_pm', PASSWORD)
+    assert pm.get('/user-settings').status_code == 200
+
+    result = json.loads(admin.put('/admin/users/1', json={
+        'username': 'admin', 'role': '管理员', 'role_en': 'gly', 'team': '管理员', 'chinese_name': '系统管理员'
+    }).data)
+    assert result['success'], result
+    assert admin.get('/admin').status_code == 200
+
+    assert json.loads(admin.delete(f'/admin/users/{user_id}').data)['success']
+    assert pm.get('/user-settings').status_code == 302
+    print("✅ 用户变更后会话失效正常")
+
+
+def test_password_change_invalidates_other_sessions():
+    """修改密码后其他设备上的会话失效，当前会话保留"""
+    print("🧪 测试修改密码...")
+    seed_users([('sess_pwd', 'sess_pwd', '产品经理', 'pm', '网络分析')], PASSWORD)
+    laptop = login_client('sess_pwd', PASSWORD)
+    phone = login_client('sess_pwd', PASSWORD)
+    result = json.loads(laptop.post('/api/user/change-password', json={
+        'current_password': PASSWORD, 'new_password': 'newpw123'
+    }).data)
+    assert result['success'], result
+    assert laptop.get('/user-settings').status_code == 200
+    assert phone.get('/user-settings').status_code == 302
+    print("✅ 修改密码正常")
+
+
+def test_session_lifetime():
+    """会话有效期取SESSION_TIMEOUT，登录后的会话cookie带过期时间"""
+    print("🧪 测试会话有效期...")
+    app = rebugtracker.app
+    assert app.permanent_session_lifetime == timedelta(seconds=config_adapter.SESSION_TIMEOUT)
+    response = rebugtracker.app.test_client().post('/login', data={'username': 'admin', 'password': 'admin'})
+    cookie = [h for h in response.headers.getlist('Set-Cookie') if h.startswith(SESSION_COOKIE)][0]
+    assert 'Expires=' in cookie, cookie
+    print("✅ 会话有效期正常")
+
+
+def test_generated_secret_key():
+    """未配置SECRET_KEY（或为示例默认值）时使用自动生成并持久化的随机密钥"""
+    print("🧪 测试自动生成密钥...")
+    path = os.environ['SECRET_KEY_FILE']
+    assert not config_adapter.SECRET_KEY_FROM_ENV
+    assert rebugtracker.app.secret_key == config_adapter.SECRET_KEY
+    assert config_adapter.SECRET_KEY not in config_adapter.KNOWN_DEFAULT_SECRET_KEYS
+    assert len(config_adapter.SECRET_KEY) >= 32
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    # 重启后读取同一个密钥
+    assert config_adapter._load_or_create_secret_key(path) == config_adapter.SECRET_KEY
+    other = config_adapter._load_or_create_secret_key(os.path.join(_tmp_dir, 'other_key'))
+    assert other != config_adapter.SECRET_KEY
+    print("✅ 自动生成密钥正常")
+
+
+def test_logout(client):
+    """登出后会话失效"""
+    print("🧪 测试登出...")
+    client.get('/logout')
+    assert client.get('/admin').status_code == 302
+    print("✅ 登出正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    client = test_login_sets_signed_session()
+    test_forged_cookies_rejected()
+    test_user_cached_per_request()
+    test_user_changes_invalidate_sessions(client)
+    test_password_change_invalidates_other_sessions()
+    test_session_lifetime()
+    test_generated_secret_key()
+    test_logout(client)
+    print("🎉 登录会话测试全部通过")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库同步管道（database_tools/sync_tools/sync_pipeline.py）
+使用两个临时SQLite数据库，校验分批同步、保留主键、过滤孤儿记录、
+中断后从断点继续不重复写入、派生表重建、按高水位的增量同步（变更与删除），
+以及COPY字段的NULL/空字符串编码
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+SOURCE_PATH = os.path.join(_tmp_dir, 'sync_source.db')
+TARGET_PATH = os.path.join(_tmp_dir, 'sync_target.db')
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = SOURCE_PATH
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'database_tools', 'sync_tools'))
+
+import rebugtracker
+import sync_pipeline
+
+BUG_COUNT = 230
+
+
+def _seed_source():
+    """源库：初始化结构并生成用户、问题、通知（含孤儿通知）"""
+    rebugtracker.init_db()
+    conn = sqlite3.connect(SOURCE_PATH)
+    c = conn.cursor()
+    c.execute("INSERT INTO users (id, username, password, role, role_en, team) VALUES (50, 'sync_a', 'x', '组内成员', 'zncy', '网络分析')")
+    c.execute("INSERT INTO user_teams (user_id, team) VALUES (50, '网络分析')")
+    for i in range(BUG_COUNT):
+        c.execute('INSERT INTO bugs (id, title, status, type, assigned_to, created_by, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                  (1000 + i, f'问题{i}', '处理中' if i % 2 else '待处理', 'bug', 50, 1, f'2024-03-{1 + i % 28:02d} 10:00:00'))
+    c.executemany('INSERT INTO notifications (user_id, title, content, read_status) VALUES (?, ?, ?, ?)',
+                  [(50, f'通知{i}', '', i % 3 == 0) for i in range(40)] + [(999, '孤儿通知', '内容', 0)])
+    conn.commit()
+    conn.close()
+
+
+def _create_target():
+    """目标库：复制源库的表结构（不含数据）"""
+    source = sqlite3.connect(SOURCE_PATH)
+    statements = [row[0] for row in source.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'")]
+    source.close()
+    target = sqlite3.connect(TARGET_PATH)
+    for sql in statements:
+        target.execute(sql)
+    target.commit()
+    return target
+
+
+class _FailingTarget(sync_pipeline.SqliteEndpoint):
+    """写入第N批时失败，模拟同步中断"""
+
+    def __init__(self, conn, fail_on_batch):
+        super().__init__(conn)
+        self.batches = 0
+        self.fail_on_batch = fail_on_batch
+
+    def insert_rows(self, cursor, table, columns, rows):
+        if table == 'bugs':
+            self.batches += 1
+            if self.batches == self.fail_on_batch:
+                raise RuntimeError('模拟中断')
+        super().insert_rows(cursor, table, columns, rows)
+
+
+def test_interrupted_sync_resumes():
+    """中断后从断点继续：已提交的批次不重复写入，最终与源库一致"""
+    print("🧪 测试断点续传...")
+    source_conn = sqlite3.connect(SOURCE_PATH)
+    target_conn = _create_target()
+    source = sync_pipeline.SqliteEndpoint(source_conn)
+
+    try:
+        sync_pipeline.run_sync(source, _FailingTarget(target_conn, fail_on_batch=3), batch_size=50)
+        raise AssertionError('应在第3批中断')
+    except RuntimeError:
+        pass
+    # 前两批（100行）已随断点一起提交
+    assert target_conn.execute('SELECT COUNT(*) FROM bugs').fetchone()[0] == 100
+    assert target_conn.execute("SELECT last_key, finished FROM sync_checkpoints WHERE table_name = 'bugs'").fetchone() == ('[1099]', 0)
+
+    results = sync_pipeline.run_sync(source, sync_pipeline.SqliteEndpoint(target_conn), batch_size=50, resume=True)
+    assert 'users' not in results, results
+    assert results['bugs'] == BUG_COUNT - 100, results
+    assert sync_pipeline.verify_counts(source, sync_pipeline.SqliteEndpoint(target_conn))
+    print("✅ 断点续传正常")
+    return source_conn, target_conn
+
+
+def test_synced_data(source_conn, target_conn):
+    """主键保留、孤儿通知被过滤、派生表重建"""
+    print("🧪 测试同步结果...")
+    query = 'SELECT id, title, status, assigned_to, created_at FROM bugs ORDER BY id'
+    assert source_conn.execute(query).fetchall() == target_conn.execute(query).fetchall()
+    assert target_conn.execute("SELECT COUNT(*) FROM notifications WHERE user_id = 999").fetchone()[0] == 0
+    assert target_conn.execute("SELECT content FROM notifications WHERE title = '通知1'").fetchone() == ('',)
+
+    counters = target_conn.execute('SELECT total_count, unread_count FROM notification_counters WHERE user_id = 50').fetchone()
+    assert counters == (40, 26), counters
+    stats = target_conn.execute("SELECT SUM(bug_count) FROM bug_daily_stats WHERE team = '网络分析'").fetchone()[0]
+    assert stats == BUG_COUNT, stats
+
+    # 非续传：清空后完整重新同步
+    results = sync_pipeline.run_sync(sync_pipeline.SqliteEndpoint(source_conn), sync_pipeline.SqliteEndpoint(target_conn),
+                                     batch_size=1000)
+    assert results['bugs'] == BUG_COUNT and results['notifications'] == 40, results
+    print("✅ 同步结果正常")
+
+
+def test_incremental_sync(source_conn, target_conn):
+    """增量同步：只复制高水位之后变化的行，墓碑对应的行被删除"""
+    print("🧪 测试增量同步...")
+    source = sync_pipeline.SqliteEndpoint(source_conn)
+    target = sync_pipeline.SqliteEndpoint(target_conn)
+    # 全量同步记录了高水位
+    assert target_conn.execute('SELECT COUNT(*) FROM sync_watermarks').fetchone()[0] == len(sync_pipeline.TRACKED_TABLES)
+
+    # 以当前时间作为上次同步的高水位，之后的修改才会被复制
+    time.sleep(0.01)
+    synced_at = source_conn.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')").fetchone()[0]
+    target_conn.execute('UPDATE sync_watermarks SET changed_since = ?', (synced_at,))
+    target_conn.commit()
+    time.sleep(0.01)
+
+    source_conn.execute("UPDATE bugs SET title = '已修改' WHERE id = 1000")
+    source_conn.execute("INSERT INTO bugs (id, title, status, type, assigned_to, created_by, created_at) "
+                        "VALUES (5000, '新问题', '待处理', 'bug', 50, 1, '2024-03-05 10:00:00')")
+    source_conn.execute('DELETE FROM bugs WHERE id = 1001')
+    source_conn.execute("INSERT INTO notifications (user_id, title, content, read_status) VALUES (50, '新通知', '', 0)")
+    source_conn.execute("UPDATE product_lines SET name = name WHERE id = (SELECT MIN(id) FROM product_lines)")
+    source_conn.commit()
+
+    results = sync_pipeline.run_incremental(source, target, batch_size=1, overlap_seconds=0)
+    assert results['bugs'] == 3, results
+    assert results['notifications'] == 1 and results['users'] == 0, results
+    query = 'SELECT id, title, status, assigned_to, created_at FROM bugs ORDER BY id'
+    assert source_conn.execute(query).fetchall() == target_conn.execute(query).fetchall()
+    assert target_conn.execute('SELECT COUNT(*) FROM bugs WHERE id = 1001').fetchone()[0] == 0
+    counters = target_conn.execute('SELECT total_count, unread_count FROM notification_counters WHERE user_id = 50').fetchone()
+    assert counters == (41, 27), counters
+    assert sync_pipeline.verify_counts(source, target)
+
+    # 再次执行：墓碑已应用，回退窗口内的行按主键覆盖，结果不变
+    results = sync_pipeline.run_incremental(source, target, overlap_seconds=0)
+    assert results['bugs'] <= 2, results
+    assert source_conn.execute(query).fetchall() == target_conn.execute(query).fetchall()
+
+    # 没有全量同步记录的高水位时拒绝增量同步
+    target_conn.execute('DELETE FROM sync_watermarks')
+    target_conn.commit()
+    try:
+        sync_pipeline.run_incremental(source, target)
+        raise AssertionError('缺少高水位时应拒绝增量同步')
+    except RuntimeError:
+        pass
+
+    assert sync_pipeline._since_with_overlap('2024-03-01 10:00:00.500', 300) == '2024-03-01 09:55:00.500'
+    assert sync_pipeline._since_with_overlap('2024-03-01 10:00:00', 0) == '2024-03-01 10:00:00.000'
+    assert sync_pipeline._since_with_overlap(None, 300) is None
+    print("✅ 增量同步正常")
+
+
+def test_copy_encoding():
+    """COPY CSV字段：NULL不加引号，空字符串和含引号的值加引号"""
+    print("🧪 测试COPY字段编码...")
+    values = [None, '', 'a"b', 3, True]
+    assert ','.join(sync_pipeline._copy_value(v) for v in values) == ',"","a""b","3","True"'
+    assert sync_pipeline._key_condition(('user_id', 'team'), '%s') == '(user_id, team) > (%s, %s)'
+    print("✅ COPY字段编码正常")
+
+
+if __name__ == '__main__':
+    _seed_source()
+    source_conn, target_conn = test_interrupted_sync_resumes()
+    test_synced_data(source_conn, target_conn)
+    test_incremental_sync(source_conn, target_conn)
+    test_copy_encoding()
+    source_conn.close()
+    target_conn.close()
+    print("🎉 数据库同步管道测试全部通过")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试system_config进程内缓存（system_config_cache模块）
+使用临时SQLite数据库，用两个缓存实例模拟两个gunicorn worker
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'config_cache_test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+from db_factory import get_db_connection
+from system_config_cache import SystemConfigCache, bump_config_version
+
+
+def _write_config(key, value, bump=True):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('INSERT OR REPLACE INTO system_config (config_key, config_value) VALUES (?, ?)', (key, value))
+    if bump:
+        bump_config_version(c)
+    conn.commit()
+    conn.close()
+
+
+def test_typed_getters():
+    """按类型读取及默认值"""
+    print("🧪 测试类型化读取...")
+    _write_config('notification_max_per_user', '25')
+    _write_config('notification_auto_cleanup_enabled', 'TRUE')
+    _write_config('notification_retention_days', 'abc')
+    cache = SystemConfigCache()
+    assert cache.get_int('notification_max_per_user', 100) == 25
+    assert cache.get_bool('notification_auto_cleanup_enabled') is True
+    assert cache.get_int('notification_retention_days', 30) == 30
+    assert cache.get('missing_key', 'fallback') == 'fallback'
+    assert 'notification_max_per_user' in cache.get_prefix('notification_')
+    print("✅ 类型化读取正常")
+
+
+def test_reads_do_not_query():
+    """版本检查间隔内的读取不访问数据库"""
+    print("🧪 测试缓存命中...")
+    cache = SystemConfigCache(ttl=60, version_check_interval=60)
+    for _ in range(100):
+        cache.get_int('notification_max_per_user', 100)
+    stats = cache.get_stats()
+    assert stats['loads'] == 1 and stats['version_checks'] == 0, stats
+    print("✅ 100次读取只加载1次")
+
+
+def test_cross_worker_staleness():
+    """另一个worker写入并更新版本行后，在版本检查间隔内感知变化"""
+    print("🧪 测试跨进程失效...")
+    worker_a = SystemConfigCache(ttl=60, version_check_interval=0.2)
+    worker_b = SystemConfigCache(ttl=60, version_check_interval=0.2)
+    assert worker_a.get_int('notification_max_per_user') == 25
+    assert worker_b.get_int('notification_max_per_user') == 25
+
+    # worker_b 写入配置，本进程立即失效
+    _write_config('notification_max_per_user', '40')
+    worker_b.invalidate()
+    assert worker_b.get_int('notification_max_per_user') == 40
+
+    # worker_a 在检查间隔内仍读旧值，超过间隔后读到新值
+    assert worker_a.get_int('notification_max_per_user') == 25
+    time.sleep(0.25)
+    assert worker_a.get_int('notification_max_per_user') == 40
+
+    # 未更新版本行的写入只会在TTL到期后生效
+    _write_config('notification_max_per_user', '50', bump=False)
+    time.sleep(0.25)
+    assert worker_a.get_int('notification_max_per_user') == 40
+    print("✅ 跨进程失效正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    test_typed_getters()
+    test_reads_do_not_query()
+    test_cross_worker_staleness()
+    print("🎉 配置缓存测试全部通过")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按内容寻址的上传文件存储（upload_store模块）
+使用临时SQLite数据库和上传目录，校验分片路径与去重、提交问题时的附件登记、
+/uploads/<filename> 访问与缓存头、旧附件迁移工具，以及无引用文件的清理
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+UPLOAD_DIR = os.path.join(_tmp_dir, 'uploads')
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'upload_store_test.db')
+os.environ['UPLOAD_FOLDER'] = UPLOAD_DIR
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'database_tools', 'maintenance_tools'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'test'))
+
+import rebugtracker
+import upload_store
+import migrate_uploads_to_blobs
+from db_factory import get_db_connection
+from app_helpers import seed_users, login_client
+
+USERS = [
+    # (用户名, 中文名, 角色, 角色英文, 团队)
+    ('blob_ssz', '实施乙', '实施组', 'ssz', '网络分析'),
+    ('blob_fzr', '负责人乙', '负责人', 'fzr', '网络分析'),
+]
+SCREENSHOT = b'\x89PNG\r\n' + b'screenshot' * 20000
+
+
+def _blob_files():
+    files = []
+    for root, dirs, names in os.walk(upload_store.blob_folder(UPLOAD_DIR)):
+        dirs[:] = [d for d in dirs if d != 'tmp']
+        files.extend(os.path.join(root, name) for name in names)
+    return files
+
+
+def _query(sql, params=()):
+    conn = get_db_connection()
+    rows = [tuple(row) for row in conn.execute(sql, params).fetchall()]
+    conn.close()
+    return rows
+
+
+def test_store_dedup():
+    """按SHA-256分片保存，相同内容只保存一份，临时文件不残留"""
+    print("🧪 测试存储与去重...")
+    sha256 = hashlib.sha256(SCREENSHOT).hexdigest()
+    first = upload_store.store_stream(io.BytesIO(SCREENSHOT), UPLOAD_DIR, '截图.PNG')
+    second = upload_store.store_stream(io.BytesIO(SCREENSHOT), UPLOAD_DIR, 'image.png')
+    assert first['sha256'] == second['sha256'] == sha256
+    assert first['created'] and not second['created']
+    assert first['name'] == f'{sha256}.png' and first['size'] == len(SCREENSHOT)
+    path = upload_store.blob_file_path(UPLOAD_DIR, sha256)
+    assert path.endswith(os.path.join('blobs', sha256[:2], sha256[2:4], sha256))
+    assert _blob_files() == [path]
+    assert os.listdir(os.path.join(upload_store.blob_folder(UPLOAD_DIR), 'tmp')) == []
+
+    assert upload_store.resolve_blob(UPLOAD_DIR, f'{sha256}.png') == path
+    assert upload_store.resolve_blob(UPLOAD_DIR, 'image.png') is None
+    assert upload_store.resolve_blob(UPLOAD_DIR, f'../{sha256}') is None
+    print("✅ 存储与去重正常")
+
+
+def test_submit_with_images():
+    """提交问题：相同截图只保存一份，每张附件都登记引用，按原始文件名显示"""
+    print("🧪 测试提交附件...")
+    ssz = login_client('blob_ssz')
+    result = json.loads(ssz.post('/bug/submit', data={
+        'title': '附件问题', 'description': '描述', 'manager': '负责人乙',
+        'images': [(io.BytesIO(SCREENSHOT), 'image.png'), (io.BytesIO(SCREENSHOT), 'image.png'),
+                   (io.BytesIO(b'log line'), 'app.log')],
+    }, content_type='multipart/form-data').data)
+    assert result['success'], result
+    bug_id = result['bug_id']
+
+    images = _query('SELECT i.image_path, r.sha256, r.original_name FROM bug_images i '
+                    'JOIN bug_image_blobs r ON r.bug_image_id = i.id WHERE i.bug_id = ? ORDER BY i.id', (bug_id,))
+    sha256 = hashlib.sha256(SCREENSHOT).hexdigest()
+    assert [row[1] for row in images[:2]] == [sha256, sha256], images
+    assert images[0][0] == f'uploads/{sha256}.png' and images[2][2] == 'app.log', images
+    assert _query('SELECT image_path FROM bugs WHERE id = ?', (bug_id,)) == [(images[0][0],)]
+    assert len(_query('SELECT sha256 FROM upload_blobs')) == 2
+    assert len(_blob_files()) == 2
+
+    response = ssz.get(f'/uploads/{sha256}.png')
+    assert response.status_code == 200 and response.data == SCREENSHOT
+    assert response.mimetype == 'image/png' and response.cache_control.max_age == 31536000
+    assert ssz.get('/uploads/' + '0' * 64 + '.png').status_code == 404
+
+    page = ssz.get(f'/bug/{bug_id}').get_data(as_text=True)
+    assert 'app.log' in page and f'/uploads/{sha256}.png' in page
+    print("✅ 提交附件正常")
+    return ssz, bug_id
+
+
+def test_migrate_legacy_uploads():
+    """迁移工具：旧附件转为按内容寻址，路径与引用更新，可重复运行"""
+    print("🧪 测试旧附件迁移...")
+    with open(os.path.join(UPLOAD_DIR, 'old_shot.png'), 'wb') as f:
+        f.write(SCREENSHOT)
+    with open(os.path.join(UPLOAD_DIR, 'old_only.png'), 'wb') as f:
+        f.write(b'legacy main image')
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("INSERT INTO bugs (title, status, created_by, image_path) VALUES ('旧问题1', '待处理', 1, 'uploads/old_shot.png')")
+    old_bug = c.lastrowid
+    c.execute("INSERT INTO bug_images (bug_id, image_path) VALUES (?, 'uploads/old_shot.png')", (old_bug,))
+    c.execute("INSERT INTO bugs (title, status, created_by, image_path) VALUES ('旧问题2', '待处理', 1, '/uploads/old_only.png')")
+    main_only_bug = c.lastrowid
+    c.execute("INSERT INTO bug_images (bug_id, image_path) VALUES (?, 'uploads/missing.png')", (old_bug,))
+    conn.commit()
+
+    assert migrate_uploads_to_blobs.backfill_bug_images(c) == 1
+    conn.commit()
+    migrator = migrate_uploads_to_blobs.UploadMigrator(UPLOAD_DIR)
+    assert migrator.migrate_bug_images(conn, batch_size=1) == 2
+    assert migrator.migrate_bug_main_images(conn) == 2
+    assert migrator.missing == {'missing.png'}
+    conn.close()
+
+    sha256 = hashlib.sha256(SCREENSHOT).hexdigest()
+    assert _query('SELECT image_path FROM bugs WHERE id = ?', (old_bug,)) == [(f'uploads/{sha256}.png',)]
+    main_only = _query('SELECT image_path FROM bugs WHERE id = ?', (main_only_bug,))[0][0]
+    assert main_only.startswith('/uploads/') and upload_store.resolve_blob(UPLOAD_DIR, main_only.split('/')[-1])
+    names = _query('SELECT r.original_name FROM bug_image_blobs r JOIN bug_images i ON i.id = r.bug_image_id '
+                   'WHERE i.bug_id IN (?, ?) ORDER BY i.id', (old_bug, main_only_bug))
+    assert names == [('old_shot.png',), ('old_only.png',)], names
+    # 与已上传的截图内容相同，不新增文件
+    assert len(_blob_files()) == 3
+
+    assert migrator.delete_originals() == 2
+    assert sorted(os.listdir(UPLOAD_DIR)) == ['blobs']
+    rerun = migrate_uploads_to_blobs.UploadMigrator(UPLOAD_DIR)
+    conn = get_db_connection()
+    assert rerun.migrate_bug_images(conn, batch_size=10) == 0
+    conn.close()
+    print("✅ 旧附件迁移正常")
+
+
+def test_gc(ssz, bug_id):
+    """删除问题后，没有其他附件引用的文件被清理，仍被引用的文件保留"""
+    print("🧪 测试无引用文件清理...")
+    assert json.loads(ssz.post(f'/bug/delete/{bug_id}').data)['success']
+    conn = get_db_connection()
+    c = conn.cursor()
+    log_sha = hashlib.sha256(b'log line').hexdigest()
+    assert upload_store.unreferenced_blobs(c) == [log_sha]
+    assert upload_store.delete_unreferenced_blobs(c, UPLOAD_DIR) == 1
+    conn.commit()
+    conn.close()
+    assert not os.path.exists(upload_store.blob_file_path(UPLOAD_DIR, log_sha))
+    assert os.path.exists(upload_store.blob_file_path(UPLOAD_DIR, hashlib.sha256(SCREENSHOT).hexdigest()))
+    print("✅ 无引用文件清理正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    seed_users(USERS)
+    test_store_dedup()
+    ssz, bug_id = test_submit_with_images()
+    test_migrate_legacy_uploads()
+    test_gc(ssz, bug_id)
+    print("🎉 上传文件存储测试全部通过")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试EmailNotifier的SMTP会话复用、批量发送和断线重连
+使用临时SQLite数据库和本地最简SMTP服务器，不连接真实邮件服务器
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import socketserver
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'smtp_session_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+from db_factory import get_db_connection
+from system_config_cache import system_config, bump_config_version
+from notification.channels.email_notifier import EmailNotifier
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """只实现发送所需命令的SMTP服务器"""
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self._reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip().upper()
+            if command.startswith('EHLO') or command.startswith('HELO'):
+                self._reply('250 stub')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                server.messages += 1
+                self._reply('250 queued')
+                if server.drop_after_message:
+                    # 模拟服务器断开空闲连接
+                    server.drop_after_message = False
+                    return
+            elif command == 'QUIT':
+                self._reply('221 bye')
+                return
+            else:
+                self._reply('502 not implemented')
+
+    def _reply(self, text):
+        self.wfile.write((text + '\r\n').encode('utf-8'))
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubSMTPHandler)
+        self.connections = 0
+        self.messages = 0
+        self.drop_after_message = False
+
+
+def _configure(port):
+    """写入指向本地SMTP服务器的邮件配置"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    for key, value in {
+        'notification_email_enabled': 'true',
+        'notification_email_smtp_server': '127.0.0.1',
+        'notification_email_smtp_port': str(port),
+        'notification_email_use_tls': 'false',
+        'notification_email_smtp_username': '',
+        'notification_email_smtp_password': '',
+    }.items():
+        c.execute('INSERT OR REPLACE INTO system_config (config_key, config_value) VALUES (?, ?)', (key, value))
+    bump_config_version(c)
+    conn.commit()
+    conn.close()
+    system_config.invalidate()
+
+
+def _recipients(count):
+    return [{'id': i, 'name': f'用户{i}', 'email': f'user{i}@example.com'} for i in range(count)]
+
+
+def test_bulk_send_single_session(smtp_server):
+    """一次批量发送只建立一个连接"""
+    print("🧪 测试批量发送复用连接...")
+    notifier = EmailNotifier()
+    results = notifier.send_bulk('🔄 问题状态更新', '状态已更新', _recipients(20), metadata={'bug_id': 1})
+    assert results == [True] * 20
+    assert smtp_server.connections == 1 and smtp_server.messages == 20
+    # 后续单条发送继续复用同一连接
+    assert notifier.send('标题', '内容', {'id': 99, 'name': '单发', 'email': 'single@example.com'})
+    assert smtp_server.connections == 1
+    notifier.session.close()
+    print("✅ 20封邮件使用了1个连接")
+
+
+def test_reconnect_on_disconnect(smtp_server):
+    """服务器断开连接后自动重连并重试"""
+    print("🧪 测试断线重连...")
+    notifier = EmailNotifier()
+    smtp_server.connections = smtp_server.messages = 0
+    smtp_server.drop_after_message = True
+    results = notifier.send_bulk('标题', '内容', _recipients(3))
+    assert results == [True, True, True]
+    assert smtp_server.messages == 3 and smtp_server.connections == 2
+    assert notifier.session.get_stats()['reconnects'] == 1
+    notifier.session.close()
+    print("✅ 断线重连正常")
+
+
+def test_idle_timeout(smtp_server):
+    """空闲超时后重新建立连接"""
+    print("🧪 测试空闲超时...")
+    notifier = EmailNotifier()
+    notifier.session.idle_timeout = 0.1
+    smtp_server.connections = 0
+    notifier.send_bulk('标题', '内容', _recipients(1))
+    time.sleep(0.2)
+    notifier.session.close_if_idle()
+    assert not notifier.session.get_stats()['connected']
+    notifier.send_bulk('标题', '内容', _recipients(1))
+    assert smtp_server.connections == 2
+    notifier.session.close()
+    print("✅ 空闲超时正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    server = StubSMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _configure(server.server_address[1])
+    try:
+        test_bulk_send_single_session(server)
+        test_reconnect_on_disconnect(server)
+        test_idle_timeout(server)
+    finally:
+        server.shutdown()
+    print("🎉 SMTP会话测试全部通过")
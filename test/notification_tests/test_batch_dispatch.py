@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流转通知的批量分发（SimpleNotifier._send_to_users / InAppNotifier.send_batch）和通知计数裁剪
+使用临时SQLite数据库，统计分发过程中打开的数据库连接数
+"""
+
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'batch_dispatch_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+import db_factory
+from db_factory import get_db_connection
+from notification.simple_notifier import simple_notifier
+from system_config_cache import system_config
+from notification.cleanup_manager import cleanup_manager
+
+USER_COUNT = 30
+
+
+def _create_users():
+    """创建产品经理，仅开启应用内通知"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    user_ids = []
+    for i in range(USER_COUNT):
+        c.execute("INSERT INTO users (username, password, role, role_en, team, chinese_name) VALUES (?, 'x', '产品经理', 'pm', '网络分析', ?)",
+                  (f'batch_pm_{i}', f'产品经理{i}'))
+        user_ids.append(c.lastrowid)
+        c.execute("INSERT INTO user_notification_preferences (user_id, email_enabled, gotify_enabled, inapp_enabled) VALUES (?, 0, 0, 1)",
+                  (c.lastrowid,))
+    c.execute("DELETE FROM system_config WHERE config_key = 'notification_max_per_user'")
+    c.execute("INSERT INTO system_config (config_key, config_value) VALUES ('notification_max_per_user', '2')")
+    conn.commit()
+    conn.close()
+    # 直接写表未更新版本行，手动刷新本进程的配置缓存
+    system_config.invalidate()
+    system_config.get_int('notification_max_per_user')
+    return user_ids
+
+
+def _count_connections(func):
+    """执行func并返回期间打开的数据库连接数"""
+    opened = []
+    original = db_factory.get_db_connection
+
+    def _counting():
+        opened.append(1)
+        return original()
+
+    db_factory.get_db_connection = _counting
+    try:
+        result = func()
+    finally:
+        db_factory.get_db_connection = original
+    return result, len(opened)
+
+
+def test_batch_dispatch_connections():
+    """30个接收人只使用常数个连接"""
+    print("🧪 测试批量分发连接数...")
+    user_ids = _create_users()
+    event_data = {'bug_id': 1, 'title': '批量测试', 'description': '描述', 'creator_name': '提交人'}
+
+    sent, connections = _count_connections(
+        lambda: simple_notifier._send_to_users('bug_created', event_data, [str(uid) for uid in user_ids] + ['999999']))
+    assert sent == USER_COUNT, sent
+    # 用户信息 + 通知偏好 + 应用内通知（一条INSERT和一条计数UPSERT共用一个连接）
+    assert connections == 3, connections
+    print(f"✅ {USER_COUNT}个接收人使用了{connections}个连接")
+
+
+def _notification_rows():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT n.user_id, COUNT(*), MAX(n.related_bug_id), MAX(nc.total_count)
+        FROM notifications n JOIN notification_counters nc ON nc.user_id = n.user_id
+        GROUP BY n.user_id
+    """)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def test_counter_and_background_trim():
+    """插入只累加计数，超出上限+余量后由后台裁剪保留最新通知"""
+    print("🧪 测试通知计数与后台裁剪...")
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SELECT id FROM users WHERE username LIKE 'batch_pm_%' ORDER BY id")
+    user_ids = [str(row[0]) for row in c.fetchall()]
+    conn.close()
+
+    for i in range(3):
+        simple_notifier._send_to_users('bug_created', {'bug_id': i + 2, 'title': f'第{i}次'}, user_ids)
+
+    # 发送路径不再删除，计数与实际数量一致
+    rows = _notification_rows()
+    assert len(rows) == USER_COUNT
+    assert all(row[1] == 4 and row[3] == 4 for row in rows), rows[:3]
+
+    # 未超过 上限(2)+余量(5)，不裁剪
+    assert cleanup_manager.trim_over_cap_users(slack=5)['total_deleted'] == 0
+
+    result = cleanup_manager.trim_over_cap_users(slack=1)
+    assert result['trimmed_users'] == USER_COUNT and result['total_deleted'] == USER_COUNT * 2, result
+    rows = _notification_rows()
+    assert all(row[1] == 2 and row[2] == 4 and row[3] == 2 for row in rows), rows[:3]
+    print("✅ 通知计数与后台裁剪正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    test_batch_dispatch_connections()
+    test_counter_and_background_trim()
+    print("🎉 批量分发测试全部通过")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试GotifyNotifier的连接复用、并发推送、单服务器并发上限和熔断
+使用临时SQLite数据库和本地HTTP服务器，不连接真实Gotify服务器
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'gotify_delivery_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+os.environ['GOTIFY_MAX_CONCURRENCY_PER_HOST'] = '4'
+os.environ['GOTIFY_BREAKER_FAILURES'] = '3'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+from db_factory import get_db_connection
+from system_config_cache import system_config, bump_config_version
+from notification.channels.gotify_notifier import GotifyNotifier
+
+REQUEST_DELAY = 0.1
+
+
+class StubGotifyHandler(BaseHTTPRequestHandler):
+    """模拟Gotify /message 接口，记录连接数和最大并发"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.tokens.append(self.headers.get('X-Gotify-Key'))
+        time.sleep(REQUEST_DELAY)
+        with server.lock:
+            server.active -= 1
+        body = b'{"id": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubGotifyHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.tokens = []
+
+
+def _configure(server_url):
+    conn = get_db_connection()
+    c = conn.cursor()
+    for key, value in {
+        'notification_gotify_enabled': 'true',
+        'notification_gotify_server_url': server_url,
+        'notification_gotify_app_token': 'global-token',
+    }.items():
+        c.execute('INSERT OR REPLACE INTO system_config (config_key, config_value) VALUES (?, ?)', (key, value))
+    bump_config_version(c)
+    conn.commit()
+    conn.close()
+    system_config.invalidate()
+
+
+def _create_recipients(count):
+    """创建接收人，偶数用户配置专属Token"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    recipients = []
+    for i in range(count):
+        token = f'user-token-{i}' if i % 2 == 0 else None
+        c.execute("INSERT INTO users (username, password, role, role_en, chinese_name, gotify_app_token) VALUES (?, 'x', 'zncy', 'zncy', ?, ?)",
+                  (f'gotify_user_{i}', f'成员{i}', token))
+        recipients.append({'id': c.lastrowid, 'name': f'成员{i}'})
+    conn.commit()
+    conn.close()
+    return recipients
+
+
+def _messages(recipients):
+    return [{'title': '🔔 问题分配给您', 'content': '内容', 'recipient': recipient,
+             'priority': 3, 'metadata': {'bug_id': 1, 'event_type': 'bug_assigned'}}
+            for recipient in recipients]
+
+
+def test_parallel_fan_out(server):
+    """并发推送，受单服务器并发上限约束并复用连接"""
+    print("🧪 测试并发推送...")
+    recipients = _create_recipients(12)
+    notifier = GotifyNotifier()
+
+    started = time.perf_counter()
+    results = notifier.send_batch(_messages(recipients))
+    elapsed = time.perf_counter() - started
+
+    assert results == [True] * 12
+    assert sorted(set(server.tokens)) == sorted({f'user-token-{i}' for i in range(0, 12, 2)} | {'global-token'})
+    assert server.max_active <= 4, server.max_active
+    # 串行需要 12 * 0.1 秒
+    assert elapsed < 12 * REQUEST_DELAY * 0.6, elapsed
+    assert server.connections <= 4, server.connections
+
+    # 第二批复用已有连接
+    notifier.send_batch(_messages(recipients[:4]))
+    assert server.connections <= 4, server.connections
+    stats = GotifyNotifier.get_stats()
+    assert stats['sent'] == 16 and stats['latency_p95_ms'] >= REQUEST_DELAY * 1000
+    print(f"✅ 12条推送耗时{elapsed:.2f}秒，最大并发{server.max_active}，连接数{server.connections}")
+
+
+def test_circuit_breaker():
+    """服务器不可达时熔断，不再继续请求"""
+    print("🧪 测试熔断...")
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    dead_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    sock.close()
+    _configure(dead_url)
+
+    notifier = GotifyNotifier()
+    recipient = {'id': 1, 'name': '管理员'}
+    for _ in range(5):
+        assert notifier.send('标题', '内容', recipient) is False
+
+    circuit = GotifyNotifier.get_stats()['circuits'][dead_url]
+    assert circuit['state'] == 'open' and circuit['rejected'] == 2, circuit
+    print("✅ 熔断正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    server = StubGotifyServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _configure(f'http://127.0.0.1:{server.server_address[1]}')
+    try:
+        test_parallel_fan_out(server)
+        test_circuit_breaker()
+    finally:
+        server.shutdown()
+    print("🎉 Gotify推送测试全部通过")
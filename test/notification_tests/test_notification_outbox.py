@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流转通知发件箱（notification.outbox）
+使用临时SQLite数据库，替换实际发送函数，验证发送、重试退避和死信；
+并用真实的发送函数验证数据库不可用时通知进入重试而不是被标记为已发送，以及进程内工作线程在第一个请求时启动
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'outbox_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+import db_factory
+from db_factory import get_db_connection
+from notification import outbox
+from notification.outbox import NotificationOutboxWorker, enqueue_flow_notification
+from notification.simple_notifier import simple_notifier
+
+
+def _enqueue(event_type='bug_created', bug_id=1, **event_data):
+    conn = get_db_connection()
+    c = conn.cursor()
+    enqueue_flow_notification(c, event_type, dict({'bug_id': bug_id, 'title': '测试问题'}, **event_data))
+    conn.commit()
+    conn.close()
+
+
+def _latest_row():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('SELECT status, attempts, last_error FROM notification_outbox ORDER BY id DESC LIMIT 1')
+    row = c.fetchone()
+    conn.close()
+    return tuple(row)
+
+
+def test_send_success():
+    """发送成功后标记为sent"""
+    print("🧪 测试发件箱发送成功...")
+    sent = []
+    original = simple_notifier.send_flow_notification
+    simple_notifier.send_flow_notification = lambda event_type, event_data, raise_on_error=False: sent.append(event_type)
+    try:
+        _enqueue('bug_created')
+        worker = NotificationOutboxWorker(workers=1)
+        assert worker.process_once() == 1
+        assert worker.process_once() == 0
+    finally:
+        simple_notifier.send_flow_notification = original
+    assert sent == ['bug_created']
+    assert _latest_row()[:2] == ('sent', 1)
+    print("✅ 发件箱发送成功")
+
+
+def test_retry_then_dead():
+    """失败后按退避重试，超过最大次数进入死信，可重新排队"""
+    print("🧪 测试发件箱重试与死信...")
+
+    def _fail(event_type, event_data, raise_on_error=False):
+        raise RuntimeError('channel down')
+
+    original = simple_notifier.send_flow_notification
+    simple_notifier.send_flow_notification = _fail
+    try:
+        _enqueue('bug_closed')
+        worker = NotificationOutboxWorker(workers=1, max_attempts=3, base_backoff=3600)
+        assert worker.process_once() == 1
+        assert _latest_row()[:2] == ('pending', 1)
+        # 退避时间未到，不会被再次领取
+        assert worker.process_once() == 0
+
+        # 模拟退避时间已到
+        conn = get_db_connection()
+        conn.execute("UPDATE notification_outbox SET next_attempt_at = '2000-01-01 00:00:00' WHERE status = 'pending'")
+        conn.commit()
+        conn.close()
+        worker.base_backoff = 0
+        worker.process_once()
+        worker.process_once()
+        status, attempts, last_error = _latest_row()
+        assert (status, attempts) == ('dead', 3) and 'channel down' in last_error
+        assert worker.get_stats()['dead'] == 1
+
+        assert worker.retry_dead() == 1
+        assert _latest_row()[0] == 'pending'
+    finally:
+        simple_notifier.send_flow_notification = original
+    print("✅ 发件箱重试与死信正常")
+
+
+def test_database_outage_is_retried():
+    """发送时数据库不可用（查询通知目标、收件人或通知偏好失败）：通知重新排队，不标记为已发送"""
+    print("🧪 测试发送时数据库不可用...")
+
+    def _unavailable():
+        raise RuntimeError('database unavailable')
+
+    original = simple_notifier.send_flow_notification
+
+    def _send_with_outage(event_type, event_data, raise_on_error=False):
+        # 只在发送过程中数据库不可用，发件箱自身的读写正常
+        db_factory.get_db_connection = _unavailable
+        try:
+            return original(event_type, event_data, raise_on_error=raise_on_error)
+        finally:
+            db_factory.get_db_connection = get_db_connection
+
+    conn = get_db_connection()
+    conn.execute('DELETE FROM notification_outbox')
+    conn.commit()
+    conn.close()
+    simple_notifier.send_flow_notification = _send_with_outage
+    try:
+        worker = NotificationOutboxWorker(workers=1, base_backoff=3600)
+        # 未指定负责人：按角色查询通知目标失败
+        _enqueue('bug_created')
+        assert worker.process_once() == 1
+        status, attempts, last_error = _latest_row()
+        assert (status, attempts) == ('pending', 1) and 'database unavailable' in last_error
+
+        # 目标来自事件数据：查询收件人信息失败
+        _enqueue('bug_assigned', assignee_id=1)
+        assert worker.process_once() == 1
+        status, attempts, last_error = _latest_row()
+        assert (status, attempts) == ('pending', 1) and 'database unavailable' in last_error
+    finally:
+        simple_notifier.send_flow_notification = original
+    print("✅ 数据库不可用时通知进入重试")
+
+
+def test_worker_starts_on_first_request():
+    """进程内模式：重启后不需要新的流转事件，第一个请求即启动工作线程并投递遗留的记录"""
+    print("🧪 测试进程内工作线程自动启动...")
+    conn = get_db_connection()
+    conn.execute('DELETE FROM notification_outbox')
+    conn.commit()
+    conn.close()
+    _enqueue('bug_created', assigned_manager_id=1)
+
+    sent = []
+    original = simple_notifier.send_flow_notification
+    simple_notifier.send_flow_notification = lambda event_type, event_data, raise_on_error=False: sent.append(event_type)
+    outbox.OUTBOX_INPROCESS = True
+    try:
+        assert not any(t.is_alive() for t in outbox.outbox_worker._threads)
+        rebugtracker.app.test_client().get('/login')
+        assert any(t.is_alive() for t in outbox.outbox_worker._threads)
+        deadline = time.monotonic() + 10
+        while _latest_row()[0] != 'sent' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert _latest_row()[:2] == ('sent', 1) and sent == ['bug_created']
+    finally:
+        outbox.OUTBOX_INPROCESS = False
+        outbox.outbox_worker.stop()
+        simple_notifier.send_flow_notification = original
+    print("✅ 进程内工作线程自动启动正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    test_send_success()
+    test_retry_then_dead()
+    test_database_outage_is_retried()
+    test_worker_starts_on_first_request()
+    print("🎉 发件箱测试全部通过")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试未读通知计数（notification_counters.unread_count）和实时通知流（/api/notifications/stream）
+使用临时SQLite数据库，用两个NotificationHub实例模拟两个gunicorn worker
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_DB_PATH'] = os.path.join(_tmp_dir, 'notification_stream_test.db')
+os.environ['NOTIFICATION_OUTBOX_INPROCESS'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import rebugtracker
+from db_factory import get_db_connection
+from notification.channels.inapp_notifier import InAppNotifier
+from notification.realtime import NotificationHub, stream_unread_events, notification_hub
+
+
+def _admin_id():
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SELECT id FROM users WHERE username = 'admin'")
+    user_id = str(c.fetchone()[0])
+    conn.close()
+    return user_id
+
+
+def _send(notifier, user_id, count):
+    return notifier.send_batch([{'title': f'通知{i}', 'content': '内容', 'recipient': {'id': user_id, 'name': '管理员'},
+                                 'priority': 1, 'metadata': {'bug_id': i}} for i in range(count)])
+
+
+def _notification_ids(user_id):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('SELECT id FROM notifications WHERE user_id = ? ORDER BY id', (user_id,))
+    ids = [row[0] for row in c.fetchall()]
+    conn.close()
+    return ids
+
+
+def test_unread_counter(user_id):
+    """新增、单条已读、重复已读、全部已读都同步维护未读数"""
+    print("🧪 测试未读计数...")
+    notifier = InAppNotifier()
+    assert _send(notifier, user_id, 5) == [True] * 5
+    assert notifier.get_unread_count(user_id) == 5
+
+    first_id = _notification_ids(user_id)[0]
+    assert notifier.mark_as_read(first_id, user_id)
+    assert notifier.get_unread_count(user_id) == 4
+    # 重复标记成功但不重复扣减
+    assert notifier.mark_as_read(first_id, user_id)
+    assert notifier.get_unread_count(user_id) == 4
+    assert not notifier.mark_as_read(999999, user_id)
+
+    assert notifier.mark_all_as_read(user_id)
+    assert notifier.get_unread_count(user_id) == 0
+    print("✅ 未读计数正常")
+
+
+def test_cross_worker_stream(user_id):
+    """另一个worker写入的通知由本worker的轮询线程推送到SSE连接"""
+    print("🧪 测试跨进程推送...")
+    worker_hub = NotificationHub(poll_interval=0.1, max_clients=2)
+    subscription = worker_hub.subscribe(user_id)
+    events = []
+
+    def _consume():
+        for chunk in stream_unread_events(worker_hub, subscription, keepalive=0.2, lifetime=1.5):
+            events.append(chunk)
+
+    consumer = threading.Thread(target=_consume)
+    consumer.start()
+    time.sleep(0.3)
+    # InAppNotifier 只唤醒全局的 notification_hub，worker_hub 只能通过轮询感知
+    _send(InAppNotifier(), user_id, 2)
+    time.sleep(0.4)
+    consumer.join()
+
+    unread = [json.loads(chunk.split('data: ')[1]) for chunk in events if chunk.startswith('id: ')]
+    assert events[0].startswith('retry: ')
+    assert [state['unread_count'] for state in unread] == [0, 2], unread
+    assert any(chunk.startswith(': keepalive') for chunk in events)
+    # 生成器结束后取消订阅，轮询线程随之退出
+    time.sleep(0.2)
+    stats = worker_hub.get_stats()
+    assert stats['clients'] == 0 and not stats['poller_running'], stats
+    print(f"✅ 跨进程推送正常（{stats['polls']}次轮询）")
+
+
+def test_client_limit(user_id):
+    """超过每个worker的连接上限时拒绝订阅"""
+    print("🧪 测试连接上限...")
+    hub = NotificationHub(poll_interval=0.1, max_clients=1)
+    first = hub.subscribe(user_id)
+    assert first is not None and hub.subscribe(user_id) is None
+    hub.unsubscribe(first)
+    assert hub.get_stats()['rejected'] == 1
+    print("✅ 连接上限正常")
+
+
+def test_stream_endpoint(user_id):
+    """SSE接口返回事件流，未读数接口只读计数"""
+    print("🧪 测试SSE接口...")
+    client = rebugtracker.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin'})
+
+    data = json.loads(client.get('/api/notifications/unread-count').data)
+    assert data['success'] and data['unread_count'] == 2, data
+
+    response = client.get('/api/notifications/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    chunks = response.iter_encoded()
+    assert next(chunks).decode().startswith('retry: ')
+    first_event = next(chunks).decode()
+    assert '"unread_count": 2' in first_event, first_event
+    assert notification_hub.get_stats()['clients'] == 1
+    response.close()
+    assert notification_hub.get_stats()['clients'] == 0
+    print("✅ SSE接口正常")
+
+
+if __name__ == '__main__':
+    rebugtracker.init_db()
+    admin_id = _admin_id()
+    test_unread_counter(admin_id)
+    test_cross_worker_stream(admin_id)
+    test_client_limit(admin_id)
+    test_stream_endpoint(admin_id)
+    print("🎉 实时通知测试全部通过")
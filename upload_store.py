@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的上传文件存储
+上传文件按SHA-256存放在 uploads/blobs/<前2位>/<3-4位>/<哈希>，相同内容的文件只保存一份。
+
+- 写入时边读边计算哈希（分块，不把整个文件读入内存），先写临时文件，再原子重命名到最终位置；
+  并发上传同一内容时各自重命名，结果相同，不需要按文件名探测空闲名称
+- 对外的文件名为 <哈希>.<扩展名>（bug_images.image_path 存 uploads/<哈希>.<扩展名>），
+  /uploads/<filename> 路由通过 resolve_blob 找到分片目录中的文件，扩展名只用于Content-Type
+- upload_blobs 记录每个文件，bug_image_blobs 记录附件（bug_images）引用的文件和原始文件名；
+  没有附件引用的文件由 delete_unreferenced_blobs 清理（database_tools/maintenance_tools/migrate_uploads_to_blobs.py --gc）
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from sql_adapter import adapt_sql
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+# 对外文件名：<64位十六进制哈希>[.<扩展名>]
+BLOB_NAME_RE = re.compile(r'^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?$')
+
+
+def blob_folder(upload_folder: str) -> str:
+    return os.path.join(upload_folder, BLOB_DIR)
+
+
+def blob_file_path(upload_folder: str, sha256: str) -> str:
+    """哈希对应的分片存储路径"""
+    return os.path.join(blob_folder(upload_folder), sha256[:2], sha256[2:4], sha256)
+
+
+def _original_name(filename: str) -> str:
+    """去掉目录部分的原始文件名（只用于显示，中文文件名保留）"""
+    return (filename or '').replace('\\', '/').split('/')[-1][:255]
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(_original_name(filename))[1].lower()
+    return ext if re.match(r'^\.[a-z0-9]{1,10}$', ext) else ''
+
+
+def blob_name(sha256: str, filename: str) -> str:
+    """对外文件名：哈希 + 原始扩展名"""
+    return sha256 + _extension(filename)
+
+
+def resolve_blob(upload_folder: str, filename: str) -> Optional[str]:
+    """对外文件名对应的存储路径；不是内容寻址的文件名（旧上传）时返回None"""
+    match = BLOB_NAME_RE.match(filename or '')
+    if not match:
+        return None
+    return blob_file_path(upload_folder, match.group(1))
+
+
+def store_stream(stream: BinaryIO, upload_folder: str, filename: str) -> Dict[str, Any]:
+    """保存文件流，返回 {'sha256', 'name', 'original_name', 'size', 'created'}
+
+    created为False表示相同内容的文件已存在（去重，未写入新文件）
+    """
+    tmp_dir = os.path.join(blob_folder(upload_folder), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = blob_file_path(upload_folder, sha256)
+        created = not os.path.exists(final_path)
+        if created:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        else:
+            os.remove(tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {
+        'sha256': sha256,
+        'name': blob_name(sha256, filename),
+        'original_name': _original_name(filename) or sha256,
+        'size': size,
+        'created': created,
+    }
+
+
+def store_upload(file, upload_folder: str) -> Dict[str, Any]:
+    """保存上传的文件（werkzeug FileStorage）"""
+    return store_stream(file.stream, upload_folder, file.filename)
+
+
+def store_file(path: str, upload_folder: str, filename: Optional[str] = None) -> Dict[str, Any]:
+    """保存磁盘上已有的文件（迁移旧上传时使用），原文件不变"""
+    with open(path, 'rb') as f:
+        return store_stream(f, upload_folder, filename or os.path.basename(path))
+
+
+def record_blob(cursor, stored: Dict[str, Any]) -> None:
+    """登记文件（已登记时不变）"""
+    query, params = adapt_sql('''
+        INSERT INTO upload_blobs (sha256, size_bytes)
+        VALUES (%s, %s)
+        ON CONFLICT (sha256) DO NOTHING
+    ''', (stored['sha256'], stored['size']))
+    cursor.execute(query, params)
+
+
+def attach_blob(cursor, bug_image_id: int, stored: Dict[str, Any]) -> None:
+    """登记附件引用的文件"""
+    record_blob(cursor, stored)
+    query, params = adapt_sql('''
+        INSERT INTO bug_image_blobs (bug_image_id, sha256, original_name)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (bug_image_id) DO UPDATE SET sha256 = excluded.sha256, original_name = excluded.original_name
+    ''', (bug_image_id, stored['sha256'], stored['original_name']))
+    cursor.execute(query, params)
+
+
+def unreferenced_blobs(cursor) -> List[str]:
+    """没有附件引用的文件（附件或问题已删除）"""
+    cursor.execute('''
+        SELECT ub.sha256 FROM upload_blobs ub
+        WHERE NOT EXISTS (
+            SELECT 1 FROM bug_image_blobs r
+            JOIN bug_images i ON i.id = r.bug_image_id
+            JOIN bugs b ON b.id = i.bug_id
+            WHERE r.sha256 = ub.sha256
+        )
+    ''')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def delete_unreferenced_blobs(cursor, upload_folder: str) -> int:
+    """删除没有附件引用的文件、其图片变体及登记，返回删除的文件数（调用方负责提交）"""
+    import image_variants
+
+    deleted = 0
+    for sha256 in unreferenced_blobs(cursor):
+        query, params = adapt_sql('DELETE FROM bug_image_blobs WHERE sha256 = %s', (sha256,))
+        cursor.execute(query, params)
+        query, params = adapt_sql('DELETE FROM upload_blobs WHERE sha256 = %s', (sha256,))
+        cursor.execute(query, params)
+        image_variants.delete_variants(upload_folder, sha256)
+        path = blob_file_path(upload_folder, sha256)
+        if os.path.exists(path):
+            os.remove(path)
+            deleted += 1
+    return deleted